@@ -1,7 +1,13 @@
-from abaqus_io.deck_read import read_deck
-from abaqus_io.deck_write import write_deck, write_buffer
+from abaqus_io.deck_read import read_deck, open_chunks
+from abaqus_io.deck_write import write_deck, write_buffer, iter_buffer, write_partitioned
+from abaqus_io.deck_write import write_split_deck, split_deck_paths, split_deck_includes
+from abaqus_io.native_io import read_native, write_native, read_native_manifest, is_native
+from abaqus_io.vtu_write import write_vtu
+from abaqus_io.mesh_diff import diff, apply_patch, section_hashes
+from abaqus_io.mesh_tiles import MeshTiler
 
 from abaqus_io.mesh_io import Mesh
 from abaqus_io.element_block import ElementBlock
+from abaqus_io.spatial_index import SpatialIndex
 
-__all__ = ["read_deck", "write_deck", "write_buffer", "Mesh", "ElementBlock"]
+__all__ = ["read_deck", "open_chunks", "write_deck", "write_buffer", "iter_buffer", "write_partitioned", "write_split_deck", "split_deck_paths", "split_deck_includes", "read_native", "write_native", "read_native_manifest", "is_native", "write_vtu", "diff", "apply_patch", "section_hashes", "Mesh", "ElementBlock", "SpatialIndex", "MeshTiler"]
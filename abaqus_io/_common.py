@@ -81,6 +81,30 @@ def flatten_cell_data(structured_cell_data):
     }
 
 
+def concat_ranges(starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """
+    Concatenates the half-open integer ranges [starts[i], stops[i]) into a
+    single array without a Python loop.
+
+    Args:
+        starts: A 1D array of range starts.
+        stops: A 1D array of range ends (exclusive), same length as `starts`.
+
+    Returns:
+        A 1D int64 array holding all ranges one after another.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(stops, dtype=np.int64) - starts
+    keep = lengths > 0
+    starts, lengths = starts[keep], lengths[keep]
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    # position of each element inside its own range, offset by the range start
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return np.arange(total, dtype=np.int64) + offsets
+
+
 def find_common_values_with_indices(input_list: list) -> dict:
     """
     Finds common values in a list and returns a dictionary
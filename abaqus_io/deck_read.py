@@ -2,24 +2,135 @@
 I/O for Abaqus inp files.
 """
 
+import io
 import itertools
+import os
 from pathlib import Path
 from typing import List
 
 import numpy as np
 
 from abaqus_io.mesh_io import Mesh
+from . import profiling
 from .element_block import ElementBlock
 from .deck_utility import _get_option_map, _read_cells, _read_nodes, _read_set
 
 
-def read_deck(filename, validate_flag: bool = True):
-    """Reads an Abaqus inp file."""
+def read_deck(filename, validate_flag: bool = True, progress=None, base_dir=None):
+    """
+    Reads an Abaqus inp file.
+
+    `filename` is a path or a readable text file object, e.g. one returned by
+    `open_chunks`, which is read from its current position and not closed.
+    Included decks are looked up in `base_dir`, by default the directory of
+    the file (the current directory for file objects without a name).
+
+    `progress`, if given, is called as ``progress(position, section)`` with
+    the characters read so far and the keyword being parsed, at every keyword
+    and every `_ProgressReader.INTERVAL` lines within a section. An exception
+    raised by it aborts the parsing, e.g. to cancel it.
+
+    Within `profiling.profile` the time, characters and rows of every
+    section are recorded, see `abaqus_io.profiling`.
+    """
+    trace_path = profiling.env_trace_path()
+    if trace_path:
+        with profiling.profile(memory=os.environ.get(profiling.PROFILE_MEMORY_ENV) == "1") as prof:
+            mesh = read_deck(filename, validate_flag, progress, base_dir)
+        prof.write_trace(trace_path)
+        return mesh
+
+    if isinstance(filename, (str, os.PathLike)):
+        with open(filename, "r") as f:
+            return read_deck(f, validate_flag, progress, base_dir or Path(filename).parent)
+
+    f = filename
+    if base_dir is None:
+        name = getattr(f, "name", None)
+        base_dir = Path(name).parent if isinstance(name, str) else Path.cwd()
+    if progress is not None:
+        f = _ProgressReader(f, progress)
+    elif profiling.enabled():
+        # counts the characters of every section
+        f = _ProgressReader(f, _ignore_progress)
+    return _read_buffer(f, validate_flag, base_dir=Path(base_dir))
+
+
+def open_chunks(chunks, encoding: str = "utf-8") -> io.TextIOWrapper:
+    """
+    Returns a text file object reading the concatenation of byte chunks.
+
+    Chunks are pulled from the iterable as the file is read, so a deck can be
+    parsed with `read_deck` while it is still being received, e.g. from a
+    request body or a file being written.
+    """
+    return io.TextIOWrapper(io.BufferedReader(_ChunkStream(chunks)), encoding=encoding)
+
+
+class _ChunkStream(io.RawIOBase):
+    """A raw binary stream over an iterable of byte chunks."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._pending = memoryview(chunk)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+class _ProgressReader:
+    """Wraps a text file, reporting the position of `readline` to a callback."""
+
+    # Lines read between two reports within a section
+    INTERVAL = 1 << 16
+
+    def __init__(self, f, progress):
+        self._f = f
+        self._progress = progress
+        self.position = 0
+        self.section = None
+        self._lines = 0
+
+    def readline(self) -> str:
+        line = self._f.readline()
+        self.position += len(line)
+        self._lines += 1
+        if self._lines >= self.INTERVAL:
+            self._lines = 0
+            self._progress(self.position, self.section)
+        return line
+
+    def enter(self, section: str) -> None:
+        """Reports the start of a keyword section."""
+        self.section = section
+        self._lines = 0
+        self._progress(self.position, section)
+
+
+def _ignore_progress(position, section):
+    pass
+
+
+def _read_include(filename):
+    """Reads an included deck, which may rely on nodes defined elsewhere."""
     with open(filename, "r") as f:
-        return _read_buffer(f, validate_flag)
+        if profiling.enabled():
+            f = _ProgressReader(f, _ignore_progress)
+        return _read_buffer(f, validate_flag=False, included=True, base_dir=Path(filename).parent)
 
 
-def _read_buffer(f, validate_flag: bool = True):
+def _read_buffer(f, validate_flag: bool = True, included: bool = False, base_dir: Path = Path(".")):
     # Initialize data fields, later to combine together
     points: list[np.ndarray] = []
     point_ids: list[list[int]] = []
@@ -34,8 +145,8 @@ def _read_buffer(f, validate_flag: bool = True):
     node_sets_in_node = {}  # Handle cell sets defined in NODE
     cell_sets_in_element = {}  # Handle cell sets defined in ELEMENT
 
-    # for externally included deck in the current deck
-    mesh_ext = None
+    # for externally included decks in the current deck
+    mesh_exts: list[Mesh] = []
 
     # start parsing data
     line = f.readline()
@@ -51,6 +162,10 @@ def _read_buffer(f, validate_flag: bool = True):
             continue
 
         keyword = line.partition(",")[0].strip().replace("*", "").upper()
+        if isinstance(f, _ProgressReader):
+            f.enter(keyword)
+        section = profiling.begin(keyword, "section", reader=f)
+        rows = None
 
         if keyword == "NODE":
             options_map = _get_option_map(line)
@@ -59,9 +174,10 @@ def _read_buffer(f, validate_flag: bool = True):
                 node_sets_in_node.update(sets)
             points.append(coords)
             point_ids.append(ids)
+            rows = len(ids)
 
         elif keyword == "ELEMENT":
-            if not point_ids:
+            if not point_ids and not mesh_exts and not included:
                 raise Exception("Expected *NODE definition before *ELEMENT definition")
 
             options_map = _get_option_map(line, required_keys=["TYPE"])
@@ -69,6 +185,7 @@ def _read_buffer(f, validate_flag: bool = True):
             if sets:
                 cell_sets_in_element.update(sets)
             cells.append(ElementBlock(options_map["TYPE"], ids, nodes))
+            rows = len(ids)
 
         elif keyword == "NSET":
             options_map = _get_option_map(line, required_keys=["NSET"])
@@ -79,6 +196,7 @@ def _read_buffer(f, validate_flag: bool = True):
                 node_sets[name].extend(set_ids)
             else:
                 node_sets[name] = set_ids
+            rows = len(set_ids)
 
         elif keyword == "ELSET":
             options_map = _get_option_map(line, required_keys=["ELSET"])
@@ -102,6 +220,7 @@ def _read_buffer(f, validate_flag: bool = True):
                 elem_sets[name].extend(elem_sets_local)
             else:
                 elem_sets[name] = elem_sets_local
+            rows = len(elem_sets_local)
 
         elif keyword == "SURFACE":
             options_map = _get_option_map(line, required_keys=["NAME", "TYPE"])
@@ -116,17 +235,19 @@ def _read_buffer(f, validate_flag: bool = True):
 
         elif keyword == "INCLUDE":
             # split line to get external deck filepath (example: *INCLUDE, INPUT=bulk.inp)
-            ext_input_file = Path(f.name).parent / Path(line.split("=")[-1].strip())
+            ext_input_file = base_dir / Path(line.split("=")[-1].strip())
             if not ext_input_file.exists():
                 raise IOError(f"INCLUDE deck file does not exist {str(ext_input_file)}")
 
-            mesh_ext = read_deck(ext_input_file, validate_flag=False)
+            mesh_exts.append(_read_include(ext_input_file))
             line = f.readline()
 
         else:
             line = f.readline()
+        section.end(rows)
     # ---- END OF PARSING ----
 
+    sets_phase = profiling.begin("sets")
     # Parse cell sets defined in ELEMENT
     for name in cell_sets_in_element.keys():
         if name in elem_sets.keys():
@@ -142,22 +263,30 @@ def _read_buffer(f, validate_flag: bool = True):
         else:
             node_sets[name] = node_sets_in_node[name]
     node_sets_in_node.clear()
+    sets_phase.end()
 
     # concatenate the list to an full array
-    points_total = np.concatenate(points)
-    point_ids_total = list(itertools.chain.from_iterable(point_ids))
-
-    if mesh_ext is not None:
-        _mesh = _merge(
-            points_total,
-            point_ids_total,
-            cells,
-            node_sets,
-            elem_sets,
-            surf_sets,
-            mesh_ext,
-            validate_flag,
-        )
+    with profiling.phase("concatenate"):
+        points_total = np.concatenate(points) if points else np.empty((0, 3))
+        point_ids_total = list(itertools.chain.from_iterable(point_ids))
+
+    if mesh_exts:
+        # merge included decks one after another, validating only the result
+        for k, mesh_ext in enumerate(mesh_exts):
+            merge_phase = profiling.begin("merge")
+            _mesh = _merge(
+                points_total,
+                point_ids_total,
+                cells,
+                node_sets,
+                elem_sets,
+                surf_sets,
+                mesh_ext,
+                validate_flag and k == len(mesh_exts) - 1,
+            )
+            merge_phase.end()
+            points_total, point_ids_total, cells = _mesh.points, _mesh.point_ids, _mesh.cells
+            node_sets, elem_sets, surf_sets = _mesh.node_sets, _mesh.elem_sets, _mesh.surface_sets
     else:
         _mesh = Mesh(
             points_total,
@@ -187,7 +316,8 @@ def _merge(
     points_total = np.concatenate([points, mesh_ext.points])
     point_ids_total = point_ids + mesh_ext.point_ids
 
-    cells_total = ElementBlock.unique_cat(cells + mesh_ext.cells)
+    blocks = [block for block in cells + mesh_ext.cells if len(block)]
+    cells_total = ElementBlock.unique_cat(blocks) if blocks else []
 
     for name, val in mesh_ext.node_sets.items():
         if name in node_sets.keys():
@@ -1,95 +1,579 @@
+from __future__ import annotations
+
+import itertools
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+
 import numpy as np
-from .mesh_io import Mesh
+from .mesh_io import SECTIONS, Mesh
 
 
 func_node_line = lambda ids: ",".join(f"{id:>9}" for id in ids)
 
 
-def write_deck(filename: str, mesh: Mesh, comment_line: str = "") -> None:
-    """Writes an Abaqus inp file, focusing on geometry portion."""
-    with open(filename, "wt") as f:
-        write_buffer(f, mesh, comment_line)
+def write_deck(
+    filename: str, mesh: Mesh, comment_line: str = "", workers: int | None = None
+) -> None:
+    """
+    Writes an Abaqus inp file, focusing on geometry portion.
+
+    With more than one worker, the sections and row ranges of large sections
+    are formatted in a process pool that reads the mesh arrays from shared
+    memory; the fragments are written in order and the file is identical to
+    the single-process output.
+    """
+    if workers is None or workers <= 1:
+        with open(filename, "wt") as f:
+            write_buffer(f, mesh, comment_line)
+    else:
+        _write_deck_parallel(filename, mesh, comment_line, workers)
+
+
+def split_deck_paths(filename: str) -> dict[str, Path]:
+    """Returns the include file of every deck section of a split deck."""
+    path = Path(filename)
+    return {
+        section: path.with_name(f"{path.stem}_{section}{path.suffix or '.inp'}")
+        for section in SECTIONS
+    }
+
+
+def split_deck_includes(filename) -> dict[str, Path] | None:
+    """
+    Returns the include file of every deck section of a split deck written by
+    `write_split_deck`, or None if `filename` is missing or not such a deck.
+    """
+    path = Path(filename)
+    if not path.is_file():
+        return None
+    # the file may be binary, e.g. a native project
+    with open(path, errors="replace") as f:
+        # a split deck is a comment line and an include per section
+        lines = f.read(64 * 1024).splitlines()
+    includes = [line for line in lines if line.upper().startswith("*INCLUDE, INPUT=")]
+    if len(includes) != len(SECTIONS) or len(lines) - len(includes) > 1:
+        return None
+    paths = {section: path.parent / line.split("=", 1)[1].strip() for section, line in zip(SECTIONS, includes)}
+    if not all(path.stem.endswith(f"_{section}") for section, path in paths.items()):
+        return None
+    return paths
+
+
+def write_split_deck(
+    filename: str, mesh: Mesh, comment_line: str = "", sections=None, base=None
+) -> list[Path]:
+    """
+    Writes an Abaqus inp file as a main deck that includes one file per section.
+
+    Only the section files listed in `sections`, by default the dirty sections
+    of the mesh, are rewritten, so saving a small edit costs only the affected
+    sections instead of the whole deck; the main deck includes the files of
+    `base` for the others. Missing section files are always written, and all
+    of them are while `base` is not a split deck (e.g. a monolithic deck).
+    Every file is written to a temporary file and moved into place, so an
+    interrupted save never leaves a truncated deck behind. With a `base`
+    other than `filename`, the files of `base` are never modified, so a
+    crash leaves it complete and consistent.
+
+    Parameters
+    ----------
+    filename : str
+        The path of the main deck. Section files are placed next to it, see
+        `split_deck_paths`.
+    mesh : Mesh
+        The mesh to write. The written sections are cleared from its
+        `dirty_sections`.
+    comment_line : str
+        An optional first line of the main deck.
+    sections : iterable of str, optional
+        The sections to rewrite.
+    base : str, optional
+        The split deck, in the same directory, whose section files are kept;
+        by default `filename` itself.
+
+    Returns
+    -------
+    list[Path]
+        The files actually written.
+    """
+    paths = split_deck_paths(filename)
+    sections = set(mesh.dirty_sections if sections is None else sections)
+    unknown = sections.difference(SECTIONS)
+    if unknown:
+        raise ValueError(f"Unknown deck sections: {sorted(unknown)}")
+    current = split_deck_includes(filename if base is None else base) or {}
+
+    written, written_sections = [], []
+    includes = {}
+    for section, path in paths.items():
+        kept = current.get(section)
+        if section in sections or kept is None or not kept.exists():
+            _write_atomic(path, iter_buffer(mesh, sections=(section,)))
+            written.append(path)
+            written_sections.append(section)
+            kept = path
+        includes[section] = kept
+
+    # the main deck goes last, so it only refers to complete section files
+    main_path = Path(filename)
+    main = "".join(
+        [f"{comment_line}\n" if comment_line else ""]
+        + [f"*INCLUDE, INPUT={path.name}\n" for path in includes.values()]
+    )
+    if not (main_path.is_file() and main_path.read_text() == main):
+        _write_atomic(main_path, [main])
+        written.append(main_path)
+
+    # without arguments clear_dirty would clear every section
+    if written_sections:
+        mesh.clear_dirty(*written_sections)
+    return written
+
+
+def _write_atomic(path: Path, chunks) -> None:
+    """Writes text chunks to a temporary file and then replaces `path` with it."""
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wt") as f:
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def write_partitioned(
+    dirname: str,
+    mesh: Mesh,
+    k: int,
+    method: str = "rcb",
+    workers: int | None = None,
+) -> list[str]:
+    """
+    Splits a mesh into `k` parts and writes one self-contained deck per part.
+
+    Each deck holds the elements of its part, the nodes they use and the
+    node and element sets restricted to them. Nodes shared with other parts
+    are listed in the node set ``INTERFACE`` and, per neighbouring part j, in
+    ``INTERFACE_P<j>``. Decks are formatted in parallel worker processes.
+
+    Parameters
+    ----------
+    dirname : str
+        The output directory, created if missing.
+    mesh : Mesh
+        The mesh to split.
+    k : int
+        The number of parts.
+    method : str
+        The partitioning method, see `Mesh.partition`.
+    workers : int, optional
+        The number of worker processes. None or 1 writes in this process.
+
+    Returns
+    -------
+    list[str]
+        The paths of the written decks, ordered by part.
+    """
+    os.makedirs(dirname, exist_ok=True)
+    labels = mesh.partition(k, method)
+    interfaces = _interface_nodes(mesh, labels, k)
+
+    width = max(3, len(str(k - 1)))
+    jobs = []
+    for part in range(k):
+        submesh = mesh.extract([block_labels == part for block_labels in labels])
+        for name, nodes in interfaces[part].items():
+            submesh.node_sets[name] = nodes
+        path = os.path.join(dirname, f"part_{part:0{width}d}.inp")
+        jobs.append((path, submesh, f"** Part {part + 1} of {k}"))
+
+    if workers is None or workers <= 1:
+        for job in jobs:
+            _write_part(job)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(_write_part, jobs))
+
+    return [job[0] for job in jobs]
+
+
+def _write_part(job) -> None:
+    path, submesh, comment_line = job
+    write_deck(path, submesh, comment_line)
+
+
+def _interface_nodes(mesh: Mesh, labels: list[np.ndarray], k: int) -> list[dict]:
+    """Returns, per part, the node sets of nodes shared with other parts."""
+    node_ids = [block.connectivity.astype(np.int64) for block in mesh.cells if len(block)]
+    node_labels = [
+        np.repeat(block_labels, block.connectivity.shape[1])
+        for block, block_labels in zip(mesh.cells, labels)
+        if len(block)
+    ]
+    interfaces = [{} for _ in range(k)]
+    if not node_ids:
+        return interfaces
+
+    # unique (node, part) pairs; nodes appearing in several pairs are shared
+    pairs = np.concatenate([c.ravel() for c in node_ids]) * k + np.concatenate(node_labels)
+    pairs.sort()
+    pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+    nodes, parts = np.divmod(pairs, k)
+    shared = np.isin(nodes, nodes[np.flatnonzero(nodes[1:] == nodes[:-1])])
+    nodes, parts = nodes[shared], parts[shared]
+
+    per_part = [nodes[parts == part] for part in range(k)]
+    for part in range(k):
+        if len(per_part[part]) == 0:
+            continue
+        interfaces[part]["INTERFACE"] = per_part[part].tolist()
+        for other in range(k):
+            if other != part:
+                common = np.intersect1d(per_part[part], per_part[other], assume_unique=True)
+                if len(common):
+                    interfaces[part][f"INTERFACE_P{other}"] = common.tolist()
+    return interfaces
 
 
 def write_buffer(f, mesh: Mesh, comment_line: str = "") -> None:
     """Writes an Abaqus inp file, focusing on geometry portion."""
+    for chunk in iter_buffer(mesh, comment_line):
+        f.write(chunk)
+    f.flush()
+
+
+def iter_buffer(
+    mesh: Mesh,
+    comment_line: str = "",
+    min_chunk_size: int = 1 << 16,
+    sections: tuple[str, ...] = SECTIONS,
+):
+    """
+    Generates the Abaqus inp text of a mesh as a sequence of string chunks.
+
+    This is the streaming form of `write_buffer`: joining the chunks gives the
+    same text, but at most one chunk (bounded by the rows formatted at once)
+    is held in memory at a time. Small pieces such as keyword lines are
+    coalesced until at least `min_chunk_size` characters are pending.
+
+    Parameters
+    ----------
+    mesh : Mesh
+        The mesh to write.
+    comment_line : str
+        An optional first line.
+    min_chunk_size : int
+        The size below which pieces are accumulated before being yielded.
+    sections : tuple[str, ...]
+        The deck sections to write, by default all of them.
+
+    Yields
+    ------
+    str
+        Consecutive pieces of the deck text.
+    """
+    pending: list[str] = []
+    pending_size = 0
+
+    arrays = _MeshArrays(mesh)
+    pieces = itertools.chain(
+        [f"{comment_line}\n"] if comment_line else [],
+        *(_section_plan(mesh, section) for section in sections),
+    )
+    for piece in pieces:
+        if not isinstance(piece, str):
+            piece = _run_task(arrays, piece)
+        pending.append(piece)
+        pending_size += len(piece)
+        if pending_size >= min_chunk_size:
+            yield "".join(pending)
+            pending, pending_size = [], 0
+
+    if pending:
+        yield "".join(pending)
+
+
+def _section_plan(mesh: Mesh, section: str):
+    """
+    Generates the layout of one deck section, including its header lines.
+
+    Items are either literal text or formatting tasks ``(kind, keys, start,
+    stop)`` that render a row range of the arrays named by `keys`, see
+    `_MeshArrays` and `_run_task`.
+    """
 
     # max number of values per line
     nnl: int = 8
+    separator = "**" + "-" * 78 + "\n"
 
-    if comment_line:
-        f.write(f"{comment_line}\n")
+    if section == "nodes":
+        yield separator + "**  NODE DEFINITION\n" + "*NODE\n"
+        for start in range(0, len(mesh.point_ids), _CHUNK_ROWS):
+            yield ("nodes", ("points", "point_ids"), start, start + _CHUNK_ROWS)
+        yield "**--end--node--definition\n"
 
-    f.write("**" + "-" * 78 + "\n")
-    f.write("**  NODE DEFINITION\n")
+    elif section == "node_sets":
+        yield separator + "**  NODE SET DEFINITION\n"
+        for name, ids in mesh.node_sets.items():
+            if len(ids) > 0:
+                yield f"*NSET, NSET={name}\n"
+                for start in range(0, len(ids), _CHUNK_ROWS * nnl):
+                    yield ("ids", (f"nset:{name}",), start, start + _CHUNK_ROWS * nnl)
+                yield separator
+        yield "**--end--node--set--definition\n"
 
-    f.write("*NODE\n")
-    for k, xyz_id in enumerate(zip(mesh.points, mesh.point_ids)):
-        xyz, id = xyz_id[0], xyz_id[1]
-        str_coords = ", ".join(f"{entry:10.6f}" for entry in xyz)
-        output = f"{id:9}, {str_coords}\n"
-        f.write(output)
+    elif section == "elements":
+        yield separator + "**  ELEMENT DEFINITION\n"
+        for index, cell_block in enumerate(mesh.cells):
+            if len(cell_block.ids) > 0:
+                yield f"*ELEMENT, TYPE={cell_block.element_type}\n"
+                for start in range(0, len(cell_block.ids), _CHUNK_ROWS):
+                    keys = (f"ids:{index}", f"connectivity:{index}")
+                    yield ("elements", keys, start, start + _CHUNK_ROWS)
+                yield separator
+        yield "**--end--element--definition\n"
 
-    f.write("**--end--node--definition\n")
-    f.flush()
+    elif section == "elem_sets":
+        yield separator + "**  ELEMENT SET DEFINITION\n"
+        for name, ids in mesh.elem_sets.items():
+            if len(ids) > 0:
+                yield f"*ELSET, ELSET={name}\n"
+                for start in range(0, len(ids), _CHUNK_ROWS * nnl):
+                    yield ("ids", (f"elset:{name}",), start, start + _CHUNK_ROWS * nnl)
+                yield separator
+        yield "**--end--element--set--definition\n"
 
-    f.write("**" + "-" * 78 + "\n")
-    f.write("**  NODE SET DEFINITION\n")
+    elif section == "surfaces":
+        yield separator + "**  SURFACE DEFINITIONS\n"
+        for name, sets in mesh.surface_sets.items():
+            if len(sets) > 0:
+                yield f"*SURFACE, NAME={name}, TYPE=ELEMENT\n"
+                # join the sets with comma
+                output = "\n".join(
+                    func_node_line(sets[i : i + 2]) for i in range(0, len(sets), 2)
+                )
+                yield output + "\n"
+                yield separator
 
-    for name, ids in mesh.node_sets.items():
-        if len(ids) > 0:
-            f.write(f"*NSET, NSET={name}\n")
-            # Ensure v is a 1D array for iteration
-            output = ",\n".join(
-                func_node_line(ids[i : i + nnl]) for i in range(0, len(ids), nnl)
-            )
-            f.write(output + ",\n")
-            f.write("**" + "-" * 78 + "\n")
+    else:
+        raise ValueError(f"Unknown deck section '{section}'.")
 
-    f.write("**--end--node--set--definition\n")
-    f.flush()
 
-    f.write("**" + "-" * 78 + "\n")
-    f.write("**  ELEMENT DEFINITION\n")
+class _MeshArrays:
+    """Resolves the array names used by formatting tasks on a mesh."""
 
-    eid = 0
-    for cell_block in mesh.cells:
-        if len(cell_block.ids) > 0:
-            cell_type = cell_block.element_type
-            f.write(f"*ELEMENT, TYPE={cell_type}\n")
-            for eid, row in zip(cell_block.ids, cell_block.connectivity):
-                f.write(" " + str(eid) + "," + func_node_line(row) + ",\n")
-            f.write("**" + "-" * 78 + "\n")
+    def __init__(self, mesh: Mesh):
+        self.mesh = mesh
 
-    f.write("**--end--element--definition\n")
-    f.flush()
+    def __getitem__(self, key: str):
+        kind, _, name = key.partition(":")
+        if kind == "points":
+            return self.mesh.points
+        if kind == "point_ids":
+            return self.mesh.point_ids
+        if kind == "ids":
+            return self.mesh.cells[int(name)].ids
+        if kind == "connectivity":
+            return self.mesh.cells[int(name)].connectivity
+        if kind == "nset":
+            return self.mesh.node_sets[name]
+        if kind == "elset":
+            return self.mesh.elem_sets[name]
+        raise KeyError(key)
 
-    f.write("**" + "-" * 78 + "\n")
-    f.write("**  ELEMENT SET DEFINITION\n")
+    def keys(self):
+        yield "points"
+        yield "point_ids"
+        for index in range(len(self.mesh.cells)):
+            yield f"ids:{index}"
+            yield f"connectivity:{index}"
+        for name in self.mesh.node_sets:
+            yield f"nset:{name}"
+        for name in self.mesh.elem_sets:
+            yield f"elset:{name}"
 
-    for name, ids in mesh.elem_sets.items():
-        if len(ids) > 0:
-            f.write(f"*ELSET, ELSET={name}\n")
-            output = ",\n".join(
-                func_node_line(ids[i : i + nnl]) for i in range(0, len(ids), nnl)
-            )
-            f.write(output + ",\n")
-            f.write("**" + "-" * 78 + "\n")
 
-    f.write("**--end--element--set--definition\n")
-    f.flush()
+def _run_task(arrays, task) -> str:
+    """Formats the row range described by a task of `_section_plan`."""
+    kind, keys, start, stop = task
+    if kind == "nodes":
+        return _format_nodes(arrays[keys[0]], arrays[keys[1]], start, stop)
+    if kind == "elements":
+        return _format_elements(arrays[keys[0]], arrays[keys[1]], start, stop)
+    if kind == "ids":
+        return _format_id_lines(arrays[keys[0]], start, stop)
+    raise ValueError(f"Unknown formatting task '{kind}'.")
 
-    f.write("**" + "-" * 78 + "\n")
-    f.write("**  SURFACE DEFINITIONS\n")
 
-    for name, sets in mesh.surface_sets.items():
-        if len(sets) > 0:
-            f.write(f"*SURFACE, NAME={name}, TYPE=ELEMENT\n")
-            # join the sets with comma
-            output = "\n".join(
-                func_node_line(sets[i : i + 2]) for i in range(0, len(sets), 2)
-            )
-            f.write(output + "\n")
-            f.write("**" + "-" * 78 + "\n")
+# ==============================================================================
+# Parallel writing
+# ==============================================================================
 
-    f.flush()
+# arrays attached from shared memory in a worker process
+_worker_arrays: dict = {}
+_worker_segments: list = []
+
+
+def _write_deck_parallel(filename: str, mesh: Mesh, comment_line: str, workers: int) -> None:
+    """Formats the deck in a process pool over shared-memory copies of the arrays."""
+    plan = list(
+        itertools.chain(
+            [f"{comment_line}\n"] if comment_line else [],
+            *(_section_plan(mesh, section) for section in SECTIONS),
+        )
+    )
+
+    arrays = _MeshArrays(mesh)
+    segments = []
+    specs = {}
+    try:
+        for key in arrays.keys():
+            array = np.ascontiguousarray(np.asarray(arrays[key]))
+            if array.dtype == object:
+                array = array.astype(np.int64)
+            segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            segments.append(segment)
+            np.ndarray(array.shape, array.dtype, buffer=segment.buf)[...] = array
+            specs[key] = (segment.name, array.shape, array.dtype.str)
+
+        tasks = [item for item in plan if not isinstance(item, str)]
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_attach_arrays, initargs=(specs,)
+        ) as executor:
+            formatted = executor.map(_run_worker_task, tasks)
+            with open(filename, "wb") as f:
+                for item in plan:
+                    f.write(_encode(item) if isinstance(item, str) else next(formatted))
+    finally:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+
+
+def _attach_arrays(specs: dict) -> None:
+    """Worker initializer: maps the shared-memory arrays by name."""
+    for key, (name, shape, dtype) in specs.items():
+        segment = shared_memory.SharedMemory(name=name)
+        _worker_segments.append(segment)
+        _worker_arrays[key] = np.ndarray(shape, np.dtype(dtype), buffer=segment.buf)
+
+
+def _run_worker_task(task) -> bytes:
+    return _encode(_run_task(_worker_arrays, task))
+
+
+def _encode(text: str) -> bytes:
+    """Encodes text as a text-mode file would on this platform."""
+    if os.linesep != "\n":
+        text = text.replace("\n", os.linesep)
+    return text.encode()
+
+
+# ==============================================================================
+# Bulk formatting
+#
+# Whole row ranges are rendered with one repeated %-template, so a chunk of
+# the arrays becomes text in a single C-level formatting call instead of one
+# f-string per value. The output matches the per-row format byte for byte.
+# ==============================================================================
+
+# number of rows rendered per chunk, bounds the size of every text fragment
+_CHUNK_ROWS: int = 65536
+
+
+def _format_nodes(points: np.ndarray, point_ids, start: int = 0, stop: int | None = None) -> str:
+    """
+    Formats the node lines ``id, x, y, z`` for rows [start, stop).
+
+    Parameters
+    ----------
+    points : np.ndarray
+        The node coordinates.
+    point_ids : list | np.ndarray
+        The node IDs, same length as `points`.
+    start, stop : int
+        The row range to format.
+
+    Returns
+    -------
+    str
+        The node lines, each terminated by a newline.
+    """
+    coords = np.asarray(points[start:stop])
+    ids = point_ids[start:stop]
+    if len(coords) == 0:
+        return ""
+
+    num_coords = coords.shape[1]
+    template = "%9d, " + ", ".join(["%10.6f"] * num_coords) + "\n"
+    rows = np.empty((len(coords), num_coords + 1), dtype=object)
+    rows[:, 0] = ids
+    rows[:, 1:] = coords
+    return (template * len(rows)) % tuple(rows.ravel().tolist())
+
+
+def _format_elements(
+    ids: np.ndarray, connectivity: np.ndarray, start: int = 0, stop: int | None = None
+) -> str:
+    """
+    Formats the element lines `` id, n1, n2, ...,`` for rows [start, stop).
+
+    Parameters
+    ----------
+    ids : np.ndarray
+        The element IDs.
+    connectivity : np.ndarray
+        The element connectivity, one row per element.
+    start, stop : int
+        The row range to format.
+
+    Returns
+    -------
+    str
+        The element lines, each terminated by a newline.
+    """
+    block_ids = np.asarray(ids[start:stop], dtype=np.int64)
+    block_connectivity = np.asarray(connectivity[start:stop], dtype=np.int64)
+    if len(block_ids) == 0:
+        return ""
+
+    template = " %d," + ",".join(["%9d"] * block_connectivity.shape[1]) + ",\n"
+    rows = np.column_stack([block_ids, block_connectivity])
+    return (template * len(rows)) % tuple(rows.ravel().tolist())
+
+
+def _format_id_lines(ids, start: int = 0, stop: int | None = None, per_line: int = 8) -> str:
+    """
+    Formats set members [start, stop) as comma terminated lines of `per_line`
+    values. `start` must be a multiple of `per_line`.
+
+    Parameters
+    ----------
+    ids : list | np.ndarray
+        The set members.
+    start, stop : int
+        The value range to format.
+    per_line : int
+        The maximum number of values per line.
+
+    Returns
+    -------
+    str
+        The set lines, each terminated by ``,`` and a newline.
+    """
+    values = np.asarray(ids[start:stop], dtype=np.int64).tolist()
+    if not values:
+        return ""
+
+    num_full, remainder = divmod(len(values), per_line)
+    text = ("%9d," * per_line + "\n") * num_full % tuple(values[: num_full * per_line])
+    if remainder:
+        text += ("%9d," * remainder + "\n") % tuple(values[num_full * per_line :])
+    return text
@@ -3,7 +3,7 @@ from __future__ import annotations
 import numpy as np
 from numpy.typing import ArrayLike
 
-from ._common import find_common_values_with_indices, read_config
+from ._common import read_config
 
 # Load configuration once at the module level
 _config = read_config()
@@ -120,13 +120,14 @@ class ElementBlock:
         if not blocks:
             return [cls.empty()]
 
-        # find within blocks matched element_type
-        input_list = [b.element_type for b in blocks]
-        common_dict = find_common_values_with_indices(input_list)
+        # group blocks by element_type, including types that occur only once
+        type_indices: dict[str, list[int]] = {}
+        for index, block in enumerate(blocks):
+            type_indices.setdefault(block.element_type, []).append(index)
 
         # iterate though unique element_type and concatenate
         unique_blocks = []
-        for element_type, indices in common_dict.items():
+        for element_type, indices in type_indices.items():
             sub_blocks = [blocks[i] for i in indices]
             unique_blocks.append(cls._cat_same_type(sub_blocks))
 
@@ -0,0 +1,330 @@
+"""
+Structural differences between two meshes.
+
+Nodes and elements are aligned by ID with vectorized lookups (a direct table
+for dense IDs, a sorted join otherwise), so comparing two revisions of a
+deck costs a few array passes. The result is a patch of plain lists and
+dicts that can be serialized as JSON and applied to the first mesh to
+obtain the second.
+"""
+
+from __future__ import annotations
+
+import hashlib
+
+import numpy as np
+
+from .element_block import ElementBlock
+from .mesh_io import Mesh, _index_of
+
+
+def section_hashes(mesh: Mesh) -> dict[str, str]:
+    """
+    Computes a content hash of every deck section.
+
+    Two meshes with the same hash for a section have identical content in
+    that section, including the order of nodes, elements and set members.
+
+    Returns
+    -------
+    dict[str, str]
+        The blake2b hex digest by section: "nodes", "elements", "node_sets",
+        "elem_sets" and "surfaces".
+    """
+    nodes = hashlib.blake2b(digest_size=16)
+    nodes.update(np.asarray(mesh.point_ids, dtype=np.int64).tobytes())
+    nodes.update(np.ascontiguousarray(mesh.points, dtype=np.float64).tobytes())
+
+    elements = hashlib.blake2b(digest_size=16)
+    for block in mesh.cells:
+        elements.update(block.element_type.encode() + b"\0")
+        elements.update(np.asarray(block.ids, dtype=np.int64).tobytes())
+        elements.update(np.ascontiguousarray(block.connectivity, dtype=np.int64).tobytes())
+
+    return {
+        "nodes": nodes.hexdigest(),
+        "elements": elements.hexdigest(),
+        "node_sets": _hash_sets(mesh.node_sets),
+        "elem_sets": _hash_sets(mesh.elem_sets),
+        "surfaces": hashlib.blake2b(
+            repr(sorted(mesh.surface_sets.items())).encode(), digest_size=16
+        ).hexdigest(),
+    }
+
+
+def diff(mesh_a: Mesh, mesh_b: Mesh, tol: float = 0.0) -> dict:
+    """
+    Computes the changes that turn `mesh_a` into `mesh_b`.
+
+    Sections with the same content hash are skipped without comparing.
+
+    Parameters
+    ----------
+    mesh_a, mesh_b : Mesh
+        The old and the new revision.
+    tol : float
+        Nodes count as moved when a coordinate changes by more than `tol`.
+
+    Returns
+    -------
+    dict
+        A JSON-serializable patch, see `apply_patch`:
+
+        - ``nodes``: ``added`` (``ids``, ``coords``), ``removed`` IDs and
+          ``moved`` (``ids``, new ``coords`` and ``delta``);
+        - ``elements``: ``added`` and ``changed`` lists of blocks
+          (``element_type``, ``ids``, ``connectivity``) and ``removed`` IDs;
+        - ``node_sets``, ``elem_sets``: ``added`` sets, ``removed`` names and
+          ``changed`` sets with the ``added`` and ``removed`` members;
+        - ``surfaces``: ``added`` or changed surfaces and ``removed`` names;
+        - ``identical``: the sections skipped by their hash;
+        - ``summary``: the number of changes per kind.
+    """
+    hashes_a, hashes_b = section_hashes(mesh_a), section_hashes(mesh_b)
+    identical = [name for name in hashes_a if hashes_a[name] == hashes_b[name]]
+
+    patch = {
+        "nodes": _diff_nodes(mesh_a, mesh_b, tol) if "nodes" not in identical else _empty_nodes(),
+        "elements": _diff_elements(mesh_a, mesh_b)
+        if "elements" not in identical
+        else {"added": [], "removed": [], "changed": []},
+        "node_sets": _diff_sets(mesh_a.node_sets, mesh_b.node_sets)
+        if "node_sets" not in identical
+        else _empty_sets(),
+        "elem_sets": _diff_sets(mesh_a.elem_sets, mesh_b.elem_sets)
+        if "elem_sets" not in identical
+        else _empty_sets(),
+        "surfaces": _diff_surfaces(mesh_a.surface_sets, mesh_b.surface_sets)
+        if "surfaces" not in identical
+        else {"added": {}, "removed": []},
+        "identical": identical,
+    }
+    patch["summary"] = {
+        "nodes_added": len(patch["nodes"]["added"]["ids"]),
+        "nodes_removed": len(patch["nodes"]["removed"]),
+        "nodes_moved": len(patch["nodes"]["moved"]["ids"]),
+        "elements_added": sum(len(block["ids"]) for block in patch["elements"]["added"]),
+        "elements_removed": len(patch["elements"]["removed"]),
+        "elements_changed": sum(len(block["ids"]) for block in patch["elements"]["changed"]),
+        "sets_changed": sum(
+            len(patch[kind]["added"]) + len(patch[kind]["removed"]) + len(patch[kind]["changed"])
+            for kind in ("node_sets", "elem_sets")
+        ),
+        "surfaces_changed": len(patch["surfaces"]["added"]) + len(patch["surfaces"]["removed"]),
+    }
+    return patch
+
+
+def apply_patch(mesh: Mesh, patch: dict) -> Mesh:
+    """
+    Applies a patch from `diff` to a copy of `mesh`.
+
+    New nodes and elements are appended, so the result matches the new
+    revision up to the order of nodes, elements and set members.
+    """
+    result = mesh.copy()
+    point_ids = np.asarray(result.point_ids, dtype=np.int64)
+
+    # nodes
+    nodes = patch["nodes"]
+    moved = nodes["moved"]
+    if moved["ids"]:
+        result.points[_index_of(moved["ids"], point_ids)] = moved["coords"]
+    if nodes["removed"]:
+        keep = _index_of(point_ids, np.asarray(nodes["removed"], dtype=np.int64)) < 0
+        result.points, point_ids = result.points[keep], point_ids[keep]
+    if nodes["added"]["ids"]:
+        added = np.asarray(nodes["added"]["coords"], dtype=result.points.dtype).reshape(-1, 3)
+        result.points = np.vstack([result.points, added])
+        point_ids = np.concatenate([point_ids, nodes["added"]["ids"]])
+    result.point_ids = point_ids.tolist()
+
+    # elements: changed elements are removed and added again
+    elements = patch["elements"]
+    dropped = np.asarray(
+        elements["removed"] + [i for block in elements["changed"] for i in block["ids"]],
+        dtype=np.int64,
+    )
+    blocks = []
+    for block in result.cells:
+        if len(dropped):
+            keep = _index_of(block.ids, dropped) < 0
+            block = ElementBlock(block.element_type, block.ids[keep], block.connectivity[keep])
+        blocks.append(block)
+    for spec in elements["added"] + elements["changed"]:
+        blocks.append(ElementBlock(spec["element_type"], spec["ids"], spec["connectivity"]))
+    blocks = [block for block in blocks if len(block)]
+    result.cells = ElementBlock.unique_cat(blocks) if blocks else []
+
+    result.node_sets = _apply_sets(result.node_sets, patch["node_sets"])
+    result.elem_sets = _apply_sets(result.elem_sets, patch["elem_sets"])
+
+    surfaces = {k: v for k, v in result.surface_sets.items() if k not in patch["surfaces"]["removed"]}
+    surfaces.update(patch["surfaces"]["added"])
+    result.surface_sets = surfaces
+
+    result.mark_dirty()
+    return result
+
+
+# ----------------------------------------------------------------------
+# Internals
+# ----------------------------------------------------------------------
+
+
+def _hash_sets(sets: dict) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for name in sorted(sets):
+        digest.update(name.encode() + b"\0")
+        digest.update(np.asarray(sets[name], dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+
+def _join(keys_a: np.ndarray, keys_b: np.ndarray):
+    """
+    Aligns two arrays of unique keys.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+        The positions of the common keys in `keys_a` and `keys_b` (in the
+        same order), of the keys only in `keys_a` and of those only in
+        `keys_b`.
+    """
+    if len(keys_a) == len(keys_b) and np.array_equal(keys_a, keys_b):
+        common = np.arange(len(keys_a))
+        return common, common, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    # IDs are positive, so `_index_of` applies and avoids sorting dense IDs
+    pos = _index_of(keys_b, keys_a)
+    in_a = pos >= 0
+    common_b = np.flatnonzero(in_a)
+    common_a = pos[in_a]
+    matched = np.zeros(len(keys_a), dtype=bool)
+    matched[common_a] = True
+    return common_a, common_b, np.flatnonzero(~matched), np.flatnonzero(~in_a)
+
+
+def _empty_nodes() -> dict:
+    return {
+        "added": {"ids": [], "coords": []},
+        "removed": [],
+        "moved": {"ids": [], "coords": [], "delta": []},
+    }
+
+
+def _empty_sets() -> dict:
+    return {"added": {}, "removed": [], "changed": {}}
+
+
+def _diff_nodes(mesh_a: Mesh, mesh_b: Mesh, tol: float) -> dict:
+    ids_a = np.asarray(mesh_a.point_ids, dtype=np.int64)
+    ids_b = np.asarray(mesh_b.point_ids, dtype=np.int64)
+    common_a, common_b, only_a, only_b = _join(ids_a, ids_b)
+
+    delta = mesh_b.points[common_b] - mesh_a.points[common_a]
+    moved = np.flatnonzero(np.any(np.abs(delta) > tol, axis=1))
+
+    return {
+        "added": {"ids": ids_b[only_b].tolist(), "coords": mesh_b.points[only_b].tolist()},
+        "removed": ids_a[only_a].tolist(),
+        "moved": {
+            "ids": ids_b[common_b[moved]].tolist(),
+            "coords": mesh_b.points[common_b[moved]].tolist(),
+            "delta": delta[moved].tolist(),
+        },
+    }
+
+
+def _flatten_elements(mesh: Mesh):
+    """Returns the IDs, type codes and -1 padded connectivity of all elements."""
+    blocks = [block for block in mesh.cells if len(block)]
+    width = max((block.connectivity.shape[1] for block in blocks), default=0)
+    ids = np.concatenate([np.empty(0, dtype=np.int64)] + [block.ids for block in blocks]).astype(np.int64)
+    types = [block.element_type for block in blocks]
+    codes = np.repeat(np.arange(len(blocks)), [len(block) for block in blocks])
+    connectivity = np.full((len(ids), width), -1, dtype=np.int64)
+    start = 0
+    for block in blocks:
+        connectivity[start : start + len(block), : block.connectivity.shape[1]] = block.connectivity
+        start += len(block)
+    return ids, types, codes, connectivity
+
+
+def _group_elements(positions, ids, types, codes, connectivity) -> list[dict]:
+    """Groups elements by type into serializable blocks."""
+    groups = []
+    for code in np.unique(codes[positions]):
+        selected = positions[codes[positions] == code]
+        width = int(np.count_nonzero(connectivity[selected[0]] >= 0))
+        groups.append(
+            {
+                "element_type": types[code],
+                "ids": ids[selected].tolist(),
+                "connectivity": connectivity[selected, :width].tolist(),
+            }
+        )
+    return groups
+
+
+def _diff_elements(mesh_a: Mesh, mesh_b: Mesh) -> dict:
+    ids_a, types_a, codes_a, conn_a = _flatten_elements(mesh_a)
+    ids_b, types_b, codes_b, conn_b = _flatten_elements(mesh_b)
+    common_a, common_b, only_a, only_b = _join(ids_a, ids_b)
+
+    # compare types by name, the block order may differ between the meshes
+    type_names_a = np.asarray(types_a, dtype=object)[codes_a[common_a]]
+    type_names_b = np.asarray(types_b, dtype=object)[codes_b[common_b]]
+    width = max(conn_a.shape[1], conn_b.shape[1])
+    padded_a = np.pad(conn_a, ((0, 0), (0, width - conn_a.shape[1])), constant_values=-1)
+    padded_b = np.pad(conn_b, ((0, 0), (0, width - conn_b.shape[1])), constant_values=-1)
+    changed = (type_names_a != type_names_b) | np.any(
+        padded_a[common_a] != padded_b[common_b], axis=1
+    )
+
+    return {
+        "added": _group_elements(only_b, ids_b, types_b, codes_b, conn_b),
+        "removed": ids_a[only_a].tolist(),
+        "changed": _group_elements(common_b[changed], ids_b, types_b, codes_b, conn_b),
+    }
+
+
+def _diff_sets(sets_a: dict, sets_b: dict) -> dict:
+    result = _empty_sets()
+    for name, members in sets_b.items():
+        if name not in sets_a:
+            result["added"][name] = np.asarray(members, dtype=np.int64).tolist()
+            continue
+        old = np.asarray(sets_a[name], dtype=np.int64)
+        new = np.asarray(members, dtype=np.int64)
+        if len(old) == len(new) and np.array_equal(old, new):
+            continue
+        added = new[_index_of(new, old) < 0]
+        removed = old[_index_of(old, new) < 0]
+        if len(added) or len(removed):
+            result["changed"][name] = {"added": added.tolist(), "removed": removed.tolist()}
+    result["removed"] = [name for name in sets_a if name not in sets_b]
+    return result
+
+
+def _apply_sets(sets: dict, patch: dict) -> dict:
+    result = {}
+    for name, members in sets.items():
+        if name in patch["removed"]:
+            continue
+        change = patch["changed"].get(name)
+        if change:
+            members = np.asarray(members, dtype=np.int64)
+            keep = _index_of(members, np.asarray(change["removed"], dtype=np.int64)) < 0
+            members = np.concatenate([members[keep], change["added"]]).astype(np.int64).tolist()
+        result[name] = list(members)
+    for name, members in patch["added"].items():
+        result[name] = list(members)
+    return result
+
+
+def _diff_surfaces(surfaces_a: dict, surfaces_b: dict) -> dict:
+    return {
+        "added": {name: value for name, value in surfaces_b.items() if surfaces_a.get(name) != value},
+        "removed": [name for name in surfaces_a if name not in surfaces_b],
+    }
@@ -1,9 +1,159 @@
 from __future__ import annotations
 import copy
+import itertools
 
 import numpy as np
 
+from . import profiling
+from ._common import warning
 from .element_block import ElementBlock
+from .mesh_graph import bandwidth_profile, cuthill_mckee, morton_order, node_adjacency
+
+# The sections of a deck, in the order they are written
+SECTIONS = ("nodes", "node_sets", "elements", "elem_sets", "surfaces")
+
+# The attributes holding the data of each section
+_SECTION_ATTRIBUTES = {
+    "nodes": ("points", "point_ids"),
+    "node_sets": ("node_sets",),
+    "elements": ("cells",),
+    "elem_sets": ("elem_sets",),
+    "surfaces": ("surface_sets",),
+}
+
+
+def _map_ids(values, keys: np.ndarray, mapped: np.ndarray) -> np.ndarray:
+    """
+    Replaces every value found in `keys` by the matching entry of `mapped`.
+
+    Values not present in `keys` are returned unchanged.
+    """
+    values = np.asarray(values, dtype=np.int64)
+    if values.size == 0 or keys.size == 0:
+        return values.copy()
+
+    lowest, highest = int(keys.min()), int(keys.max())
+    if lowest >= 0 and highest < 4 * len(keys) + 1024:
+        # IDs are dense enough for a direct lookup table
+        table = np.full(highest + 1, -1, dtype=np.int64)
+        table[keys] = np.arange(len(keys))
+        pos = table[np.clip(values, 0, highest)]
+        found = (values >= 0) & (values <= highest) & (pos >= 0)
+        return np.where(found, mapped[pos], values)
+
+    sorter = np.argsort(keys, kind="stable")
+    sorted_keys = keys[sorter]
+    pos = np.minimum(np.searchsorted(sorted_keys, values), len(keys) - 1)
+    found = sorted_keys[pos] == values
+    return np.where(found, mapped[sorter[pos]], values)
+
+
+def _index_of(values, keys: np.ndarray) -> np.ndarray:
+    """
+    Returns the position of every value in `keys`, or -1 where it is missing.
+    IDs are positive, so positions are passed through `_map_ids` as negatives.
+    """
+    mapped = _map_ids(values, keys, -np.arange(1, len(keys) + 1, dtype=np.int64))
+    return np.where(mapped < 0, -mapped - 1, -1)
+
+
+def _close_pairs(points: np.ndarray, tol: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the index pairs ``(i, j)``, ``i != j``, of points at most `tol`
+    apart. Points are hashed into cells of size `tol`, so every close pair
+    lies in the same or in one of the 3**dim neighbouring cells.
+    """
+    num_points, dim = points.shape
+    if tol <= 0:
+        # exact duplicates are adjacent once sorted
+        order = np.lexsort(points.T[::-1])
+        same = np.all(points[order[1:]] == points[order[:-1]], axis=1)
+        return order[:-1][same], order[1:][same]
+
+    cells = np.floor(points / tol).astype(np.int64)
+    order = np.lexsort(cells.T[::-1])
+    sorted_cells = cells[order]
+    new_cell = np.ones(num_points, dtype=bool)
+    new_cell[1:] = np.any(sorted_cells[1:] != sorted_cells[:-1], axis=1)
+    starts = np.flatnonzero(new_cell)
+    counts = np.diff(np.append(starts, num_points))
+    keys = sorted_cells[starts]
+
+    first, second = [], []
+    for offset in itertools.product((-1, 0, 1), repeat=dim):
+        # (a, b) and (b, a) are the same pair, so half the offsets suffice
+        if offset < (0,) * dim:
+            continue
+        neighbour = _find_rows(keys + np.array(offset, dtype=np.int64), keys)
+        cell = np.flatnonzero(neighbour >= 0)
+        neighbour = neighbour[cell]
+
+        # every node of a cell against every node of its neighbour
+        sizes = counts[cell] * counts[neighbour]
+        total = int(sizes.sum())
+        block = np.repeat(np.arange(len(cell)), sizes)
+        local = np.arange(total) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        a = starts[cell][block] + local // counts[neighbour][block]
+        b = starts[neighbour][block] + local % counts[neighbour][block]
+        if not any(offset):
+            a, b = a[a < b], b[a < b]
+        first.append(order[a])
+        second.append(order[b])
+
+    first, second = np.concatenate(first), np.concatenate(second)
+    close = np.sum((points[first] - points[second]) ** 2, axis=1) <= tol * tol
+    return first[close], second[close]
+
+
+def _find_rows(rows: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """Returns the position of every row of `rows` in the unique rows `keys`, or -1."""
+    _, inverse = np.unique(np.vstack([keys, rows]), axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    table = np.full(inverse.max() + 1, -1, dtype=np.int64)
+    table[inverse[: len(keys)]] = np.arange(len(keys))
+    return table[inverse[len(keys):]]
+
+
+def _union_find(num: int, first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """
+    Joins the pairs ``(first[k], second[k])`` and returns the root of every
+    element, which is the smallest index of its connected group.
+    """
+    parent = np.arange(num)
+    while True:
+        root_a, root_b = parent[first], parent[second]
+        apart = root_a != root_b
+        if not apart.any():
+            return parent
+        root_a, root_b = root_a[apart], root_b[apart]
+        np.minimum.at(parent, np.maximum(root_a, root_b), np.minimum(root_a, root_b))
+        # pointer jumping until every element points at its root
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+
+def _bisect(centroids, indices, k, first_label, labels) -> None:
+    """Recursive coordinate bisection of `indices` into `k` labelled parts."""
+    if k == 1 or len(indices) == 0:
+        labels[indices] = first_label
+        return
+
+    coords = centroids[indices]
+    axis = int(np.argmax(coords.max(axis=0) - coords.min(axis=0)))
+    k_left = k // 2
+    split = int(round(len(indices) * k_left / k))
+    order = np.argpartition(coords[:, axis], split - 1) if 0 < split < len(indices) else np.arange(len(indices))
+    _bisect(centroids, indices[order[:split]], k_left, first_label, labels)
+    _bisect(centroids, indices[order[split:]], k - k_left, first_label + k_left, labels)
+
+
+def _unique_in_order(values: np.ndarray) -> np.ndarray:
+    """Drops repeated values, keeping the first occurrence of each."""
+    _, first = np.unique(values, return_index=True)
+    return values[np.sort(first)]
 
 
 class Mesh:
@@ -35,6 +185,9 @@ class Mesh:
     cell_ids : dict[str, np.ndarray]
         A dictionary mapping data array names to lists of arrays of data
         associated with each cell, mirroring the `cells` structure.
+    dirty_sections : set[str]
+        The deck sections (see `SECTIONS`) modified since they were last
+        saved. A new mesh has every section dirty.
     """
 
     def __init__(
@@ -58,8 +211,22 @@ class Mesh:
         self.elem_sets = elem_sets or {}
         self.surface_sets = surface_sets or {}
 
+        self.dirty_sections = set(SECTIONS)
+
         if validate_flag:
-            self._validate_data()
+            with profiling.phase("validate"):
+                self._validate_data()
+
+    def mark_dirty(self, *sections: str) -> None:
+        """Flags deck sections as modified; without arguments, all of them."""
+        unknown = set(sections).difference(SECTIONS)
+        if unknown:
+            raise ValueError(f"Unknown deck sections: {sorted(unknown)}")
+        self.dirty_sections.update(sections or SECTIONS)
+
+    def clear_dirty(self, *sections: str) -> None:
+        """Flags deck sections as saved; without arguments, all of them."""
+        self.dirty_sections.difference_update(sections or SECTIONS)
 
     def _validate_data(self):
         """
@@ -155,6 +322,351 @@ class Mesh:
         ]
         return "\n".join(lines)
 
-    def copy(self) -> Mesh:
-        """Returns a deep copy of the object."""
-        return copy.deepcopy(self)
+    def merge_coincident(self, tol: float = 1e-6) -> np.ndarray:
+        """
+        Merges nodes that share the same location (node equivalencing).
+
+        Nodes are hashed into cells of size `tol` and compared against the
+        nodes of their own and the 3**dim neighbouring cells; every pair
+        closer than `tol` is joined with union-find. A chain of nodes each
+        within `tol` of the next therefore forms one group. Each group keeps
+        the node with the smallest ID; element connectivity and node sets are
+        remapped onto the kept nodes.
+
+        Parameters
+        ----------
+        tol : float
+            The merge tolerance. Zero merges exactly equal coordinates only.
+
+        Returns
+        -------
+        np.ndarray
+            A (num_merged, 2) array of ``[removed_id, kept_id]`` rows.
+        """
+        num_points = len(self.points)
+        ids = np.asarray(self.point_ids, dtype=np.int64)
+        if num_points < 2:
+            return np.empty((0, 2), dtype=np.int64)
+
+        points = np.asarray(self.points, dtype=np.float64).reshape(num_points, -1)
+        first, second = _close_pairs(points, tol)
+        root = _union_find(num_points, first, second)
+
+        # every node maps onto the smallest ID of its group
+        group_min = ids.copy()
+        np.minimum.at(group_min, root, ids)
+        kept_ids = group_min[root]
+
+        removed = np.flatnonzero(kept_ids != ids)
+        merge_map = np.column_stack([ids[removed], kept_ids[removed]])
+        if len(removed) == 0:
+            return merge_map
+
+        collapsed = 0
+        for block in self.cells:
+            if block.connectivity.size:
+                connectivity = _map_ids(block.connectivity, ids, kept_ids)
+                block.connectivity = connectivity.astype(block.connectivity.dtype)
+                sorted_rows = np.sort(block.connectivity, axis=1)
+                collapsed += int(np.any(sorted_rows[:, 1:] == sorted_rows[:, :-1], axis=1).sum())
+
+        for name, nodes_in_set in self.node_sets.items():
+            mapped = _map_ids(nodes_in_set, ids, kept_ids)
+            self.node_sets[name] = _unique_in_order(mapped).tolist()
+
+        keep = np.ones(num_points, dtype=bool)
+        keep[removed] = False
+        self.points = self.points[keep]
+        self.point_ids = ids[keep].tolist()
+
+        self.mark_dirty("nodes", "node_sets", "elements")
+        if collapsed:
+            warning(f"{collapsed} elements reference the same node more than once after merging.")
+
+        return merge_map
+
+    def renumber(self, strategy: str = "rcm", start_id: int = 1) -> dict:
+        """
+        Renumbers nodes and elements consecutively in a bandwidth-friendly order.
+
+        The node order is computed on the node adjacency graph (nodes sharing
+        an element are neighbours). Points are reordered so that the array
+        order matches the new IDs; elements are numbered by their lowest new
+        node ID. Connectivity, node sets and element sets are rewritten in
+        vectorized passes.
+
+        Parameters
+        ----------
+        strategy : str
+            ``"rcm"`` for reverse Cuthill-McKee, ``"compact"`` to keep the
+            current ID order and only close the gaps, or ``"spatial"`` to
+            order nodes along a Z-order curve.
+        start_id : int
+            The first node and element ID.
+
+        Returns
+        -------
+        dict
+            ``bandwidth_before``, ``bandwidth_after``, ``profile_before`` and
+            ``profile_after`` of the node graph (equations numbered by node
+            ID), plus ``node_map`` and ``element_map``, (num, 2) arrays of
+            ``[old_id, new_id]`` rows.
+
+        Raises
+        ------
+        ValueError
+            If the strategy is unknown.
+        """
+        if strategy not in ("rcm", "compact", "spatial"):
+            raise ValueError(
+                f"Unknown renumbering strategy '{strategy}', expected 'rcm', 'compact' or 'spatial'."
+            )
+
+        ids = np.asarray(self.point_ids, dtype=np.int64)
+        num_points = len(ids)
+        node_index = np.arange(num_points, dtype=np.int64)
+        blocks = [block for block in self.cells if len(block)]
+        connectivities = [_map_ids(block.connectivity, ids, node_index) for block in blocks]
+        indptr, indices = node_adjacency(connectivities, num_points)
+
+        rank_before = np.empty(num_points, dtype=np.int64)
+        rank_before[np.argsort(ids, kind="stable")] = node_index
+        bandwidth_before, profile_before = bandwidth_profile(indptr, indices, rank_before)
+
+        if strategy == "rcm":
+            perm = cuthill_mckee(indptr, indices)
+        elif strategy == "compact":
+            perm = np.argsort(ids, kind="stable")
+        else:
+            perm = morton_order(self.points)
+
+        rank = np.empty(num_points, dtype=np.int64)
+        rank[perm] = node_index
+        bandwidth_after, profile_after = bandwidth_profile(indptr, indices, rank)
+        new_ids = rank + start_id
+
+        # element numbering follows the new node order (or the old IDs)
+        old_element_ids = [block.ids.astype(np.int64) for block in blocks]
+        if strategy == "compact":
+            element_keys = old_element_ids
+        else:
+            element_keys = [rank[connectivity].min(axis=1) for connectivity in connectivities]
+        all_old_element_ids = np.concatenate(old_element_ids) if blocks else np.empty(0, np.int64)
+        all_keys = np.concatenate(element_keys) if blocks else np.empty(0, np.int64)
+        all_new_element_ids = np.empty(len(all_keys), dtype=np.int64)
+        all_new_element_ids[np.argsort(all_keys, kind="stable")] = (
+            np.arange(len(all_keys), dtype=np.int64) + start_id
+        )
+
+        offset = 0
+        for block, connectivity in zip(blocks, connectivities):
+            block_new_ids = all_new_element_ids[offset : offset + len(block)]
+            offset += len(block)
+            order = np.argsort(block_new_ids, kind="stable")
+            block.ids = block_new_ids[order].astype(block.ids.dtype)
+            block.connectivity = new_ids[connectivity[order]].astype(block.connectivity.dtype)
+
+        for name, nodes_in_set in self.node_sets.items():
+            self.node_sets[name] = _map_ids(nodes_in_set, ids, new_ids).tolist()
+        for name, elements_in_set in self.elem_sets.items():
+            self.elem_sets[name] = _map_ids(
+                elements_in_set, all_old_element_ids, all_new_element_ids
+            ).tolist()
+
+        self.points = self.points[perm]
+        self.point_ids = (node_index + start_id).tolist()
+        self.mark_dirty("nodes", "node_sets", "elements", "elem_sets")
+
+        return {
+            "bandwidth_before": bandwidth_before,
+            "bandwidth_after": bandwidth_after,
+            "profile_before": profile_before,
+            "profile_after": profile_after,
+            "node_map": np.column_stack([ids, new_ids]),
+            "element_map": np.column_stack([all_old_element_ids, all_new_element_ids]),
+        }
+
+    def element_centroids(self) -> list[np.ndarray]:
+        """Returns the centroid of every element, one (num_elements, 3) array per block."""
+        ids = np.asarray(self.point_ids, dtype=np.int64)
+        node_index = np.arange(len(ids), dtype=np.int64)
+        centroids = []
+        for block in self.cells:
+            if len(block) == 0:
+                centroids.append(np.empty((0, self.points.shape[1])))
+                continue
+            connectivity = _map_ids(block.connectivity, ids, node_index)
+            centroids.append(self.points[connectivity].mean(axis=1))
+        return centroids
+
+    def partition(self, k: int, method: str = "rcb") -> list[np.ndarray]:
+        """
+        Splits the elements into `k` parts of (nearly) equal size.
+
+        Parameters
+        ----------
+        k : int
+            The number of parts.
+        method : str
+            ``"rcb"`` for recursive coordinate bisection of the element
+            centroids, or ``"graph"`` to cut the reverse Cuthill-McKee element
+            order into `k` consecutive ranges, which keeps parts connected
+            along the node adjacency graph.
+
+        Returns
+        -------
+        list[np.ndarray]
+            The 0-based part label of every element, one array per block,
+            mirroring the `cells` attribute.
+
+        Raises
+        ------
+        ValueError
+            If `k` is not positive or the method is unknown.
+        """
+        if k < 1:
+            raise ValueError("The number of parts must be at least 1.")
+        if method not in ("rcb", "graph"):
+            raise ValueError(f"Unknown partitioning method '{method}', expected 'rcb' or 'graph'.")
+
+        counts = [len(block) for block in self.cells]
+        num_elements = sum(counts)
+        labels = np.zeros(num_elements, dtype=np.int32)
+
+        if num_elements and k > 1:
+            if method == "rcb":
+                centroids = np.concatenate(self.element_centroids())
+                _bisect(centroids, np.arange(num_elements), k, 0, labels)
+            else:
+                ids = np.asarray(self.point_ids, dtype=np.int64)
+                node_index = np.arange(len(ids), dtype=np.int64)
+                connectivities = [
+                    _map_ids(block.connectivity, ids, node_index) for block in self.cells
+                ]
+                indptr, indices = node_adjacency(
+                    [c for c in connectivities if c.size], len(ids)
+                )
+                rank = np.empty(len(ids), dtype=np.int64)
+                rank[cuthill_mckee(indptr, indices)] = node_index
+                keys = np.concatenate(
+                    [rank[c].min(axis=1) for c in connectivities if c.size]
+                )
+                order = np.argsort(keys, kind="stable")
+                labels[order] = (np.arange(num_elements) * k // num_elements).astype(np.int32)
+
+        return np.split(labels, np.cumsum(counts)[:-1])
+
+    def extract(self, element_masks: list[np.ndarray]) -> Mesh:
+        """
+        Returns the sub-mesh made of the selected elements.
+
+        Only the nodes referenced by the selected elements are kept. Node and
+        element sets are restricted to the kept entities, and surfaces keep
+        only the element sets that remain.
+
+        Parameters
+        ----------
+        element_masks : list[np.ndarray]
+            One boolean mask per block, mirroring the `cells` attribute.
+
+        Returns
+        -------
+        Mesh
+            The extracted mesh (not validated).
+        """
+        cells = []
+        for block, mask in zip(self.cells, element_masks):
+            mask = np.asarray(mask, dtype=bool)
+            if np.any(mask):
+                cells.append(
+                    ElementBlock(block.element_type, block.ids[mask], block.connectivity[mask])
+                )
+
+        ids = np.asarray(self.point_ids, dtype=np.int64)
+        used = (
+            np.unique(np.concatenate([block.connectivity.ravel() for block in cells]))
+            if cells
+            else np.empty(0, dtype=np.int64)
+        )
+        keep = np.isin(ids, used)
+        element_ids = (
+            np.concatenate([block.ids for block in cells]) if cells else np.empty(0, np.int64)
+        )
+
+        node_sets = {}
+        for name, nodes_in_set in self.node_sets.items():
+            nodes_in_set = np.asarray(nodes_in_set, dtype=np.int64)
+            restricted = nodes_in_set[np.isin(nodes_in_set, used)]
+            if len(restricted):
+                node_sets[name] = restricted.tolist()
+
+        elem_sets = {}
+        for name, elements_in_set in self.elem_sets.items():
+            elements_in_set = np.asarray(elements_in_set, dtype=np.int64)
+            restricted = elements_in_set[np.isin(elements_in_set, element_ids)]
+            if len(restricted):
+                elem_sets[name] = restricted.tolist()
+
+        surface_sets = {}
+        for name, set_names in self.surface_sets.items():
+            remaining = [set_name for set_name in set_names if set_name in elem_sets]
+            if remaining:
+                surface_sets[name] = remaining
+
+        return Mesh(
+            self.points[keep],
+            ids[keep].tolist(),
+            cells,
+            node_sets,
+            elem_sets,
+            surface_sets,
+            validate_flag=False,
+        )
+
+    def save_native(self, path, extra: dict | None = None) -> None:
+        """
+        Saves the mesh in the native binary format, a directory or ``.zip``
+        archive of ``.npy`` arrays and a JSON manifest, see
+        `abaqus_io.native_io.write_native`.
+        """
+        from .native_io import write_native
+
+        write_native(path, self, extra)
+
+    @classmethod
+    def load_native(cls, path, mmap: bool = True) -> Mesh:
+        """
+        Loads a mesh saved by `save_native`, memory-mapping its arrays unless
+        `mmap` is False, see `abaqus_io.native_io.read_native`.
+        """
+        from .native_io import read_native
+
+        return read_native(path, mmap)
+
+    def copy(self, sections=None) -> Mesh:
+        """
+        Returns a deep copy of the object.
+
+        With `sections`, only the data of those deck sections (see `SECTIONS`)
+        is copied. The other sections share their arrays, lists and element
+        blocks with this mesh, held in new containers: replacing a set or an
+        element block in either mesh does not affect the other, but changing
+        a shared array in place does.
+        """
+        if sections is None:
+            return copy.deepcopy(self)
+        unknown = set(sections).difference(SECTIONS)
+        if unknown:
+            raise ValueError(f"Unknown deck sections: {sorted(unknown)}")
+
+        mesh = copy.copy(self)
+        for section, names in _SECTION_ATTRIBUTES.items():
+            for name in names:
+                value = getattr(self, name)
+                if section in sections:
+                    value = copy.deepcopy(value)
+                elif isinstance(value, (dict, list)) and name != "point_ids":
+                    value = copy.copy(value)
+                setattr(mesh, name, value)
+        mesh.dirty_sections = set(self.dirty_sections)
+        return mesh
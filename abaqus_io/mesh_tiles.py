@@ -0,0 +1,306 @@
+"""
+Quadtree tiles over the planar extent of a mesh, for viewport streaming.
+
+Level ``l`` splits the bounding square of the mesh into ``2**l`` tiles per
+axis. Every element belongs to the tile holding its centroid and every node
+to the tile holding it, so the tiles covering a viewport can be fetched and
+merged without duplicates. A tile with more elements than a viewer can draw
+is decimated to the boundary edges of the mesh and a subset of the nodes.
+"""
+
+from __future__ import annotations
+
+import copy
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from .mesh_io import Mesh, _index_of
+from .spatial_index import SpatialIndex
+
+# Finest level of the element count table, 4**10 cells
+_COUNT_LEVEL = 10
+
+
+class MeshTiler:
+    """Selects the nodes and elements of quadtree tiles over a mesh.
+
+    Tiles are described by rows of ``mesh.points`` and of the element
+    blocks, so their coordinates are always read from the mesh itself. The
+    tiler must be rebuilt when nodes or elements are removed or reordered;
+    moved or appended nodes only need to be passed on to `node_index`.
+
+    Parameters
+    ----------
+    mesh : Mesh
+        The mesh; only the first two coordinates are used.
+    max_elements : int
+        Tiles with more elements are decimated.
+    max_nodes : int
+        The maximum number of sampled nodes in a decimated tile.
+    max_level : int
+        The finest tile level.
+    node_index : SpatialIndex, optional
+        A planar index of ``mesh.points`` to share, e.g. one that the caller
+        keeps up to date with moved nodes. By default one is built.
+    """
+
+    def __init__(
+        self,
+        mesh: Mesh,
+        max_elements: int = 20000,
+        max_nodes: int = 5000,
+        max_level: int = 16,
+        node_index: SpatialIndex | None = None,
+    ):
+        self.max_elements = max_elements
+        self.max_nodes = max_nodes
+        self.max_level = max_level
+
+        xy = np.asarray(mesh.points, dtype=np.float64)[:, :2]
+        point_ids = np.asarray(mesh.point_ids, dtype=np.int64)
+        self.node_index = node_index if node_index is not None else SpatialIndex(xy)
+
+        if len(xy):
+            self.origin = xy.min(axis=0)
+            self.size = float((xy.max(axis=0) - self.origin).max()) or 1.0
+        else:
+            self.origin = np.zeros(2)
+            self.size = 1.0
+
+        # element centroids, numbered across the blocks
+        self.block_offsets = np.cumsum([0] + [len(block) for block in mesh.cells])
+        centroids = np.full((int(self.block_offsets[-1]), 2), np.nan)
+        edges = []
+        # the connectivity as node rows, -1 for undefined nodes
+        self._connectivity_rows = []
+        for block, start in zip(mesh.cells, self.block_offsets):
+            rows = _index_of(block.connectivity.ravel(), point_ids).reshape(block.connectivity.shape)
+            self._connectivity_rows.append(rows)
+            if not len(block):
+                continue
+            valid = np.all(rows >= 0, axis=1)
+            centroids[start : start + len(block)][valid] = xy[rows[valid]].mean(axis=1)
+            edges.append(_outline_edges(rows[valid], block.dim))
+
+        self.num_elements = len(centroids)
+        self._element_numbers = np.flatnonzero(~np.isnan(centroids[:, 0]))
+        self._element_centroids = centroids[self._element_numbers]
+        self.element_index = SpatialIndex(self._element_centroids)
+        self._element_counts = self._count_table(self._element_centroids)
+
+        # edges used by a single element lie on the boundary
+        edges = np.concatenate(edges) if edges else np.empty((0, 3), dtype=np.int64)
+        keys = edges[:, 0] * max(len(xy), 1) + edges[:, 1]
+        _, first, counts = np.unique(keys, return_index=True, return_counts=True)
+        boundary = edges[first[(counts == 1) | (edges[first, 2] == 1)], :2]
+        self.boundary_edges = boundary
+        self._edge_midpoints = xy[boundary].mean(axis=1) if len(boundary) else np.empty((0, 2))
+        self._edge_index = SpatialIndex(self._edge_midpoints)
+
+        # a fixed random subset of the nodes for decimated tiles
+        sample_size = min(len(xy), max_nodes * 64)
+        rng = np.random.default_rng(0)
+        self._sample_rows = np.sort(rng.choice(len(xy), size=sample_size, replace=False))
+        self._sample_coords = xy[self._sample_rows]
+        self._sample_index = SpatialIndex(self._sample_coords)
+
+    def __repr__(self) -> str:
+        return (
+            f"<MeshTiler: #elements={self.num_elements}, "
+            f"#boundary_edges={len(self.boundary_edges)}, max_level={self.max_level}>"
+        )
+
+    def copy(self) -> MeshTiler:
+        """
+        Returns a tiler with its own copy of `node_index`, which nodes later
+        moved or appended in this one leave as it is. Everything else is
+        fixed at build time and shared.
+        """
+        tiler = copy.copy(self)
+        tiler.node_index = copy.deepcopy(self.node_index)
+        return tiler
+
+    # ------------------------------------------------------------------
+    # Tile layout
+    # ------------------------------------------------------------------
+
+    def level_for_scale(self, scale: float, tile_pixels: float = 256.0) -> int:
+        """
+        Returns the level whose tiles are about `tile_pixels` wide on screen
+        at `scale` pixels per unit length.
+        """
+        if scale <= 0:
+            return 0
+        level = int(np.ceil(np.log2(max(self.size * scale / tile_pixels, 1.0))))
+        return min(level, self.max_level)
+
+    def tile_bounds(self, level: int, tx: int, ty: int) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the lower and upper corner of a tile."""
+        width = self.size / (1 << level)
+        lower = self.origin + width * np.array([tx, ty], dtype=np.float64)
+        return lower, lower + width
+
+    def tiles_in_box(self, lower: ArrayLike, upper: ArrayLike, level: int) -> list[tuple[int, int]]:
+        """Returns the tiles of a level that overlap a box, row by row."""
+        lower = np.asarray(lower, dtype=np.float64)
+        upper = np.asarray(upper, dtype=np.float64)
+        if np.any(upper < self.origin) or np.any(lower > self.origin + self.size):
+            return []
+        (x0, y0), (x1, y1) = self._tile_of(np.array([lower, upper]), level)
+        return [(tx, ty) for ty in range(y0, y1 + 1) for tx in range(x0, x1 + 1)]
+
+    # ------------------------------------------------------------------
+    # Tile content
+    # ------------------------------------------------------------------
+
+    def tile(self, level: int, tx: int, ty: int) -> dict:
+        """
+        Selects the content of a tile.
+
+        Returns
+        -------
+        dict
+            - ``decimated``: whether the tile was decimated;
+            - ``num_elements``: the number of elements in the tile;
+            - ``node_rows``: the sorted rows of the nodes to draw: those in
+              the tile (all or sampled) and those of the elements or edges;
+            - ``element_rows``: the rows of the tile elements, one array per
+              block, empty for a decimated tile;
+            - ``edges``: the boundary edges in the tile as (num_edges, 2)
+              node rows, empty for a full tile.
+        """
+        lower, upper = self.tile_bounds(level, tx, ty)
+        # widen the query a little, membership is decided by `_tile_of`
+        margin = 1e-9 * self.size
+        lower, upper = lower - margin, upper + margin
+
+        num_elements = self._count_upper_bound(level, tx, ty)
+        if num_elements > self.max_elements:
+            candidates = self.element_index.in_box(lower, upper)
+            candidates = candidates[self._in_tile(self._element_centroids[candidates], level, tx, ty)]
+            num_elements = len(candidates)
+        else:
+            candidates = None
+
+        if num_elements > self.max_elements:
+            # membership by the positions at build time, like the index
+            edges = self._edge_index.in_box(lower, upper)
+            edges = self.boundary_edges[edges[self._in_tile(self._edge_midpoints[edges], level, tx, ty)]]
+            sampled = self._sample_index.in_box(lower, upper)
+            sampled = self._sample_rows[sampled[self._in_tile(self._sample_coords[sampled], level, tx, ty)]]
+            if len(sampled) > self.max_nodes:
+                sampled = sampled[:: -(-len(sampled) // self.max_nodes)]
+            return {
+                "decimated": True,
+                "num_elements": num_elements,
+                "node_rows": np.union1d(sampled, edges.ravel()),
+                "element_rows": [np.empty(0, dtype=np.int64) for _ in range(len(self.block_offsets) - 1)],
+                "edges": edges,
+            }
+
+        if candidates is None:
+            candidates = self.element_index.in_box(lower, upper)
+            candidates = candidates[self._in_tile(self._element_centroids[candidates], level, tx, ty)]
+        numbers = self._element_numbers[candidates]
+        blocks = np.searchsorted(self.block_offsets, numbers, side="right") - 1
+        element_rows = [
+            numbers[blocks == b] - self.block_offsets[b] for b in range(len(self.block_offsets) - 1)
+        ]
+
+        nodes = self.node_index.in_box(lower, upper)
+        nodes = nodes[self._in_tile(self.node_index.points[nodes], level, tx, ty)]
+        element_nodes = [self._connectivity_rows[b][rows].ravel() for b, rows in enumerate(element_rows)]
+        return {
+            "decimated": False,
+            "num_elements": num_elements,
+            "node_rows": np.unique(np.concatenate([nodes] + element_nodes)),
+            "element_rows": element_rows,
+            "edges": np.empty((0, 2), dtype=np.int64),
+        }
+
+    def full_tiles(self, level: int, tiles: list[tuple[int, int]] | None = None):
+        """
+        Yields the content of tiles with all their elements, splitting
+        decimated tiles into their four children until they are full.
+
+        Parameters
+        ----------
+        level : int
+            The level of `tiles`.
+        tiles : list[tuple[int, int]], optional
+            The tiles to cover, in the order to yield them; by default all
+            tiles of the level, row by row.
+
+        Yields
+        ------
+        tuple
+            ``(level, tx, ty, tile)`` for the non-empty full tiles, see `tile`.
+            Together they hold every element exactly once. Decimated tiles
+            at `max_level` are yielded as they are.
+        """
+        if tiles is None:
+            cells = 1 << level
+            tiles = [(tx, ty) for ty in range(cells) for tx in range(cells)]
+        for tx, ty in tiles:
+            tile = self.tile(level, tx, ty)
+            if tile["decimated"] and level < self.max_level:
+                children = [(2 * tx + dx, 2 * ty + dy) for dy in (0, 1) for dx in (0, 1)]
+                yield from self.full_tiles(level + 1, children)
+            elif len(tile["node_rows"]) or tile["num_elements"]:
+                yield level, tx, ty, tile
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _tile_of(self, coords: np.ndarray, level: int) -> np.ndarray:
+        cells = 1 << level
+        tiles = np.floor((coords - self.origin) / self.size * cells)
+        return np.clip(np.nan_to_num(tiles, nan=-1), 0, cells - 1).astype(np.int64)
+
+    def _in_tile(self, coords: np.ndarray, level: int, tx: int, ty: int) -> np.ndarray:
+        tiles = self._tile_of(coords.reshape(-1, 2), level)
+        return (tiles[:, 0] == tx) & (tiles[:, 1] == ty)
+
+    def _count_table(self, centroids: np.ndarray) -> np.ndarray:
+        """Summed-area table of the element counts at `_COUNT_LEVEL`."""
+        cells = 1 << _COUNT_LEVEL
+        tiles = self._tile_of(centroids, _COUNT_LEVEL)
+        counts = np.bincount(tiles[:, 1] * cells + tiles[:, 0], minlength=cells * cells)
+        table = np.zeros((cells + 1, cells + 1), dtype=np.int64)
+        table[1:, 1:] = counts.reshape(cells, cells).cumsum(axis=0).cumsum(axis=1)
+        return table
+
+    def _count_upper_bound(self, level: int, tx: int, ty: int) -> int:
+        """
+        Counts the elements of a tile from the summed-area table: exactly up
+        to `_COUNT_LEVEL`, as the count of the enclosing cell beyond it.
+        """
+        if level > _COUNT_LEVEL:
+            shift = level - _COUNT_LEVEL
+            tx, ty, level = tx >> shift, ty >> shift, _COUNT_LEVEL
+        factor = 1 << (_COUNT_LEVEL - level)
+        x0, y0 = tx * factor, ty * factor
+        x1, y1 = x0 + factor, y0 + factor
+        table = self._element_counts
+        return int(table[y1, x1] - table[y0, x1] - table[y1, x0] + table[y0, x0])
+
+
+def _outline_edges(rows: np.ndarray, dim: int | None) -> np.ndarray:
+    """
+    Returns the edges of elements as (num_edges, 3) rows: the two node rows,
+    lower first, and 1 for line elements, which always count as boundary.
+    """
+    if len(rows) == 0 or rows.shape[1] < 2:
+        return np.empty((0, 3), dtype=np.int64)
+    if dim == 1 or rows.shape[1] == 2:
+        pairs = rows[:, [0, -1]]
+        line = 1
+    else:
+        # corner nodes come first, the mid-side nodes of quadratic elements after them
+        corners = rows[:, :3] if rows.shape[1] in (3, 6) else rows[:, :4]
+        pairs = np.stack([corners, np.roll(corners, -1, axis=1)], axis=2).reshape(-1, 2)
+        line = 0
+    pairs = np.sort(pairs, axis=1)
+    return np.column_stack([pairs, np.full(len(pairs), line, dtype=np.int64)])
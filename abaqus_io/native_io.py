@@ -0,0 +1,284 @@
+"""
+I/O for the native binary mesh format.
+
+A native project stores every mesh array as a ``.npy`` file next to a JSON
+manifest that describes the element blocks, the sets and any application
+data. It is either a directory or an uncompressed zip archive of the same
+files. Loading memory-maps the arrays, so opening a mesh costs little more
+than reading the data, with no text to parse.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+from .element_block import ElementBlock
+from .mesh_io import SECTIONS, Mesh
+
+MANIFEST = "manifest.json"
+FORMAT_NAME = "abaqus_io-native"
+FORMAT_VERSION = 1
+
+
+def is_native(path) -> bool:
+    """Checks whether `path` is a native project, directory or zip archive."""
+    path = Path(path)
+    if path.is_dir():
+        return (path / MANIFEST).exists()
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            return MANIFEST in zf.namelist()
+    return False
+
+
+def write_native(path, mesh: Mesh, extra: dict | None = None, sections=None, base=None) -> None:
+    """
+    Writes a mesh in the native binary format.
+
+    Parameters
+    ----------
+    path : str or Path
+        The project path. A path ending in ``.zip`` is written as a zip
+        archive, any other as a directory.
+    mesh : Mesh
+        The mesh to write.
+    extra : dict, optional
+        JSON-serializable application data stored in the manifest, e.g. the
+        connections of the editor.
+    sections : iterable of str, optional
+        For directories only: the sections (see `SECTIONS`) whose arrays are
+        rewritten; the arrays of other sections are kept if present. By
+        default everything is written.
+    base : str or Path, optional
+        For directories only: the project directory whose arrays are kept,
+        by default `path` itself. They are hard-linked into `path` (copied
+        where links are not supported), so `base` is never modified and
+        stays complete if writing `path` is interrupted.
+    """
+    path = Path(path)
+    arrays, manifest = _layout(mesh, extra)
+
+    if path.suffix.lower() == ".zip":
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        os.close(fd)
+        try:
+            # stored, not deflated, so the arrays can be memory-mapped
+            with zipfile.ZipFile(tmp_name, "w", zipfile.ZIP_STORED) as zf:
+                for name, (_, array) in arrays.items():
+                    with zf.open(name, "w", force_zip64=True) as f:
+                        np.lib.format.write_array(f, np.ascontiguousarray(array))
+                zf.writestr(MANIFEST, json.dumps(manifest))
+            os.replace(tmp_name, path)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+        return
+
+    path.mkdir(parents=True, exist_ok=True)
+    sections = set(SECTIONS if sections is None else sections)
+    base = path if base is None else Path(base)
+    for name, (section, array) in arrays.items():
+        if section not in sections and (base / name).is_file():
+            if base != path:
+                _link_file(base / name, path / name)
+            continue
+        _replace_file(path / name, lambda f: np.lib.format.write_array(f, np.ascontiguousarray(array)))
+    # the manifest goes last, so it only refers to complete arrays
+    _replace_file(path / MANIFEST, lambda f: f.write(json.dumps(manifest).encode()))
+
+
+def read_native_manifest(path) -> dict:
+    """Reads the manifest of a native project, including its ``extra`` data."""
+    path = Path(path)
+    if path.is_dir():
+        manifest = json.loads((path / MANIFEST).read_text())
+    else:
+        with zipfile.ZipFile(path) as zf:
+            manifest = json.loads(zf.read(MANIFEST))
+
+    if manifest.get("format") != FORMAT_NAME:
+        raise ValueError(f"{path} is not a native mesh project.")
+    if manifest.get("version", 0) > FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported native format version {manifest['version']}, "
+            f"expected at most {FORMAT_VERSION}."
+        )
+    return manifest
+
+
+def read_native(path, mmap: bool = True) -> Mesh:
+    """
+    Reads a mesh in the native binary format.
+
+    Parameters
+    ----------
+    path : str or Path
+        The project directory or zip archive.
+    mmap : bool
+        Whether to memory-map the coordinates and the element arrays
+        (copy-on-write, so the mesh can still be edited) instead of reading
+        them. ID lists are always materialized, since `Mesh` holds them as
+        Python lists.
+
+    Returns
+    -------
+    Mesh
+        The mesh. It is not validated, and no section is dirty.
+    """
+    path = Path(path)
+    manifest = read_native_manifest(path)
+    load = _directory_loader(path, mmap) if path.is_dir() else _zip_loader(path, mmap)
+
+    points = load(manifest["points"])
+    point_ids = load(manifest["point_ids"]).tolist()
+
+    cells = [
+        ElementBlock(block["element_type"], load(block["ids"]), load(block["connectivity"]))
+        for block in manifest["cells"]
+    ]
+
+    node_sets = _split_sets(manifest["node_sets"], load)
+    elem_sets = _split_sets(manifest["elem_sets"], load)
+
+    mesh = Mesh(
+        points,
+        point_ids,
+        cells,
+        node_sets,
+        elem_sets,
+        manifest["surface_sets"],
+        validate_flag=False,
+    )
+    mesh.clear_dirty()
+    return mesh
+
+
+# ----------------------------------------------------------------------
+# Internals
+# ----------------------------------------------------------------------
+
+
+def _layout(mesh: Mesh, extra: dict | None):
+    """Returns the arrays to store, by file name, and the manifest."""
+    arrays = {
+        "points.npy": ("nodes", np.asarray(mesh.points, dtype=np.float64)),
+        "point_ids.npy": ("nodes", np.asarray(mesh.point_ids, dtype=np.int64)),
+    }
+
+    cells = []
+    for index, block in enumerate(mesh.cells):
+        if block.element_type == "":
+            continue
+        arrays[f"cells_{index}_ids.npy"] = ("elements", block.ids)
+        arrays[f"cells_{index}_connectivity.npy"] = ("elements", block.connectivity)
+        cells.append(
+            {
+                "element_type": block.element_type,
+                "ids": f"cells_{index}_ids.npy",
+                "connectivity": f"cells_{index}_connectivity.npy",
+            }
+        )
+
+    manifest = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "points": "points.npy",
+        "point_ids": "point_ids.npy",
+        "cells": cells,
+        "node_sets": _join_sets(mesh.node_sets, "node_sets", arrays),
+        "elem_sets": _join_sets(mesh.elem_sets, "elem_sets", arrays),
+        "surface_sets": mesh.surface_sets,
+        "extra": extra or {},
+    }
+    return arrays, manifest
+
+
+def _join_sets(sets: dict, section: str, arrays: dict) -> dict:
+    """Stores all sets of one kind as one array, returning their offsets."""
+    name = f"{section}.npy"
+    values = [np.asarray(ids, dtype=np.int64).ravel() for ids in sets.values()]
+    offsets = np.concatenate([[0], np.cumsum([len(v) for v in values])]).astype(int)
+    arrays[name] = (section, np.concatenate(values) if values else np.empty(0, dtype=np.int64))
+    return {"values": name, "names": list(sets.keys()), "offsets": offsets.tolist()}
+
+
+def _split_sets(spec: dict, load) -> dict[str, list]:
+    values = load(spec["values"])
+    offsets = spec["offsets"]
+    return {
+        name: values[offsets[i] : offsets[i + 1]].tolist()
+        for i, name in enumerate(spec["names"])
+    }
+
+
+def _replace_file(path: Path, write) -> None:
+    """Writes a file through a temporary file, then moves it into place."""
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def _link_file(source: Path, path: Path) -> None:
+    """Hard-links `source` to `path`, replacing it, or copies it where links are not supported."""
+    path.unlink(missing_ok=True)
+    try:
+        os.link(source, path)
+    except OSError:
+        with open(source, "rb") as src:
+            _replace_file(path, lambda f: shutil.copyfileobj(src, f))
+
+
+def _directory_loader(path: Path, mmap: bool):
+    mmap_mode = "c" if mmap else None
+    return lambda name: np.load(path / name, mmap_mode=mmap_mode)
+
+
+def _zip_loader(path: Path, mmap: bool):
+    """Loads arrays from a zip archive, memory-mapping the stored members."""
+    with zipfile.ZipFile(path) as zf:
+        infos = {info.filename: info for info in zf.infolist()}
+
+    def load(name):
+        info = infos[name]
+        if not mmap or info.compress_type != zipfile.ZIP_STORED:
+            with zipfile.ZipFile(path) as zf, zf.open(info) as f:
+                return np.lib.format.read_array(f)
+
+        with open(path, "rb") as f:
+            # skip the local file header, whose extra field may differ from
+            # the one in the central directory
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(f.read(4), dtype="<u2")
+            f.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            offset = f.tell()
+        if dtype.hasobject:
+            raise ValueError(f"Cannot memory-map object array {name}.")
+        if int(np.prod(shape)) == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(
+            path,
+            dtype=dtype,
+            mode="c",
+            shape=shape,
+            order="F" if fortran_order else "C",
+            offset=offset,
+        )
+
+    return load
@@ -0,0 +1,292 @@
+"""
+Opt-in profiling of reading decks.
+
+Inside `profile`, the deck reader records a span for every keyword section
+(its wall time, the characters read and the rows parsed) and for the phases
+after parsing: resolving sets, concatenating, merging included decks and
+validating. With ``memory=True`` the peak memory allocated within every span
+is measured through `tracemalloc` as well. The spans come back as a summary
+per section and phase, or as a Chrome trace-event file to open in
+``chrome://tracing`` or Perfetto.
+
+Setting the ``ABAQUS_IO_PROFILE`` environment variable to a file name profiles
+every `read_deck` call outside a profile and writes its trace there;
+``ABAQUS_IO_PROFILE_MEMORY=1`` measures the memory too.
+
+Outside a profile the hooks cost one context variable lookup per keyword
+section and nothing per line.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Names the trace file of the read_deck calls made outside a profile
+PROFILE_ENV = "ABAQUS_IO_PROFILE"
+# Set to 1 to measure the memory of those calls too
+PROFILE_MEMORY_ENV = "ABAQUS_IO_PROFILE_MEMORY"
+
+_current: ContextVar[Profile | None] = ContextVar("abaqus_io_profile", default=None)
+
+
+class Span:
+    """A timed part of the work: a keyword section or a phase.
+
+    Attributes
+    ----------
+    name : str
+        The keyword, e.g. ``NODE``, or the phase, e.g. ``validate``.
+    category : str
+        ``section`` or ``phase``.
+    start, duration : float
+        In seconds from the start of the profile.
+    bytes : int | None
+        The characters read, for sections.
+    rows : int | None
+        The data lines parsed, for sections.
+    memory_peak : int | None
+        The most bytes allocated within the span at once, beyond those
+        allocated when it began; None unless memory is profiled.
+    depth : int
+        The number of spans enclosing this one, e.g. the sections of an
+        included deck are within its ``INCLUDE`` section.
+    """
+
+    def __init__(self, profile: Profile, name: str, category: str, depth: int, reader=None):
+        self.name = name
+        self.category = category
+        self.depth = depth
+        self.thread = threading.get_ident()
+        self.duration: float | None = None
+        self.bytes: int | None = None
+        self.rows: int | None = None
+        self.memory_peak: int | None = None
+        self._profile = profile
+        self._reader = reader
+        self._position = getattr(reader, "position", None)
+        self._memory_start = 0
+        self._memory_seen = 0
+        self.start = time.perf_counter() - profile._origin
+
+    def __repr__(self) -> str:
+        return f"<Span: {self.category} {self.name}, duration={self.duration}>"
+
+    def end(self, rows: int | None = None) -> None:
+        """Ends the span, with the number of rows parsed in it."""
+        self._profile._end(self, rows)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "category": self.category,
+            "start": self.start,
+            "duration": self.duration,
+            "bytes": self.bytes,
+            "rows": self.rows,
+            "memory_peak": self.memory_peak,
+            "depth": self.depth,
+        }
+
+
+class _NullSpan:
+    """The span returned outside a profile, which records nothing."""
+
+    def end(self, rows: int | None = None) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Profile:
+    """The spans recorded within a `profile`.
+
+    Parameters
+    ----------
+    memory : bool
+        Measures the peak memory of the spans through `tracemalloc`.
+    """
+
+    def __init__(self, memory: bool = False):
+        self.memory = memory
+        # in the order they began
+        self.spans: list[Span] = []
+        self.duration: float | None = None
+        self.memory_peak: int | None = None
+        self._stack: list[Span] = []
+        self._origin = time.perf_counter()
+
+    def __repr__(self) -> str:
+        return f"<Profile: #spans={len(self.spans)}, duration={self.duration}>"
+
+    def begin(self, name: str, category: str, reader=None) -> Span:
+        """Begins a span, see the module-level `begin`."""
+        span = Span(self, name, category, len(self._stack), reader)
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                parent = self._stack[-1]
+                parent._memory_seen = max(parent._memory_seen, peak)
+            tracemalloc.reset_peak()
+            span._memory_start = span._memory_seen = current
+        self.spans.append(span)
+        self._stack.append(span)
+        return span
+
+    def _end(self, span: Span, rows: int | None) -> None:
+        if span not in self._stack:
+            return
+        # spans left open by an exception end with the one enclosing them
+        while self._stack[-1] is not span:
+            self._end(self._stack[-1], None)
+        self._stack.pop()
+        span.duration = time.perf_counter() - self._origin - span.start
+        span.rows = rows
+        if span._position is not None:
+            span.bytes = span._reader.position - span._position
+        if self.memory:
+            span._memory_seen = max(span._memory_seen, tracemalloc.get_traced_memory()[1])
+            span.memory_peak = span._memory_seen - span._memory_start
+            if self._stack:
+                parent = self._stack[-1]
+                parent._memory_seen = max(parent._memory_seen, span._memory_seen)
+
+    def summary(self) -> list[dict]:
+        """
+        Returns the totals per section and phase: the number of spans, the
+        seconds, the bytes and rows, and the largest memory peak; the
+        slowest first. The spans of included decks count with the others.
+        """
+        totals: dict[tuple, dict] = {}
+        for span in self.spans:
+            if span.duration is None:
+                continue
+            total = totals.setdefault(
+                (span.category, span.name),
+                {"name": span.name, "category": span.category, "count": 0, "seconds": 0.0, "bytes": 0, "rows": 0},
+            )
+            total["count"] += 1
+            total["seconds"] += span.duration
+            total["bytes"] += span.bytes or 0
+            total["rows"] += span.rows or 0
+            if span.memory_peak is not None:
+                total["memory_peak"] = max(total.get("memory_peak", 0), span.memory_peak)
+        return sorted(totals.values(), key=lambda total: -total["seconds"])
+
+    def to_dict(self) -> dict:
+        """Returns the profile as plain data, e.g. to write as JSON."""
+        return {
+            "duration": self.duration,
+            "memory_peak": self.memory_peak,
+            "summary": self.summary(),
+            "spans": [span.to_dict() for span in self.spans if span.duration is not None],
+        }
+
+    def to_trace(self) -> dict:
+        """Returns the spans in the Chrome trace-event format, as complete events."""
+        pid = os.getpid()
+        events = []
+        for span in self.spans:
+            if span.duration is None:
+                continue
+            args = {key: value for key, value in span.to_dict().items() if key in ("bytes", "rows", "memory_peak")}
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    # microseconds
+                    "ts": span.start * 1e6,
+                    "dur": span.duration * 1e6,
+                    "pid": pid,
+                    "tid": span.thread,
+                    "args": {key: value for key, value in args.items() if value is not None},
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_trace(self, path) -> None:
+        """Writes the Chrome trace-event file of the profile."""
+        with open(path, "w") as f:
+            json.dump(self.to_trace(), f)
+
+    def format(self) -> str:
+        """Returns the summary as a text table."""
+        lines = [f"{'name':<12} {'category':<8} {'count':>6} {'seconds':>9} {'MB':>9} {'rows':>10} {'peak MB':>8}"]
+        for total in self.summary():
+            peak = total.get("memory_peak")
+            lines.append(
+                f"{total['name']:<12} {total['category']:<8} {total['count']:>6} {total['seconds']:>9.3f} "
+                f"{total['bytes'] / 1e6:>9.2f} {total['rows']:>10} {'' if peak is None else f'{peak / 1e6:.2f}':>8}"
+            )
+        return "\n".join(lines)
+
+
+@contextmanager
+def profile(memory: bool = False):
+    """
+    Returns a context manager profiling the decks read in it, in this thread,
+    and yielding the `Profile`.
+
+    With `memory`, `tracemalloc` is started if it is not tracing yet, which
+    slows the reading down severalfold; its peak is reset at every span.
+    """
+    prof = Profile(memory)
+    token = _current.set(prof)
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if memory:
+        tracemalloc.reset_peak()
+        memory_start = tracemalloc.get_traced_memory()[0]
+    prof._origin = time.perf_counter()
+    try:
+        yield prof
+    finally:
+        while prof._stack:
+            prof._end(prof._stack[-1], None)
+        prof.duration = time.perf_counter() - prof._origin
+        if memory:
+            prof.memory_peak = tracemalloc.get_traced_memory()[1] - memory_start
+        _current.reset(token)
+        if started_tracing:
+            tracemalloc.stop()
+
+
+def enabled() -> bool:
+    """Tells whether a profile is recording in this context."""
+    return _current.get() is not None
+
+
+def begin(name: str, category: str = "phase", reader=None):
+    """
+    Begins a span of the current profile and returns it, to be ended with
+    its ``end`` method; does nothing outside a profile. The characters read
+    in the span are counted if `reader` tracks its ``position``.
+    """
+    prof = _current.get()
+    if prof is None:
+        return _NULL_SPAN
+    return prof.begin(name, category, reader)
+
+
+@contextmanager
+def phase(name: str):
+    """Records the code in the context as a phase of the current profile."""
+    span = begin(name)
+    try:
+        yield
+    finally:
+        span.end()
+
+
+def env_trace_path() -> str | None:
+    """Returns the trace file named by `PROFILE_ENV`, unless a profile is recording."""
+    path = os.environ.get(PROFILE_ENV)
+    return path if path and not enabled() else None
@@ -0,0 +1,311 @@
+"""
+Uniform-grid spatial index for nearest-node, radius and box queries.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from ._common import concat_ranges
+
+# Upper bound for the number of grid cells along one axis
+_MAX_CELLS_PER_AXIS = 1 << 20
+
+
+class SpatialIndex:
+    """A uniform hash grid over a fixed set of points.
+
+    Points are bucketed into axis-aligned cells and sorted by their flat cell
+    key, so building the index costs one ``argsort`` (O(n log n)) and every
+    query only touches the cells overlapping its search region.
+
+    Moved or appended points are kept in a small overflow list that is
+    checked exhaustively; once it grows beyond ``rebuild_fraction`` of the
+    indexed points the grid is rebuilt.
+
+    Attributes
+    ----------
+    points : np.ndarray
+        A (num_points, dim) copy of the indexed coordinates.
+    cell_size : float
+        The edge length of a grid cell.
+    dims : tuple[int, ...]
+        The number of grid cells along each axis.
+
+    Parameters
+    ----------
+    points : ArrayLike
+        A (num_points, dim) array of coordinates, e.g. ``mesh.points`` or
+        ``mesh.points[:, :2]`` for planar queries.
+    cell_size : float, optional
+        The edge length of a grid cell. By default it is chosen so that a
+        cell holds ``points_per_cell`` points on average.
+    points_per_cell : float
+        The average cell occupancy used to derive the default cell size.
+    rebuild_fraction : float
+        The fraction of moved points that triggers a full rebuild.
+    """
+
+    def __init__(
+        self,
+        points: ArrayLike,
+        cell_size: float | None = None,
+        points_per_cell: float = 4.0,
+        rebuild_fraction: float = 0.1,
+    ):
+        self.points_per_cell = points_per_cell
+        self.rebuild_fraction = rebuild_fraction
+        self._requested_cell_size = cell_size
+
+        points = np.array(points, dtype=np.float64)
+        if points.ndim != 2:
+            raise ValueError("Points must be a 2D array of shape (num_points, dim).")
+        self.points = points
+        self.build()
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def __repr__(self) -> str:
+        return (
+            f"<SpatialIndex: #points={len(self.points)}, dims={self.dims}, "
+            f"cell_size={self.cell_size:g}, #moved={len(self._moved)}>"
+        )
+
+    # ------------------------------------------------------------------
+    # Construction and updates
+    # ------------------------------------------------------------------
+
+    def build(self) -> None:
+        """(Re)builds the grid from the current ``points``."""
+        num_points, dim = self.points.shape
+
+        if num_points:
+            self._lower = self.points.min(axis=0)
+            extent = self.points.max(axis=0) - self._lower
+        else:
+            self._lower = np.zeros(dim)
+            extent = np.zeros(dim)
+
+        cell_size = self._requested_cell_size
+        if not cell_size:
+            active = extent[extent > 0]
+            if active.size:
+                num_cells = max(num_points / self.points_per_cell, 1.0)
+                cell_size = float(np.prod(active) / num_cells) ** (1.0 / active.size)
+                # never use cells much smaller than the spread along one axis
+                cell_size = max(cell_size, float(active.max()) / _MAX_CELLS_PER_AXIS)
+            else:
+                cell_size = 1.0
+        self.cell_size = float(cell_size)
+
+        dims = np.floor(extent / self.cell_size).astype(np.int64) + 1
+        self.dims = tuple(int(d) for d in np.minimum(dims, _MAX_CELLS_PER_AXIS))
+
+        keys = self._keys(self.points)
+        self._order = np.argsort(keys, kind="stable")
+        self._sorted_keys = keys[self._order]
+        self._stale = np.zeros(num_points, dtype=bool)
+        self._moved = np.empty(0, dtype=np.int64)
+
+    def update(self, indices: ArrayLike, coords: ArrayLike) -> None:
+        """
+        Moves or appends points.
+
+        Indices equal to or beyond the current number of points append new
+        points; the index grows to cover them.
+
+        Parameters
+        ----------
+        indices : ArrayLike
+            The 0-based indices of the points to update.
+        coords : ArrayLike
+            The new coordinates, one row per index.
+        """
+        indices = np.atleast_1d(np.asarray(indices, dtype=np.int64))
+        coords = np.asarray(coords, dtype=np.float64).reshape(len(indices), -1)
+        if len(indices) == 0:
+            return
+
+        num_points = len(self.points)
+        required = int(indices.max()) + 1
+        if required > num_points:
+            grown = np.full((required, self.points.shape[1]), np.nan)
+            grown[:num_points] = self.points
+            self.points = grown
+            self._stale = np.concatenate(
+                [self._stale, np.ones(required - num_points, dtype=bool)]
+            )
+
+        self.points[indices] = coords[:, : self.points.shape[1]]
+        self._stale[indices] = True
+        self._moved = np.union1d(self._moved, indices)
+
+        if len(self._moved) > max(64, self.rebuild_fraction * len(self.points)):
+            self.build()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def in_box(self, lower: ArrayLike, upper: ArrayLike) -> np.ndarray:
+        """
+        Finds all points inside an axis-aligned box (bounds inclusive).
+
+        Parameters
+        ----------
+        lower, upper : ArrayLike
+            The box corners. Missing trailing axes are unbounded.
+
+        Returns
+        -------
+        np.ndarray
+            The sorted 0-based indices of the points inside the box.
+        """
+        lower, upper = self._box_bounds(lower, upper)
+        candidates = self._candidates(lower, upper)
+        inside = np.all(
+            (self.points[candidates] >= lower) & (self.points[candidates] <= upper),
+            axis=1,
+        )
+        return np.sort(candidates[inside])
+
+    def within_radius(self, points: ArrayLike, radius: float) -> list[np.ndarray]:
+        """
+        Finds, for each query point, all indexed points within ``radius``.
+
+        Parameters
+        ----------
+        points : ArrayLike
+            A (num_queries, dim) array of query points.
+        radius : float
+            The search radius.
+
+        Returns
+        -------
+        list[np.ndarray]
+            For each query point, the indices of the neighbours sorted by
+            increasing distance.
+        """
+        queries = self._as_queries(points)
+        results = []
+        for query in queries:
+            candidates = self._candidates(query - radius, query + radius)
+            dist2 = np.sum((self.points[candidates] - query) ** 2, axis=1)
+            keep = dist2 <= radius * radius
+            candidates, dist2 = candidates[keep], dist2[keep]
+            results.append(candidates[np.argsort(dist2, kind="stable")])
+        return results
+
+    def nearest(self, points: ArrayLike, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the ``k`` nearest indexed points for each query point.
+
+        Parameters
+        ----------
+        points : ArrayLike
+            A (num_queries, dim) array of query points.
+        k : int
+            The number of neighbours to return.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]
+            The (num_queries, k) distances and indices, sorted by increasing
+            distance. Missing neighbours (``k`` larger than the number of
+            points) are reported with distance ``inf`` and index -1.
+        """
+        queries = self._as_queries(points)
+        distances = np.full((len(queries), k), np.inf)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+
+        num_valid = int(np.count_nonzero(~np.isnan(self.points[:, 0])))
+        wanted = min(k, num_valid)
+        if wanted == 0:
+            return distances, indices
+
+        span = float(np.max(np.asarray(self.dims) * self.cell_size))
+        for row, query in enumerate(queries):
+            # distance from the query to the grid, so the first ring is not empty
+            outside = np.maximum(self._lower - query, 0.0) + np.maximum(
+                query - (self._lower + np.asarray(self.dims) * self.cell_size), 0.0
+            )
+            radius = float(np.linalg.norm(outside)) + self.cell_size
+            while True:
+                candidates = self._candidates(query - radius, query + radius)
+                dist = np.sqrt(np.sum((self.points[candidates] - query) ** 2, axis=1))
+                exhausted = radius > span + float(np.linalg.norm(outside))
+                if len(candidates) >= wanted:
+                    part = np.argpartition(dist, wanted - 1)[:wanted]
+                    # the box only contains every point closer than radius
+                    if dist[part].max() <= radius or exhausted:
+                        order = part[np.argsort(dist[part], kind="stable")]
+                        distances[row, :wanted] = dist[order]
+                        indices[row, :wanted] = candidates[order]
+                        break
+                elif exhausted:
+                    break
+                radius *= 2.0
+
+        return distances, indices
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _cell_coords(self, coords: np.ndarray) -> np.ndarray:
+        cells = np.floor((coords - self._lower) / self.cell_size)
+        return np.clip(cells, 0, np.asarray(self.dims) - 1).astype(np.int64)
+
+    def _keys(self, coords: np.ndarray) -> np.ndarray:
+        if len(coords) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.ravel_multi_index(self._cell_coords(coords).T, self.dims)
+
+    def _as_queries(self, points: ArrayLike) -> np.ndarray:
+        dim = self.points.shape[1]
+        queries = np.atleast_2d(np.asarray(points, dtype=np.float64))
+        if queries.shape[1] < dim:
+            raise ValueError(f"Query points must have at least {dim} coordinates.")
+        return queries[:, :dim]
+
+    def _box_bounds(self, lower: ArrayLike, upper: ArrayLike):
+        dim = self.points.shape[1]
+        box_lower = np.full(dim, -np.inf)
+        box_upper = np.full(dim, np.inf)
+        lower = np.asarray(lower, dtype=np.float64).ravel()[:dim]
+        upper = np.asarray(upper, dtype=np.float64).ravel()[:dim]
+        box_lower[: len(lower)] = lower
+        box_upper[: len(upper)] = upper
+        return box_lower, box_upper
+
+    def _candidates(self, lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+        """Returns the indices of all points in cells overlapping the box."""
+        grid_upper = self._lower + np.asarray(self.dims) * self.cell_size
+        if np.any(upper < self._lower) or np.any(lower > grid_upper):
+            found = np.empty(0, dtype=np.int64)
+        else:
+            first = self._cell_coords(np.maximum(lower, self._lower)[None, :])[0]
+            last = self._cell_coords(np.minimum(upper, grid_upper)[None, :])[0]
+
+            # every cell row along the leading axes is a contiguous key range
+            # along the last axis
+            axes = [np.arange(a, b + 1) for a, b in zip(first[:-1], last[:-1])]
+            rows = np.stack(
+                [g.ravel() for g in np.meshgrid(*axes, indexing="ij")], axis=0
+            ) if axes else np.zeros((0, 1), dtype=np.int64)
+            num_rows = rows.shape[1]
+            start_cells = np.vstack([rows, np.full(num_rows, first[-1])])
+            stop_cells = np.vstack([rows, np.full(num_rows, last[-1])])
+            start_keys = np.ravel_multi_index(start_cells, self.dims)
+            stop_keys = np.ravel_multi_index(stop_cells, self.dims)
+
+            starts = np.searchsorted(self._sorted_keys, start_keys, side="left")
+            stops = np.searchsorted(self._sorted_keys, stop_keys, side="right")
+            found = self._order[concat_ranges(starts, stops)]
+            found = found[~self._stale[found]]
+
+        if len(self._moved):
+            found = np.concatenate([found, self._moved])
+        return found
@@ -0,0 +1,173 @@
+"""
+I/O for VTK unstructured grid (.vtu) files.
+"""
+
+from __future__ import annotations
+
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
+
+from .element_block import _config
+from .mesh_io import Mesh, _index_of
+
+# Size of the blocks compressed independently, as VTK expects
+_BLOCK_SIZE = 1 << 20
+
+_VTK_TYPES = {
+    np.dtype(np.uint8): "UInt8",
+    np.dtype(np.int32): "Int32",
+    np.dtype(np.int64): "Int64",
+    np.dtype(np.float32): "Float32",
+    np.dtype(np.float64): "Float64",
+}
+
+
+def write_vtu(path, mesh: Mesh, compress: bool | int = False) -> None:
+    """
+    Writes a mesh as a VTK XML unstructured grid with appended binary data.
+
+    Element types are mapped to VTK cell types through the ``vtk`` entry of
+    ``config.yaml``. Point and element IDs are exported as the ``point_ids``
+    and ``element_ids`` arrays, and every node or element set as a 0/1 mask
+    in the point or cell data. Surfaces, being element faces, are not
+    exported.
+
+    Parameters
+    ----------
+    path : str or Path
+        The output file, usually with a ``.vtu`` suffix.
+    mesh : Mesh
+        The mesh to write.
+    compress : bool or int
+        Whether to zlib-compress the data arrays. True uses the fastest
+        level, an integer selects the compression level (1-9).
+
+    Raises
+    ------
+    ValueError
+        If an element type has no VTK cell type or an element refers to a
+        node that does not exist.
+    """
+    level = 1 if compress is True else int(compress)
+    point_ids = np.asarray(mesh.point_ids, dtype=np.int64)
+    num_points = len(point_ids)
+    blocks = [block for block in mesh.cells if len(block)]
+    num_cells = sum(len(block) for block in blocks)
+
+    # the smallest integer type that holds every node index and offset
+    num_entries = sum(block.connectivity.size for block in blocks)
+    index_dtype = np.int32 if max(num_points, num_entries) <= np.iinfo(np.int32).max else np.int64
+
+    connectivity, cell_types, nodes_per_cell = [], [], []
+    for block in blocks:
+        try:
+            vtk_type = _config[block.element_type]["vtk"]
+        except KeyError:
+            raise ValueError(f"No VTK cell type configured for element type {block.element_type}")
+        indices = _index_of(block.connectivity.ravel(), point_ids)
+        if np.any(indices < 0):
+            missing = np.unique(block.connectivity.ravel()[indices < 0])
+            raise ValueError(f"Elements refer to undefined nodes: {missing[:10].tolist()}")
+        connectivity.append(indices.astype(index_dtype))
+        cell_types.append(np.full(len(block), vtk_type, dtype=np.uint8))
+        nodes_per_cell.append(np.full(len(block), block.connectivity.shape[1], dtype=index_dtype))
+
+    def concatenate(arrays, dtype):
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=dtype)
+
+    element_ids = concatenate([block.ids.astype(np.int64) for block in blocks], np.int64)
+    offsets = np.cumsum(concatenate(nodes_per_cell, index_dtype), dtype=index_dtype)
+
+    point_data = [("point_ids", point_ids)]
+    for name, ids in mesh.node_sets.items():
+        point_data.append((name, _mask(ids, point_ids)))
+    cell_data = [("element_ids", element_ids)]
+    for name, ids in mesh.elem_sets.items():
+        cell_data.append((name, _mask(ids, element_ids)))
+
+    sections = [
+        ("PointData", point_data),
+        ("CellData", cell_data),
+        ("Points", [("Points", np.asarray(mesh.points, dtype=np.float64).reshape(num_points, -1))]),
+        (
+            "Cells",
+            [
+                ("connectivity", concatenate(connectivity, index_dtype)),
+                ("offsets", offsets),
+                ("types", concatenate(cell_types, np.uint8)),
+            ],
+        ),
+    ]
+
+    # encode the arrays first, the header needs their offsets
+    xml = [
+        '<?xml version="1.0"?>\n',
+        '<VTKFile type="UnstructuredGrid" version="1.0" byte_order="LittleEndian" '
+        'header_type="UInt64"'
+        + (' compressor="vtkZLibDataCompressor"' if level else "")
+        + ">\n",
+        "  <UnstructuredGrid>\n",
+        f'    <Piece NumberOfPoints="{num_points}" NumberOfCells="{num_cells}">\n',
+    ]
+    payload: list = []
+    offset = 0
+    # zlib releases the GIL, so blocks are compressed in parallel
+    executor = ThreadPoolExecutor() if level else None
+    for tag, arrays in sections:
+        xml.append(f"      <{tag}>\n")
+        for name, array in arrays:
+            array = np.ascontiguousarray(array)
+            pieces = _encode(array, level, executor)
+            components = f' NumberOfComponents="{array.shape[1]}"' if array.ndim == 2 else ""
+            xml.append(
+                f'        <DataArray type="{_VTK_TYPES[array.dtype]}" Name={quoteattr(name)}'
+                f'{components} format="appended" offset="{offset}"/>\n'
+            )
+            payload.extend(pieces)
+            offset += sum(memoryview(piece).nbytes for piece in pieces)
+        xml.append(f"      </{tag}>\n")
+    if executor is not None:
+        executor.shutdown()
+    xml += [
+        "    </Piece>\n",
+        "  </UnstructuredGrid>\n",
+        '  <AppendedData encoding="raw">\n',
+        "_",
+    ]
+
+    with open(path, "wb") as f:
+        f.write("".join(xml).encode())
+        for piece in payload:
+            f.write(piece)
+        f.write(b"\n  </AppendedData>\n</VTKFile>\n")
+
+
+def _mask(ids, keys: np.ndarray) -> np.ndarray:
+    """Flags the entries of `keys` listed in `ids`."""
+    mask = np.zeros(len(keys), dtype=np.uint8)
+    indices = _index_of(ids, keys)
+    mask[indices[indices >= 0]] = 1
+    return mask
+
+
+def _encode(array: np.ndarray, level: int, executor=None) -> list:
+    """
+    Returns the appended-data pieces of an array: a UInt64 byte count and the
+    raw bytes, or the VTK compression header and the zlib-compressed blocks.
+    """
+    data = memoryview(array.astype(array.dtype.newbyteorder("<"), copy=False)).cast("B")
+    if not level:
+        return [np.uint64(data.nbytes).tobytes(), data]
+
+    chunks = [data[start : start + _BLOCK_SIZE] for start in range(0, data.nbytes, _BLOCK_SIZE)]
+    compress = lambda chunk: zlib.compress(chunk, level)
+    blocks = list(executor.map(compress, chunks) if executor else map(compress, chunks))
+    last_size = data.nbytes - (len(blocks) - 1) * _BLOCK_SIZE if blocks else 0
+    header = np.array(
+        [len(blocks), _BLOCK_SIZE, last_size] + [len(block) for block in blocks],
+        dtype="<u8",
+    )
+    return [header.tobytes()] + blocks
@@ -1,48 +1,245 @@
 import os
+import atexit
+import copy
+import functools
+import itertools
 import tempfile
 import shutil
 import json
-import io
+import time
+import uuid
+import zlib
 import numpy as np
 
-from flask import Flask, render_template, request, jsonify, Response
-from flask_socketio import SocketIO, emit
+from flask import Flask, render_template, request, Response, abort, send_file, g
+from flask_socketio import SocketIO, emit, join_room
 from werkzeug.utils import secure_filename
 
-from abaqus_io import read_deck, write_buffer, Mesh, ElementBlock
+from abaqus_io import iter_buffer, Mesh, ElementBlock, MeshTiler
+from abaqus_io import is_native, read_native, write_native, read_native_manifest
+from documents import DOCUMENT_ID_PATTERN, Document, DocumentRegistry, SAVE_SECONDS, observe_parse_throughput
+from jobs import JobExecutor, parse_deck, format_deck
+from metrics import REGISTRY, SIZE_BUCKETS
 
 app = Flask(__name__)
 socketio = SocketIO(app)
 
-# Global variable to hold the mesh object
-mesh: Mesh | None = None
-# Global variable to hold connections for frontend visualization
-connections: list = []
-
-
-# Path for storing information about the last used mesh file
-MESH_INFO_PATH = os.path.join(os.getcwd(), "temp", "mesh_info.json")
-TEMP_MESH_DIR = os.path.join(os.getcwd(), "temp", "mesh_files")
+# Identifies this server process in ETags, as versions restart with it
+SERVER_INSTANCE = uuid.uuid4().hex[:12]
+
+# Directory of the default document, which holds the state of a server
+# from before documents; the others are in DOCUMENTS_DIR
+TEMP_DIR = os.path.join(os.getcwd(), "temp")
+DOCUMENTS_DIR = os.path.join(TEMP_DIR, "documents")
+# Decks written by export jobs, until the jobs are forgotten
+EXPORTS_DIR = os.path.join(TEMP_DIR, "exports")
+# The document of clients that do not name one
+DEFAULT_DOCUMENT = "default"
+# Memory the loaded documents may hold before idle ones are evicted, in bytes
+DOCUMENT_MEMORY_BUDGET = 8 << 30
+# Rate at which intermediate drag positions are applied and broadcast, in Hz
+DRAG_FLUSH_RATE = 30
+# Bytes of an upload written at once, the parser follows the file as it grows
+UPLOAD_CHUNK_SIZE = 1 << 20
+# Least elements in a batch frame of a progressive mesh stream, see mesh_frames
+PROGRESSIVE_BATCH_ELEMENTS = 20000
+# Most tiles sent for one viewport, coarser levels are used beyond it
+MAX_VIEWPORT_TILES = 64
 
 # Ensure the temporary directories exist
-os.makedirs(os.path.dirname(MESH_INFO_PATH), exist_ok=True)
-os.makedirs(TEMP_MESH_DIR, exist_ok=True)
+os.makedirs(DOCUMENTS_DIR, exist_ok=True)
+os.makedirs(EXPORTS_DIR, exist_ok=True)
+
+# Metrics served at /metrics, see the metrics module
+HTTP_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Time to handle an HTTP request, until the headers of a streamed response.",
+    ("endpoint", "method", "status"),
+)
+HTTP_RESPONSE_BYTES = REGISTRY.histogram(
+    "http_response_size_bytes", "Body sizes of HTTP responses not streamed.", ("endpoint",), buckets=SIZE_BUCKETS
+)
+EVENT_LATENCY = REGISTRY.histogram(
+    "socketio_event_duration_seconds", "Time to handle a Socket.IO event.", ("event", "outcome")
+)
+PAYLOAD_BYTES = REGISTRY.histogram(
+    "mesh_payload_size_bytes",
+    "Sizes of serialized mesh payloads by kind, before compression.",
+    ("kind",),
+    buckets=SIZE_BUCKETS,
+)
+BROADCAST_FANOUT = REGISTRY.histogram(
+    "broadcast_fanout_sessions",
+    "Sessions a document event is broadcast to.",
+    ("event",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+BROADCAST_MESSAGES = REGISTRY.counter(
+    "broadcast_messages_total", "Messages sent by broadcasts, one per receiving session.", ("event",)
+)
+
+
+def record_edit(doc: Document, record: dict, log: bool = True):
+    """
+    Applies an edit to a document and appends it to its edit log.
+
+    The record is durable once this returns; writing the deck is left to the
+    background checkpoints. Returns the change, see `apply_edit`.
+    """
+    with doc.lock:
+        delta = apply_edit(doc, record)
+        if log:
+            doc.edit_log.append(record)
+    if log:
+        doc.checkpointer.start()
+        doc.checkpointer.notify()
+    return delta
+
+
+def mesh_state_message(doc: Document, **extra):
+    """Returns the full state of a document as sent in a ``mesh_data`` event."""
+    with doc.lock:
+        return {
+            "mesh": doc.cached_payload("dict", lambda: mesh_to_dict(doc.mesh)),
+            "connections": doc.connections,
+            "version": doc.version,
+            "instance": SERVER_INSTANCE,
+            "isDragging": False,
+            **extra,
+        }
 
-def save_mesh_to_disk():
-    """Saves the current mesh to disk."""
-    if not mesh:
-        return
 
-    try:
-        with open(MESH_INFO_PATH, "r") as f:
-            mesh_info = json.load(f)
-            mesh_filepath = mesh_info.get("filepath")
-            if mesh_filepath:
-                with open(mesh_filepath, "w") as f:
-                    write_buffer(f, mesh)
-                print(f"[DEBUG] Mesh saved to {mesh_filepath}")
-    except (json.JSONDecodeError, IOError) as e:
-        print(f"[ERROR] Failed to save mesh to disk: {e}")
+def mesh_response(doc: Document, kind: str, build, mimetype: str):
+    """
+    Sends a payload of the current version of a document over HTTP.
+
+    The payload is cached per version, see `Document.cached_payload`. Its
+    weak ETag names the server instance, the document and the version, so a
+    client that already has it gets a 304 Not Modified; otherwise it is gzip
+    or deflate compressed if the client accepts it, the compressed body being
+    cached as well.
+    """
+    with doc.lock:
+        version = doc.version
+        body = doc.cached_payload(kind, measured_payload(kind, build))
+    etag = f"{SERVER_INSTANCE}.{doc.id}.{version}"
+
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        encoding = request.accept_encodings.best_match(["gzip", "deflate"])
+        if encoding:
+            with doc.lock:
+                compressed = doc.payload_cache.get(f"{kind}.{encoding}") if doc.version == version else None
+            if compressed is None:
+                # compress without the lock, edits need not wait for it
+                compressor = zlib.compressobj(6, zlib.DEFLATED, 31 if encoding == "gzip" else 15)
+                compressed = compressor.compress(body) + compressor.flush()
+                with doc.lock:
+                    if doc.version == version:
+                        doc.payload_cache[f"{kind}.{encoding}"] = compressed
+            body = compressed
+        response = Response(body, mimetype=mimetype)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+
+    response.set_etag(etag, weak=True)
+    # always revalidate, the ETag makes that cheap
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+
+def measured_payload(kind: str, build):
+    """Wraps a payload builder to record the sizes of the payloads it makes."""
+
+    def measured():
+        payload = build()
+        PAYLOAD_BYTES.observe(len(payload), kind=kind)
+        return payload
+
+    return measured
+
+
+def count_broadcast(doc: Document, event: str, skipped: int = 0):
+    """Records the fan-out of an event sent to the viewers of a document."""
+    sessions = max(len(doc.viewers) - skipped, 0)
+    BROADCAST_FANOUT.observe(sessions, event=event)
+    BROADCAST_MESSAGES.inc(sessions, event=event)
+
+
+def publish_edit(doc: Document, record: dict, log: bool = True, include_self: bool = True, **extra):
+    """
+    Records an edit of a document and sends the change to its viewers.
+
+    Edits with a small change are broadcast as a ``mesh_patch`` event stamped
+    with the new version, so the cost does not depend on the mesh size.
+    Clients apply patches in version order and ask for the full state with
+    ``get_mesh`` when they miss one. Edits that replace the state as a whole
+    are broadcast as a full ``mesh_data`` event. `extra` is added to the
+    event, e.g. the drag state.
+    """
+    if log:
+        # pending drag positions were sent before this edit, apply them first
+        flush_drag_moves(doc)
+    # the version and the broadcast order must follow the order of the edits
+    with doc.lock:
+        delta = record_edit(doc, record, log)
+        if delta is None:
+            doc.version += 1
+            skip_sid = None if include_self else request.sid
+            socketio.emit("mesh_data", mesh_state_message(doc), to=doc.room, skip_sid=skip_sid)
+            count_broadcast(doc, "mesh_data", skipped=0 if include_self else 1)
+            if not include_self:
+                emit("mesh_version", {"version": doc.version})
+        elif delta:
+            doc.version += 1
+            socketio.emit("mesh_patch", {"version": doc.version, **delta, **extra}, to=doc.room)
+            count_broadcast(doc, "mesh_patch")
+
+
+def queue_drag_moves(doc: Document, nodes: list):
+    """
+    Records intermediate drag positions to be applied by the next flush.
+
+    A drag sends a position on every mouse move. Applying and broadcasting
+    each one would queue work behind a slow client, so only the latest
+    position of every node is kept, and `flush_drag_moves` sends all of
+    them as one patch `DRAG_FLUSH_RATE` times per second.
+    """
+    with doc.lock:
+        for node in nodes:
+            doc.pending_drag_moves[node["id"]] = {"id": node["id"], "x": node["x"], "y": node["y"]}
+        doc.pending_drag_sources.add(request.sid)
+        if not doc.drag_flusher_started:
+            doc.drag_flusher_started = True
+            socketio.start_background_task(_drag_flush_loop, doc)
+    doc.drag_moves_queued.set()
+
+
+def flush_drag_moves(doc: Document):
+    """Applies and broadcasts the pending drag positions of a document as one patch."""
+    with doc.lock:
+        if not doc.pending_drag_moves:
+            return
+        nodes = list(doc.pending_drag_moves.values())
+        sources = sorted(doc.pending_drag_sources)
+        doc.pending_drag_moves.clear()
+        doc.pending_drag_sources.clear()
+        # intermediate drag positions are not logged, the final position is
+        publish_edit(doc, {"op": "update_nodes", "nodes": nodes}, log=False, isDragging=True, sources=sources)
+
+
+def _drag_flush_loop(doc: Document):
+    while True:
+        doc.drag_moves_queued.wait()
+        socketio.sleep(1.0 / DRAG_FLUSH_RATE)
+        doc.drag_moves_queued.clear()
+        try:
+            flush_drag_moves(doc)
+        except Exception as e:  # keep flushing later drags
+            print(f"[ERROR] Failed to flush drag updates: {e}")
+
 
 def mesh_to_dict(mesh_obj: Mesh | None):
     """Converts a Mesh object to a JSON-serializable dictionary."""
@@ -74,6 +271,281 @@ def mesh_to_dict(mesh_obj: Mesh | None):
     }
 
 
+# Byte alignment of the arrays in a binary mesh payload, enough for Float64Array views
+BINARY_ALIGNMENT = 8
+
+
+def mesh_to_binary(mesh_obj: Mesh | None, connections_list: list, version: int, coords_dtype="float64") -> bytes:
+    """
+    Converts a Mesh object to a compact binary payload for the browser.
+
+    The payload is a little-endian uint32 header length, a JSON header and
+    the mesh arrays, each aligned to `BINARY_ALIGNMENT` bytes so the client
+    can view them as typed arrays without copying. The header describes every
+    array by name (``dtype``, ``shape``, byte ``offset`` from the end of the
+    header) and holds the element types, the set names and offsets, the
+    surface sets and the connections.
+
+    Point IDs are sent as int32, or as float64 (exact up to 2**53) if they do
+    not fit; element IDs and connectivity are int32.
+    """
+    arrays = {}
+    header = {"version": version, "instance": SERVER_INSTANCE, "connections": connections_list}
+
+    if mesh_obj:
+        arrays["point_ids"] = binary_id_array(mesh_obj.point_ids)
+        arrays["points"] = np.asarray(mesh_obj.points, dtype=np.dtype(coords_dtype).newbyteorder("<"))
+        header["blocks"] = []
+        for index, block in enumerate(mesh_obj.cells):
+            if not len(block):
+                continue
+            arrays[f"block_{index}_ids"] = binary_id_array(block.ids)
+            arrays[f"block_{index}_connectivity"] = binary_id_array(block.connectivity).reshape(
+                block.connectivity.shape
+            )
+            header["blocks"].append(
+                {
+                    "element_type": block.element_type,
+                    "ids": f"block_{index}_ids",
+                    "connectivity": f"block_{index}_connectivity",
+                }
+            )
+        header["node_sets"] = binary_sets(mesh_obj.node_sets, "node_sets", arrays)
+        header["element_sets"] = binary_sets(mesh_obj.elem_sets, "element_sets", arrays)
+        header["surface_sets"] = mesh_obj.surface_sets
+
+    return pack_binary(header, arrays)
+
+
+def binary_sets(sets: dict, name: str, arrays: dict) -> dict:
+    """
+    Adds the IDs of named sets to `arrays` as one array and returns the set
+    names and their offsets in it, for the header of a binary payload.
+    """
+    values = [np.asarray(ids, dtype=np.int64).ravel() for ids in sets.values()]
+    arrays[name] = binary_id_array(np.concatenate(values) if values else [])
+    return {"names": list(sets.keys()), "offsets": np.cumsum([0] + [len(v) for v in values]).tolist()}
+
+
+def mesh_part_arrays(point_ids: np.ndarray, points: np.ndarray, cells: list, node_rows, element_rows: list):
+    """
+    Returns the arrays of some nodes and elements of a mesh, given by their
+    rows, and the descriptions of their element blocks, for `pack_binary`.
+    `element_rows` holds one array of rows per block.
+    """
+    arrays = {
+        "point_ids": binary_id_array(point_ids[node_rows]),
+        "points": np.asarray(points[node_rows], dtype="<f8"),
+    }
+    blocks = []
+    for index, (block, rows) in enumerate(zip(cells, element_rows)):
+        if not len(rows):
+            continue
+        arrays[f"block_{index}_ids"] = binary_id_array(block.ids[rows])
+        arrays[f"block_{index}_connectivity"] = binary_id_array(block.connectivity[rows]).reshape(len(rows), -1)
+        blocks.append(
+            {
+                "element_type": block.element_type,
+                "ids": f"block_{index}_ids",
+                "connectivity": f"block_{index}_connectivity",
+            }
+        )
+    return arrays, blocks
+
+
+def binary_id_array(values) -> np.ndarray:
+    """Returns IDs as int32, or as float64 (exact up to 2**53) if they do not fit."""
+    values = np.asarray(values, dtype=np.int64).ravel()
+    int32 = np.iinfo(np.int32)
+    if values.size and (values.min() < int32.min or values.max() > int32.max):
+        return values.astype("<f8")
+    return values.astype("<i4")
+
+
+def pack_binary(header: dict, arrays: dict) -> bytes:
+    """
+    Packs a JSON header and little-endian arrays into a binary payload, see
+    `mesh_to_binary`. The array descriptions are added to the header.
+    """
+    header = {**header, "arrays": {}}
+    offset = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = {
+            "dtype": {"i4": "int32", "f4": "float32", "f8": "float64"}[array.dtype.str[1:]],
+            "shape": list(array.shape),
+            "offset": offset,
+        }
+        offset += -(-array.nbytes // BINARY_ALIGNMENT) * BINARY_ALIGNMENT
+
+    header_bytes = json.dumps(header, separators=(",", ":")).encode()
+    # pad with spaces so the arrays start aligned
+    header_bytes += b" " * (-(4 + len(header_bytes)) % BINARY_ALIGNMENT)
+
+    payload = bytearray(len(header_bytes).to_bytes(4, "little") + header_bytes)
+    for array in arrays.values():
+        payload += np.ascontiguousarray(array).tobytes()
+        payload += bytes(-len(payload) % BINARY_ALIGNMENT)
+    return bytes(payload)
+
+
+def viewport_to_binary(doc: Document, lower, upper, scale: float) -> bytes | None:
+    """
+    Converts the tiles of a document covering a viewport to a binary payload, see
+    `pack_binary`. The level of the tiles follows `scale`, in pixels per unit
+    length, coarsened until at most `MAX_VIEWPORT_TILES` tiles cover the
+    viewport. Tiles are cached per mesh version.
+
+    The payload holds the nodes and elements of the tiles like
+    `mesh_to_binary`, with live coordinates, and the boundary ``edges`` of
+    decimated tiles as node ID pairs. Sets are not sent; the header lists the
+    ``level``, the ``tiles`` as [tx, ty, decimated] and the connections
+    between the sent nodes.
+    """
+    with doc.lock:
+        mesh, connections = doc.mesh, doc.connections
+        tiler = doc.get_mesh_tiler()
+        if tiler is None:
+            return None
+        level = tiler.level_for_scale(scale)
+        tiles = tiler.tiles_in_box(lower, upper, level)
+        while len(tiles) > MAX_VIEWPORT_TILES and level > 0:
+            level -= 1
+            tiles = tiler.tiles_in_box(lower, upper, level)
+        contents = [
+            doc.cached_payload(f"tile.{level}.{tx}.{ty}", lambda tx=tx, ty=ty: tiler.tile(level, tx, ty))
+            for tx, ty in tiles
+        ]
+
+        empty = np.empty(0, dtype=np.int64)
+        node_rows = np.unique(np.concatenate([empty] + [tile["node_rows"] for tile in contents]))
+        point_ids = np.asarray(mesh.point_ids, dtype=np.int64)
+        element_rows = [
+            np.concatenate([empty] + [tile["element_rows"][index] for tile in contents])
+            for index in range(len(mesh.cells))
+        ]
+        arrays, blocks = mesh_part_arrays(point_ids, mesh.points, mesh.cells, node_rows, element_rows)
+        edges = np.concatenate([np.empty((0, 2), dtype=np.int64)] + [tile["edges"] for tile in contents])
+        arrays["edges"] = binary_id_array(point_ids[edges]).reshape(-1, 2)
+
+        sent = set(point_ids[node_rows].tolist())
+        header = {
+            "version": doc.version,
+            "instance": SERVER_INSTANCE,
+            "level": level,
+            "tiles": [[tx, ty, tile["decimated"]] for (tx, ty), tile in zip(tiles, contents)],
+            "connections": [c for c in connections if c["source"] in sent and c["target"] in sent],
+            "blocks": blocks,
+        }
+    return pack_binary(header, arrays)
+
+
+def mesh_frames(doc: Document):
+    """
+    Generates the mesh of a document as binary frames to display as they
+    arrive, coarse first. Every frame is a uint32 length and a `pack_binary`
+    payload whose header names the ``frame``:
+
+    1. ``outline``: the bounds and sizes of the mesh and its boundary
+       ``edges`` as node ID pairs, with their nodes;
+    2. ``sample``: a spatially uniform sample of the other nodes;
+    3. ``batch``: the elements of neighbouring tiles (see
+       `MeshTiler.full_tiles`) and their nodes not sent yet, at least
+       `PROGRESSIVE_BATCH_ELEMENTS` at a time, from the centre of the mesh
+       outwards;
+    4. ``done``: the nodes not sent yet, the sets and the connections.
+
+    The frames hold the state of the version in the first one, later edits
+    are sent as patches. Nothing but the ``done`` frame is sent for a
+    document without mesh.
+    """
+    with doc.lock:
+        mesh = doc.mesh
+        version, connections = doc.version, list(doc.connections)
+        tiler = doc.get_mesh_tiler()
+        if tiler is not None:
+            # edits replace these arrays and lists rather than change them,
+            # except for moved node coordinates
+            points = mesh.points.copy()
+            point_ids = list(mesh.point_ids)
+            cells = [copy.copy(block) for block in mesh.cells]
+            node_sets, elem_sets = dict(mesh.node_sets), dict(mesh.elem_sets)
+            surface_sets = dict(mesh.surface_sets)
+            # the tiles are selected by the node positions of the copy, not
+            # by the shared index that follows the edits
+            tiler = tiler.copy()
+    header = {"version": version, "instance": SERVER_INSTANCE}
+
+    def frame(kind: str, node_rows, element_rows=(), extra_arrays=None, **extra) -> bytes:
+        arrays, blocks = mesh_part_arrays(point_ids, points, cells, node_rows, element_rows)
+        sent[node_rows] = True
+        payload = pack_binary({**header, "frame": kind, "blocks": blocks, **extra}, {**arrays, **(extra_arrays or {})})
+        return len(payload).to_bytes(4, "little") + payload
+
+    if tiler is None:
+        payload = pack_binary({**header, "frame": "done", "connections": connections}, {})
+        yield len(payload).to_bytes(4, "little") + payload
+        return
+
+    point_ids = np.asarray(point_ids, dtype=np.int64)
+    sent = np.zeros(len(points), dtype=bool)
+    num_elements = sum(len(block) for block in cells)
+    bounds = {"min": points[:, :2].min(axis=0).tolist(), "max": points[:, :2].max(axis=0).tolist()} if len(points) else None
+
+    edges = tiler.boundary_edges
+    yield frame(
+        "outline",
+        np.unique(edges),
+        extra_arrays={"edges": binary_id_array(point_ids[edges]).reshape(-1, 2)},
+        bounds=bounds,
+        num_nodes=len(points),
+        num_elements=num_elements,
+    )
+
+    overview = tiler.tile(0, 0, 0)
+    if overview["decimated"]:
+        yield frame("sample", overview["node_rows"][~sent[overview["node_rows"]]])
+
+    # tiles of about PROGRESSIVE_BATCH_ELEMENTS elements, nearest to the centre first
+    level = int(np.clip(np.ceil(np.log(max(num_elements / PROGRESSIVE_BATCH_ELEMENTS, 1)) / np.log(4)), 0, tiler.max_level))
+    cells_per_axis = 1 << level
+    centre = (np.array(bounds["min"]) + np.array(bounds["max"])) / 2 if bounds else tiler.origin
+    order = sorted(
+        ((tx, ty) for ty in range(cells_per_axis) for tx in range(cells_per_axis)),
+        key=lambda t: float(np.sum((np.mean(tiler.tile_bounds(level, *t), axis=0) - centre) ** 2)),
+    )
+    tiles = tiler.full_tiles(level, order)
+    pending_nodes, pending_elements, count = [], [[] for _ in cells], 0
+    while True:
+        item = next(tiles, None)
+        if item is not None:
+            tile = item[3]
+            pending_nodes.append(tile["node_rows"])
+            for rows, tile_rows in zip(pending_elements, tile["element_rows"]):
+                rows.append(tile_rows)
+            count += tile["num_elements"]
+        if count >= PROGRESSIVE_BATCH_ELEMENTS or (item is None and pending_nodes):
+            node_rows = np.unique(np.concatenate(pending_nodes))
+            yield frame(
+                "batch",
+                node_rows[~sent[node_rows]],
+                [np.concatenate(rows) if rows else np.empty(0, dtype=np.int64) for rows in pending_elements],
+            )
+            pending_nodes, pending_elements, count = [], [[] for _ in cells], 0
+        if item is None:
+            break
+
+    set_arrays = {}
+    yield frame(
+        "done",
+        np.flatnonzero(~sent),
+        extra_arrays=set_arrays,
+        node_sets=binary_sets(node_sets, "node_sets", set_arrays),
+        element_sets=binary_sets(elem_sets, "element_sets", set_arrays),
+        surface_sets=surface_sets,
+        connections=connections,
+    )
+
+
 def dict_to_mesh(mesh_dict: dict):
     """Converts a dictionary to a Mesh object."""
     print(f"[DEBUG] dict_to_mesh received: {mesh_dict.keys()}")
@@ -116,29 +588,257 @@ def dict_to_mesh(mesh_dict: dict):
     return new_mesh
 
 
-# Load the last used mesh on startup
-if os.path.exists(MESH_INFO_PATH):
-    try:
-        with open(MESH_INFO_PATH, "r") as f:
-            mesh_info = json.load(f)
-            mesh_filepath = mesh_info.get("filepath")
-            if mesh_filepath and os.path.exists(mesh_filepath):
-                print(f"[DEBUG] Loading initial mesh from {mesh_filepath}")
-                mesh = read_deck(mesh_filepath)
-                print(f"[DEBUG] Mesh loaded successfully on startup: {mesh is not None}")
-    except (json.JSONDecodeError, IOError) as e:
-        print(f"[ERROR] Failed to load initial mesh info: {e}")
+def _apply_add_node(doc, record):
+    mesh = doc.mesh
+    coords = [record["x"], record["y"], 0]  # Assuming 2D for now
+    node = {"id": record["id"], "x": record["x"], "y": record["y"], "z": 0}
+    row = doc.find_node(record["id"])
+    if row is not None:
+        # already applied, e.g. replayed over a checkpoint that includes it
+        mesh.points[row] = coords
+        doc.update_spatial_index(row, coords)
+    else:
+        mesh.points = np.vstack([mesh.points, coords])
+        mesh.point_ids.append(record["id"])
+        doc.node_index[record["id"]] = len(mesh.points) - 1
+        doc.update_spatial_index(len(mesh.points) - 1, coords)
+    mesh.mark_dirty("nodes")
+    return {"nodes": [node]}
+
+
+def _apply_delete_node(doc, record):
+    mesh = doc.mesh
+    node_id_to_delete = record["id"]
+    row = doc.find_node(node_id_to_delete)
+    if row is None:
+        print(f"[WARNING] Node with ID {node_id_to_delete} not found for deletion.")
+        return {}
+
+    mesh.points = np.delete(mesh.points, row, axis=0)
+    mesh.point_ids.pop(row)
+    mesh.mark_dirty("nodes", "node_sets")
+    doc.invalidate_node_indices()
+
+    # Also remove node from any node sets
+    for name, ids in mesh.node_sets.items():
+        mesh.node_sets[name] = [i for i in ids if i != node_id_to_delete]
+    return {"removed_nodes": [node_id_to_delete]}
+
+
+def _apply_update_nodes(doc, record):
+    mesh = doc.mesh
+    moved_indices = []
+    moved_nodes = []
+    for updated_node in record["nodes"]:
+        node_id = updated_node["id"]
+        row = doc.find_node(node_id)
+        if row is None:
+            print(f"[WARNING] Node with ID {node_id} not found for update.")
+            continue
+        mesh.points[row] = [updated_node["x"], updated_node["y"], 0]  # Assuming 2D
+        moved_indices.append(row)
+        moved_nodes.append({"id": node_id, "x": updated_node["x"], "y": updated_node["y"], "z": 0})
+    if moved_indices:
+        mesh.mark_dirty("nodes")
+    doc.update_spatial_index(moved_indices, mesh.points[moved_indices])
+    return {"nodes": moved_nodes} if moved_nodes else {}
+
+
+def _apply_delete_nodes(doc, record):
+    mesh, connections = doc.mesh, doc.connections
+    node_ids_to_delete = set(record["ids"])
+
+    # Find indices of nodes to delete
+    indices_to_delete = [
+        i for i, pid in enumerate(mesh.point_ids) if pid in node_ids_to_delete
+    ]
+    removed_nodes = [mesh.point_ids[i] for i in indices_to_delete]
+
+    # Remove nodes and point_ids
+    mesh.points = np.delete(mesh.points, indices_to_delete, axis=0)
+    mesh.point_ids = [pid for pid in mesh.point_ids if pid not in node_ids_to_delete]
+    mesh.mark_dirty("nodes", "node_sets", "elements", "elem_sets")
+    doc.invalidate_node_indices()
+
+    # Remove nodes from node sets
+    for name, ids in mesh.node_sets.items():
+        mesh.node_sets[name] = [i for i in ids if i not in node_ids_to_delete]
+
+    # Remove elements connected to the deleted nodes, also from element sets
+    deleted_elements = set()
+    for cell_block in mesh.cells:
+        mask = np.isin(
+            cell_block.connectivity, list(node_ids_to_delete), invert=True
+        ).all(axis=1)
+        deleted_elements.update(cell_block.ids[~mask].tolist())
+        cell_block.connectivity = cell_block.connectivity[mask]
+        cell_block.ids = cell_block.ids[mask]
+    for name, ids in mesh.elem_sets.items():
+        mesh.elem_sets[name] = [i for i in ids if i not in deleted_elements]
+
+    # Filter out connections involving deleted nodes
+    removed_connections = [
+        {"source": c["source"], "target": c["target"]}
+        for c in connections
+        if c["source"] in node_ids_to_delete or c["target"] in node_ids_to_delete
+    ]
+    doc.connections = [
+        c
+        for c in connections
+        if c["source"] not in node_ids_to_delete
+        and c["target"] not in node_ids_to_delete
+    ]
+
+    if not (removed_nodes or deleted_elements or removed_connections):
+        return {}
+    return {
+        "removed_nodes": removed_nodes,
+        "removed_elements": sorted(deleted_elements),
+        "removed_connections": removed_connections,
+    }
+
+
+def _apply_add_connection(doc, record):
+    connections = doc.connections
+    connection = record["connection"]
+    if any(c.get("id") == connection["id"] for c in connections):
+        return {}
+    connections.append(connection)
+    return {"connections": [connection]}
+
+
+def _apply_delete_connection(doc, record):
+    connections = doc.connections
+    count = len(connections)
+    doc.connections = [
+        c
+        for c in connections
+        if not (
+            (c["source"] == record["source"] and c["target"] == record["target"])
+            or (c["source"] == record["target"] and c["target"] == record["source"])
+        )
+    ]
+    if len(doc.connections) == count:
+        return {}
+    return {"removed_connections": [{"source": record["source"], "target": record["target"]}]}
+
+
+def _apply_add_connections(doc, record):
+    connections = doc.connections
+    existing = {(c["source"], c["target"]) for c in connections}
+    added = [c for c in record["connections"] if (c["source"], c["target"]) not in existing]
+    connections.extend(added)
+    return {"connections": added} if added else {}
+
+
+def _apply_clear(doc, record):
+    doc.mesh = None
+    doc.connections = []
+    doc.invalidate_node_indices()
+    return None
+
+
+def _apply_sync(doc, record):
+    doc.mesh = dict_to_mesh(record["mesh"])
+    doc.connections = record["connections"]
+    doc.invalidate_node_indices()
+    return None
+
+
+# Edits by record type. Applying a record twice has the same effect as
+# applying it once, so replaying the log over a checkpoint that already
+# contains some of its edits still gives the logged state. Each returns the
+# change it made, see `apply_edit`.
+_EDIT_OPS = {
+    "add_node": _apply_add_node,
+    "delete_node": _apply_delete_node,
+    "update_nodes": _apply_update_nodes,
+    "delete_nodes": _apply_delete_nodes,
+    "add_connection": _apply_add_connection,
+    "delete_connection": _apply_delete_connection,
+    "add_connections": _apply_add_connections,
+    "clear": _apply_clear,
+    "sync": _apply_sync,
+}
+
+
+# Edits that need a mesh to apply to
+_MESH_EDITS = {"add_node", "delete_node", "update_nodes", "delete_nodes"}
+
+
+def apply_edit(doc: Document, record: dict):
+    """
+    Applies one edit record to the mesh and the connections of a document.
+
+    Returns
+    -------
+    dict or None
+        The change as sent in a ``mesh_patch`` event, with any of the keys
+        ``nodes`` (added or moved nodes), ``removed_nodes``,
+        ``removed_elements``, ``connections`` (added connections) and
+        ``removed_connections`` (source and target pairs). It is empty if
+        nothing changed, and None if the state was replaced as a whole.
+    """
+    if doc.mesh is None and record["op"] in _MESH_EDITS:
+        return {}
+    return _EDIT_OPS[record["op"]](doc, record)
+
+
+# Documents are loaded on first use, from the last checkpoint and the edits
+# logged after it
+documents = DocumentRegistry(
+    DOCUMENTS_DIR,
+    apply_edit,
+    DOCUMENT_MEMORY_BUDGET,
+    directories={DEFAULT_DOCUMENT: TEMP_DIR},
+    start_thread=socketio.start_background_task,
+)
+atexit.register(documents.stop)
+
+
+def _mesh_sizes(count):
+    for doc in documents.documents():
+        mesh = doc.mesh
+        if doc.loaded and mesh is not None:
+            yield {"doc": doc.id}, count(mesh)
+
+
+REGISTRY.gauge(
+    "mesh_nodes", "Nodes of the loaded documents.", ("doc",), collect=lambda: _mesh_sizes(lambda mesh: len(mesh.points))
+)
+REGISTRY.gauge(
+    "mesh_elements",
+    "Elements of the loaded documents.",
+    ("doc",),
+    collect=lambda: _mesh_sizes(lambda mesh: sum(len(block) for block in mesh.cells)),
+)
+REGISTRY.gauge(
+    "documents_loaded",
+    "Documents loaded in memory.",
+    collect=lambda: [({}, sum(doc.loaded for doc in documents.documents()))],
+)
+
+
+def send_job_progress(job):
+    """Sends the state of a job to the viewers of its document."""
+    socketio.emit("job_progress", job.to_dict(), to=documents.get(job.doc_id).room)
+
+
+# Loads and exports run as background jobs, parsing and formatting in worker processes
+jobs = JobExecutor(on_update=send_job_progress)
+atexit.register(jobs.shutdown)
 
 
 def allowed_file(filename):
     """Checks if a file has an allowed extension."""
-    ALLOWED_EXTENSIONS = {"inp", "deck"}
+    ALLOWED_EXTENSIONS = {"inp", "deck", "zip"}
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def get_mesh_summary():
-    """Returns a summary of the current mesh."""
+def get_mesh_summary(doc: Document):
+    """Returns a summary of the mesh of a document."""
     print("[DEBUG] get_mesh_summary called.")
+    mesh = doc.mesh
     if not mesh:
         return {
             "num_nodes": 0,
@@ -159,6 +859,62 @@ def get_mesh_summary():
     }
 
 
+def requested_document():
+    """
+    Uses the document named by the ``doc`` query argument of the request, the
+    default one if there is none, see `DocumentRegistry.use`.
+    """
+    doc_id = request.args.get("doc", DEFAULT_DOCUMENT)
+    if not DOCUMENT_ID_PATTERN.fullmatch(doc_id):
+        abort(400, "Invalid document ID")
+    return documents.use(doc_id)
+
+
+def session_document():
+    """Uses the document the Socket.IO client views, see `DocumentRegistry.use`."""
+    return documents.use(documents.document_of(request.sid) or DEFAULT_DOCUMENT)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Records the latency and the body size of a request by route, see `/metrics`."""
+    start = g.pop("request_start", None)
+    # the route pattern, not the path, keeps the number of series bounded
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    if start is not None:
+        HTTP_LATENCY.observe(
+            time.perf_counter() - start, endpoint=endpoint, method=request.method, status=response.status_code
+        )
+    if not response.is_streamed and response.content_length is not None:
+        HTTP_RESPONSE_BYTES.observe(response.content_length, endpoint=endpoint)
+    return response
+
+
+def on_event(event: str):
+    """Registers a Socket.IO event handler like `socketio.on`, recording its latency."""
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = handler(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                EVENT_LATENCY.observe(time.perf_counter() - start, event=event, outcome=outcome)
+
+        return socketio.on(event)(timed)
+
+    return decorator
+
+
 @app.route("/")
 def index():
     """Renders the main page."""
@@ -167,329 +923,625 @@ def index():
 
 @app.route("/load", methods=["POST"])
 def load_mesh():
-    """Loads a mesh from a file."""
-    global mesh
+    """
+    Loads a mesh from an Abaqus deck or a native project archive (.zip).
+
+    The file is either the raw request body (``application/octet-stream``,
+    named by ``?filename=``) or the ``file`` field of a form. It is loaded by
+    a background job, see `load_job`; responds with the job, whose progress
+    is sent as ``job_progress`` events. A deck sent as the raw body is parsed
+    while it is received.
+
+    The file is received into a new file, and only replaces the one of the
+    same name once loaded: the current mesh may be memory-mapped from it.
+    """
     print("[DEBUG] /load endpoint called")
-    if "file" not in request.files:
-        return "No file part", 400
-    file = request.files["file"]
-    if file.filename == "":
+    if request.mimetype == "application/octet-stream":
+        file = None
+        filename = request.args.get("filename", "")
+    else:
+        if "file" not in request.files:
+            return "No file part", 400
+        file = request.files["file"]
+        filename = file.filename
+    if not filename:
         return "No selected file", 400
-    if file and file.filename and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(TEMP_MESH_DIR, filename)
-        file.save(filepath)
+    if not allowed_file(filename):
+        return "Invalid file", 400
+
+    with requested_document() as doc:
+        filepath = os.path.join(doc.mesh_dir, secure_filename(filename))
+        fd, upload_path = tempfile.mkstemp(
+            dir=doc.mesh_dir, prefix=f".{os.path.basename(filepath)}.", suffix=".upload"
+        )
+        os.close(fd)
+        if file is None and not filepath.lower().endswith(".zip"):
+            # the deck is parsed while the rest of it arrives
+            upload = jobs.shared_dict(total=request.content_length, received=0, complete=False, failed=False)
+            job = jobs.submit("load", load_job, doc.id, filepath, upload_path, upload, doc_id=doc.id)
+            receive_upload(upload_path, upload)
+            return {"job": job.to_dict()}, 202
         try:
-            mesh = read_deck(filepath)
-            # Save the path for persistence
-            with open(MESH_INFO_PATH, "w") as f:
-                json.dump({"filepath": filepath}, f)
-            print(f"[DEBUG] Mesh loaded from uploaded file: {filepath}")
-        except Exception as e:
-            print(f"[ERROR] Failed to parse mesh from {filepath}: {e}")
-            return f"Failed to parse mesh: {e}", 400
-        return "Mesh loaded", 200
-    return "Invalid file", 400
+            if file is not None:
+                file.save(upload_path)
+            else:
+                # a native project is only read once it is complete
+                receive_upload(upload_path)
+        except BaseException:
+            os.unlink(upload_path)
+            raise
+    job = jobs.submit("load", load_job, doc.id, filepath, upload_path, doc_id=doc.id)
+    return {"job": job.to_dict()}, 202
+
+
+def receive_upload(filepath: str, upload=None):
+    """
+    Writes the raw request body to a file chunk by chunk, recording the
+    progress in `upload`, a dict shared with the job parsing the file, see
+    `follow_upload`.
+    """
+    received = 0
+    try:
+        with open(filepath, "wb") as f:
+            while True:
+                chunk = request.stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+                f.flush()
+                received += len(chunk)
+                if upload is not None:
+                    upload["received"] = received
+    except Exception:
+        if upload is not None:
+            upload["failed"] = True
+        raise
+    if upload is not None:
+        upload["complete"] = True
+    print(f"[DEBUG] Received {received} bytes into {filepath}")
+
+
+def load_job(job, doc_id: str, filepath: str, upload_path: str, upload=None):
+    """
+    Loads an uploaded file into a document.
+
+    The file was received at `upload_path` and is moved to `filepath` once
+    the mesh is installed, or removed if loading fails. A deck is parsed in a
+    worker process into a native project in a new directory, which is then
+    memory-mapped here and moved next to `filepath` at the same time;
+    native projects are mapped directly. `upload` is the state of a deck
+    still being received, see `parse_deck`.
+    """
+    directory, name = os.path.split(filepath)
+    parse_path = tempfile.mkdtemp(dir=directory, prefix=f".{name}.", suffix=".native")
+    try:
+        return _load_upload(job, doc_id, filepath, upload_path, parse_path, upload)
+    finally:
+        if os.path.exists(upload_path):
+            os.unlink(upload_path)
+        if os.path.exists(parse_path):
+            shutil.rmtree(parse_path)
+
+
+def _load_upload(job, doc_id: str, filepath: str, upload_path: str, parse_path: str, upload=None):
+    connections = None
+    if upload is None and is_native(upload_path):
+        native_path = filepath
+        parsed = False
+        connections = read_native_manifest(upload_path)["extra"].get("connections", [])
+        job.report(stage="loading")
+        # the mapping stays valid once the file is moved to filepath
+        new_mesh = read_native(upload_path)
+    else:
+        # the project at native_path may be the document's checkpoint, it is
+        # only replaced once the new mesh is installed
+        native_path = filepath + ".native"
+        parsed = True
+        summary = jobs.run_in_process(job, parse_deck, upload_path, parse_path, upload)
+        # metrics recorded in the worker process would stay there
+        observe_parse_throughput(summary["num_bytes"], summary["seconds"])
+        job.report(stage="loading")
+        new_mesh = read_native(parse_path)
+    # the tiles are ready before the first viewer asks for the outline, see `mesh_frames`
+    job.report(stage="indexing")
+    new_tiler = MeshTiler(new_mesh)
+
+    job.report(stage="installing")
+    with documents.use(doc_id) as doc:
+        # the parsed project is the new checkpoint, earlier edits are void
+        with doc.checkpointer.paused(), doc.lock:
+            job.check_cancelled()
+            # the previous mesh keeps the files it may be mapped from
+            os.replace(upload_path, filepath)
+            if parsed:
+                _replace_directory(parse_path, native_path)
+            doc.mesh = new_mesh
+            if connections is not None:
+                doc.connections = connections
+            doc.mesh.clear_dirty()
+            previous, doc.filepath = doc.filepath, native_path
+            doc.version += 1
+            # drags on the previous mesh must not move the new one
+            doc.pending_drag_moves.clear()
+            doc.invalidate_node_indices()
+            doc.spatial_index, doc.mesh_tiler = new_tiler.node_index, new_tiler
+            doc.write_info(
+                {
+                    "filepath": native_path,
+                    "has_mesh": True,
+                    "connections": doc.connections,
+                    "seq": doc.edit_log.last_seq,
+                }
+            )
+            doc.edit_log.reset()
+            if previous != filepath:
+                doc.remove_checkpoint_files(previous, native_path)
+            summary = get_mesh_summary(doc)
+    print(f"[DEBUG] Mesh loaded from uploaded file: {filepath}")
+    return summary
+
+
+def _replace_directory(source: str, target: str) -> None:
+    """
+    Moves the directory `source` to `target`. An existing `target` is moved
+    aside first and then removed, as `os.replace` only replaces empty
+    directories; a mesh memory-mapped from it keeps its data.
+    """
+    if not os.path.isdir(target):
+        os.replace(source, target)
+        return
+    directory, name = os.path.split(target)
+    stale = tempfile.mkdtemp(dir=directory, prefix=f".{name}.", suffix=".old")
+    os.replace(target, stale)
+    try:
+        os.replace(source, target)
+    except BaseException:
+        os.replace(stale, target)
+        raise
+    shutil.rmtree(stale, ignore_errors=True)
 
 
 @app.route("/export")
 def export_mesh():
-    """Exports the current mesh and returns it as a file download."""
+    """
+    Exports the current mesh and streams it as a file download.
+
+    The deck is generated chunk by chunk while it is sent, so the text is
+    never held in memory as a whole. It is generated from a copy of the
+    mesh taken under the document lock, so edits made meanwhile neither
+    break the stream nor mix two states of the mesh. The stream is
+    gzip-compressed when the client accepts it, unless ``?compress=0`` is
+    given.
+    """
     print("[DEBUG] /export endpoint called.")
-    if not mesh:
+    with requested_document() as doc:
+        with doc.lock:
+            export_mesh_obj = doc.mesh.copy() if doc.mesh else None
+    if not export_mesh_obj:
         return "No mesh to export", 400
 
-    try:
-        # Use an in-memory text buffer to write the deck content
-        deck_buffer = io.StringIO()
-        write_buffer(deck_buffer, mesh)
-        deck_content = deck_buffer.getvalue()
-        deck_buffer.close()
-
-        print(f"[DEBUG] Mesh exported to in-memory buffer")
-
-        # Return the content as a downloadable file
-        return Response(
-            deck_content,
-            mimetype="text/plain",
-            headers={"Content-Disposition": "attachment;filename=mesh.deck"},
-        )
+    compress = request.args.get("compress", "1") != "0" and "gzip" in request.headers.get(
+        "Accept-Encoding", ""
+    )
 
-    except Exception as e:
-        print(f"[ERROR] Failed to export mesh: {e}")
-        return f"Failed to export mesh: {e}", 500
+    def generate():
+        try:
+            if compress:
+                compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+                for chunk in iter_buffer(export_mesh_obj):
+                    data = compressor.compress(chunk.encode())
+                    if data:
+                        yield data
+                yield compressor.flush()
+            else:
+                for chunk in iter_buffer(export_mesh_obj):
+                    yield chunk.encode()
+            print("[DEBUG] Mesh export stream finished")
+        except Exception as e:
+            print(f"[ERROR] Failed to export mesh: {e}")
+            raise
+
+    headers = {"Content-Disposition": "attachment;filename=mesh.deck"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+
+    # Return the content as a streamed, downloadable file
+    return Response(generate(), mimetype="text/plain", headers=headers)
+
+
+@app.route("/export", methods=["POST"])
+def export_mesh_job():
+    """
+    Starts a background job writing the current mesh as a deck, see
+    `export_job`; the deck is then fetched from `/jobs/<id>/download`.
+    """
+    with requested_document() as doc:
+        if not doc.mesh:
+            return "No mesh to export", 400
+    job = jobs.submit("export", export_job, doc.id, doc_id=doc.id)
+    return {"job": job.to_dict()}, 202
+
+
+def export_job(job, doc_id: str):
+    """
+    Writes a document as a deck: the mesh is copied and written as a native
+    project here, which a worker process formats.
+    """
+    job.report(stage="copying")
+    with documents.use(doc_id) as doc:
+        with doc.lock:
+            mesh_copy = doc.mesh.copy() if doc.mesh else None
+    if mesh_copy is None:
+        raise ValueError("No mesh to export")
+
+    native_path = os.path.join(EXPORTS_DIR, f"{job.id}.native")
+    deck_path = os.path.join(EXPORTS_DIR, f"{job.id}.deck")
+    job.files.append(deck_path)
+    try:
+        with SAVE_SECONDS.time(kind="export"):
+            write_native(native_path, mesh_copy)
+            del mesh_copy
+            size = jobs.run_in_process(job, format_deck, native_path, deck_path)
+    finally:
+        shutil.rmtree(native_path, ignore_errors=True)
+    return {"filename": "mesh.deck", "size": size}
+
+
+@app.route("/metrics")
+def metrics():
+    """Returns the metrics of the server in the Prometheus text format."""
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    """Returns the state of a job."""
+    job = jobs.get(job_id)
+    if job is None:
+        return "Unknown job", 404
+    return job.to_dict()
+
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    """Requests the cancellation of a job, see `JobExecutor.cancel`."""
+    if not jobs.cancel(job_id):
+        return "Unknown or finished job", 404
+    return jobs.get(job_id).to_dict()
+
+
+@app.route("/jobs/<job_id>/download")
+def download_job(job_id):
+    """Sends the deck written by an export job."""
+    job = jobs.get(job_id)
+    if job is None or job.kind != "export" or job.status != "done":
+        return "No finished export with this ID", 404
+    return send_file(
+        job.files[0], mimetype="text/plain", as_attachment=True, download_name=job.result["filename"]
+    )
 
 
 @app.route("/last_mesh")
 def last_mesh():
-    """Returns the last loaded mesh."""
+    """Returns the last loaded mesh, see `mesh_response`."""
     print("[DEBUG] /last_mesh endpoint called. Returning current mesh state.")
-    mesh_dict_for_client = mesh_to_dict(mesh)
-    mesh_dict_for_client["connections"] = connections
-    print(f"[DEBUG] /last_mesh sending mesh_dict: nodes={len(mesh_dict_for_client.get('nodes', []))}, elements={len(mesh_dict_for_client.get('elements', []))}")
-    return jsonify(mesh_dict_for_client)
 
+    with requested_document() as doc:
+
+        def build():
+            mesh_dict_for_client = dict(doc.cached_payload("dict", lambda: mesh_to_dict(doc.mesh)))
+            mesh_dict_for_client["connections"] = doc.connections
+            mesh_dict_for_client["version"] = doc.version
+            return json.dumps(mesh_dict_for_client).encode()
+
+        return mesh_response(doc, "json", build, "application/json")
+
+
+@app.route("/mesh.bin")
+def mesh_binary():
+    """
+    Returns the current mesh as a binary payload, see `mesh_to_binary`.
+    ``?coords=float32`` halves the size of the coordinates.
+    """
+    coords_dtype = request.args.get("coords", "float64")
+    if coords_dtype not in ("float32", "float64"):
+        return "Invalid coordinate type", 400
+    with requested_document() as doc:
+        return mesh_response(
+            doc,
+            f"binary.{coords_dtype}",
+            lambda: mesh_to_binary(doc.mesh, doc.connections, doc.version, coords_dtype),
+            "application/octet-stream",
+        )
 
-@socketio.on("get_mesh")
-def handle_get_mesh(data=None):
-    """Handles a request to get the current mesh."""
-    print("[DEBUG] get_mesh SocketIO event received.")
-    emit("mesh_data", {"mesh": mesh_to_dict(mesh), "connections": connections, "isDragging": False})
 
+@app.route("/mesh.stream")
+def mesh_stream():
+    """
+    Streams the current mesh as frames to display as they arrive, coarse
+    first, see `mesh_frames`. The stream is gzip-compressed when the client
+    accepts it, flushed after every frame.
+    """
+    with requested_document() as doc:
+        frames = mesh_frames(doc)
+        # the state is taken while the document is in use
+        first = next(frames)
+    compress = "gzip" in request.headers.get("Accept-Encoding", "")
+
+    def generate():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+        for data in itertools.chain([first], frames):
+            PAYLOAD_BYTES.observe(len(data), kind="stream.frame")
+            yield compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH) if compressor else data
+        if compressor:
+            yield compressor.flush()
+
+    headers = {"Cache-Control": "no-store", "Vary": "Accept-Encoding"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return Response(generate(), mimetype="application/octet-stream", headers=headers)
+
+
+@app.route("/tiles/info")
+def tiles_info():
+    """
+    Returns the size and the planar bounds of the current mesh, for the client
+    to decide between loading it whole and streaming it by `/viewport`.
+    """
+
+    with requested_document() as doc:
+
+        def build():
+            mesh = doc.mesh
+            info = {"version": doc.version, "instance": SERVER_INSTANCE, "num_nodes": 0, "num_elements": 0}
+            if mesh and len(mesh.points):
+                info["num_nodes"] = len(mesh.points)
+                info["num_elements"] = sum(len(block) for block in mesh.cells)
+                info["bounds"] = {
+                    "min": mesh.points[:, :2].min(axis=0).tolist(),
+                    "max": mesh.points[:, :2].max(axis=0).tolist(),
+                }
+            return json.dumps(info).encode()
 
-@socketio.on("add_node")
-def handle_add_node(data):
-    """Handles a request to add a node to the mesh."""
-    global mesh
-    if not mesh:
-        return
+        return mesh_response(doc, "tiles.info", build, "application/json")
 
-    print(f"[DEBUG] add_node SocketIO event received. Node ID: {data.get('id')}")
-    new_point_id = data.get("id")
-    new_point_coords = [data.get("x", 0), data.get("y", 0), 0]  # Assuming 2D for now
 
-    mesh.points = np.vstack([mesh.points, new_point_coords])
-    mesh.point_ids.append(new_point_id)
+@app.route("/viewport")
+def viewport():
+    """
+    Returns the part of the mesh in a viewport as a binary payload, see
+    `viewport_to_binary`. Takes ``bounds=x0,y0,x1,y1`` in world coordinates
+    and the ``scale`` of the view in pixels per unit length.
+    """
+    try:
+        x0, y0, x1, y1 = (float(v) for v in request.args["bounds"].split(","))
+        scale = float(request.args.get("scale", 0))
+    except (KeyError, ValueError):
+        return "Expected bounds=x0,y0,x1,y1 and a numeric scale", 400
+    with requested_document() as doc:
+        payload = viewport_to_binary(doc, [min(x0, x1), min(y0, y1)], [max(x0, x1), max(y0, y1)], scale)
+    if payload is None:
+        return "No mesh loaded", 404
+    PAYLOAD_BYTES.observe(len(payload), kind="viewport")
+    response = Response(payload, mimetype="application/octet-stream")
+    # every viewport differs, there is nothing to revalidate
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+@on_event("connect")
+def handle_connect(auth=None):
+    """Joins the client to the room of the document named by its ``doc`` query argument."""
+    doc_id = request.args.get("doc", DEFAULT_DOCUMENT)
+    if not DOCUMENT_ID_PATTERN.fullmatch(doc_id):
+        return False
+    doc = documents.add_viewer(doc_id, request.sid)
+    join_room(doc.room)
+
+
+@on_event("disconnect")
+def handle_disconnect(reason=None):
+    """Forgets the client, its document may be evicted once it has no viewers left."""
+    documents.remove_viewer(request.sid)
+
+
+@on_event("get_mesh")
+def handle_get_mesh(data=None):
+    """
+    Handles a request to get the current mesh. With ``{"binary": true}`` the
+    mesh is sent as a `mesh_to_binary` payload in the ``buffer`` field, as a
+    Socket.IO binary attachment.
+    """
+    print("[DEBUG] get_mesh SocketIO event received.")
+    with session_document() as doc:
+        if data and data.get("binary"):
+            with doc.lock:
+                payload = doc.cached_payload(
+                    "binary.float64",
+                    measured_payload("binary.float64", lambda: mesh_to_binary(doc.mesh, doc.connections, doc.version)),
+                )
+                version = doc.version
+            emit("mesh_data", {"buffer": payload, "version": version, "isDragging": False})
+            return
+        emit("mesh_data", mesh_state_message(doc))
+
+
+@on_event("add_node")
+def handle_add_node(data):
+    """Handles a request to add a node to the mesh."""
+    with session_document() as doc:
+        if not doc.mesh:
+            return
 
-    emit("mesh_data", {"mesh": mesh_to_dict(mesh), "connections": connections, "isDragging": False}, broadcast=True)
-    emit("mesh_summary", get_mesh_summary(), broadcast=True)
-    save_mesh_to_disk()
+        print(f"[DEBUG] add_node SocketIO event received. Node ID: {data.get('id')}")
+        publish_edit(doc, {"op": "add_node", "id": data.get("id"), "x": data.get("x", 0), "y": data.get("y", 0)})
+        emit("mesh_summary", get_mesh_summary(doc), to=doc.room)
 
 
-@socketio.on("delete_node")
+@on_event("delete_node")
 def handle_delete_node(data):
     """Handles a request to delete a node from the mesh."""
-    global mesh
-    if not mesh:
-        return
-
-    node_id_to_delete = data["id"]
-    print(f"[DEBUG] delete_node SocketIO event received. Node ID: {node_id_to_delete}")
-
-    try:
-        node_index = mesh.point_ids.index(node_id_to_delete)
-        mesh.points = np.delete(mesh.points, node_index, axis=0)
-        mesh.point_ids.pop(node_index)
-
-        # Also remove node from any node sets
-        for name, ids in mesh.node_sets.items():
-            mesh.node_sets[name] = [i for i in ids if i != node_id_to_delete]
+    with session_document() as doc:
+        if not doc.mesh:
+            return
 
-    except ValueError:
-        print(f"[WARNING] Node with ID {node_id_to_delete} not found for deletion.")
-
-    emit("mesh_data", {"mesh": mesh_to_dict(mesh), "connections": connections, "isDragging": False}, broadcast=True)
-    emit("mesh_summary", get_mesh_summary(), broadcast=True)
-    save_mesh_to_disk()
+        print(f"[DEBUG] delete_node SocketIO event received. Node ID: {data['id']}")
+        publish_edit(doc, {"op": "delete_node", "id": data["id"]})
+        emit("mesh_summary", get_mesh_summary(doc), to=doc.room)
 
 
-@socketio.on("update_node")
+@on_event("update_node")
 def handle_update_node(data):
     """Handles a request to update a node in the mesh."""
-    if not mesh:
-        return
+    with session_document() as doc:
+        if not doc.mesh:
+            return
 
-    node_id = data["id"]
+        nodes_data = [{"id": data["id"], "x": data["x"], "y": data["y"]}]
+        if data.get("isDragging", False):
+            queue_drag_moves(doc, nodes_data)
+            return
 
-    try:
-        node_index = mesh.point_ids.index(node_id)
-        mesh.points[node_index] = [data["x"], data["y"], 0]  # Assuming 2D
-    except ValueError:
-        print(f"[WARNING] Node with ID {node_id} not found for update.")
-
-    is_dragging = data.get("isDragging", False)
-    dragging_node_id = data.get("draggingNodeId")
-
-    emit(
-        "mesh_data",
-        {
-            "mesh": mesh_to_dict(mesh),
-            "connections": connections,
-            "isDragging": is_dragging,
-            "draggingNodeId": dragging_node_id,
-        },
-        broadcast=True,
-    )
-    if not is_dragging:
-        emit("mesh_summary", get_mesh_summary(), broadcast=True)
-        save_mesh_to_disk()
+        publish_edit(doc, {"op": "update_nodes", "nodes": nodes_data})
+        emit("mesh_summary", get_mesh_summary(doc), to=doc.room)
 
 
-@socketio.on("update_nodes_bulk")
+@on_event("update_nodes_bulk")
 def handle_update_nodes_bulk(data):
     """Handles a request to update multiple nodes in the mesh."""
-    global mesh
-    if not mesh:
-        return
+    with session_document() as doc:
+        if not doc.mesh:
+            return
 
-    nodes_data = data.get("nodes", [])
+        nodes_data = [
+            {"id": node["id"], "x": node["x"], "y": node["y"]} for node in data.get("nodes", [])
+        ]
+        if data.get("isDragging", False):
+            queue_drag_moves(doc, nodes_data)
+            return
 
-    for updated_node in nodes_data:
-        node_id = updated_node["id"]
-        try:
-            node_index = mesh.point_ids.index(node_id)
-            mesh.points[node_index] = [updated_node["x"], updated_node["y"], 0]  # Assuming 2D
-        except ValueError:
-            print(f"[WARNING] Node with ID {node_id} not found for bulk update.")
-
-    is_dragging = data.get("isDragging", False)
-    dragging_node_id = data.get("draggingNodeId")
-
-    emit(
-        "mesh_data",
-        {
-            "mesh": mesh_to_dict(mesh),
-            "connections": connections,
-            "isDragging": is_dragging,
-            "draggingNodeId": dragging_node_id,
-        },
-        broadcast=True,
-    )
-    if not is_dragging:
-        emit("mesh_summary", get_mesh_summary(), broadcast=True)
-        save_mesh_to_disk()
+        publish_edit(doc, {"op": "update_nodes", "nodes": nodes_data})
+        emit("mesh_summary", get_mesh_summary(doc), to=doc.room)
 
 
-@socketio.on("delete_nodes_bulk")
+@on_event("delete_nodes_bulk")
 def handle_delete_nodes_bulk(data):
     """Handles a request to delete multiple nodes from the mesh."""
-    global mesh, connections
-    if not mesh:
-        return
+    with session_document() as doc:
+        if not doc.mesh:
+            return
 
-    node_ids_to_delete = set(data.get("ids", []))
-    print(
-        f"[DEBUG] delete_nodes_bulk SocketIO event received. Node IDs to delete: {list(node_ids_to_delete)}"
-    )
-
-    # Find indices of nodes to delete
-    indices_to_delete = [
-        i for i, pid in enumerate(mesh.point_ids) if pid in node_ids_to_delete
-    ]
-
-    # Remove nodes and point_ids
-    mesh.points = np.delete(mesh.points, indices_to_delete, axis=0)
-    mesh.point_ids = [pid for pid in mesh.point_ids if pid not in node_ids_to_delete]
-
-    # Remove nodes from node sets
-    for name, ids in mesh.node_sets.items():
-        mesh.node_sets[name] = [i for i in ids if i not in node_ids_to_delete]
-
-    # Remove elements connected to the deleted nodes
-    for cell_block in mesh.cells:
-        mask = np.isin(
-            cell_block.connectivity, list(node_ids_to_delete), invert=True
-        ).all(axis=1)
-        cell_block.connectivity = cell_block.connectivity[mask]
-        cell_block.ids = cell_block.ids[mask]
-
-    # Filter out connections involving deleted nodes
-    connections = [
-        c
-        for c in connections
-        if c["source"] not in node_ids_to_delete
-        and c["target"] not in node_ids_to_delete
-    ]
-
-    emit("mesh_data", {"mesh": mesh_to_dict(mesh), "connections": connections, "isDragging": False}, broadcast=True)
-    emit("mesh_summary", get_mesh_summary(), broadcast=True)
-    save_mesh_to_disk()
+        node_ids_to_delete = list(set(data.get("ids", [])))
+        print(
+            f"[DEBUG] delete_nodes_bulk SocketIO event received. Node IDs to delete: {node_ids_to_delete}"
+        )
+        publish_edit(doc, {"op": "delete_nodes", "ids": node_ids_to_delete})
+        emit("mesh_summary", get_mesh_summary(doc), to=doc.room)
 
 
-@socketio.on("add_connection")
+@on_event("add_connection")
 def handle_add_connection(data):
     """Handles a request to add a connection to the mesh."""
-    global connections
     print(
         f"[DEBUG] add_connection SocketIO event received. Source: {data.get('source')}, Target: {data.get('target')}"
     )
-    new_id = max([c.get("id") or 0 for c in connections]) + 1 if connections else 1
-    data["id"] = new_id
-    connections.append(data)
-
-    emit(
-        "mesh_data",
-        {"mesh": mesh_to_dict(mesh), "connections": connections, "isDragging": False},
-        broadcast=True,
-    )
-    emit("mesh_summary", get_mesh_summary(), broadcast=True)
-    save_mesh_to_disk()
+    with session_document() as doc:
+        with doc.lock:
+            connections = doc.connections
+            new_id = max([c.get("id") or 0 for c in connections]) + 1 if connections else 1
+            data["id"] = new_id
+            publish_edit(doc, {"op": "add_connection", "connection": data})
+        emit("mesh_summary", get_mesh_summary(doc), to=doc.room)
 
 
-@socketio.on("delete_connection")
+@on_event("delete_connection")
 def handle_delete_connection(data):
     """Handles a request to delete a connection from the mesh."""
-    global connections
     print(
         f"[DEBUG] delete_connection SocketIO event received. Source: {data.get('source')}, Target: {data.get('target')}"
     )
-    connections = [
-        c
-        for c in connections
-        if not (
-            (c["source"] == data["source"] and c["target"] == data["target"])
-            or (c["source"] == data["target"] and c["target"] == data["source"])
-        )
-    ]
-    emit(
-        "mesh_data",
-        {"mesh": mesh_to_dict(mesh), "connections": connections, "isDragging": False},
-        broadcast=True,
-    )
-    emit("mesh_summary", get_mesh_summary(), broadcast=True)
-    save_mesh_to_disk()
+    with session_document() as doc:
+        publish_edit(doc, {"op": "delete_connection", "source": data["source"], "target": data["target"]})
+        emit("mesh_summary", get_mesh_summary(doc), to=doc.room)
 
 
-@socketio.on("add_triangulation_connections")
+@on_event("add_triangulation_connections")
 def handle_add_triangulation_connections(data):
     """Handles a request to add multiple triangulation connections to the mesh."""
-    global connections
     new_connections = data.get("connections", [])
     print(
         f"[DEBUG] add_triangulation_connections SocketIO event received. Adding {len(new_connections)} connections."
     )
-    connections.extend(new_connections)
-    emit(
-        "mesh_data",
-        {"mesh": mesh_to_dict(mesh), "connections": connections, "isDragging": False},
-        broadcast=True,
-    )
-    emit("mesh_summary", get_mesh_summary(), broadcast=True)
-    save_mesh_to_disk()
+    with session_document() as doc:
+        publish_edit(doc, {"op": "add_connections", "connections": new_connections})
+        emit("mesh_summary", get_mesh_summary(doc), to=doc.room)
 
 
-@socketio.on("clear_mesh")
+@on_event("clear_mesh")
 def handle_clear_mesh():
     """Handles a request to clear the mesh."""
-    global mesh, connections
     print("[DEBUG] clear_mesh SocketIO event received.")
-    mesh = None
-    connections = []
-    emit(
-        "mesh_data",
-        {"mesh": mesh_to_dict(mesh), "connections": connections, "isDragging": False},
-        broadcast=True,
-    )
-    emit("mesh_summary", get_mesh_summary(), broadcast=True)
-    save_mesh_to_disk()
+    with session_document() as doc:
+        publish_edit(doc, {"op": "clear"})
+        emit("mesh_summary", get_mesh_summary(doc), to=doc.room)
 
 
-@socketio.on("sync_mesh")
+@on_event("sync_mesh")
 def handle_sync_mesh(data):
     """Handles a request to sync the mesh from a client."""
-    global mesh, connections
     print("[DEBUG] sync_mesh SocketIO event received.")
-    mesh = dict_to_mesh(data.get("mesh"))
-    connections = data.get("connections", [])
-    # Broadcast the synced mesh to all clients except the sender
-    emit(
-        "mesh_data",
-        {"mesh": mesh_to_dict(mesh), "connections": connections, "isDragging": False},
-        broadcast=True,
-        include_self=False,
-    )
-    emit("mesh_summary", get_mesh_summary(), broadcast=True)
-    save_mesh_to_disk()
+    with session_document() as doc:
+        # Broadcast the synced mesh to all viewers except the sender
+        publish_edit(
+            doc,
+            {"op": "sync", "mesh": data.get("mesh"), "connections": data.get("connections", [])},
+            include_self=False,
+        )
+        emit("mesh_summary", get_mesh_summary(doc), to=doc.room)
+
+
+@on_event("query_nodes_in_box")
+def handle_query_nodes_in_box(data):
+    """Returns the IDs of the nodes inside a box, as the event acknowledgement."""
+    with session_document() as doc:
+        # edits and drag flushes update the index and the node IDs
+        with doc.lock:
+            index = doc.get_spatial_index()
+            if index is None:
+                return {"ids": []}
+
+            indices = index.in_box(data["min"], data["max"])
+            return {"ids": [int(doc.mesh.point_ids[i]) for i in indices]}
+
+
+@on_event("query_nearest_nodes")
+def handle_query_nearest_nodes(data):
+    """
+    Returns the nearest node IDs for one or more points, as the event
+    acknowledgement. An optional radius drops neighbours further away, which
+    is what snapping needs.
+    """
+    points = data.get("points") or [[data["x"], data["y"]]]
+    k = int(data.get("k", 1))
+    radius = data.get("radius")
+
+    with session_document() as doc:
+        # edits and drag flushes update the index and the node IDs
+        with doc.lock:
+            index = doc.get_spatial_index()
+            if index is None:
+                return {"ids": [], "distances": []}
+
+            distances, indices = index.nearest(points, k)
+            result_ids, result_distances = [], []
+            for row_distances, row_indices in zip(distances, indices):
+                keep = row_indices >= 0
+                if radius is not None:
+                    keep &= row_distances <= float(radius)
+                result_ids.append([int(doc.mesh.point_ids[i]) for i in row_indices[keep]])
+                result_distances.append(row_distances[keep].tolist())
+            return {"ids": result_ids, "distances": result_distances}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,7 @@
+"""
+Performance benchmarks for the abaqus_io package.
+
+Each module can be run as a script, e.g. ``python -m benchmarks.bench_deck_write``.
+`benchmarks.generate` writes synthetic decks of any size and
+`benchmarks.suite` times the I/O paths over them against a JSON baseline.
+"""
@@ -0,0 +1,73 @@
+"""
+Compares the bulk deck formatter against the original per-row formatting,
+and the multi-process writer against a single process.
+
+Usage: python -m benchmarks.bench_deck_write [num_nodes] [workers]
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from abaqus_io import ElementBlock, Mesh, write_buffer, write_deck
+
+
+def per_row_write(f, mesh: Mesh) -> None:
+    """The node and element sections written one f-string per row."""
+    func_node_line = lambda ids: ",".join(f"{id:>9}" for id in ids)
+    for xyz, id in zip(mesh.points, mesh.point_ids):
+        str_coords = ", ".join(f"{entry:10.6f}" for entry in xyz)
+        f.write(f"{id:9}, {str_coords}\n")
+    for cell_block in mesh.cells:
+        for eid, row in zip(cell_block.ids, cell_block.connectivity):
+            f.write(" " + str(eid) + "," + func_node_line(row) + ",\n")
+
+
+def make_mesh(num_nodes: int) -> Mesh:
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-1e3, 1e3, size=(num_nodes, 3))
+    point_ids = list(range(1, num_nodes + 1))
+    connectivity = rng.integers(1, num_nodes + 1, size=(num_nodes, 4))
+    cells = [ElementBlock("CGAX4", np.arange(1, num_nodes + 1), connectivity)]
+    return Mesh(points, point_ids, cells, validate_flag=False)
+
+
+def main(num_nodes: int = 1_000_000, workers: int = 0) -> None:
+    mesh = make_mesh(num_nodes)
+
+    start = time.perf_counter()
+    per_row_write(io.StringIO(), mesh)
+    per_row = time.perf_counter() - start
+
+    start = time.perf_counter()
+    write_buffer(io.StringIO(), mesh)
+    bulk = time.perf_counter() - start
+
+    print(f"{num_nodes} nodes + {num_nodes} elements")
+    print(f"  per-row formatting: {per_row:8.2f} s")
+    print(f"  bulk formatting:    {bulk:8.2f} s  ({per_row / bulk:.1f}x faster)")
+
+    if workers > 1:
+        with tempfile.TemporaryDirectory() as dirname:
+            path = os.path.join(dirname, "mesh.inp")
+            start = time.perf_counter()
+            write_deck(path, mesh)
+            serial = time.perf_counter() - start
+
+            start = time.perf_counter()
+            write_deck(path, mesh, workers=workers)
+            parallel = time.perf_counter() - start
+
+        print(f"  write_deck, 1 process:      {serial:8.2f} s")
+        print(f"  write_deck, {workers} workers:    {parallel:8.2f} s  ({serial / parallel:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 0,
+    )
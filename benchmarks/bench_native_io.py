@@ -0,0 +1,42 @@
+"""
+Compares opening a mesh from an Abaqus deck against the native binary format.
+
+Usage: python -m benchmarks.bench_native_io [num_nodes]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from abaqus_io import read_deck, read_native, write_deck, write_native
+from benchmarks.bench_deck_write import make_mesh
+
+
+def main(num_nodes: int = 1_000_000) -> None:
+    mesh = make_mesh(num_nodes)
+
+    with tempfile.TemporaryDirectory() as dirname:
+        deck = os.path.join(dirname, "mesh.inp")
+        project = os.path.join(dirname, "mesh.zip")
+        write_deck(deck, mesh)
+        write_native(project, mesh)
+
+        timings = {}
+        start = time.perf_counter()
+        read_deck(deck, validate_flag=False)
+        timings["deck"] = time.perf_counter() - start
+        for mmap in (False, True):
+            start = time.perf_counter()
+            read_native(project, mmap=mmap)
+            timings[f"native, mmap={mmap}"] = time.perf_counter() - start
+
+        print(f"{num_nodes} nodes + {num_nodes} elements")
+        print(f"  deck size:   {os.path.getsize(deck) / 1e6:8.1f} MB")
+        print(f"  native size: {os.path.getsize(project) / 1e6:8.1f} MB")
+        for name, seconds in timings.items():
+            print(f"  {name:<20} {seconds:8.2f} s  ({timings['deck'] / seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,211 @@
+"""
+Deterministic synthetic Abaqus decks of any size, for benchmarks.
+
+A deck is a grid of CGAX4 quads, CGAX3 triangles or rows of SFMGAX1 lines
+with exactly the requested number of elements of that type. The
+``unstructured`` layout jitters the interior nodes, picks the diagonal of
+every triangle pair at random, and writes the nodes and elements in a
+shuffled order, so IDs are scattered across the deck and the connectivity as
+a real mesher would leave them. Every deck has node and element sets given
+by ID lists, by ``GENERATE`` ranges, by the ``NSET``/``ELSET`` options of its
+``*NODE`` and ``*ELEMENT`` keywords and by other set names, and a surface.
+The last tenth of the elements, and the SFMGAX1 edge of the bottom boundary
+of 2D meshes, are in a deck included from the main one.
+
+The text is formatted here, independently of `abaqus_io.deck_write`, so the
+writer can be benchmarked against its own input.
+
+Usage: python -m benchmarks.generate path num_elements [element_type] [layout] [seed]
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import sys
+
+import numpy as np
+
+ELEMENT_TYPES = ("CGAX3", "CGAX4", "SFMGAX1")
+LAYOUTS = ("structured", "unstructured")
+
+# Rows formatted at once, bounds the memory of the text fragments
+_CHUNK_ROWS = 65536
+# Share of the elements written to the included deck
+_INCLUDED_SHARE = 0.1
+
+
+def generate_deck(
+    path: str, num_elements: int, element_type: str = "CGAX4", layout: str = "structured", seed: int = 0
+) -> dict:
+    """
+    Writes a synthetic deck and the deck it includes next to it.
+
+    Parameters
+    ----------
+    path : str
+        The main deck; the included one is ``<stem>_include.inp`` beside it.
+    num_elements : int
+        The number of elements of `element_type`.
+    element_type : str
+        ``CGAX3``, ``CGAX4`` or ``SFMGAX1``.
+    layout : str
+        ``structured`` or ``unstructured``.
+    seed : int
+        Seeds the unstructured layout; the same arguments give the same bytes.
+
+    Returns
+    -------
+    dict
+        The paths, the numbers of nodes and elements (of all types), and the
+        size of both decks in bytes.
+    """
+    if element_type not in ELEMENT_TYPES:
+        raise ValueError(f"Unknown element type {element_type!r}, expected one of {ELEMENT_TYPES}")
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout {layout!r}, expected one of {LAYOUTS}")
+    if num_elements < 1:
+        raise ValueError("At least one element is needed")
+
+    rng = np.random.default_rng(seed)
+    unstructured = layout == "unstructured"
+    points, connectivity, edge = _grid(num_elements, element_type, unstructured, rng)
+    num_nodes = len(points)
+
+    # node and element IDs are contiguous, so GENERATE ranges stay valid;
+    # the unstructured layout scatters them over the grid
+    node_ids = rng.permutation(num_nodes) + 1 if unstructured else np.arange(1, num_nodes + 1)
+    connectivity = node_ids[connectivity]
+    element_ids = np.arange(1, num_elements + 1)
+    node_order = rng.permutation(num_nodes) if unstructured else np.arange(num_nodes)
+    element_order = rng.permutation(num_elements) if unstructured else np.arange(num_elements)
+
+    num_included = int(num_elements * _INCLUDED_SHARE)
+    main_rows, included_rows = element_order[: num_elements - num_included], element_order[num_elements - num_included :]
+
+    stem, _ = os.path.splitext(path)
+    include_path = f"{stem}_include.inp"
+    # the first grid row of elements and the left column of nodes
+    strip = element_ids[: min(num_elements, edge["row_elements"])]
+    left = node_ids[edge["left_nodes"]]
+
+    with open(path, "w") as f:
+        f.write(f"*Heading\n** Synthetic {layout} {element_type} mesh, {num_elements} elements, seed {seed}\n")
+        f.write("*Node, NSET=NALL\n")
+        _write_rows(f, " %d, %.6f, %.6f, %.6f\n", np.column_stack([node_ids[node_order], points[node_order]]))
+        f.write(f"*Element, type={element_type}, ELSET=EALL\n")
+        _write_element_rows(f, element_ids[main_rows], connectivity[main_rows])
+        f.write("*Nset, nset=LEFT\n")
+        _write_id_lines(f, left)
+        f.write("*Nset, nset=FIRST_NODES, generate\n")
+        f.write(f" 1, {max(num_nodes // 10, 1)}, 1\n")
+        f.write("*Elset, elset=STRIP\n")
+        _write_id_lines(f, strip)
+        f.write("*Elset, elset=EVERY_TENTH, generate\n")
+        f.write(f" 1, {num_elements}, 10\n")
+        f.write("*Elset, elset=COMBINED\n STRIP, EVERY_TENTH\n")
+        f.write("*Surface, NAME=BOTTOM, TYPE=ELEMENT\n STRIP, S1\n")
+        f.write(f"*INCLUDE, INPUT={os.path.basename(include_path)}\n")
+
+    num_edges = 0
+    with open(include_path, "w") as f:
+        f.write(f"** Included part of {os.path.basename(path)}\n")
+        if num_included:
+            f.write(f"*Element, type={element_type}, ELSET=EALL\n")
+            _write_element_rows(f, element_ids[included_rows], connectivity[included_rows])
+        if element_type != "SFMGAX1":
+            bottom = node_ids[edge["bottom_nodes"]]
+            num_edges = len(bottom) - 1
+            edge_ids = np.arange(num_elements + 1, num_elements + num_edges + 1)
+            f.write("*Element, type=SFMGAX1, ELSET=BOTTOM_EDGE\n")
+            _write_element_rows(f, edge_ids, np.column_stack([bottom[:-1], bottom[1:]]))
+            f.write("*Nset, nset=BOTTOM\n")
+            _write_id_lines(f, bottom)
+
+    return {
+        "path": path,
+        "include_path": include_path,
+        "num_nodes": num_nodes,
+        "num_elements": num_elements + num_edges,
+        "bytes": os.path.getsize(path) + os.path.getsize(include_path),
+    }
+
+
+def _grid(num_elements: int, element_type: str, unstructured: bool, rng):
+    """
+    Returns the node coordinates, the element connectivity as node rows, and
+    the rows of the bottom and left nodes and the elements per grid row.
+    """
+    if element_type == "SFMGAX1":
+        # rows of nx segments over (nx + 1) x ny nodes
+        nx = max(math.ceil(math.sqrt(num_elements)), 1)
+        ny = math.ceil(num_elements / nx)
+        cols, rows = nx + 1, ny
+        segments = np.arange(nx * ny)
+        first = segments // nx * cols + segments % nx
+        connectivity = np.column_stack([first, first + 1])
+        row_elements = nx
+    else:
+        num_quads = num_elements if element_type == "CGAX4" else math.ceil(num_elements / 2)
+        nx = max(math.ceil(math.sqrt(num_quads)), 1)
+        ny = math.ceil(num_quads / nx)
+        cols, rows = nx + 1, ny + 1
+        quads = np.arange(nx * ny)
+        n0 = quads // nx * cols + quads % nx
+        n1, n2, n3 = n0 + 1, n0 + cols + 1, n0 + cols
+        if element_type == "CGAX4":
+            connectivity = np.column_stack([n0, n1, n2, n3])
+            row_elements = nx
+        else:
+            # two triangles per quad, split along a random diagonal if unstructured
+            flip = rng.random(len(quads)) < 0.5 if unstructured else np.zeros(len(quads), dtype=bool)
+            first = np.where(flip[:, None], np.column_stack([n0, n1, n3]), np.column_stack([n0, n1, n2]))
+            second = np.where(flip[:, None], np.column_stack([n1, n2, n3]), np.column_stack([n0, n2, n3]))
+            connectivity = np.stack([first, second], axis=1).reshape(-1, 3)
+            row_elements = 2 * nx
+    connectivity = connectivity[:num_elements]
+
+    spacing = 1.0 / max(nx, 1)
+    x, y = np.meshgrid(np.arange(cols) * spacing, np.arange(rows) * spacing)
+    points = np.column_stack([x.ravel(), y.ravel(), np.zeros(cols * rows)])
+    if unstructured:
+        interior = (x > 0) & (x < x.max()) & (y > 0) & (y < y.max())
+        jitter = rng.uniform(-0.25 * spacing, 0.25 * spacing, size=(int(interior.sum()), 2))
+        points[interior.ravel(), :2] += jitter
+
+    edge = {
+        "bottom_nodes": np.arange(cols),
+        "left_nodes": np.arange(rows) * cols,
+        "row_elements": row_elements,
+    }
+    return points, connectivity, edge
+
+
+def _write_rows(f, template: str, rows: np.ndarray) -> None:
+    for start in range(0, len(rows), _CHUNK_ROWS):
+        chunk = rows[start : start + _CHUNK_ROWS]
+        f.write((template * len(chunk)) % tuple(chunk.ravel().tolist()))
+
+
+def _write_element_rows(f, ids: np.ndarray, connectivity: np.ndarray) -> None:
+    template = " %d, " + ", ".join(["%d"] * connectivity.shape[1]) + "\n"
+    _write_rows(f, template, np.column_stack([ids, connectivity]).astype(np.int64))
+
+
+def _write_id_lines(f, ids: np.ndarray, per_line: int = 16) -> None:
+    ids = np.asarray(ids, dtype=np.int64)
+    num_full = len(ids) // per_line
+    _write_rows(f, " " + ", ".join(["%d"] * per_line) + "\n", ids[: num_full * per_line].reshape(-1, per_line))
+    if len(ids) > num_full * per_line:
+        f.write(" " + ", ".join(str(i) for i in ids[num_full * per_line :].tolist()) + "\n")
+
+
+if __name__ == "__main__":
+    info = generate_deck(
+        sys.argv[1],
+        int(float(sys.argv[2])),
+        sys.argv[3] if len(sys.argv) > 3 else "CGAX4",
+        sys.argv[4] if len(sys.argv) > 4 else "structured",
+        int(sys.argv[5]) if len(sys.argv) > 5 else 0,
+    )
+    print(f"{info['num_nodes']} nodes, {info['num_elements']} elements, {info['bytes'] / 1e6:.1f} MB")
@@ -0,0 +1,484 @@
+"""
+Load test of the editing server with simulated clients.
+
+Starts the server in this process and drives simulated ``python-socketio``
+clients, run in worker processes so that they do not compete with the
+server for its interpreter, through editing scripts: node drags (a stream
+of ``update_node`` events with ``isDragging`` ending with the final
+position), bulk deletes, ``sync_mesh`` of the whole mesh and reconnects.
+For every mesh size it reports:
+
+* the latency of edits, from the emit until a client receives the patch
+  holding it, for the sender itself (``echo``) and for the other clients in
+  the same worker process (``fanout``); intermediate drag positions
+  replaced by a later one before the next flush are never broadcast and
+  count as ``coalesced``;
+* the round trip of ``sync_mesh``, for meshes whose JSON is within the
+  message size the server accepts, and the time to reconnect;
+* the events sent and the messages received per second;
+* the CPU time used by the server process, i.e. by everything but the
+  clients.
+
+The client needs ``python-socketio[client]`` (``requests`` and
+``websocket-client``). The server runs in a temporary working directory,
+so its documents do not touch those of a running server.
+
+Usage: python -m benchmarks.load_test [--clients 20] [--sizes 1e3,1e4,1e5]
+    [--duration 20] [--client-processes 2] [--output results.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from abaqus_io import read_deck, write_native
+from benchmarks.generate import generate_deck
+
+# Relative frequency of the client actions
+DEFAULT_WEIGHTS = {"drag": 10, "update": 3, "delete": 1, "sync": 0.2, "reconnect": 0.5}
+# Rate of the intermediate drag positions a client sends, in Hz, like mouse moves
+DRAG_RATE = 60
+# Nodes deleted by one bulk delete
+DELETE_BATCH = 5
+# Largest sync_mesh payload, in bytes of JSON: the server takes messages up to the
+# default max_http_buffer_size of Engine.IO and drops the connection beyond
+MAX_SYNC_BYTES = 1_000_000
+# Seconds a client waits for the acknowledgement of a sync
+SYNC_TIMEOUT = 30
+
+
+# ----------------------------------------------------------------------
+# Server
+# ----------------------------------------------------------------------
+
+
+def start_server(workdir: str, verbose: bool = False):
+    """
+    Starts the server on a free local port, with `workdir` as its working
+    directory; returns its URL and a function stopping it. The request log
+    is only shown if `verbose`.
+    """
+    from werkzeug.serving import make_server
+
+    if not verbose:
+        logging.getLogger("werkzeug").setLevel(logging.CRITICAL)
+    os.chdir(workdir)
+    import app
+
+    server = make_server("127.0.0.1", 0, app.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, name="load-test-server", daemon=True)
+    thread.start()
+
+    def stop():
+        server.shutdown()
+        app.jobs.shutdown()
+        app.documents.stop()
+
+    return f"http://127.0.0.1:{server.server_port}", stop
+
+
+def load_mesh(url: str, doc_id: str, num_elements: int, workdir: str) -> dict:
+    """
+    Generates a deck and loads it into a document, as a native project as
+    the server would not find the deck it includes; returns its summary.
+    """
+    import requests
+
+    deck = os.path.join(workdir, f"mesh_{num_elements}.inp")
+    generate_deck(deck, num_elements, "CGAX4", "unstructured")
+    path = os.path.join(workdir, f"mesh_{num_elements}.zip")
+    write_native(path, read_deck(deck))
+    with open(path, "rb") as f:
+        response = requests.post(
+            f"{url}/load",
+            params={"doc": doc_id, "filename": os.path.basename(path)},
+            data=f,
+            headers={"Content-Type": "application/octet-stream"},
+        )
+    response.raise_for_status()
+    job_id = response.json()["job"]["id"]
+    while True:
+        job = requests.get(f"{url}/jobs/{job_id}").json()
+        if job["status"] not in ("queued", "running"):
+            break
+        time.sleep(0.1)
+    if job["status"] != "done":
+        raise RuntimeError(f"Loading the mesh failed: {job['error']}")
+    return job["result"]
+
+
+# ----------------------------------------------------------------------
+# Clients
+# ----------------------------------------------------------------------
+
+
+class _Timings:
+    """The send times and the measurements of the clients of a worker process."""
+
+    def __init__(self):
+        # emit time of every node position and deleted node, by key
+        self.sent: dict = {}
+        self.latencies: dict[str, list[float]] = {"echo": [], "fanout": [], "sync": [], "reconnect": []}
+        self.events_sent = 0
+        self.messages_received = 0
+        self.matched: set = set()
+        self.errors: list[str] = []
+        self.lock = threading.Lock()
+
+    def send(self, keys) -> None:
+        now = time.perf_counter()
+        with self.lock:
+            self.events_sent += 1
+            for key in keys:
+                self.sent[key] = (now, threading.get_ident())
+
+    def receive(self, keys, receiver: int) -> None:
+        now = time.perf_counter()
+        with self.lock:
+            for key in keys:
+                sent = self.sent.get(key)
+                if sent is not None:
+                    start, sender = sent
+                    self.latencies["echo" if sender == receiver else "fanout"].append(now - start)
+                    self.matched.add(key)
+
+
+class SimulatedClient:
+    """A Socket.IO client running an editing script in its own thread.
+
+    Parameters
+    ----------
+    url : str
+        The server.
+    doc_id : str
+        The document the client edits.
+    node_ids : list[int]
+        The nodes the client drags and deletes; those of the clients of a
+        run do not overlap, so deleted nodes are only ever deleted once.
+    timings : _Timings
+        Shared by the clients of a worker process.
+    mesh : dict, optional
+        The mesh sent by ``sync_mesh``; without it the client does not sync.
+    """
+
+    def __init__(self, url, doc_id, node_ids, timings, weights, seed, think_time, mesh=None):
+        import socketio
+
+        self.url = url
+        self.doc_id = doc_id
+        self.timings = timings
+        self.weights = dict(weights)
+        if mesh is None:
+            self.weights.pop("sync", None)
+        self.mesh = mesh
+        self.think_time = think_time
+        self.rng = random.Random(seed)
+        half = len(node_ids) // 2
+        self.drag_nodes = node_ids[:half] or node_ids
+        self.delete_pool = node_ids[half:]
+        self.synced = threading.Event()
+        self.thread: threading.Thread | None = None
+        self.client = socketio.Client(reconnection=False, handle_sigint=False)
+        self.client.on("*", self._on_message)
+
+    def connect(self) -> None:
+        self.client.connect(f"{self.url}?doc={self.doc_id}", transports=["websocket"])
+
+    def start(self, deadline: float) -> None:
+        self.thread = threading.Thread(target=self._run, args=(deadline,), daemon=True)
+        self.thread.start()
+
+    def _on_message(self, event, data=None):
+        with self.timings.lock:
+            self.timings.messages_received += 1
+        if event == "mesh_patch":
+            keys = [("node", node["id"], node["x"], node["y"]) for node in data.get("nodes", [])]
+            keys += [("removed", node_id) for node_id in data.get("removed_nodes", [])]
+            self.timings.receive(keys, self.thread.ident if self.thread else None)
+        elif event == "mesh_version":
+            # the acknowledgement of a sync, whose state went to the other clients
+            self.synced.set()
+
+    def _run(self, deadline: float) -> None:
+        actions, weights = zip(*self.weights.items())
+        while time.perf_counter() < deadline:
+            action = self.rng.choices(actions, weights)[0]
+            try:
+                getattr(self, f"_{action}")()
+            except Exception as e:  # count and go on, like a user retrying
+                self.timings.errors.append(f"{action}: {e}")
+            time.sleep(self.rng.expovariate(1 / self.think_time))
+
+    def _emit_position(self, node_id: int, dragging: bool) -> None:
+        # random positions keep every key unique
+        x, y = self.rng.random(), self.rng.random()
+        self.timings.send([("node", node_id, x, y)])
+        self.client.emit("update_node", {"id": node_id, "x": x, "y": y, "isDragging": dragging})
+
+    def _drag(self) -> None:
+        node_id = self.rng.choice(self.drag_nodes)
+        for _ in range(self.rng.randint(10, 60)):
+            self._emit_position(node_id, True)
+            time.sleep(1 / DRAG_RATE)
+        self._emit_position(node_id, False)
+
+    def _update(self) -> None:
+        self._emit_position(self.rng.choice(self.drag_nodes), False)
+
+    def _delete(self) -> None:
+        if len(self.delete_pool) < DELETE_BATCH:
+            return
+        ids = [self.delete_pool.pop() for _ in range(DELETE_BATCH)]
+        self.timings.send([("removed", node_id) for node_id in ids])
+        self.client.emit("delete_nodes_bulk", {"ids": ids})
+
+    def _sync(self) -> None:
+        self.synced.clear()
+        start = time.perf_counter()
+        self.timings.send([])
+        self.client.emit("sync_mesh", {"mesh": self.mesh, "connections": []})
+        if not self.synced.wait(SYNC_TIMEOUT):
+            raise TimeoutError(f"no mesh_version within {SYNC_TIMEOUT} s")
+        with self.timings.lock:
+            self.timings.latencies["sync"].append(time.perf_counter() - start)
+
+    def _reconnect(self) -> None:
+        self.client.disconnect()
+        start = time.perf_counter()
+        self.connect()
+        with self.timings.lock:
+            self.timings.latencies["reconnect"].append(time.perf_counter() - start)
+
+
+def run_clients(url, doc_id, partitions, duration, weights, seed, think_time) -> dict:
+    """
+    Runs clients in a worker process, one per node partition, for `duration`
+    seconds; returns their measurements. The clients only sync meshes whose
+    JSON fits in `MAX_SYNC_BYTES`.
+    """
+    import requests
+
+    mesh = None
+    if weights.get("sync"):
+        state = requests.get(f"{url}/last_mesh", params={"doc": doc_id}).json()
+        mesh = {key: state[key] for key in ("nodes", "elements", "node_sets", "element_sets", "surface_sets")}
+        if len(json.dumps({"mesh": mesh, "connections": []})) > MAX_SYNC_BYTES:
+            mesh = None
+
+    timings = _Timings()
+    clients = [
+        SimulatedClient(url, doc_id, node_ids, timings, weights, seed + i, think_time, mesh)
+        for i, node_ids in enumerate(partitions)
+    ]
+    for client in clients:
+        client.connect()
+    start = time.perf_counter()
+    deadline = start + duration
+    for client in clients:
+        client.start(deadline)
+    for client in clients:
+        client.thread.join()
+    window = (start, time.perf_counter())
+    # let the last patches arrive
+    time.sleep(1)
+    for client in clients:
+        client.client.disconnect()
+
+    node_sends = sum(key[0] == "node" for key in timings.sent)
+    node_matched = sum(key[0] == "node" for key in timings.matched)
+    return {
+        "window": window,
+        "latencies": timings.latencies,
+        "events_sent": timings.events_sent,
+        "messages_received": timings.messages_received,
+        "coalesced": node_sends - node_matched,
+        "unmatched_deletes": sum(key[0] == "removed" for key in timings.sent)
+        - sum(key[0] == "removed" for key in timings.matched),
+        "errors": timings.errors[:20],
+        "num_errors": len(timings.errors),
+    }
+
+
+# ----------------------------------------------------------------------
+# Runs
+# ----------------------------------------------------------------------
+
+
+class _CpuSampler:
+    """Samples the CPU time of this process, to measure it over a window given afterwards."""
+
+    INTERVAL = 0.05
+
+    def __init__(self):
+        self.samples: list[tuple[float, float]] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _sample(self) -> None:
+        while True:
+            self.samples.append((time.perf_counter(), time.process_time()))
+            if self._stop.wait(self.INTERVAL):
+                return
+
+    def between(self, start: float, end: float) -> float:
+        """Returns the CPU seconds used between two `time.perf_counter` values."""
+        times, cpu = np.array(self.samples).T
+        return float(np.interp(end, times, cpu) - np.interp(start, times, cpu))
+
+
+def percentiles(values) -> dict:
+    """Returns the count, the 50th, 90th and 99th percentiles and the maximum, in milliseconds."""
+    if not values:
+        return {"count": 0}
+    values = np.asarray(values) * 1e3
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {"count": len(values), "p50": p50, "p90": p90, "p99": p99, "max": float(values.max())}
+
+
+def run_size(
+    url: str,
+    workdir: str,
+    num_elements: int,
+    num_clients: int = 20,
+    duration: float = 20.0,
+    client_processes: int = 2,
+    weights: dict = DEFAULT_WEIGHTS,
+    think_time: float = 0.2,
+    seed: int = 0,
+    pool: ProcessPoolExecutor | None = None,
+) -> dict:
+    """Loads a mesh of `num_elements` and runs the clients against it; returns the report."""
+    doc_id = f"load-{num_elements}"
+    summary = load_mesh(url, doc_id, num_elements, workdir)
+
+    import requests
+
+    node_ids = [node["id"] for node in requests.get(f"{url}/last_mesh", params={"doc": doc_id}).json()["nodes"]]
+    random.Random(seed).shuffle(node_ids)
+    partitions = [node_ids[i::num_clients] for i in range(num_clients)]
+    groups = [partitions[i::client_processes] for i in range(client_processes) if partitions[i::client_processes]]
+
+    sampler = _CpuSampler()
+    futures = [
+        pool.submit(run_clients, url, doc_id, group, duration, weights, seed + 1000 * i, think_time)
+        for i, group in enumerate(groups)
+    ]
+    with sampler:
+        results = [future.result() for future in futures]
+    # the clients connect and fetch the mesh first, the CPU time counts while they edit
+    window = (min(result["window"][0] for result in results), max(result["window"][1] for result in results))
+    cpu, wall = sampler.between(*window), window[1] - window[0]
+
+    latencies = {kind: sum((result["latencies"][kind] for result in results), []) for kind in results[0]["latencies"]}
+    events = sum(result["events_sent"] for result in results)
+    messages = sum(result["messages_received"] for result in results)
+    return {
+        "num_nodes": summary["num_nodes"],
+        "num_elements": summary["num_elements"],
+        "clients": num_clients,
+        "duration": wall,
+        "events_sent": events,
+        "events_per_second": events / wall,
+        "messages_received": messages,
+        "messages_per_second": messages / wall,
+        "server_cpu_seconds": cpu,
+        "server_cpu_percent": 100 * cpu / wall,
+        "latency_ms": {kind: percentiles(values) for kind, values in latencies.items()},
+        "coalesced_positions": sum(result["coalesced"] for result in results),
+        "unmatched_deletes": sum(result["unmatched_deletes"] for result in results),
+        "errors": sum(result["num_errors"] for result in results),
+        "error_samples": sum((result["errors"] for result in results), [])[:5],
+    }
+
+
+def format_report(report: dict) -> str:
+    lines = [
+        f"{report['num_elements']} elements, {report['num_nodes']} nodes, {report['clients']} clients, "
+        f"{report['duration']:.1f} s",
+        f"  sent {report['events_per_second']:.0f} events/s, received {report['messages_per_second']:.0f} messages/s, "
+        f"server CPU {report['server_cpu_percent']:.0f} %",
+    ]
+    for kind, stats in report["latency_ms"].items():
+        if stats["count"]:
+            lines.append(
+                f"  {kind:<10} n={stats['count']:<7} p50={stats['p50']:8.1f} ms  p90={stats['p90']:8.1f} ms  "
+                f"p99={stats['p99']:8.1f} ms  max={stats['max']:8.1f} ms"
+            )
+    lines.append(
+        f"  {report['coalesced_positions']} drag positions coalesced, {report['unmatched_deletes']} deletes "
+        f"without patch, {report['errors']} errors"
+    )
+    return "\n".join(lines)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load_test", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--sizes", default="1e3,1e4,1e5", help="numbers of elements, e.g. 1e3,1e6")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of editing per size")
+    parser.add_argument("--client-processes", type=int, default=2)
+    parser.add_argument("--think-time", type=float, default=0.2, help="mean pause between actions, in seconds")
+    parser.add_argument(
+        "--weights", type=json.loads, default=DEFAULT_WEIGHTS, help=f"JSON, by default {json.dumps(DEFAULT_WEIGHTS)}"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the reports as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show the output of the server")
+    args = parser.parse_args(argv)
+
+    out = sys.stdout
+    output = os.path.abspath(args.output) if args.output else None
+    context = multiprocessing.get_context(
+        "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    )
+    reports = []
+    with tempfile.TemporaryDirectory() as workdir, contextlib.ExitStack() as stack:
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(open(os.devnull, "w")))
+        pool = stack.enter_context(ProcessPoolExecutor(args.client_processes, mp_context=context))
+        url, stop = start_server(workdir, args.verbose)
+        stack.callback(stop)
+        for size in args.sizes.split(","):
+            report = run_size(
+                url,
+                workdir,
+                int(float(size)),
+                args.clients,
+                args.duration,
+                args.client_processes,
+                args.weights,
+                args.think_time,
+                args.seed,
+                pool,
+            )
+            reports.append(report)
+            print(format_report(report), file=out, flush=True)
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(reports, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Times the deck I/O and mesh conversion paths over synthetic decks, see
+`benchmarks.generate`, and compares the timings against a JSON baseline.
+
+Benchmarks, each the best of ``--repeat`` runs:
+
+* ``read_deck``: parsing the deck and its include, without validation;
+* ``validate``: ``Mesh._validate_data`` of the parsed mesh;
+* ``write_buffer``: formatting the mesh as a deck;
+* ``mesh_to_dict`` and ``dict_to_mesh``: the JSON conversions of the
+  server, up to ``--max-dict-elements`` as they hold a dict per node;
+* ``unique_cat``: concatenating the element blocks split in 64 pieces.
+
+The server conversions are imported from ``app``, which creates its
+``temp`` directory in the working directory.
+
+Usage:
+
+    python -m benchmarks.suite run [--sizes 1e3,1e4,1e5] [--types CGAX3,CGAX4,SFMGAX1]
+        [--layouts structured,unstructured] [--repeat 3] [--output results.json]
+        [--baseline baseline.json] [--threshold 0.2] [--min-seconds 0.005] [--data-dir DIR]
+    python -m benchmarks.suite compare baseline.json results.json [--threshold 0.2]
+
+Both exit with status 1 when a benchmark is slower than its baseline by
+more than the threshold, e.g. 0.2 for 20 %, and by more than
+``--min-seconds``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from abaqus_io import ElementBlock, read_deck, write_buffer
+from benchmarks.generate import ELEMENT_TYPES, LAYOUTS, generate_deck
+
+BENCHMARKS = ("read_deck", "validate", "write_buffer", "mesh_to_dict", "dict_to_mesh", "unique_cat")
+# Pieces every element block is split into for unique_cat
+_UNIQUE_CAT_PIECES = 64
+
+
+class _Discard:
+    """A text file dropping what is written, so only the formatting is timed."""
+
+    def write(self, text: str) -> int:
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+def _best_of(repeat: int, fn) -> tuple[float, list[float]]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times), times
+
+
+def run_case(
+    path: str, info: dict, repeat: int = 3, max_dict_elements: int = 10**6, benchmarks=BENCHMARKS
+) -> dict[str, dict]:
+    """Runs the benchmarks over one generated deck; returns the timings by benchmark."""
+    results = {}
+
+    def record(name, fn):
+        if name in benchmarks:
+            seconds, times = _best_of(repeat, fn)
+            results[name] = {"seconds": seconds, "times": times}
+
+    mesh = read_deck(path, validate_flag=False)
+    record("read_deck", lambda: read_deck(path, validate_flag=False))
+    record("validate", mesh._validate_data)
+    record("write_buffer", lambda: write_buffer(_Discard(), mesh))
+
+    if info["num_elements"] <= max_dict_elements and {"mesh_to_dict", "dict_to_mesh"} & set(benchmarks):
+        from app import dict_to_mesh, mesh_to_dict
+
+        mesh_dict = mesh_to_dict(mesh)
+        record("mesh_to_dict", lambda: mesh_to_dict(mesh))
+        record("dict_to_mesh", lambda: dict_to_mesh(mesh_dict))
+        del mesh_dict
+
+    pieces = [
+        ElementBlock(block.element_type, ids, connectivity)
+        for block in mesh.cells
+        for ids, connectivity in zip(
+            np.array_split(block.ids, _UNIQUE_CAT_PIECES), np.array_split(block.connectivity, _UNIQUE_CAT_PIECES)
+        )
+    ]
+    record("unique_cat", lambda: ElementBlock.unique_cat(pieces))
+
+    for result in results.values():
+        result.update(num_nodes=info["num_nodes"], num_elements=info["num_elements"], deck_bytes=info["bytes"])
+    return results
+
+
+def run(
+    sizes, element_types=ELEMENT_TYPES, layouts=LAYOUTS, repeat: int = 3, data_dir: str | None = None, **kwargs
+) -> dict:
+    """
+    Generates the decks, kept in `data_dir` if given, and runs the
+    benchmarks over each; returns the results keyed by
+    ``benchmark/element_type/layout/num_elements``.
+    """
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "cpus": os.cpu_count(),
+        },
+        "repeat": repeat,
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory() as tmpdir:
+        directory = data_dir or tmpdir
+        os.makedirs(directory, exist_ok=True)
+        for num_elements in sizes:
+            for element_type in element_types:
+                for layout in layouts:
+                    case = f"{element_type}/{layout}/{num_elements}"
+                    path = os.path.join(directory, f"{element_type}_{layout}_{num_elements}.inp")
+                    info = generate_deck(path, num_elements, element_type, layout)
+                    print(f"{case}: {info['num_nodes']} nodes, {info['bytes'] / 1e6:.1f} MB", file=sys.stderr)
+                    for name, result in run_case(path, info, repeat, **kwargs).items():
+                        report["results"][f"{name}/{case}"] = result
+                        print(f"  {name:<14} {result['seconds']:10.4f} s", file=sys.stderr)
+                    if data_dir is None:
+                        os.remove(info["path"])
+                        os.remove(info["include_path"])
+    return report
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.2, min_seconds: float = 0.005) -> list[dict]:
+    """
+    Compares two reports of `run`. Every benchmark of either gets a row with
+    both timings, their ratio and a status: ``regression`` when slower by
+    more than `threshold`, ``improvement`` when faster by as much, ``ok``,
+    or ``new`` and ``missing`` when it is in only one of them. Differences
+    below `min_seconds` are timer noise and always ``ok``.
+    """
+    rows = []
+    base_results, current_results = baseline["results"], current["results"]
+    for key in sorted(set(base_results) | set(current_results)):
+        base, now = base_results.get(key), current_results.get(key)
+        row = {"key": key, "baseline": base and base["seconds"], "current": now and now["seconds"], "ratio": None}
+        if base is None:
+            row["status"] = "new"
+        elif now is None:
+            row["status"] = "missing"
+        else:
+            row["ratio"] = now["seconds"] / base["seconds"] if base["seconds"] > 0 else float("inf")
+            if abs(now["seconds"] - base["seconds"]) < min_seconds:
+                row["status"] = "ok"
+            elif row["ratio"] > 1 + threshold:
+                row["status"] = "regression"
+            elif row["ratio"] < 1 / (1 + threshold):
+                row["status"] = "improvement"
+            else:
+                row["status"] = "ok"
+        rows.append(row)
+    return rows
+
+
+def format_comparison(rows: list[dict]) -> str:
+    lines = [f"{'benchmark':<48} {'baseline':>10} {'current':>10} {'ratio':>7}  status"]
+    for row in rows:
+        base = "" if row["baseline"] is None else f"{row['baseline']:.4f}"
+        now = "" if row["current"] is None else f"{row['current']:.4f}"
+        ratio = "" if row["ratio"] is None else f"{row['ratio']:.2f}"
+        lines.append(f"{row['key']:<48} {base:>10} {now:>10} {ratio:>7}  {row['status']}")
+    return "\n".join(lines)
+
+
+def _parse_list(text: str) -> list[str]:
+    return [item.strip() for item in text.split(",") if item.strip()]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite", description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--sizes", default="1e3,1e4,1e5", help="numbers of elements, e.g. 1e3,1e6")
+    run_parser.add_argument("--types", default=",".join(ELEMENT_TYPES))
+    run_parser.add_argument("--layouts", default=",".join(LAYOUTS))
+    run_parser.add_argument("--benchmarks", default=",".join(BENCHMARKS))
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--max-dict-elements", type=float, default=1e6)
+    run_parser.add_argument("--data-dir", help="keep the generated decks here")
+    run_parser.add_argument("--output", help="write the results as JSON, e.g. a new baseline")
+    run_parser.add_argument("--baseline", help="compare the results against this JSON baseline")
+    run_parser.add_argument("--threshold", type=float, default=0.2)
+    run_parser.add_argument("--min-seconds", type=float, default=0.005, help="ignore smaller differences")
+
+    compare_parser = commands.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2)
+    compare_parser.add_argument("--min-seconds", type=float, default=0.005, help="ignore smaller differences")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        current = run(
+            [int(float(size)) for size in _parse_list(args.sizes)],
+            _parse_list(args.types),
+            _parse_list(args.layouts),
+            repeat=args.repeat,
+            data_dir=args.data_dir,
+            max_dict_elements=int(args.max_dict_elements),
+            benchmarks=_parse_list(args.benchmarks),
+        )
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(current, f, indent=1)
+        if not args.baseline:
+            return 0
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+
+    rows = compare(baseline, current, args.threshold, args.min_seconds)
+    print(format_comparison(rows))
+    regressions = [row for row in rows if row["status"] == "regression"]
+    if regressions:
+        print(f"{len(regressions)} regressions beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
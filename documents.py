@@ -0,0 +1,601 @@
+"""
+Registry of the mesh documents hosted by one server.
+
+Every document has its own mesh, connections, edit log and checkpoints, kept
+in a directory of its own, and its own Socket.IO room. Documents are loaded
+on first use. When the loaded documents exceed a memory budget, the least
+recently used ones without viewers are evicted: their state is written to a
+native project in their directory, which is memory-mapped back on the next
+use.
+
+Checkpoints and evictions write the mesh to new files named by the sequence
+number of the last edit they cover, e.g. ``checkpoint.12.native``; the files
+of clean sections are shared with the previous checkpoint. Only once they are
+complete does ``mesh_info.json`` switch to them, atomically, together with
+that sequence number; the files of the previous checkpoint are removed then.
+So after a crash the checkpoint recorded there is intact and the edits logged
+after it replay onto exactly the state they were made on.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+from abaqus_io import read_deck, split_deck_includes, write_split_deck, Mesh, SpatialIndex, MeshTiler
+from abaqus_io import is_native, read_native, write_native
+from abaqus_io.mesh_io import SECTIONS
+from edit_log import EditLog, Checkpointer
+from metrics import REGISTRY
+
+# Document IDs are used in paths and room names
+DOCUMENT_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+# Name of the checkpoint files, followed by the sequence number they cover
+CHECKPOINT_NAME = "checkpoint"
+
+# Estimated bytes per entry of a list of Python ints: the slot and the int
+_LIST_INT_BYTES = 36
+# Estimated bytes per entry of the node ID lookup dict
+_DICT_ENTRY_BYTES = 100
+
+SAVE_SECONDS = REGISTRY.histogram(
+    "mesh_save_duration_seconds", "Time spent writing a mesh to disk, by checkpoint, eviction or export.", ("kind",)
+)
+# Upper bounds of the parse throughput buckets, in MB/s
+PARSE_THROUGHPUT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+PARSE_THROUGHPUT = REGISTRY.histogram(
+    "deck_parse_throughput_mb_per_second",
+    "Abaqus decks parsed, by megabytes per second.",
+    buckets=PARSE_THROUGHPUT_BUCKETS,
+)
+
+
+def observe_parse_throughput(num_bytes: int, seconds: float) -> None:
+    """Records the throughput of a parsed deck."""
+    if seconds > 0:
+        PARSE_THROUGHPUT.observe(num_bytes / 1e6 / seconds)
+
+
+class Document:
+    """The state of one mesh document.
+
+    All attributes are guarded by `lock`. While the document is not loaded
+    (see `load` and `unload`) the mesh and its indices are None; the
+    version, the edit log and the viewers survive eviction.
+
+    Parameters
+    ----------
+    doc_id : str
+        The document ID.
+    directory : str
+        Holds ``mesh_info.json`` (the last checkpoint), ``edit_log.jsonl``
+        and the mesh files in ``mesh_files``.
+    apply_edit : callable
+        Called as ``apply_edit(document, record)`` to replay logged edits.
+    start_thread : callable, optional
+        Starts background loops, see `Checkpointer`.
+    """
+
+    def __init__(self, doc_id: str, directory: str, apply_edit, start_thread=None):
+        self.id = doc_id
+        self.directory = directory
+        self.info_path = os.path.join(directory, "mesh_info.json")
+        self.mesh_dir = os.path.join(directory, "mesh_files")
+        os.makedirs(self.mesh_dir, exist_ok=True)
+        self._apply_edit = apply_edit
+
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.mesh: Mesh | None = None
+        self.connections: list = []
+        # path of the deck or native project the mesh is checkpointed to
+        self.filepath: str | None = None
+        # version of the state, increased by every change sent to the viewers
+        self.version = 0
+
+        # planar index of the nodes, node ID lookup and viewport tiles, built on demand
+        self.spatial_index: SpatialIndex | None = None
+        self.node_index: dict | None = None
+        self.mesh_tiler: MeshTiler | None = None
+
+        # latest drag position of every node moved since the last flush, and
+        # the sessions that moved them
+        self.pending_drag_moves: dict = {}
+        self.pending_drag_sources: set = set()
+        self.drag_moves_queued = threading.Event()
+        self.drag_flusher_started = False
+
+        # serialized payloads of the version `payload_cache_version`, by format
+        self.payload_cache: dict = {}
+        self.payload_cache_version = None
+
+        # the Socket.IO sessions viewing the document, and the requests using it
+        self.viewers: set = set()
+        self.pins = 0
+
+        self.edit_log = EditLog(os.path.join(directory, "edit_log.jsonl"))
+        self.checkpointer = Checkpointer(self.edit_log, self.lock, self.snapshot, start_thread=start_thread)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "evicted"
+        return f"<Document: {self.id}, {state}, version={self.version}, #viewers={len(self.viewers)}>"
+
+    @property
+    def room(self) -> str:
+        """The Socket.IO room of the viewers."""
+        return f"doc:{self.id}"
+
+    # ------------------------------------------------------------------
+    # Loading and eviction
+    # ------------------------------------------------------------------
+
+    def load(self) -> None:
+        """
+        Restores the last checkpoint and replays the edits logged after it.
+        Does nothing if the document is loaded. Called with `lock` held.
+
+        Raises
+        ------
+        IOError, ValueError
+            If the checkpoint cannot be read or an edit not replayed. The
+            document stays unloaded, and its checkpoint and log untouched.
+        """
+        if self.loaded:
+            return
+        self.loaded = True
+        if not os.path.exists(self.info_path):
+            return
+        try:
+            with open(self.info_path, "r") as f:
+                mesh_info = json.load(f)
+            self.filepath = mesh_info.get("filepath")
+            self.connections = mesh_info.get("connections", [])
+            checkpoint_seq = mesh_info.get("seq", 0)
+            self.edit_log.last_seq = max(self.edit_log.last_seq, checkpoint_seq)
+            if mesh_info.get("has_mesh", True) and self.filepath:
+                if not os.path.exists(self.filepath):
+                    raise FileNotFoundError(f"The checkpoint {self.filepath} does not exist")
+                print(f"[DEBUG] Loading mesh of document {self.id} from {self.filepath}")
+                if is_native(self.filepath):
+                    self.mesh = read_native(self.filepath)
+                else:
+                    start = time.perf_counter()
+                    self.mesh = read_deck(self.filepath)
+                    observe_parse_throughput(os.path.getsize(self.filepath), time.perf_counter() - start)
+                    # the files on disk are up to date; the next checkpoint
+                    # writes everything anyway if they are not a split deck
+                    self.mesh.clear_dirty()
+            replayed = 0
+            for record in self.edit_log.replay(after=checkpoint_seq):
+                self._apply_edit(self, record)
+                replayed += 1
+            if replayed:
+                print(f"[DEBUG] Replayed {replayed} edits from {self.edit_log.path}")
+        except (json.JSONDecodeError, IOError, ValueError) as e:
+            # an empty document would replace the checkpoint and drop the log
+            # on its next save, leave them for another attempt instead
+            self.loaded = False
+            self.mesh = None
+            self.filepath = None
+            self.connections = []
+            self.invalidate_node_indices()
+            print(f"[ERROR] Failed to load document {self.id}: {e}")
+            raise
+
+    def unload(self) -> None:
+        """
+        Writes the state to the native cache and drops it from memory.
+
+        Called with `checkpointer.paused()` and `lock` held. Pending drag
+        positions are dropped, like those of a disconnected client.
+        """
+        if not self.loaded:
+            return
+        previous = filepath = self.filepath
+        if self.mesh is not None:
+            native = filepath is not None and os.path.exists(filepath) and is_native(filepath)
+            if self.edit_log.num_records or self.mesh.dirty_sections or not native:
+                with SAVE_SECONDS.time(kind="evict"):
+                    filepath = self._write_checkpoint_files(
+                        self.mesh, self.connections, self.edit_log.last_seq, previous, native=True
+                    )
+        self.write_info(
+            {
+                "filepath": filepath,
+                "has_mesh": self.mesh is not None,
+                "connections": self.connections,
+                "seq": self.edit_log.last_seq,
+            }
+        )
+        self.filepath = filepath
+        self.edit_log.reset()
+        self.remove_checkpoint_files(previous, filepath)
+
+        self.loaded = False
+        self.mesh = None
+        self.connections = []
+        self.invalidate_node_indices()
+        self.pending_drag_moves.clear()
+        self.pending_drag_sources.clear()
+        self.payload_cache.clear()
+        self.payload_cache_version = None
+        print(f"[DEBUG] Document {self.id} evicted to {self.filepath}")
+
+    def memory_usage(self) -> int:
+        """
+        Estimates the bytes held by the loaded state: the mesh, its indices
+        and the cached payloads. Memory-mapped arrays count in full.
+        """
+        size = sum(len(payload) for payload in list(self.payload_cache.values()) if isinstance(payload, bytes))
+        mesh = self.mesh
+        if mesh is None:
+            return size
+        size += mesh.points.nbytes + len(mesh.point_ids) * _LIST_INT_BYTES
+        size += sum(block.ids.nbytes + block.connectivity.nbytes for block in mesh.cells)
+        for sets in (mesh.node_sets, mesh.elem_sets):
+            size += sum(len(ids) for ids in sets.values()) * _LIST_INT_BYTES
+        if self.node_index is not None:
+            size += len(self.node_index) * _DICT_ENTRY_BYTES
+        if self.spatial_index is not None:
+            # the planar coordinates and the cell order
+            size += len(self.spatial_index) * 24
+        if self.mesh_tiler is not None:
+            # the element centroids and the node rows of the connectivity
+            size += self.mesh_tiler.num_elements * 24 + sum(block.connectivity.size * 8 for block in mesh.cells)
+        return size
+
+    # ------------------------------------------------------------------
+    # Checkpoints
+    # ------------------------------------------------------------------
+
+    def write_info(self, mesh_info: dict) -> None:
+        """Atomically replaces the checkpoint information file."""
+        tmp_path = self.info_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(mesh_info, f)
+        os.replace(tmp_path, self.info_path)
+
+    def snapshot(self):
+        """
+        Copies the state for a checkpoint and returns the function writing it.
+
+        Called with `lock` held. Only the dirty deck sections are written, so
+        only their data is copied, and they are cleared here, so edits made
+        while the checkpoint is being written mark them dirty again for the
+        next one. The checkpoint is written in the format of the current one,
+        to new files, see the module documentation.
+        """
+        mesh = self.mesh
+        previous = self.filepath
+        filepath = previous or os.path.join(self.mesh_dir, "mesh.inp")
+        dirty = set(mesh.dirty_sections) if mesh else set()
+        mesh_copy = None
+        if mesh:
+            mesh_copy = mesh.copy(sections=self._written_sections(mesh, filepath, native=is_native(filepath)))
+            mesh.clear_dirty()
+        connections_copy = json.loads(json.dumps(self.connections))
+
+        def write(seq):
+            target = filepath
+            try:
+                with SAVE_SECONDS.time(kind="checkpoint"):
+                    if mesh_copy is not None:
+                        target = self._write_checkpoint_files(
+                            mesh_copy, connections_copy, seq, filepath, native=is_native(filepath)
+                        )
+                        print(f"[DEBUG] Checkpoint {seq}: written to {target}")
+                self.write_info(
+                    {
+                        "filepath": target,
+                        "has_mesh": mesh_copy is not None,
+                        "connections": connections_copy,
+                        "seq": seq,
+                    }
+                )
+            except Exception:
+                with self.lock:
+                    # without arguments mark_dirty would mark every section
+                    if self.mesh is mesh and dirty:
+                        mesh.mark_dirty(*dirty)
+                raise
+            with self.lock:
+                if self.filepath == previous:
+                    self.filepath = target
+            self.remove_checkpoint_files(filepath, target)
+
+        return write
+
+    def _write_checkpoint_files(self, mesh: Mesh, connections: list, seq: int, previous: str | None, native: bool):
+        """
+        Writes the mesh to new checkpoint files, as a native project or a
+        split deck, and returns their path. The files of `previous` are
+        shared for the clean sections when it is in the same format; they
+        are never modified.
+        """
+        suffix = ".native" if native else ".inp"
+        for n in itertools.count():
+            path = os.path.join(self.mesh_dir, f"{CHECKPOINT_NAME}.{seq}{f'-{n}' if n else ''}{suffix}")
+            # an eviction may cover the same edits as the checkpoint before it
+            if previous is None or os.path.abspath(path) != os.path.abspath(previous):
+                break
+        # left by a checkpoint interrupted before it was recorded
+        _remove_path(path)
+        if native:
+            base = _native_base(previous)
+            sections = mesh.dirty_sections if base else None
+            write_native(path, mesh, extra={"connections": connections}, sections=sections, base=base)
+        else:
+            write_split_deck(path, mesh, base=previous)
+        return path
+
+    @staticmethod
+    def _written_sections(mesh: Mesh, previous: str | None, native: bool) -> set[str]:
+        """
+        Returns the sections `_write_checkpoint_files` writes rather than
+        shares from `previous`: the dirty ones and those `previous` lacks.
+        """
+        if native:
+            return set(mesh.dirty_sections) if _native_base(previous) else set(SECTIONS)
+        includes = split_deck_includes(previous) if previous else None
+        if includes is None:
+            return set(SECTIONS)
+        return set(mesh.dirty_sections) | {section for section, path in includes.items() if not path.exists()}
+
+    def remove_checkpoint_files(self, previous: str | None, current: str | None) -> None:
+        """
+        Removes the files of the previous checkpoint that the current one
+        does not share. Files outside the mesh directory are never removed.
+        """
+        if not previous or os.path.abspath(previous) == os.path.abspath(current or ""):
+            return
+        if os.path.dirname(os.path.abspath(previous)) != os.path.abspath(self.mesh_dir):
+            return
+        shared = {os.path.abspath(path) for path in (split_deck_includes(current) or {}).values()}
+        paths = [previous, *(split_deck_includes(previous) or {}).values()]
+        try:
+            for path in paths:
+                if os.path.abspath(path) not in shared:
+                    # a mesh memory-mapped from them keeps its data
+                    _remove_path(path)
+        except OSError as e:  # the checkpoint is recorded, only disk space is lost
+            print(f"[ERROR] Failed to remove the previous checkpoint {previous}: {e}")
+
+    # ------------------------------------------------------------------
+    # Indices and payloads
+    # ------------------------------------------------------------------
+
+    def get_spatial_index(self):
+        """Returns the spatial index of the mesh, building it if needed."""
+        if not self.mesh:
+            return None
+        if self.spatial_index is None or len(self.spatial_index) != len(self.mesh.points):
+            self.spatial_index = SpatialIndex(self.mesh.points[:, :2])
+        return self.spatial_index
+
+    def find_node(self, node_id):
+        """Returns the row of a node in the mesh arrays, or None if there is no such node."""
+        if self.node_index is None or len(self.node_index) != len(self.mesh.point_ids):
+            self.node_index = {int(pid): i for i, pid in enumerate(self.mesh.point_ids)}
+        return self.node_index.get(node_id)
+
+    def get_mesh_tiler(self):
+        """Returns the viewport tiles of the mesh, building them if needed."""
+        if not self.mesh:
+            return None
+        index = self.get_spatial_index()
+        # the tiler shares the spatial index, so it follows moved and added nodes
+        if self.mesh_tiler is None or self.mesh_tiler.node_index is not index:
+            self.mesh_tiler = MeshTiler(self.mesh, node_index=index)
+        return self.mesh_tiler
+
+    def invalidate_node_indices(self):
+        """Drops the spatial index, the node ID lookup and the tiles after structural changes to the mesh."""
+        self.spatial_index = None
+        self.node_index = None
+        self.mesh_tiler = None
+
+    def update_spatial_index(self, indices, coords):
+        """Moves or appends nodes in the spatial index, if it has been built."""
+        if self.spatial_index is not None:
+            self.spatial_index.update(indices, np.asarray(coords)[..., :2])
+
+    def cached_payload(self, kind: str, build):
+        """
+        Returns the payload `kind` of the current version, calling `build`
+        only if it was not made yet. Every change of the state increases the
+        version, which drops the payloads of the previous one.
+        """
+        with self.lock:
+            if self.payload_cache_version != self.version:
+                self.payload_cache.clear()
+                self.payload_cache_version = self.version
+            if kind not in self.payload_cache:
+                self.payload_cache[kind] = build()
+            return self.payload_cache[kind]
+
+
+def _remove_path(path) -> None:
+    """Removes a file or a directory tree, if it exists."""
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.unlink(path)
+
+
+def _native_base(previous: str | None) -> str | None:
+    """Returns `previous` if a native checkpoint can share its arrays, else None."""
+    return previous if previous and os.path.isdir(previous) and is_native(previous) else None
+
+
+class DocumentRegistry:
+    """Creates documents on first use and evicts idle ones over a memory budget.
+
+    Requests work on a document inside `use`, which loads it and keeps it
+    from being evicted meanwhile. A document is idle when no request uses it
+    and no Socket.IO session views it.
+
+    Parameters
+    ----------
+    root : str
+        The directory holding a subdirectory per document.
+    apply_edit : callable
+        Replays logged edits, see `Document`.
+    memory_budget : int
+        The bytes the loaded documents may hold before idle ones are evicted,
+        least recently used first, see `Document.memory_usage`.
+    directories : dict, optional
+        Directories of documents stored outside `root`, by ID.
+    start_thread : callable, optional
+        Starts background loops, see `Checkpointer`.
+    """
+
+    # Least interval between two eviction checks, in seconds
+    EVICTION_INTERVAL = 1.0
+
+    def __init__(self, root: str, apply_edit, memory_budget: int, directories: dict | None = None, start_thread=None):
+        self.root = root
+        self.memory_budget = memory_budget
+        self._apply_edit = apply_edit
+        self._directories = dict(directories or {})
+        self._start_thread = start_thread
+        # by recency of use, the least recent first
+        self._documents: OrderedDict[str, Document] = OrderedDict()
+        self._sessions: dict = {}
+        self._lock = threading.Lock()
+        self._last_eviction = 0.0
+
+    def __repr__(self) -> str:
+        loaded = sum(doc.loaded for doc in self._documents.values())
+        return f"<DocumentRegistry: {self.root}, #documents={len(self._documents)}, #loaded={loaded}>"
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def documents(self) -> list[Document]:
+        """Returns the documents created so far, the least recently used first."""
+        with self._lock:
+            return list(self._documents.values())
+
+    def get(self, doc_id: str) -> Document:
+        """
+        Returns a document, creating it if needed, without loading it.
+
+        Raises
+        ------
+        ValueError
+            If the ID is not 1 to 64 letters, digits, dashes or underscores.
+        """
+        if not isinstance(doc_id, str) or not DOCUMENT_ID_PATTERN.fullmatch(doc_id):
+            raise ValueError(f"Invalid document ID: {doc_id!r}")
+        with self._lock:
+            return self._get(doc_id)
+
+    def _get(self, doc_id: str) -> Document:
+        doc = self._documents.get(doc_id)
+        if doc is None:
+            directory = self._directories.get(doc_id) or os.path.join(self.root, doc_id)
+            doc = Document(doc_id, directory, self._apply_edit, self._start_thread)
+            self._documents[doc_id] = doc
+        return doc
+
+    @contextmanager
+    def use(self, doc_id: str):
+        """
+        Returns a context manager yielding a loaded document, which is not
+        evicted before the context exits. Raises ValueError like `get`.
+        """
+        doc = self.get(doc_id)
+        with self._lock:
+            doc.pins += 1
+            self._documents.move_to_end(doc_id)
+        loading = False
+        try:
+            with doc.lock:
+                loading = not doc.loaded
+                doc.load()
+            yield doc
+        finally:
+            with self._lock:
+                doc.pins -= 1
+            self.evict_idle(force=loading)
+
+    def add_viewer(self, doc_id: str, sid: str) -> Document:
+        """Records that a Socket.IO session views a document, see `get`."""
+        doc = self.get(doc_id)
+        with self._lock:
+            self._remove_viewer(sid)
+            doc.viewers.add(sid)
+            self._sessions[sid] = doc
+        return doc
+
+    def remove_viewer(self, sid: str) -> Document | None:
+        """Forgets a Socket.IO session; returns the document it viewed."""
+        with self._lock:
+            return self._remove_viewer(sid)
+
+    def _remove_viewer(self, sid: str) -> Document | None:
+        # called with `_lock` held
+        doc = self._sessions.pop(sid, None)
+        if doc is not None:
+            doc.viewers.discard(sid)
+        return doc
+
+    def document_of(self, sid: str) -> str | None:
+        """Returns the ID of the document a Socket.IO session views."""
+        doc = self._sessions.get(sid)
+        return doc.id if doc is not None else None
+
+    def memory_usage(self) -> int:
+        """Estimates the bytes held by the loaded documents."""
+        return sum(doc.memory_usage() for doc in self.documents())
+
+    def evict_idle(self, force: bool = False) -> list[str]:
+        """
+        Evicts idle documents, least recently used first, until the loaded
+        ones fit in the memory budget. Runs at most once per
+        `EVICTION_INTERVAL` unless `force` is set. Returns the evicted IDs.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_eviction < self.EVICTION_INTERVAL:
+            return []
+        self._last_eviction = now
+
+        documents = self.documents()
+        usage = {doc.id: doc.memory_usage() for doc in documents}
+        total = sum(usage.values())
+        evicted = []
+        for doc in documents:
+            if total <= self.memory_budget:
+                break
+            if usage[doc.id] and self._evict(doc):
+                total -= usage[doc.id]
+                evicted.append(doc.id)
+        return evicted
+
+    def _evict(self, doc: Document) -> bool:
+        with doc.checkpointer.paused(), doc.lock:
+            # a request pinning the document after this check waits for the
+            # lock and loads it again
+            with self._lock:
+                if doc.pins or doc.viewers or not doc.loaded:
+                    return False
+            try:
+                doc.unload()
+            except Exception as e:  # keep it loaded, the edits are still logged
+                print(f"[ERROR] Failed to evict document {doc.id}: {e}")
+                return False
+        return True
+
+    def stop(self) -> None:
+        """Stops the checkpoints of every document, writing a final one."""
+        for doc in self.documents():
+            doc.checkpointer.stop()
@@ -0,0 +1,242 @@
+"""
+Write-ahead log of mesh edits with periodic background checkpoints.
+
+Every edit is appended to a JSON-lines file as a small record before it is
+acknowledged, which costs one buffered write instead of a full deck save. A
+background thread periodically writes a checkpoint (the full state) and then
+drops the records it covers. After a crash, the state is restored by
+replaying the log over the last checkpoint.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+
+
+class EditLog:
+    """An append-only log of JSON records, numbered by a sequence number.
+
+    Records are written as one JSON object per line with an added ``seq``
+    field. A checkpoint rotates the log: records appended after `rotate` go
+    to a fresh file, and the rotated file is deleted by `discard_rotated`
+    once the checkpoint covering it is safely on disk.
+
+    Parameters
+    ----------
+    path : str
+        The path of the log file; the rotated file gets a ``.old`` suffix.
+    fsync : bool
+        Whether to fsync after every record. Without it a record survives a
+        crash of the process but not necessarily of the machine.
+    """
+
+    def __init__(self, path: str, fsync: bool = False):
+        self.path = path
+        self.rotated_path = path + ".old"
+        self.fsync = fsync
+
+        self.last_seq = 0
+        self.num_records = 0
+        self.num_bytes = 0
+        for record in self.replay():
+            self.last_seq = max(self.last_seq, record["seq"])
+            self.num_records += 1
+        if os.path.exists(self.path):
+            self.num_bytes = os.path.getsize(self.path)
+
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def __repr__(self) -> str:
+        return f"<EditLog: {self.path}, #records={self.num_records}, last_seq={self.last_seq}>"
+
+    def append(self, record: dict) -> int:
+        """Appends a record and returns its sequence number."""
+        self.last_seq += 1
+        line = json.dumps({"seq": self.last_seq, **record}, separators=(",", ":")) + "\n"
+        self._file.write(line)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.num_records += 1
+        self.num_bytes += len(line)
+        return self.last_seq
+
+    def replay(self, after: int = 0):
+        """
+        Yields the logged records with a sequence number above `after`, the
+        rotated file first. A truncated last line (from a crash during the
+        write) is ignored.
+        """
+        for path in (self.rotated_path, self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    if record["seq"] > after:
+                        yield record
+
+    def rotate(self) -> int:
+        """
+        Moves the current records aside and starts a fresh file.
+
+        Returns
+        -------
+        int
+            The sequence number of the last rotated record.
+        """
+        self._file.close()
+        if os.path.exists(self.rotated_path):
+            # an earlier checkpoint failed, keep its records too
+            with open(self.rotated_path, "a", encoding="utf-8") as dst, open(
+                self.path, "r", encoding="utf-8"
+            ) as src:
+                dst.write(src.read())
+            os.remove(self.path)
+        else:
+            os.replace(self.path, self.rotated_path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self.num_records = 0
+        self.num_bytes = 0
+        return self.last_seq
+
+    def discard_rotated(self) -> None:
+        """Deletes the rotated records once a checkpoint covers them."""
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+    def reset(self, seq: int | None = None) -> None:
+        """Drops all records, e.g. after the state was replaced as a whole."""
+        self._file.close()
+        self.discard_rotated()
+        self._file = open(self.path, "w", encoding="utf-8")
+        if seq is not None:
+            self.last_seq = seq
+        self.num_records = 0
+        self.num_bytes = 0
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class Checkpointer:
+    """Runs checkpoints in a background thread on a time or size policy.
+
+    A checkpoint is due when the log holds at least `max_records` records or
+    `max_bytes` bytes, or when it holds any record older than `interval`
+    seconds.
+
+    Parameters
+    ----------
+    log : EditLog
+        The log whose records the checkpoints cover.
+    lock : threading.Lock
+        The lock that guards the state and the log.
+    snapshot : callable
+        Called with `lock` held; returns a callable that writes the
+        checkpoint. It should only copy what is needed, so the expensive
+        writing happens without blocking edits.
+    interval, max_records, max_bytes :
+        The checkpoint policy.
+    start_thread : callable, optional
+        Starts the background loop, e.g. ``socketio.start_background_task``.
+        By default a daemon thread is used.
+    """
+
+    def __init__(
+        self,
+        log: EditLog,
+        lock,
+        snapshot,
+        interval: float = 30.0,
+        max_records: int = 1000,
+        max_bytes: int = 4 << 20,
+        start_thread=None,
+    ):
+        self.log = log
+        self.lock = lock
+        self.snapshot = snapshot
+        self.interval = interval
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self._start_thread = start_thread
+        self._first_pending = None
+        self._checkpointing = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._running = False
+
+    def notify(self) -> None:
+        """Tells the checkpointer that a record was appended."""
+        if self._first_pending is None:
+            self._first_pending = time.monotonic()
+        if self.log.num_records >= self.max_records or self.log.num_bytes >= self.max_bytes:
+            self._wakeup.set()
+
+    def due(self) -> bool:
+        """Whether the checkpoint policy asks for a checkpoint now."""
+        if self.log.num_records == 0:
+            return False
+        if self.log.num_records >= self.max_records or self.log.num_bytes >= self.max_bytes:
+            return True
+        if self._first_pending is None:
+            self._first_pending = time.monotonic()
+        return time.monotonic() - self._first_pending >= self.interval
+
+    def checkpoint(self) -> bool:
+        """Writes a checkpoint if there are pending records; returns whether it did."""
+        # one checkpoint at a time, or one could discard the other's records
+        with self._checkpointing:
+            with self.lock:
+                if self.log.num_records == 0:
+                    return False
+                write = self.snapshot()
+                seq = self.log.rotate()
+                self._first_pending = None
+            write(seq)
+            with self.lock:
+                self.log.discard_rotated()
+            return True
+
+    def paused(self):
+        """
+        Returns a context manager that holds off checkpoints, e.g. while the
+        state is replaced as a whole and the log reset.
+        """
+        return self._checkpointing
+
+    def start(self) -> None:
+        """Starts the background loop."""
+        if self._running:
+            return
+        self._running = True
+        if self._start_thread is not None:
+            self._start_thread(self._run)
+        else:
+            threading.Thread(target=self._run, name="checkpointer", daemon=True).start()
+
+    def stop(self) -> None:
+        """Stops the background loop and writes a final checkpoint."""
+        if not self._running:
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        self.checkpoint()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(timeout=min(1.0, self.interval))
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            if self.due():
+                try:
+                    self.checkpoint()
+                except Exception as e:  # keep the records, retry on the next round
+                    print(f"[ERROR] Checkpoint failed: {e}")
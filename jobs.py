@@ -0,0 +1,386 @@
+"""
+Background jobs for loads, exports and other long operations.
+
+A request starting a job gets its ID at once and follows it through progress
+callbacks (sent to the clients as ``job_progress`` events) instead of waiting
+for it. Jobs run in a thread pool, so they never hold a request thread;
+CPU-bound steps such as parsing or formatting a deck run in a process pool
+through `JobExecutor.run_in_process`, so they do not hold the interpreter
+lock either and the server keeps serving other clients meanwhile.
+
+Jobs are cancelled cooperatively: `Job.report` raises `JobCancelled` once a
+cancellation was requested, in the job thread as in a worker process.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from abaqus_io import read_deck, open_chunks, read_native, write_native, iter_buffer
+from abaqus_io.mesh_io import SECTIONS
+
+
+class JobCancelled(Exception):
+    """Raised by `Job.report` in a job whose cancellation was requested."""
+
+
+class Job:
+    """A background job and its progress.
+
+    The status goes from ``queued`` to ``running`` and then to ``done``,
+    ``failed`` or ``cancelled``. The progress is a dict of fields set by the
+    job through `report`; ``done`` and ``total`` (e.g. bytes) give the
+    fraction done and the estimated time left.
+
+    Parameters
+    ----------
+    kind : str
+        What the job does, e.g. ``load``.
+    doc_id : str, optional
+        The document the job works on.
+    on_update : callable, optional
+        Called with the job when its status changes, and when its progress
+        changes at most every `UPDATE_INTERVAL` seconds.
+    """
+
+    # Least interval between two progress updates, in seconds
+    UPDATE_INTERVAL = 0.2
+
+    def __init__(self, kind: str, doc_id: str | None = None, on_update=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.doc_id = doc_id
+        self.status = "queued"
+        self.progress: dict = {}
+        self.result = None
+        self.error: str | None = None
+        # files owned by the job, deleted when it is forgotten
+        self.files: list[str] = []
+        self.created = time.time()
+        self.started: float | None = None
+        self.finished: float | None = None
+        self.cancel_requested = threading.Event()
+        self._on_update = on_update
+        self._last_update = 0.0
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"<Job: {self.kind} {self.id}, {self.status}>"
+
+    def report(self, **progress) -> None:
+        """
+        Updates the progress of the job.
+
+        Raises
+        ------
+        JobCancelled
+            If the cancellation of the job was requested.
+        """
+        self.check_cancelled()
+        self.update_progress(progress)
+
+    def check_cancelled(self) -> None:
+        """Raises `JobCancelled` if the cancellation of the job was requested."""
+        if self.cancel_requested.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    def update_progress(self, progress: dict) -> None:
+        """Merges fields into the progress, notifying at most every `UPDATE_INTERVAL`."""
+        with self._lock:
+            self.progress.update(progress)
+            now = time.monotonic()
+            if now - self._last_update < self.UPDATE_INTERVAL:
+                return
+            self._last_update = now
+        self._notify()
+
+    def set_status(self, status: str, result=None, error: str | None = None) -> None:
+        with self._lock:
+            self.status = status
+            if status == "running":
+                self.started = time.time()
+            elif status in ("done", "failed", "cancelled"):
+                self.finished = time.time()
+                self.result = result
+                self.error = error
+        self._notify()
+
+    def to_dict(self) -> dict:
+        """Returns the state of the job as sent to clients."""
+        with self._lock:
+            state = {
+                "id": self.id,
+                "kind": self.kind,
+                "doc": self.doc_id,
+                "status": self.status,
+                "progress": dict(self.progress),
+                "result": self.result,
+                "error": self.error,
+                "elapsed": None,
+                "eta": None,
+            }
+            if self.started is not None:
+                elapsed = (self.finished or time.time()) - self.started
+                state["elapsed"] = elapsed
+                done, total = self.progress.get("done"), self.progress.get("total")
+                if self.status == "running" and done and total:
+                    state["eta"] = elapsed * max(total - done, 0) / done
+        return state
+
+    def _notify(self) -> None:
+        if self._on_update is not None:
+            try:
+                self._on_update(self)
+            except Exception as e:  # a failed notification must not fail the job
+                print(f"[ERROR] Failed to send the progress of job {self.id}: {e}")
+
+
+class JobExecutor:
+    """Runs jobs in a thread pool, with a process pool for CPU-bound steps.
+
+    Parameters
+    ----------
+    max_threads : int
+        The number of jobs running at once.
+    max_processes : int, optional
+        The number of worker processes, by default the number of CPUs.
+    on_update : callable, optional
+        Called with a job when its state changes, see `Job`.
+    max_finished : int
+        The number of finished jobs kept for status queries; older ones are
+        forgotten and their files deleted.
+    """
+
+    def __init__(self, max_threads: int = 4, max_processes: int | None = None, on_update=None, max_finished: int = 100):
+        self.max_processes = max_processes or os.cpu_count() or 1
+        self.max_finished = max_finished
+        self._on_update = on_update
+        self._threads = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="job")
+        # the pool and the manager relaying progress start with the first
+        # process step; workers are not forked from this threaded process
+        self._processes: ProcessPoolExecutor | None = None
+        self._manager = None
+        self._context = multiprocessing.get_context(
+            "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        )
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        running = sum(job.status == "running" for job in self.jobs())
+        return f"<JobExecutor: #jobs={len(self._jobs)}, #running={running}>"
+
+    def submit(self, kind: str, fn, *args, doc_id: str | None = None) -> Job:
+        """
+        Starts a job calling ``fn(job, *args)`` in the thread pool and returns
+        it at once. The return value of `fn` becomes the job result, an
+        exception its error.
+        """
+        job = Job(kind, doc_id, self._on_update)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._threads.submit(self._run, job, fn, args)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, doc_id: str | None = None) -> list[Job]:
+        """Returns the known jobs, of one document if given, oldest first."""
+        with self._lock:
+            return [job for job in self._jobs.values() if doc_id is None or job.doc_id == doc_id]
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Requests the cancellation of a job. A queued job does not start; a
+        running one stops at its next progress report. Returns False if the
+        job is unknown or already finished.
+        """
+        job = self.get(job_id)
+        if job is None or job.status not in ("queued", "running"):
+            return False
+        job.cancel_requested.set()
+        return True
+
+    def run_in_process(self, job: Job, fn, *args):
+        """
+        Calls ``fn(report, *args)`` in a worker process from a job thread and
+        returns its result. `report` is called with progress fields like
+        `Job.report`, which it relays to the job and which raises
+        `JobCancelled` in the worker once the job is cancelled. `fn` and its
+        arguments must be picklable, i.e. module-level functions and plain data.
+        """
+        job.check_cancelled()
+        processes, manager = self._process_pool()
+        progress_queue = manager.Queue()
+        cancel_event = manager.Event()
+        future = processes.submit(_run_reporting, fn, args, progress_queue, cancel_event, Job.UPDATE_INTERVAL)
+        while True:
+            if job.cancel_requested.is_set():
+                cancel_event.set()
+            try:
+                job.update_progress(progress_queue.get(timeout=0.1))
+                continue
+            except queue.Empty:
+                pass
+            if future.done():
+                break
+        return future.result()
+
+    def shared_dict(self, **values):
+        """
+        Returns a dict shared with the worker processes, e.g. to pass the
+        state of an upload to a process step while it is received.
+        """
+        return self._process_pool()[1].dict(values)
+
+    def shutdown(self) -> None:
+        """Cancels the jobs and stops the pools."""
+        for job in self.jobs():
+            job.cancel_requested.set()
+        self._threads.shutdown(wait=True, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=True, cancel_futures=True)
+            self._manager.shutdown()
+
+    def _process_pool(self):
+        with self._lock:
+            if self._processes is None:
+                self._manager = self._context.Manager()
+                self._processes = ProcessPoolExecutor(max_workers=self.max_processes, mp_context=self._context)
+            return self._processes, self._manager
+
+    def _run(self, job: Job, fn, args) -> None:
+        try:
+            if job.cancel_requested.is_set():
+                raise JobCancelled(f"Job {job.id} was cancelled")
+            job.set_status("running")
+            result = fn(job, *args)
+            job.set_status("done", result=result)
+        except JobCancelled:
+            job.set_status("cancelled")
+        except Exception as e:
+            print(f"[ERROR] Job {job.kind} {job.id} failed: {e}")
+            job.set_status("failed", error=str(e))
+        finally:
+            self._forget_finished()
+
+    def _forget_finished(self) -> None:
+        with self._lock:
+            finished = [job for job in self._jobs.values() if job.finished is not None]
+            forgotten = finished[: max(len(finished) - self.max_finished, 0)]
+            for job in forgotten:
+                del self._jobs[job.id]
+        for job in forgotten:
+            for path in job.files:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def _run_reporting(fn, args, progress_queue, cancel_event, interval: float):
+    """Calls a process step in a worker, with a `report` relaying to the job thread."""
+    last = 0.0
+
+    def report(**progress):
+        nonlocal last
+        now = time.monotonic()
+        if now - last < interval:
+            return
+        last = now
+        if cancel_event.is_set():
+            raise JobCancelled("The job was cancelled")
+        progress_queue.put(progress)
+
+    return fn(report, *args)
+
+
+# ----------------------------------------------------------------------
+# Process steps
+# ----------------------------------------------------------------------
+
+
+def parse_deck(report, deck_path: str, native_path: str, upload=None) -> dict:
+    """
+    Parses an Abaqus deck into a native project, which the server then
+    memory-maps instead of receiving the mesh from the worker.
+
+    With `upload`, the deck is parsed while it is being written, see
+    `follow_upload`. Returns the size of the mesh, and the size of the deck
+    and the seconds spent parsing it.
+    """
+    total = upload["total"] if upload is not None else os.path.getsize(deck_path)
+    report(stage="parsing", done=0, total=total)
+    start = time.perf_counter()
+
+    def progress(position, section):
+        report(stage="parsing", done=position, section=section)
+
+    if upload is None:
+        mesh = read_deck(deck_path, progress=progress)
+    else:
+        with open_chunks(follow_upload(report, deck_path, upload)) as f:
+            mesh = read_deck(f, progress=progress, base_dir=os.path.dirname(deck_path))
+    seconds = time.perf_counter() - start
+    report(stage="writing", done=total, section=None)
+    write_native(native_path, mesh)
+    return {
+        "num_nodes": len(mesh.points),
+        "num_elements": sum(len(block) for block in mesh.cells),
+        "num_bytes": os.path.getsize(deck_path),
+        # includes waiting for the bytes of an upload
+        "seconds": seconds,
+    }
+
+
+def follow_upload(report, path: str, upload, chunk_size: int = 1 << 20, poll: float = 0.05):
+    """
+    Yields the bytes of a file while it is being written, until the upload
+    is complete.
+
+    `upload` is a dict shared with the writer (see `JobExecutor.shared_dict`)
+    whose ``complete`` or ``failed`` key it sets once it has written and
+    flushed the last bytes, or given up. Waiting for more bytes reports the
+    progress, so the job can be cancelled meanwhile.
+    """
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if chunk:
+                yield chunk
+                continue
+            state = dict(upload)
+            if state["failed"]:
+                raise IOError("The upload was interrupted")
+            # bytes written before the upload completed are read first
+            chunk = f.read(chunk_size)
+            if chunk:
+                yield chunk
+            elif state["complete"]:
+                return
+            else:
+                report(stage="receiving", received=state["received"])
+                time.sleep(poll)
+
+
+def format_deck(report, native_path: str, deck_path: str) -> int:
+    """Writes the mesh of a native project as an Abaqus deck; returns its size in bytes."""
+    mesh = read_native(native_path)
+    written = 0
+    with open(deck_path, "w") as f:
+        for done, section in enumerate(SECTIONS):
+            report(stage="formatting", section=section, done=done, total=len(SECTIONS))
+            for chunk in iter_buffer(mesh, sections=(section,)):
+                f.write(chunk)
+                written += len(chunk)
+                report(stage="formatting", section=section, bytes=written)
+    return written
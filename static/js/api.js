@@ -2,43 +2,122 @@ function uploadMesh() {
     const fileInput = document.getElementById('mesh-file');
     if (!fileInput.files.length) return showMessage('Please select a file first.', 'error');
     
-    const formData = new FormData();
-    formData.append('file', fileInput.files[0]);
+    const file = fileInput.files[0];
 
-    fetch('/load', { method: 'POST', body: formData })
+    // The raw file is sent so the server can parse it while it arrives; it loads it in a background job and
+    // reports its progress
+    fetch(documentUrl(`/load?filename=${encodeURIComponent(file.name)}`), {
+        method: 'POST',
+        body: file,
+        headers: { 'Content-Type': 'application/octet-stream' },
+    })
         .then(response => {
-            if (response.ok) {
-                showMessage('Mesh loaded successfully.', 'success');
-                appState.meshLoaded = true; // Set to true on successful upload
-                appState.meshDisplayed = false; // Not yet displayed
-                showMesh();
-            } else {
-                response.text().then(text => showMessage(`Error: ${text}`, 'error'));
-                appState.meshLoaded = false; // Set to false on failed upload
-            }
+            if (!response.ok) return response.text().then(text => { throw new Error(text); });
+            return response.json();
+        })
+        .then(({ job }) => {
+            showMessage('Loading mesh...', 'info');
+            return waitForJob(job);
+        })
+        .then(() => {
+            showMessage('Mesh loaded successfully.', 'success');
+            appState.meshLoaded = true; // Set to true on successful load
+            appState.meshDisplayed = false; // Not yet displayed
+            showMesh();
         })
         .catch(err => {
-            showMessage(`Upload error: ${err}`, 'error');
-            appState.meshLoaded = false; // Set to false on upload error
+            showMessage(`Error: ${err.message}`, 'error');
+            appState.meshLoaded = false; // Set to false on failed load
         });
 }
 window.uploadMesh = uploadMesh;
 
+// Jobs started by this page, by ID, settled by their final job_progress event
+const pendingJobs = new Map();
+
+/**
+ * Waits for a background job of the server.
+ * @param {Object} job - The job as returned by the request starting it.
+ * @returns {Promise<Object>} Resolves with the finished job, rejects if it failed or was cancelled.
+ */
+function waitForJob(job) {
+    return new Promise((resolve, reject) => {
+        pendingJobs.set(job.id, { resolve, reject });
+        // the job may have finished before this page could wait for its events
+        fetch(documentUrl(`/jobs/${job.id}`))
+            .then(response => response.ok ? response.json() : null)
+            .then(state => state && handleJobProgress(state));
+    });
+}
+
+/** Settles the wait for a job once it has finished, shows its progress otherwise. */
+function handleJobProgress(job) {
+    const pending = pendingJobs.get(job.id);
+    if (!pending) return;
+    if (job.status === 'done') {
+        pendingJobs.delete(job.id);
+        pending.resolve(job);
+    } else if (job.status === 'failed' || job.status === 'cancelled') {
+        pendingJobs.delete(job.id);
+        pending.reject(new Error(job.error || `The ${job.kind} job was ${job.status}.`));
+    } else if (job.status === 'running') {
+        const { stage, section, done, total } = job.progress;
+        let text = `${job.kind}: ${stage || 'running'}${section ? ` ${section.toLowerCase()}` : ''}`;
+        if (done && total) text += ` ${Math.floor(100 * done / total)}%`;
+        if (job.eta !== null) text += `, about ${Math.ceil(job.eta)} s left`;
+        showMessage(text, 'info', 2000);
+    }
+}
+window.handleJobProgress = handleJobProgress;
+
+/** Asks the server to cancel a job of this page. */
+function cancelJob(jobId) {
+    return fetch(documentUrl(`/jobs/${jobId}/cancel`), { method: 'POST' });
+}
+window.cancelJob = cancelJob;
+
+// Meshes with more nodes and elements than this are streamed by viewport, see requestViewport
+const VIEWPORT_MODE_MIN_ITEMS = 500000;
+
+/**
+ * Asks the server for the size of the mesh and switches to viewport streaming if it is too large to
+ * hold whole. Resolves with true if viewport mode was entered.
+ */
+function enterViewportModeIfLarge() {
+    return fetch(documentUrl('/tiles/info'), { cache: 'no-store' })
+        .then(response => response.ok ? response.json() : null)
+        .then(info => {
+            if (!info || info.num_nodes + info.num_elements < VIEWPORT_MODE_MIN_ITEMS) {
+                appState.viewportMode = false;
+                return false;
+            }
+            enterViewportMode(info);
+            return true;
+        });
+}
+window.enterViewportModeIfLarge = enterViewportModeIfLarge;
+
 function showMesh() {
     if (!appState.meshLoaded) return showMessage('Please load a mesh file first.', 'error');
     if (appState.meshDisplayed) return showMessage('Mesh is already displayed.', 'info');
 
-    fetch('/last_mesh').then(response => {
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
+    enterViewportModeIfLarge().then(streamed => {
+        if (streamed) {
+            showMessage('Large mesh: only the visible part is loaded.', 'info');
+        } else {
+            showWholeMesh();
         }
-        return response.json();
-    }).then(data => {
-        if (data.nodes && data.nodes.length > 0) {
-            appState.isNewImport = true; // Set flag for recentering
-            socket.emit('get_mesh');
+    }).catch(err => {
+        showMessage(`Failed to retrieve mesh data from server: ${err.message}`, 'error');
+    });
+}
+
+function showWholeMesh() {
+    // The mesh is drawn frame by frame as it arrives, the outline first
+    streamMesh().then(completed => {
+        if (!completed) return; // replaced by another state while it was received
+        if (mesh.nodes.length > 0) {
             showMessage('Mesh displayed.', 'success');
-            appState.meshDisplayed = true; // Set to true when mesh is displayed
         } else {
             showMessage('Loaded mesh has no nodes to display.', 'error');
             appState.meshDisplayed = false; // Set to false if no nodes
@@ -48,6 +127,69 @@ function showMesh() {
         appState.meshDisplayed = false; // Set to false on fetch error
     });
 }
+
+// Increased to abandon the progressive stream in progress, e.g. when the whole state is replaced
+let meshStreamGeneration = 0;
+
+/**
+ * Reads the mesh from the progressive stream (/mesh.stream, see mesh_frames in app.py) and applies every
+ * frame as soon as it is complete, see applyMeshFrame.
+ * @returns {Promise<boolean>} Resolves with true once the last frame is applied, false if the stream was abandoned.
+ */
+async function streamMesh() {
+    const generation = ++meshStreamGeneration;
+    const response = await fetch(documentUrl('/mesh.stream'), { cache: 'no-store' });
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    const reader = response.body.getReader();
+    let chunks = [];
+    let available = 0;
+    let frameSize = null;
+    // removes the first n received bytes, as an ArrayBuffer of their own so typed arrays can view it
+    const take = n => {
+        const bytes = new Uint8Array(n);
+        let filled = 0;
+        while (filled < n) {
+            const chunk = chunks[0];
+            const count = Math.min(chunk.length, n - filled);
+            bytes.set(chunk.subarray(0, count), filled);
+            filled += count;
+            if (count === chunk.length) chunks.shift(); else chunks[0] = chunk.subarray(count);
+        }
+        available -= n;
+        return bytes.buffer;
+    };
+
+    try {
+        while (true) {
+            const { value, done } = await reader.read();
+            if (generation !== meshStreamGeneration) {
+                reader.cancel();
+                return false;
+            }
+            if (value) {
+                chunks.push(value);
+                available += value.length;
+            }
+            while (true) {
+                if (frameSize === null && available >= 4) {
+                    frameSize = new DataView(take(4)).getUint32(0, true);
+                }
+                if (frameSize === null || available < frameSize) break;
+                const decoded = decodeMeshBinary(take(frameSize));
+                frameSize = null;
+                applyMeshFrame(decoded);
+                if (decoded.header.frame === 'done') return true;
+            }
+            if (done) throw new Error('The mesh stream ended early.');
+        }
+    } catch (err) {
+        if (generation === meshStreamGeneration) abandonMeshStream();
+        throw err;
+    }
+}
+window.streamMesh = streamMesh;
 window.showMesh = showMesh;
 
 function clearMesh() {
@@ -91,7 +233,14 @@ async function exportMesh() {
         showMessage('Your browser does not support advanced file saving. File will download directly.', 'info');
     }
 
-    fetch('/export')
+    // The deck is written by a background job on the server, then downloaded
+    fetch(documentUrl('/export'), { method: 'POST' })
+        .then(response => {
+            if (!response.ok) throw new Error('Failed to export mesh.');
+            return response.json();
+        })
+        .then(({ job }) => waitForJob(job))
+        .then(job => fetch(documentUrl(`/jobs/${job.id}/download`)))
         .then(response => {
             if (response.ok) {
                 return response.text();
@@ -122,6 +271,148 @@ async function exportMesh() {
 }
 window.exportMesh = exportMesh;
 
+const MESH_ARRAY_TYPES = { int32: Int32Array, float32: Float32Array, float64: Float64Array };
+
+/**
+ * Decodes a binary mesh payload (from /mesh.bin, /viewport or a frame of /mesh.stream, see pack_binary in app.py).
+ * The arrays are viewed in place as typed arrays; only the node and element objects used by the canvas are built.
+ * @param {ArrayBuffer} buffer - The payload.
+ * @returns {{mesh: object, connections: Array, version: number, instance: string, header: object}} The mesh in the same
+ *     shape as the JSON mesh, and the payload header.
+ */
+function decodeMeshBinary(buffer) {
+    const headerLength = new DataView(buffer).getUint32(0, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength)));
+    const dataStart = 4 + headerLength;
+    const view = name => {
+        const spec = header.arrays[name];
+        const length = spec.shape.reduce((a, b) => a * b, 1);
+        return new MESH_ARRAY_TYPES[spec.dtype](buffer, dataStart + spec.offset, length);
+    };
+    const decodeSets = (spec, values) => {
+        const sets = {};
+        spec.names.forEach((name, i) => {
+            sets[name] = Array.from(values.subarray(spec.offsets[i], spec.offsets[i + 1]));
+        });
+        return sets;
+    };
+
+    const mesh = { nodes: [], elements: [], node_sets: {}, element_sets: {}, surface_sets: header.surface_sets || {} };
+    if (header.arrays.point_ids) {
+        const ids = view('point_ids');
+        const points = view('points');
+        const dim = header.arrays.points.shape[1];
+        mesh.nodes = new Array(ids.length);
+        for (let i = 0; i < ids.length; i++) {
+            mesh.nodes[i] = { id: ids[i], x: points[i * dim], y: points[i * dim + 1], z: dim > 2 ? points[i * dim + 2] : 0 };
+        }
+
+        for (const block of header.blocks) {
+            const ids = view(block.ids);
+            const connectivity = view(block.connectivity);
+            const width = header.arrays[block.connectivity].shape[1];
+            for (let i = 0; i < ids.length; i++) {
+                const nodeIds = new Array(width);
+                for (let j = 0; j < width; j++) {
+                    nodeIds[j] = connectivity[i * width + j];
+                }
+                mesh.elements.push({ id: ids[i], type: block.element_type, node_ids: nodeIds });
+            }
+        }
+
+        if (header.node_sets) {
+            mesh.node_sets = decodeSets(header.node_sets, view('node_sets'));
+            mesh.element_sets = decodeSets(header.element_sets, view('element_sets'));
+        }
+        if (header.arrays.edges) {
+            // boundary edges of decimated viewport tiles, as node ID pairs
+            mesh.edges = view('edges');
+        }
+    }
+    return { mesh, connections: header.connections || [], version: header.version, instance: header.instance, header };
+}
+window.decodeMeshBinary = decodeMeshBinary;
+
+// The region and scale of the last viewport fetched from the server, see requestViewport
+let viewportRegion = null;
+let viewportScale = null;
+let viewportStale = false;
+let viewportTimer = null;
+
+/**
+ * Fetches the part of the mesh in view when the view leaves the last fetched region, zooms by more
+ * than a factor 2 or the mesh changed. Requests are debounced while the view moves.
+ * @param {object} bounds - The visible world region, { min: [x, y], max: [x, y] }.
+ * @param {number} scale - The view scale in pixels per unit length.
+ */
+function requestViewport(bounds, scale) {
+    const region = viewportRegion;
+    const covered = region && !viewportStale &&
+        bounds.min[0] >= region.min[0] && bounds.min[1] >= region.min[1] &&
+        bounds.max[0] <= region.max[0] && bounds.max[1] <= region.max[1] &&
+        Math.abs(Math.log2(scale / viewportScale)) < 1;
+    if (covered) return;
+    clearTimeout(viewportTimer);
+    viewportTimer = setTimeout(() => fetchViewport(bounds, scale).catch(err => {
+        console.error('Viewport fetch failed:', err);
+    }), 100);
+}
+window.requestViewport = requestViewport;
+
+/**
+ * Fetches the viewport with a margin of a quarter of its size on every side, so small pans need no request.
+ * @returns {Promise} Resolves once the viewport is applied, see applyViewportData.
+ */
+function fetchViewport(bounds, scale) {
+    const marginX = (bounds.max[0] - bounds.min[0]) / 4;
+    const marginY = (bounds.max[1] - bounds.min[1]) / 4;
+    const region = {
+        min: [bounds.min[0] - marginX, bounds.min[1] - marginY],
+        max: [bounds.max[0] + marginX, bounds.max[1] + marginY],
+    };
+    const query = `bounds=${region.min[0]},${region.min[1]},${region.max[0]},${region.max[1]}&scale=${scale}`;
+    viewportStale = false;
+    return fetch(documentUrl(`/viewport?${query}`), { cache: 'no-store' })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            return response.arrayBuffer();
+        })
+        .then(buffer => {
+            viewportRegion = region;
+            viewportScale = scale;
+            applyViewportData(decodeMeshBinary(buffer));
+        });
+}
+
+/**
+ * Refetches the current viewport, e.g. after a structural change or a missed patch.
+ * @returns {Promise} Resolves once the viewport is applied.
+ */
+function refreshViewport() {
+    viewportStale = true;
+    if (!viewportRegion) {
+        return Promise.resolve();
+    }
+    const marginX = (viewportRegion.max[0] - viewportRegion.min[0]) / 6;
+    const marginY = (viewportRegion.max[1] - viewportRegion.min[1]) / 6;
+    const bounds = {
+        min: [viewportRegion.min[0] + marginX, viewportRegion.min[1] + marginY],
+        max: [viewportRegion.max[0] - marginX, viewportRegion.max[1] - marginY],
+    };
+    return fetchViewport(bounds, viewportScale);
+}
+window.refreshViewport = refreshViewport;
+
+function resetViewport() {
+    viewportRegion = null;
+    viewportScale = null;
+    viewportStale = false;
+    clearTimeout(viewportTimer);
+}
+window.resetViewport = resetViewport;
+
 function sendBulkNodeUpdate(nodesData, isDragging = false, draggingNodeId = null) {
     socket.emit('update_nodes_bulk', { nodes: nodesData, isDragging: isDragging, draggingNodeId: draggingNodeId });
 }
@@ -130,4 +421,23 @@ window.sendBulkNodeUpdate = sendBulkNodeUpdate;
 function saveMeshToServer() {
     socket.emit('save_mesh');
 }
-window.saveMeshToServer = saveMeshToServer;
\ No newline at end of file
+window.saveMeshToServer = saveMeshToServer;
+
+function queryNodesInBox(bounds) {
+    // Resolves with the IDs of the nodes inside bounds ({ min: [x, y], max: [x, y] }), using the server-side spatial index
+    return new Promise(resolve => {
+        socket.emit('query_nodes_in_box', { min: bounds.min, max: bounds.max }, result => resolve(result.ids));
+    });
+}
+window.queryNodesInBox = queryNodesInBox;
+
+function queryNearestNodes(x, y, k = 1, radius = null) {
+    // Resolves with { ids, distances } of the k nearest nodes to (x, y), optionally limited to a snapping radius
+    return new Promise(resolve => {
+        socket.emit('query_nearest_nodes', { x, y, k, radius }, result => resolve({
+            ids: result.ids[0] || [],
+            distances: result.distances[0] || [],
+        }));
+    });
+}
+window.queryNearestNodes = queryNearestNodes;
@@ -1,11 +1,44 @@
-const socket = io();
+const socket = io({ query: { doc: documentId } }); // joins the room of the document
 
 let isDeleting = false;
 let lastEmittedConnection = null; // New: To store the last connection emitted to the server
+let meshVersion = null; // Version of the server state the local mesh reflects
+let meshInstance = null; // Server process the version belongs to, versions restart with it
+let awaitingResync = false; // Set while a full state has been requested after a missed patch
+let pendingPatches = []; // Patches received while awaiting the full state
 
 // --- SOCKET.IO HANDLERS ---
 
 socket.on('mesh_data', data => {
+    if (data.buffer) {
+        // binary reply to get_mesh, see decodeMeshBinary
+        const decoded = decodeMeshBinary(data.buffer);
+        data = { ...data, mesh: decoded.mesh, connections: decoded.connections, version: decoded.version, instance: decoded.instance };
+    }
+    if (appState.viewportMode) {
+        // the mesh was replaced as a whole, it may no longer need streaming
+        enterViewportModeIfLarge().then(streamed => {
+            if (!streamed) {
+                applyMeshData(data);
+            }
+        });
+        return;
+    }
+    applyMeshData(data);
+});
+
+/**
+ * Replaces the local mesh by a full state from the server.
+ * @param {object} data - The mesh_data event: mesh, connections, version and drag state.
+ */
+function applyMeshData(data) {
+    meshStreamGeneration++; // this state replaces the one being streamed, if any
+    meshVersion = data.version !== undefined ? data.version : null;
+    meshInstance = data.instance || meshInstance;
+    awaitingResync = false;
+    appState.viewportMode = false;
+    mesh.edges = null;
+
     const meshData = data.mesh || data;
     const connections = data.connections || [];
     const isDragging = data.isDragging || false;
@@ -43,17 +76,7 @@ socket.on('mesh_data', data => {
     nodesMap = new Map(mesh.nodes.map(n => [n.id, n]));
 
     if (mesh.nodes.length > 0) {
-        const bounds = { min: [Infinity, Infinity], max: [-Infinity, -Infinity] };
-        for (const node of mesh.nodes) {
-            bounds.min[0] = Math.min(bounds.min[0], node.x);
-            bounds.min[1] = Math.min(bounds.min[1], node.y);
-            bounds.max[0] = Math.max(bounds.max[0], node.x);
-            bounds.max[1] = Math.max(bounds.max[1], node.y);
-        }
-        const range = Math.max(bounds.max[0] - bounds.min[0], bounds.max[1] - bounds.min[1]);
-        const cellSize = range / Math.max(1, Math.sqrt(mesh.nodes.length) / 4);
-        spatialGrid = new SpatialHashGrid(bounds, [cellSize, cellSize]);
-        mesh.nodes.forEach(node => spatialGrid.insert(node));
+        rebuildSpatialGrid();
 
         appState.meshLoaded = true;
         appState.meshDisplayed = true;
@@ -88,8 +111,335 @@ socket.on('mesh_data', data => {
     scheduleDrawMesh();
     window.updateSummary(mesh);
     window.updateSetsUI(mesh);
+}
+window.applyMeshData = applyMeshData;
+
+/**
+ * Switches to viewport streaming for a mesh too large to hold whole: only the part in view is fetched,
+ * see requestViewport, and undo history is off as the local mesh is partial.
+ * @param {object} info - The /tiles/info reply: version, counts and bounds of the mesh.
+ */
+function enterViewportMode(info) {
+    meshStreamGeneration++;
+    appState.viewportMode = true;
+    meshVersion = info.version;
+    meshInstance = info.instance;
+    awaitingResync = false;
+    resetViewport();
+    // a saved partial state would be synced back over the mesh on the next page load
+    localStorage.removeItem(historyStorageKey);
+
+    mesh = { nodes: [], connections: [], elements: [], edges: null, node_sets: {}, element_sets: {}, surface_sets: {} };
+    nodesMap = new Map();
+    spatialGrid = null;
+    window.selectedNodes = [];
+    appState.meshLoaded = true;
+    appState.meshDisplayed = true;
+
+    // the totals of the whole mesh, the local one only holds the viewport
+    window.updateSummary({ nodes: { length: info.num_nodes }, elements: { length: info.num_elements } });
+    window.updateSetsUI(mesh);
+    // drawing requests the first viewport
+    centerAndDrawMesh({ nodes: [{ x: info.bounds.min[0], y: info.bounds.min[1] }, { x: info.bounds.max[0], y: info.bounds.max[1] }] });
+}
+window.enterViewportMode = enterViewportMode;
+
+/**
+ * Replaces the local mesh by a viewport fetched from the server, see fetchViewport.
+ * @param {object} decoded - The decoded /viewport payload.
+ */
+function applyViewportData(decoded) {
+    if (!appState.viewportMode) return; // left viewport mode while the request was in flight
+    const selectedIds = new Set(window.selectedNodes.map(n => n.id));
+    const dragged = new Map(window.selectedNodes.map(n => [n.id, n]));
+
+    mesh.nodes = decoded.mesh.nodes;
+    mesh.elements = decoded.mesh.elements;
+    mesh.edges = decoded.mesh.edges || null;
+    mesh.connections = decoded.connections;
+    for (const node of mesh.nodes) {
+        // selected nodes may be moving locally ahead of the server
+        const local = dragged.get(node.id);
+        if (local) {
+            node.x = local.x;
+            node.y = local.y;
+        }
+    }
+    nodesMap = new Map(mesh.nodes.map(n => [n.id, n]));
+    window.selectedNodes = [...selectedIds].map(id => nodesMap.get(id)).filter(n => n);
+    if (mesh.nodes.length > 0) {
+        rebuildSpatialGrid();
+    } else {
+        spatialGrid = null;
+    }
+
+    meshVersion = decoded.version;
+    meshInstance = decoded.instance;
+    awaitingResync = false;
+    scheduleDrawMesh();
+}
+window.applyViewportData = applyViewportData;
+
+/**
+ * Applies a frame of the progressive mesh stream, see streamMesh. The outline frame replaces the local mesh and
+ * centers the view on it, the next frames add nodes and elements, and the done frame adds the sets and
+ * connections. Patches received meanwhile are applied after the done frame.
+ * @param {object} decoded - The decoded frame.
+ */
+function applyMeshFrame(decoded) {
+    const { header } = decoded;
+    if (header.frame === 'outline' || (header.frame === 'done' && !awaitingResync)) {
+        meshVersion = header.version;
+        meshInstance = header.instance;
+        awaitingResync = true;
+        appState.viewportMode = false;
+        mesh = { nodes: [], connections: [], elements: [], edges: decoded.mesh.edges || null, node_sets: {}, element_sets: {}, surface_sets: {} };
+        nodesMap = new Map();
+        spatialGrid = null;
+        window.selectedNodes = [];
+        if (header.frame === 'outline') {
+            appState.meshLoaded = true;
+            appState.meshDisplayed = true;
+            window.updateSummary({ nodes: { length: header.num_nodes }, elements: { length: header.num_elements } });
+            if (header.bounds) {
+                const [minX, minY] = header.bounds.min;
+                const [maxX, maxY] = header.bounds.max;
+                centerAndDrawMesh({ nodes: [{ x: minX, y: minY }, { x: maxX, y: maxY }] });
+            }
+        }
+    }
+
+    for (const node of decoded.mesh.nodes) {
+        if (!nodesMap.has(node.id)) {
+            mesh.nodes.push(node);
+            nodesMap.set(node.id, node);
+        }
+    }
+    for (const element of decoded.mesh.elements) {
+        mesh.elements.push(element);
+    }
+
+    if (header.frame === 'done') {
+        mesh.connections = decoded.connections;
+        mesh.node_sets = decoded.mesh.node_sets;
+        mesh.element_sets = decoded.mesh.element_sets;
+        mesh.surface_sets = decoded.mesh.surface_sets;
+        mesh.edges = null; // every element is there now
+        if (mesh.nodes.length > 0) {
+            rebuildSpatialGrid();
+        }
+        appState.meshLoaded = mesh.nodes.length > 0;
+        appState.meshDisplayed = mesh.nodes.length > 0;
+        window.updateSummary(mesh);
+        window.updateSetsUI(mesh);
+        awaitingResync = false;
+        applyPendingPatches();
+    }
+    scheduleDrawMesh();
+}
+window.applyMeshFrame = applyMeshFrame;
+
+/** Gives up on a progressive stream that failed: the next patch asks for the full state. */
+function abandonMeshStream() {
+    meshStreamGeneration++;
+    awaitingResync = false;
+    meshVersion = null;
+    pendingPatches = [];
+}
+window.abandonMeshStream = abandonMeshStream;
+
+socket.on('mesh_patch', handleMeshPatch);
+socket.on('job_progress', handleJobProgress);
+
+function handleMeshPatch(patch) {
+    if (awaitingResync) {
+        pendingPatches.push(patch); // applied on top of the requested full state
+        return;
+    }
+    if (meshVersion !== null && patch.version <= meshVersion) {
+        return; // already covered by the local state
+    }
+    if (meshVersion === null || patch.version !== meshVersion + 1) {
+        // A patch was missed, the local mesh can no longer be patched
+        requestResync();
+        pendingPatches.push(patch);
+        return;
+    }
+    applyMeshPatch(patch);
+    meshVersion = patch.version;
+}
+
+socket.on('mesh_version', data => {
+    // Our own state was sent to the server as a whole, e.g. by undo
+    meshVersion = data.version;
 });
 
+socket.on('connect', () => {
+    // Patches sent while disconnected are lost
+    if (meshVersion !== null) {
+        requestResync();
+    }
+});
+
+/**
+ * Fetches the full state after a missed patch or a reconnect. The ETag of the local state is sent along,
+ * so an up-to-date client gets a 304 and nothing is transferred or decoded.
+ */
+function requestResync() {
+    if (awaitingResync) return;
+    awaitingResync = true;
+    const load = appState.viewportMode ? refreshViewport() : fetchFullState();
+    load
+        .catch(err => {
+            console.error('Mesh resync failed:', err);
+            awaitingResync = false;
+            meshVersion = null; // the next patch retries
+        })
+        .finally(applyPendingPatches);
+}
+
+/** Applies the patches received while awaiting a full state, in version order. */
+function applyPendingPatches() {
+    const patches = pendingPatches.sort((a, b) => a.version - b.version);
+    pendingPatches = [];
+    patches.forEach(handleMeshPatch);
+}
+
+function fetchFullState() {
+    const headers = meshInstance !== null && meshVersion !== null
+        ? { 'If-None-Match': `W/"${meshInstance}.${documentId}.${meshVersion}"` }
+        : {};
+    return fetch(documentUrl('/mesh.bin'), { headers, cache: 'no-store' })
+        .then(response => {
+            if (response.status === 304) {
+                awaitingResync = false;
+                return;
+            }
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            return response.arrayBuffer().then(buffer => {
+                const decoded = decodeMeshBinary(buffer);
+                applyMeshData({ mesh: decoded.mesh, connections: decoded.connections, version: decoded.version, instance: decoded.instance });
+            });
+        });
+}
+
+/**
+ * Applies a mesh_patch event to the local mesh. The cost depends on the size
+ * of the change only, except for removals which filter the mesh arrays.
+ * @param {object} patch - The change, see apply_edit in app.py.
+ */
+function applyMeshPatch(patch) {
+    const isDragging = patch.isDragging || false;
+    // The nodes this client is dragging are already updated locally in the mousemove handler,
+    // and the batched positions may lag behind them
+    const selectedNodeIds = isDragging && (patch.sources || []).includes(socket.id)
+        ? new Set(window.selectedNodes.map(n => n.id))
+        : null;
+
+    if (patch.removed_nodes && patch.removed_nodes.length) {
+        const removed = new Set(patch.removed_nodes);
+        for (const id of removed) {
+            const node = nodesMap.get(id);
+            if (node && spatialGrid) {
+                spatialGrid.remove(node);
+            }
+            nodesMap.delete(id);
+        }
+        mesh.nodes = mesh.nodes.filter(n => !removed.has(n.id));
+        for (const name of Object.keys(mesh.node_sets)) {
+            mesh.node_sets[name] = mesh.node_sets[name].filter(id => !removed.has(id));
+        }
+    }
+
+    if (patch.removed_elements && patch.removed_elements.length) {
+        const removed = new Set(patch.removed_elements);
+        mesh.elements = mesh.elements.filter(e => !removed.has(e.id));
+        for (const name of Object.keys(mesh.element_sets)) {
+            mesh.element_sets[name] = mesh.element_sets[name].filter(id => !removed.has(id));
+        }
+    }
+
+    for (const node of patch.nodes || []) {
+        if (selectedNodeIds && selectedNodeIds.has(node.id)) {
+            continue;
+        }
+        if (nodesMap.has(node.id)) {
+            updateNodePosition(node.id, node.x, node.y);
+        } else if (appState.viewportMode && isDragging) {
+            continue; // moved outside the fetched viewport
+        } else {
+            mesh.nodes.push(node);
+            nodesMap.set(node.id, node);
+            if (spatialGrid) {
+                spatialGrid.insert(node);
+            }
+        }
+    }
+
+    if (patch.removed_connections && patch.removed_connections.length) {
+        const key = c => `${Math.min(c.source, c.target)}-${Math.max(c.source, c.target)}`;
+        const removed = new Set(patch.removed_connections.map(key));
+        mesh.connections = mesh.connections.filter(c => !removed.has(key(c)));
+    }
+    if (patch.connections && patch.connections.length) {
+        mesh.connections.push(...patch.connections);
+    }
+
+    if (mesh.nodes.length > 0) {
+        if (!spatialGrid) {
+            rebuildSpatialGrid();
+        }
+        appState.meshLoaded = true;
+        appState.meshDisplayed = true;
+    } else {
+        spatialGrid = null;
+        appState.meshLoaded = false;
+        appState.meshDisplayed = false;
+    }
+    isDeleting = false;
+
+    // Highlight the newly added connection if applicable
+    if (window.lastEmittedConnection && patch.connections) {
+        const newConnection = patch.connections.find(c =>
+            (c.source === window.lastEmittedConnection.source && c.target === window.lastEmittedConnection.target) ||
+            (c.source === window.lastEmittedConnection.target && c.target === window.lastEmittedConnection.source)
+        );
+        if (newConnection) {
+            window.setHighlightedConnection(newConnection.id);
+            window.lastEmittedConnection = null; // Reset after processing
+        }
+    }
+
+    scheduleDrawMesh();
+    if (appState.viewportMode) {
+        if (!isDragging) {
+            // elements and decimated outlines are not patched, fetch the viewport again
+            refreshViewport();
+        }
+    } else if (!isDragging) {
+        // Drags move nodes only, the counts and sets stay the same
+        window.updateSummary(mesh);
+        window.updateSetsUI(mesh);
+    }
+}
+
+function rebuildSpatialGrid() {
+    const bounds = { min: [Infinity, Infinity], max: [-Infinity, -Infinity] };
+    for (const node of mesh.nodes) {
+        bounds.min[0] = Math.min(bounds.min[0], node.x);
+        bounds.min[1] = Math.min(bounds.min[1], node.y);
+        bounds.max[0] = Math.max(bounds.max[0], node.x);
+        bounds.max[1] = Math.max(bounds.max[1], node.y);
+    }
+    const range = Math.max(bounds.max[0] - bounds.min[0], bounds.max[1] - bounds.min[1]);
+    // a single node has no extent, any positive cell size will do
+    const cellSize = range / Math.max(1, Math.sqrt(mesh.nodes.length) / 4) || 1;
+    spatialGrid = new SpatialHashGrid(bounds, [cellSize, cellSize]);
+    mesh.nodes.forEach(node => spatialGrid.insert(node));
+}
+
 
 
 // --- INITIALIZATION ---
@@ -151,10 +501,14 @@ window.addEventListener('DOMContentLoaded', async () => {
     historyManager = new HistoryManager(state, callbacks);
 
         if (!historyManager.loadFromLocalStorage()) {
-        fetch('/last_mesh').then(r => r.json()).then(data => {
+        enterViewportModeIfLarge().then(streamed => streamed ? null : fetch(documentUrl('/mesh.bin')).then(r => r.arrayBuffer()).then(buffer => {
+            const decoded = decodeMeshBinary(buffer);
+            const data = decoded.mesh;
+            meshVersion = decoded.version;
+            meshInstance = decoded.instance;
             if (data.nodes && data.nodes.length) {
                 mesh.nodes = data.nodes;
-                mesh.connections = data.connections || [];
+                mesh.connections = decoded.connections;
                 mesh.elements = data.elements || [];
                 mesh.node_sets = data.node_sets || {};
                 mesh.element_sets = data.element_sets || {};
@@ -188,7 +542,7 @@ window.addEventListener('DOMContentLoaded', async () => {
             window.updateSummary(mesh);
             window.updateSetsUI(mesh);
             historyManager.pushState();
-        });
+        }));
     }
 
     // Reset editing modes on page load to ensure a clean state
@@ -156,8 +156,28 @@
             max: [Math.max(viewBounds.min.x, viewBounds.max.x), Math.max(viewBounds.min.y, viewBounds.max.y)]
         };
         
+        if (appState.viewportMode) {
+            window.requestViewport(queryBounds, view.scale);
+        }
         const visibleNodes = spatialGrid ? spatialGrid.query(queryBounds) : [];
 
+        if (mesh.edges && mesh.edges.length > 0) {
+            // Outline of the parts of a streamed mesh that are too dense to draw element by element
+            ctx.beginPath();
+            for (let i = 0; i < mesh.edges.length; i += 2) {
+                const n1 = nodesMap.get(mesh.edges[i]);
+                const n2 = nodesMap.get(mesh.edges[i + 1]);
+                if (n1 && n2) {
+                    const p1 = toScreen(n1.x, n1.y), p2 = toScreen(n2.x, n2.y);
+                    ctx.moveTo(p1.x, p1.y);
+                    ctx.lineTo(p2.x, p2.y);
+                }
+            }
+            ctx.strokeStyle = 'rgba(0, 39, 76, 0.6)';
+            ctx.lineWidth = 1;
+            ctx.stroke();
+        }
+
         if (mesh.elements && mesh.elements.length > 0) {
             // Draw elements and their labels
             mesh.elements.forEach(elem => {
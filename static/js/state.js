@@ -1,3 +1,18 @@
+// The document this page edits, from ?doc= in the page URL; every request to the server names it
+const documentId = new URLSearchParams(window.location.search).get('doc') || 'default';
+// Undo history is kept per document
+const historyStorageKey = documentId === 'default' ? 'meshProjectState' : `meshProjectState:${documentId}`;
+
+/**
+ * Adds the document ID to a server URL.
+ * @param {string} path - The URL path, with or without a query.
+ * @returns {string} The URL naming the document.
+ */
+function documentUrl(path) {
+    return `${path}${path.includes('?') ? '&' : '?'}doc=${encodeURIComponent(documentId)}`;
+}
+window.documentUrl = documentUrl;
+
 let mesh = { nodes: [], connections: [], elements: [], node_sets: {}, element_sets: {}, surface_sets: {} };
 let nodesMap = new Map();
 let spatialGrid = null;
@@ -10,6 +25,7 @@ let appState = {
     firstNodeForConnection: null, // Store the first selected node for connection
     isEditingMode: false, // New state to indicate if any editing mode is active,
     isNewImport: false, // Flag to indicate a new mesh has been imported
+    viewportMode: false, // Set while a large mesh is streamed by viewport, the local mesh is then partial
 };
 
 let view = { offsetX: 0, offsetY: 0, scale: 1, rotation: 0, drawPending: false };
@@ -65,6 +81,8 @@ class HistoryManager {
     }
 
     pushState() {
+        if (appState.viewportMode) return; // a partial mesh must never be synced back
+
         const currentState = this.getCurrentState();
 
         if (this.pointer < this.history.length - 1) {
@@ -98,6 +116,8 @@ class HistoryManager {
     }
 
     applyState() {
+        if (appState.viewportMode) return;
+
         const stateToApply = JSON.parse(JSON.stringify(this.history[this.pointer]));
 
         this.state.mesh = stateToApply.mesh;
@@ -114,12 +134,12 @@ class HistoryManager {
 
     saveToLocalStorage() {
         if (this.history.length > 0) {
-            localStorage.setItem('meshProjectState', JSON.stringify(this.history[this.pointer]));
+            localStorage.setItem(historyStorageKey, JSON.stringify(this.history[this.pointer]));
         }
     }
 
     loadFromLocalStorage() {
-        const savedState = localStorage.getItem('meshProjectState');
+        const savedState = localStorage.getItem(historyStorageKey);
         if (savedState) {
             const state = JSON.parse(savedState);
             this.history = [state];
@@ -0,0 +1,732 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from abaqus_io.deck_read import read_deck
+from abaqus_io.deck_write import write_deck
+from abaqus_io.element_block import ElementBlock
+from abaqus_io.mesh_io import Mesh
+from abaqus_io.mesh_tiles import MeshTiler
+from abaqus_io.native_io import read_native
+
+TRIANGLE_DECK = b"""*NODE
+1, 0.0, 0.0, 0.0
+2, 1.0, 0.0, 0.0
+3, 0.0, 1.0, 0.0
+*ELEMENT, TYPE=CGAX3
+1, 1, 2, 3
+"""
+
+SEGMENT_DECK = b"""*NODE
+1, 0.0, 0.0, 0.0
+2, 1.0, 0.0, 0.0
+"""
+
+app = None
+_workdir = None
+
+
+def setUpModule():
+    # the server keeps its state in temp/ under the working directory
+    global app, _workdir
+    _workdir = tempfile.TemporaryDirectory()
+    cwd = os.getcwd()
+    os.chdir(_workdir.name)
+    try:
+        import app as app_module
+    finally:
+        os.chdir(cwd)
+    app = app_module
+
+
+def tearDownModule():
+    app.jobs.shutdown()
+    app.documents.stop()
+    for doc in app.documents.documents():
+        doc.edit_log.close()
+    _workdir.cleanup()
+
+
+def install_mesh(doc_id, mesh):
+    """Replaces the state of a document by a mesh, as a new version."""
+    with app.documents.use(doc_id) as doc:
+        with doc.lock:
+            doc.mesh = mesh
+            doc.connections = []
+            doc.invalidate_node_indices()
+            doc.pending_drag_moves.clear()
+            doc.version += 1
+    return doc
+
+
+def deck_text(mesh) -> str:
+    """Returns the deck `write_deck` writes for a mesh."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "mesh.inp")
+        write_deck(path, mesh)
+        with open(path) as f:
+            return f.read()
+
+
+def received(client, name):
+    """Returns the arguments of the events of a kind a test client received."""
+    return [message["args"][0] for message in client.get_received() if message["name"] == name]
+
+
+def decode_binary(payload: bytes):
+    """Decodes a binary payload like decodeMeshBinary in static/js/api.js."""
+    header_length = int.from_bytes(payload[:4], "little")
+    header = json.loads(payload[4 : 4 + header_length])
+    start = 4 + header_length
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"]).newbyteorder("<")
+        count = int(np.prod(spec["shape"]))
+        arrays[name] = np.frombuffer(payload, dtype, count, start + spec["offset"]).reshape(spec["shape"])
+    return header, arrays
+
+
+def read_frames(data: bytes):
+    """Splits a progressive mesh stream into its decoded frames."""
+    frames, offset = [], 0
+    while offset < len(data):
+        length = int.from_bytes(data[offset : offset + 4], "little")
+        frames.append(decode_binary(data[offset + 4 : offset + 4 + length]))
+        offset += 4 + length
+    return frames
+
+
+def grid_mesh(n):
+    """An n x n grid of unit CGAX4 elements, with shuffled node IDs and a few sets."""
+    rng = np.random.default_rng(3)
+    ij = np.stack(np.meshgrid(np.arange(n + 1), np.arange(n + 1), indexing="xy"), axis=-1).reshape(-1, 2)
+    points = np.column_stack([ij, np.zeros(len(ij))]).astype(np.float64)
+    ids = rng.permutation(len(ij)) + 1
+    corner = (np.arange(n)[None, :] + (n + 1) * np.arange(n)[:, None]).ravel()
+    rows = np.stack([corner, corner + 1, corner + n + 2, corner + n + 1], axis=1)
+    block = ElementBlock("CGAX4", np.arange(1, n * n + 1), ids[rows])
+    node_sets = {"bottom": ids[: n + 1].tolist()}
+    elem_sets = {"first": [1, 2, 3]}
+    return Mesh(points, ids.tolist(), [block], node_sets, elem_sets, {})
+
+
+class TestMeshPatches(unittest.TestCase):
+
+    DOC = "patches"
+
+    def setUp(self):
+        self.mesh = read_deck(os.path.join("data", "simple_mesh.inp"))
+        self.doc = install_mesh(self.DOC, self.mesh)
+        self.sender = app.socketio.test_client(app.app, query_string=f"doc={self.DOC}")
+        self.viewer = app.socketio.test_client(app.app, query_string=f"doc={self.DOC}")
+        self.addCleanup(self.sender.disconnect)
+        self.addCleanup(self.viewer.disconnect)
+        self.sender.get_received()
+        self.viewer.get_received()
+
+    def patch(self, event, data=None):
+        """Sends an edit and returns the one patch each client received."""
+        version = self.doc.version
+        self.sender.emit(event, data)
+        patches = received(self.viewer, "mesh_patch")
+        self.assertEqual(received(self.sender, "mesh_patch"), patches)
+        self.assertEqual(len(patches), 1)
+        self.assertEqual(patches[0]["version"], version + 1)
+        self.assertEqual(self.doc.version, version + 1)
+        return patches[0]
+
+    def test_node_patches(self):
+        node_id = self.mesh.point_ids[0]
+        patch = self.patch("add_node", {"id": 1000, "x": 1.5, "y": 2.5})
+        self.assertEqual(patch["nodes"], [{"id": 1000, "x": 1.5, "y": 2.5, "z": 0}])
+        self.assertIn(1000, self.mesh.point_ids)
+
+        patch = self.patch("update_node", {"id": node_id, "x": 3.0, "y": 4.0})
+        self.assertEqual(patch["nodes"], [{"id": node_id, "x": 3.0, "y": 4.0, "z": 0}])
+        self.assertFalse(patch.get("isDragging"))
+
+        patch = self.patch("update_nodes_bulk", {"nodes": [{"id": node_id, "x": 5.0, "y": 6.0}]})
+        self.assertEqual(patch["nodes"], [{"id": node_id, "x": 5.0, "y": 6.0, "z": 0}])
+
+        patch = self.patch("delete_node", {"id": 1000})
+        self.assertEqual(patch["removed_nodes"], [1000])
+        self.assertNotIn(1000, self.mesh.point_ids)
+
+    def test_delete_nodes_patch(self):
+        block = next(block for block in self.mesh.cells if len(block))
+        node_id = int(block.connectivity[0, 0])
+        other_id = next(pid for pid in self.mesh.point_ids if pid != node_id)
+        elements = sorted(
+            int(element_id)
+            for block in self.mesh.cells
+            for element_id, nodes in zip(block.ids, block.connectivity)
+            if node_id in nodes
+        )
+        self.patch("add_connection", {"source": node_id, "target": other_id})
+
+        patch = self.patch("delete_nodes_bulk", {"ids": [node_id]})
+        self.assertEqual(patch["removed_nodes"], [node_id])
+        self.assertEqual(patch["removed_elements"], elements)
+        self.assertEqual(patch["removed_connections"], [{"source": node_id, "target": other_id}])
+        self.assertEqual(self.doc.connections, [])
+
+    def test_connection_patches(self):
+        source, target, other = self.mesh.point_ids[:3]
+        patch = self.patch("add_connection", {"source": source, "target": target})
+        self.assertEqual(patch["connections"], [{"source": source, "target": target, "id": 1}])
+
+        connections = [{"source": target, "target": other}, {"source": source, "target": target}]
+        patch = self.patch("add_triangulation_connections", {"connections": connections})
+        # connections that exist already are not sent again
+        self.assertEqual(patch["connections"], connections[:1])
+
+        patch = self.patch("delete_connection", {"source": target, "target": source})
+        self.assertEqual(patch["removed_connections"], [{"source": target, "target": source}])
+        self.assertEqual(self.doc.connections, connections[:1])
+
+    def test_versions_follow_edits(self):
+        node_id = self.mesh.point_ids[0]
+        version = self.doc.version
+        for i in range(3):
+            self.sender.emit("update_node", {"id": node_id, "x": float(i), "y": 0.0})
+        # edits that change nothing are not sent
+        self.sender.emit("delete_node", {"id": -1})
+        self.sender.emit("add_node", {"id": 1000, "x": 9.0, "y": 9.0})
+
+        patches = received(self.viewer, "mesh_patch")
+        self.assertEqual([patch["version"] for patch in patches], list(range(version + 1, version + 5)))
+        self.assertEqual(self.doc.version, version + 4)
+
+    def test_clear_sends_mesh_data(self):
+        version = self.doc.version
+        self.sender.emit("clear_mesh")
+        for client in (self.sender, self.viewer):
+            messages = client.get_received()
+            self.assertNotIn("mesh_patch", [message["name"] for message in messages])
+            states = [message["args"][0] for message in messages if message["name"] == "mesh_data"]
+            self.assertEqual(len(states), 1)
+            self.assertEqual(states[0]["version"], version + 1)
+            self.assertEqual(states[0]["mesh"], {})
+        self.assertIsNone(self.doc.mesh)
+
+    def test_sync_sends_mesh_data_to_others(self):
+        mesh_dict = app.mesh_to_dict(self.mesh)
+        mesh_dict["nodes"] = mesh_dict["nodes"][:2]
+        mesh_dict.update(elements=[], node_sets={}, element_sets={}, surface_sets={})
+        connections = [{"id": 1, "source": mesh_dict["nodes"][0]["id"], "target": mesh_dict["nodes"][1]["id"]}]
+        version = self.doc.version
+        self.sender.emit("sync_mesh", {"mesh": mesh_dict, "connections": connections})
+
+        messages = received(self.viewer, "mesh_data")
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0]["version"], version + 1)
+        self.assertEqual(messages[0]["mesh"]["nodes"], mesh_dict["nodes"])
+        self.assertEqual(messages[0]["connections"], connections)
+        # the sender has the state already and only learns its version
+        messages = [m for m in self.sender.get_received() if m["name"] != "mesh_summary"]
+        self.assertEqual(messages, [{"name": "mesh_version", "args": [{"version": version + 1}], "namespace": "/"}])
+
+    def test_get_mesh_after_a_gap(self):
+        self.patch("update_node", {"id": self.mesh.point_ids[0], "x": 1.0, "y": 2.0})
+        self.sender.emit("get_mesh")
+        messages = received(self.sender, "mesh_data")
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0]["version"], self.doc.version)
+        self.assertEqual(len(messages[0]["mesh"]["nodes"]), len(self.mesh.point_ids))
+        self.assertEqual(received(self.viewer, "mesh_data"), [])
+
+
+class TestBinaryPayload(unittest.TestCase):
+
+    def setUp(self):
+        self.mesh = read_deck(os.path.join("data", "simple_mesh.inp"))
+
+    def test_header_layout(self):
+        payload = app.mesh_to_binary(self.mesh, [], 7)
+        header_length = int.from_bytes(payload[:4], "little")
+        # the arrays start aligned, the header is padded with spaces
+        self.assertEqual((4 + header_length) % app.BINARY_ALIGNMENT, 0)
+        header = json.loads(payload[4 : 4 + header_length])
+        self.assertEqual(header["version"], 7)
+        self.assertEqual(
+            header["arrays"],
+            {
+                "point_ids": {"dtype": "int32", "shape": [12], "offset": 0},
+                "points": {"dtype": "float64", "shape": [12, 3], "offset": 48},
+                "block_0_ids": {"dtype": "int32", "shape": [4], "offset": 336},
+                "block_0_connectivity": {"dtype": "int32", "shape": [4, 3], "offset": 352},
+                "node_sets": {"dtype": "int32", "shape": [16], "offset": 400},
+                "element_sets": {"dtype": "int32", "shape": [10], "offset": 464},
+            },
+        )
+        self.assertEqual(len(payload), 4 + header_length + 504)
+
+    def test_pack_binary(self):
+        arrays = {
+            "a": np.arange(3, dtype="<i4"),
+            "b": np.arange(6, dtype="<f8").reshape(3, 2),
+            "c": np.ones(5, dtype="<f4"),
+        }
+        payload = app.pack_binary({"version": 7}, arrays)
+        header, decoded = decode_binary(payload)
+        self.assertEqual(header["version"], 7)
+        self.assertEqual(
+            header["arrays"],
+            {
+                "a": {"dtype": "int32", "shape": [3], "offset": 0},
+                "b": {"dtype": "float64", "shape": [3, 2], "offset": 16},
+                "c": {"dtype": "float32", "shape": [5], "offset": 64},
+            },
+        )
+        header_length = int.from_bytes(payload[:4], "little")
+        self.assertEqual(len(payload), 4 + header_length + 88)
+        for name, array in arrays.items():
+            self.assertEqual(decoded[name].dtype, array.dtype)
+            np.testing.assert_array_equal(decoded[name], array)
+
+    def test_mesh_round_trip(self):
+        connections = [{"id": 1, "source": 1, "target": 2}]
+        header, arrays = decode_binary(app.mesh_to_binary(self.mesh, connections, 3))
+        self.assertEqual(header["version"], 3)
+        self.assertEqual(header["instance"], app.SERVER_INSTANCE)
+        self.assertEqual(header["connections"], connections)
+        self.assertEqual(header["surface_sets"], self.mesh.surface_sets)
+        for spec in header["arrays"].values():
+            self.assertEqual(spec["offset"] % app.BINARY_ALIGNMENT, 0)
+
+        self.assertEqual(arrays["point_ids"].dtype, np.dtype("<i4"))
+        self.assertEqual(arrays["point_ids"].tolist(), self.mesh.point_ids)
+        self.assertEqual(arrays["points"].dtype, np.dtype("<f8"))
+        np.testing.assert_array_equal(arrays["points"], self.mesh.points)
+
+        blocks = [block for block in self.mesh.cells if len(block)]
+        self.assertEqual([block["element_type"] for block in header["blocks"]], [b.element_type for b in blocks])
+        for spec, block in zip(header["blocks"], blocks):
+            self.assertEqual(arrays[spec["connectivity"]].shape, block.connectivity.shape)
+            np.testing.assert_array_equal(arrays[spec["ids"]], block.ids)
+            np.testing.assert_array_equal(arrays[spec["connectivity"]], block.connectivity)
+
+        for key, sets in (("node_sets", self.mesh.node_sets), ("element_sets", self.mesh.elem_sets)):
+            spec, values = header[key], arrays[key]
+            self.assertEqual(spec["names"], list(sets))
+            decoded = {
+                name: values[spec["offsets"][i] : spec["offsets"][i + 1]].tolist()
+                for i, name in enumerate(spec["names"])
+            }
+            self.assertEqual(decoded, {name: list(ids) for name, ids in sets.items()})
+
+    def test_float32_coordinates_and_large_ids(self):
+        self.mesh.point_ids = [2**40 + i for i in range(len(self.mesh.point_ids))]
+        _, arrays = decode_binary(app.mesh_to_binary(self.mesh, [], 1, coords_dtype="float32"))
+        self.assertEqual(arrays["points"].dtype, np.dtype("<f4"))
+        np.testing.assert_allclose(arrays["points"], self.mesh.points, rtol=1e-6)
+        # beyond int32, IDs are sent as float64, exact up to 2**53
+        self.assertEqual(arrays["point_ids"].dtype, np.dtype("<f8"))
+        self.assertEqual(arrays["point_ids"].astype(np.int64).tolist(), self.mesh.point_ids)
+
+    def test_no_mesh(self):
+        header, arrays = decode_binary(app.mesh_to_binary(None, [], 2))
+        self.assertEqual(arrays, {})
+        self.assertEqual(header["version"], 2)
+        self.assertNotIn("blocks", header)
+
+    def test_route_and_event(self):
+        doc = install_mesh("binary", self.mesh)
+        client = app.app.test_client()
+        response = client.get("/mesh.bin?doc=binary&coords=float32")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/octet-stream")
+        header, arrays = decode_binary(response.data)
+        self.assertEqual(header["version"], doc.version)
+        self.assertEqual(arrays["points"].dtype, np.dtype("<f4"))
+        self.assertEqual(client.get("/mesh.bin?doc=binary&coords=int8").status_code, 400)
+
+        socket = app.socketio.test_client(app.app, query_string="doc=binary")
+        self.addCleanup(socket.disconnect)
+        socket.emit("get_mesh", {"binary": True})
+        messages = received(socket, "mesh_data")
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0]["buffer"], app.mesh_to_binary(self.mesh, [], doc.version))
+
+
+class TestMeshETags(unittest.TestCase):
+
+    DOC = "etags"
+
+    def setUp(self):
+        self.mesh = read_deck(os.path.join("data", "simple_mesh.inp"))
+        self.doc = install_mesh(self.DOC, self.mesh)
+        self.client = app.app.test_client()
+        self.socket = app.socketio.test_client(app.app, query_string=f"doc={self.DOC}")
+        self.addCleanup(self.socket.disconnect)
+
+    def get(self, route, etag=None, **headers):
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        return self.client.get(f"{route}?doc={self.DOC}", headers=headers)
+
+    def test_not_modified(self):
+        for route in ("/mesh.bin", "/last_mesh"):
+            with self.subTest(route=route):
+                response = self.get(route)
+                self.assertEqual(response.status_code, 200)
+                etag = response.headers["ETag"]
+                self.assertTrue(etag.startswith('W/"'))
+                self.assertEqual(response.headers["Cache-Control"], "no-cache")
+
+                cached = self.get(route, etag)
+                self.assertEqual(cached.status_code, 304)
+                self.assertEqual(cached.data, b"")
+                self.assertEqual(cached.headers["ETag"], etag)
+
+                # the ETag does not depend on the encoding
+                compressed = self.get(route, etag, **{"Accept-Encoding": "gzip"})
+                self.assertEqual(compressed.status_code, 304)
+
+    def test_etag_changes_after_edit(self):
+        response = self.get("/mesh.bin")
+        etag = response.headers["ETag"]
+
+        node_id = self.mesh.point_ids[0]
+        self.socket.emit("update_node", {"id": node_id, "x": 5.0, "y": 6.0, "isDragging": False})
+
+        updated = self.get("/mesh.bin", etag)
+        self.assertEqual(updated.status_code, 200)
+        self.assertNotEqual(updated.headers["ETag"], etag)
+        _, arrays = decode_binary(updated.data)
+        index = arrays["point_ids"].tolist().index(node_id)
+        np.testing.assert_array_equal(arrays["points"][index, :2], [5.0, 6.0])
+        self.assertEqual(self.get("/mesh.bin", updated.headers["ETag"]).status_code, 304)
+
+    def test_compressed_body(self):
+        plain = self.get("/last_mesh")
+        compressed = self.get("/last_mesh", **{"Accept-Encoding": "gzip"})
+        self.assertEqual(compressed.headers["Content-Encoding"], "gzip")
+        self.assertEqual(compressed.headers["ETag"], plain.headers["ETag"])
+        self.assertEqual(gzip.decompress(compressed.data), plain.data)
+
+
+class TestDragCoalescing(unittest.TestCase):
+
+    DOC = "drags"
+
+    def setUp(self):
+        self.mesh = read_deck(os.path.join("data", "simple_mesh.inp"))
+        self.doc = install_mesh(self.DOC, self.mesh)
+        # the moves are flushed by the test, not by the background loop
+        patcher = mock.patch.object(app.socketio, "start_background_task")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.dragger = app.socketio.test_client(app.app, query_string=f"doc={self.DOC}")
+        self.viewer = app.socketio.test_client(app.app, query_string=f"doc={self.DOC}")
+        self.addCleanup(self.dragger.disconnect)
+        self.addCleanup(self.viewer.disconnect)
+
+    def test_moves_within_an_interval_make_one_patch(self):
+        node_id, other_id = self.mesh.point_ids[:2]
+        version, last_seq = self.doc.version, self.doc.edit_log.last_seq
+        for x in (1.0, 2.0, 3.0):
+            self.dragger.emit("update_node", {"id": node_id, "x": x, "y": -x, "isDragging": True})
+        self.dragger.emit("update_node", {"id": other_id, "x": 9.0, "y": 9.0, "isDragging": True})
+        self.assertEqual(received(self.viewer, "mesh_patch"), [])
+
+        app.flush_drag_moves(self.doc)
+        for client in (self.viewer, self.dragger):
+            patches = received(client, "mesh_patch")
+            self.assertEqual(len(patches), 1)
+            self.assertEqual(patches[0]["version"], version + 1)
+            self.assertTrue(patches[0]["isDragging"])
+            self.assertEqual(
+                sorted((node["id"], node["x"], node["y"]) for node in patches[0]["nodes"]),
+                sorted([(node_id, 3.0, -3.0), (other_id, 9.0, 9.0)]),
+            )
+        self.assertEqual(self.doc.version, version + 1)
+        np.testing.assert_array_equal(self.mesh.points[self.doc.find_node(node_id), :2], [3.0, -3.0])
+        # intermediate positions are not logged
+        self.assertEqual(self.doc.edit_log.last_seq, last_seq)
+
+        # nothing is left to flush
+        app.flush_drag_moves(self.doc)
+        self.assertEqual(received(self.viewer, "mesh_patch"), [])
+
+    def test_final_position_follows_pending_moves(self):
+        node_id = self.mesh.point_ids[0]
+        version, last_seq = self.doc.version, self.doc.edit_log.last_seq
+        self.dragger.emit("update_node", {"id": node_id, "x": 1.0, "y": 1.0, "isDragging": True})
+        self.dragger.emit("update_node", {"id": node_id, "x": 2.0, "y": 2.0, "isDragging": False})
+
+        patches = received(self.viewer, "mesh_patch")
+        self.assertEqual([patch["version"] for patch in patches], [version + 1, version + 2])
+        self.assertEqual([(node["id"], node["x"], node["y"]) for node in patches[0]["nodes"]], [(node_id, 1.0, 1.0)])
+        self.assertEqual([(node["id"], node["x"], node["y"]) for node in patches[1]["nodes"]], [(node_id, 2.0, 2.0)])
+        self.assertEqual(self.doc.pending_drag_moves, {})
+        # only the final position is logged
+        self.assertEqual(self.doc.edit_log.last_seq, last_seq + 1)
+
+
+class TestLoadJobs(unittest.TestCase):
+
+    def setUp(self):
+        # every test starts from an empty document
+        self.doc_id = self._testMethodName
+        self.client = app.app.test_client()
+
+    def load(self, data: bytes, filename: str, raw: bool = False):
+        """Uploads a file as a form field, or as the raw request body, and returns the job ID."""
+        if raw:
+            response = self.client.post(
+                f"/load?doc={self.doc_id}&filename={filename}", data=data, content_type="application/octet-stream"
+            )
+        else:
+            response = self.client.post(
+                f"/load?doc={self.doc_id}",
+                data={"file": (io.BytesIO(data), filename)},
+                content_type="multipart/form-data",
+            )
+        self.assertEqual(response.status_code, 202)
+        job = response.get_json()["job"]
+        self.assertEqual((job["kind"], job["doc"]), ("load", self.doc_id))
+        return job["id"]
+
+    def wait(self, job_id, timeout=30.0):
+        """Polls a job until it is finished and returns its state."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            state = self.client.get(f"/jobs/{job_id}").get_json()
+            if state["status"] not in ("queued", "running"):
+                return state
+            time.sleep(0.05)
+        self.fail(f"job {job_id} did not finish")
+
+    def cancel_before_install(self):
+        """Cancels the load jobs of the document through the API once their deck is parsed."""
+        tiler = app.MeshTiler
+
+        def cancel(mesh):
+            for job in app.jobs.jobs(self.doc_id):
+                if job.status != "running":
+                    continue
+                response = self.client.post(f"/jobs/{job.id}/cancel")
+                self.assertEqual(response.status_code, 200)
+            return tiler(mesh)
+
+        return mock.patch.object(app, "MeshTiler", side_effect=cancel)
+
+    def test_completed_load(self):
+        viewer = app.socketio.test_client(app.app, query_string=f"doc={self.doc_id}")
+        self.addCleanup(viewer.disconnect)
+        for raw in (False, True):
+            with self.subTest(raw=raw):
+                job_id = self.load(TRIANGLE_DECK, "part.inp", raw)
+                state = self.wait(job_id)
+                self.assertEqual(state["status"], "done")
+                self.assertEqual(state["result"]["num_nodes"], 3)
+                self.assertEqual(state["result"]["num_elements"], 1)
+                updates = [u for u in received(viewer, "job_progress") if u["id"] == job_id]
+                self.assertEqual(updates[-1]["status"], "done")
+
+                with app.documents.use(self.doc_id) as doc:
+                    self.assertEqual(doc.mesh.point_ids, [1, 2, 3])
+                    self.assertEqual(doc.filepath, os.path.join(doc.mesh_dir, "part.inp.native"))
+                    # no upload or parse directory is left behind
+                    self.assertEqual(sorted(os.listdir(doc.mesh_dir)), ["part.inp", "part.inp.native"])
+        self.assertEqual(self.client.get(f"/jobs/{job_id}").get_json()["status"], "done")
+        self.assertEqual(self.client.post(f"/jobs/{job_id}/cancel").status_code, 404)
+        self.assertEqual(self.client.get("/jobs/unknown").status_code, 404)
+
+    def test_cancelled_load(self):
+        with app.documents.use(self.doc_id) as doc:
+            version = doc.version
+        with self.cancel_before_install():
+            state = self.wait(self.load(TRIANGLE_DECK, "part.inp"))
+        self.assertEqual(state["status"], "cancelled")
+        with app.documents.use(self.doc_id) as doc:
+            self.assertIsNone(doc.mesh)
+            self.assertIsNone(doc.filepath)
+            self.assertEqual(doc.version, version)
+            self.assertEqual(os.listdir(doc.mesh_dir), [])
+
+    def test_cancelled_reload_keeps_the_checkpoint(self):
+        state = self.wait(self.load(TRIANGLE_DECK, "part.inp"))
+        self.assertEqual(state["status"], "done")
+        with app.documents.use(self.doc_id) as doc:
+            checkpoint = doc.filepath
+        self.assertEqual(len(read_native(checkpoint).point_ids), 3)
+
+        with self.cancel_before_install():
+            state = self.wait(self.load(SEGMENT_DECK, "part.inp"))
+        self.assertEqual(state["status"], "cancelled")
+
+        with app.documents.use(self.doc_id) as doc:
+            self.assertEqual(doc.filepath, checkpoint)
+            self.assertEqual(len(doc.mesh.point_ids), 3)
+            with open(doc.info_path) as f:
+                self.assertEqual(json.load(f)["filepath"], checkpoint)
+            self.assertEqual(sorted(os.listdir(doc.mesh_dir)), ["part.inp", "part.inp.native"])
+            with open(os.path.join(doc.mesh_dir, "part.inp"), "rb") as f:
+                self.assertEqual(f.read(), TRIANGLE_DECK)
+        # the checkpoint on disk is still the installed mesh
+        self.assertEqual(len(read_native(checkpoint).point_ids), 3)
+
+        state = self.wait(self.load(SEGMENT_DECK, "part.inp"))
+        self.assertEqual(state["status"], "done")
+        with app.documents.use(self.doc_id) as doc:
+            self.assertEqual(doc.filepath, checkpoint)
+            self.assertEqual(len(doc.mesh.point_ids), 2)
+            self.assertEqual(sorted(os.listdir(doc.mesh_dir)), ["part.inp", "part.inp.native"])
+        self.assertEqual(len(read_native(checkpoint).point_ids), 2)
+
+    def test_export_job(self):
+        self.assertEqual(self.client.post(f"/export?doc={self.doc_id}").status_code, 400)
+        mesh = read_deck(os.path.join("data", "simple_mesh.inp"))
+        install_mesh(self.doc_id, mesh)
+        response = self.client.post(f"/export?doc={self.doc_id}")
+        self.assertEqual(response.status_code, 202)
+        job_id = response.get_json()["job"]["id"]
+        self.assertEqual(self.client.get(f"/jobs/{job_id}/download").status_code, 404)
+
+        state = self.wait(job_id)
+        self.assertEqual(state["status"], "done")
+        download = self.client.get(f"/jobs/{job_id}/download")
+        self.assertEqual(download.status_code, 200)
+        self.assertIn("attachment", download.headers["Content-Disposition"])
+        self.assertEqual(len(download.data), state["result"]["size"])
+        download.close()
+        self.assertEqual(download.data.decode(), deck_text(mesh))
+
+
+class TestProgressiveFrames(unittest.TestCase):
+
+    DOC = "frames"
+
+    def setUp(self):
+        self.mesh = grid_mesh(40)
+        self.expected = self.mesh.copy()
+        self.doc = install_mesh(self.DOC, self.mesh)
+        with self.doc.lock:
+            # small tiles, so the overview is decimated and there are several batches
+            self.doc.mesh_tiler = MeshTiler(
+                self.mesh, max_elements=200, max_nodes=50, node_index=self.doc.get_spatial_index()
+            )
+        patcher = mock.patch.object(app, "PROGRESSIVE_BATCH_ELEMENTS", 200)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def check_frames(self, frames, version):
+        """Checks that the frames hold the expected mesh exactly once."""
+        mesh = self.expected
+        kinds = [header["frame"] for header, _ in frames]
+        self.assertEqual(kinds[0], "outline")
+        self.assertEqual(kinds[1], "sample")
+        self.assertGreater(kinds.count("batch"), 1)
+        self.assertEqual(kinds[-1], "done")
+        self.assertEqual({header["version"] for header, _ in frames}, {version})
+
+        outline = frames[0][0]
+        self.assertEqual((outline["num_nodes"], outline["num_elements"]), (len(mesh.point_ids), 1600))
+        self.assertEqual(outline["bounds"], {"min": [0.0, 0.0], "max": [40.0, 40.0]})
+
+        point_ids = np.concatenate([arrays["point_ids"] for _, arrays in frames])
+        points = np.concatenate([arrays["points"] for _, arrays in frames])
+        self.assertEqual(len(point_ids), len(mesh.point_ids))
+        rows = self.doc_rows(mesh, point_ids)
+        np.testing.assert_array_equal(points, mesh.points[rows])
+
+        element_ids, connectivity = [], []
+        for header, arrays in frames:
+            for block in header["blocks"]:
+                self.assertEqual(block["element_type"], "CGAX4")
+                element_ids.append(arrays[block["ids"]])
+                connectivity.append(arrays[block["connectivity"]])
+        element_ids = np.concatenate(element_ids)
+        order = np.argsort(element_ids)
+        np.testing.assert_array_equal(element_ids[order], mesh.cells[0].ids)
+        np.testing.assert_array_equal(np.concatenate(connectivity)[order], mesh.cells[0].connectivity)
+
+        done, arrays = frames[-1]
+        spec = done["node_sets"]
+        self.assertEqual(spec["names"], ["bottom"])
+        self.assertEqual(arrays["node_sets"].tolist(), mesh.node_sets["bottom"])
+        self.assertEqual(arrays["element_sets"].tolist(), mesh.elem_sets["first"])
+
+    def doc_rows(self, mesh, point_ids):
+        """Returns the rows of node IDs in a mesh, checking that each is there once."""
+        self.assertEqual(len(set(point_ids.tolist())), len(point_ids))
+        lookup = {pid: row for row, pid in enumerate(mesh.point_ids)}
+        return np.array([lookup[pid] for pid in point_ids.tolist()])
+
+    def test_stream(self):
+        client = app.app.test_client()
+        response = client.get(f"/mesh.stream?doc={self.DOC}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Cache-Control"], "no-store")
+        self.check_frames(read_frames(response.data), self.doc.version)
+
+        compressed = client.get(f"/mesh.stream?doc={self.DOC}", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(compressed.headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(compressed.data), response.data)
+
+    def test_edits_during_the_stream(self):
+        version = self.doc.version
+        frames = app.mesh_frames(self.doc)
+        data = [next(frames)]
+
+        socket = app.socketio.test_client(app.app, query_string=f"doc={self.DOC}")
+        self.addCleanup(socket.disconnect)
+        # a node appended after the copy, and a corner node moved to the centre
+        socket.emit("add_node", {"id": 10**6, "x": 20.5, "y": 20.5})
+        corner = self.mesh.point_ids[0]
+        socket.emit("update_node", {"id": corner, "x": 20.25, "y": 20.25})
+        self.assertEqual(self.doc.version, version + 2)
+
+        data.extend(frames)
+        frames = [decode_binary(payload[4:]) for payload in data]
+        # the frames hold the mesh as it was, the edits follow as patches
+        self.check_frames(frames, version)
+
+    def test_no_mesh(self):
+        install_mesh(self.DOC, None)
+        frames = read_frames(app.app.test_client().get(f"/mesh.stream?doc={self.DOC}").data)
+        self.assertEqual([header["frame"] for header, _ in frames], ["done"])
+        self.assertEqual(frames[0][1], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+class TestExport(unittest.TestCase):
+
+    DOC = "export"
+
+    def setUp(self):
+        self.client = app.app.test_client()
+
+    def test_export(self):
+        install_mesh(self.DOC, None)
+        self.assertEqual(self.client.get(f"/export?doc={self.DOC}").status_code, 400)
+        mesh = read_deck(os.path.join("data", "simple_mesh.inp"))
+        install_mesh(self.DOC, mesh)
+        expected = deck_text(mesh)
+
+        plain = self.client.get(f"/export?doc={self.DOC}")
+        self.assertEqual(plain.status_code, 200)
+        self.assertIn("attachment", plain.headers["Content-Disposition"])
+        self.assertNotIn("Content-Encoding", plain.headers)
+        self.assertEqual(plain.data.decode(), expected)
+
+        compressed = self.client.get(f"/export?doc={self.DOC}", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(compressed.headers["Content-Encoding"], "gzip")
+        self.assertEqual(compressed.headers["Vary"], "Accept-Encoding")
+        self.assertEqual(gzip.decompress(compressed.data).decode(), expected)
+
+        uncompressed = self.client.get(f"/export?doc={self.DOC}&compress=0", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", uncompressed.headers)
+        self.assertEqual(uncompressed.data.decode(), expected)
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+
+from abaqus_io import read_deck
+from benchmarks.generate import ELEMENT_TYPES, LAYOUTS, generate_deck
+from benchmarks.suite import compare
+
+
+class TestGenerateDeck(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_readable(self):
+        for element_type in ELEMENT_TYPES:
+            for layout in LAYOUTS:
+                with self.subTest(element_type=element_type, layout=layout):
+                    path = os.path.join(self.tmpdir.name, f"{element_type}_{layout}.inp")
+                    info = generate_deck(path, 1001, element_type, layout)
+                    mesh = read_deck(path)
+                    self.assertEqual(len(mesh.points), info["num_nodes"])
+                    self.assertEqual(sum(len(block) for block in mesh.cells), info["num_elements"])
+                    main_block = next(block for block in mesh.cells if block.element_type == element_type)
+                    self.assertEqual(len(main_block), 1001)
+                    self.assertEqual(len(mesh.elem_sets["EALL"]), 1001)
+                    self.assertEqual(len(mesh.elem_sets["EVERY_TENTH"]), 101)
+                    self.assertEqual(len(mesh.node_sets["NALL"]), info["num_nodes"])
+
+    def test_deterministic(self):
+        contents = []
+        for name in ("a", "b"):
+            os.mkdir(os.path.join(self.tmpdir.name, name))
+            path = os.path.join(self.tmpdir.name, name, "mesh.inp")
+            generate_deck(path, 500, "CGAX3", "unstructured", seed=3)
+            with open(path) as f:
+                contents.append(f.read())
+        self.assertEqual(contents[0], contents[1])
+
+
+class TestCompare(unittest.TestCase):
+
+    def test_statuses(self):
+        baseline = {"results": {"a": {"seconds": 1.0}, "b": {"seconds": 1.0}, "c": {"seconds": 1.0}, "d": {"seconds": 1e-3}}}
+        # d is slower, but by less than the timer noise
+        current = {"results": {"a": {"seconds": 1.5}, "b": {"seconds": 0.5}, "d": {"seconds": 3e-3}, "e": {"seconds": 1.0}}}
+        statuses = {row["key"]: row["status"] for row in compare(baseline, current, threshold=0.2)}
+        self.assertEqual(statuses, {"a": "regression", "b": "improvement", "c": "missing", "d": "ok", "e": "new"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,230 @@
+import io
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from abaqus_io.deck_read import read_deck
+from abaqus_io.deck_write import (
+    iter_buffer,
+    split_deck_paths,
+    write_buffer,
+    write_deck,
+    write_split_deck,
+)
+from abaqus_io.element_block import ElementBlock
+from abaqus_io.mesh_io import Mesh
+
+
+def legacy_write_buffer(f, mesh, comment_line=""):
+    """The original per-row writer, kept as the reference output format."""
+    func_node_line = lambda ids: ",".join(f"{id:>9}" for id in ids)
+    nnl = 8
+    if comment_line:
+        f.write(f"{comment_line}\n")
+    f.write("**" + "-" * 78 + "\n")
+    f.write("**  NODE DEFINITION\n")
+    f.write("*NODE\n")
+    for xyz, id in zip(mesh.points, mesh.point_ids):
+        str_coords = ", ".join(f"{entry:10.6f}" for entry in xyz)
+        f.write(f"{id:9}, {str_coords}\n")
+    f.write("**--end--node--definition\n")
+    f.write("**" + "-" * 78 + "\n")
+    f.write("**  NODE SET DEFINITION\n")
+    for name, ids in mesh.node_sets.items():
+        if len(ids) > 0:
+            f.write(f"*NSET, NSET={name}\n")
+            output = ",\n".join(
+                func_node_line(ids[i : i + nnl]) for i in range(0, len(ids), nnl)
+            )
+            f.write(output + ",\n")
+            f.write("**" + "-" * 78 + "\n")
+    f.write("**--end--node--set--definition\n")
+    f.write("**" + "-" * 78 + "\n")
+    f.write("**  ELEMENT DEFINITION\n")
+    for cell_block in mesh.cells:
+        if len(cell_block.ids) > 0:
+            f.write(f"*ELEMENT, TYPE={cell_block.element_type}\n")
+            for eid, row in zip(cell_block.ids, cell_block.connectivity):
+                f.write(" " + str(eid) + "," + func_node_line(row) + ",\n")
+            f.write("**" + "-" * 78 + "\n")
+    f.write("**--end--element--definition\n")
+    f.write("**" + "-" * 78 + "\n")
+    f.write("**  ELEMENT SET DEFINITION\n")
+    for name, ids in mesh.elem_sets.items():
+        if len(ids) > 0:
+            f.write(f"*ELSET, ELSET={name}\n")
+            output = ",\n".join(
+                func_node_line(ids[i : i + nnl]) for i in range(0, len(ids), nnl)
+            )
+            f.write(output + ",\n")
+            f.write("**" + "-" * 78 + "\n")
+    f.write("**--end--element--set--definition\n")
+    f.write("**" + "-" * 78 + "\n")
+    f.write("**  SURFACE DEFINITIONS\n")
+    for name, sets in mesh.surface_sets.items():
+        if len(sets) > 0:
+            f.write(f"*SURFACE, NAME={name}, TYPE=ELEMENT\n")
+            output = "\n".join(
+                func_node_line(sets[i : i + 2]) for i in range(0, len(sets), 2)
+            )
+            f.write(output + "\n")
+            f.write("**" + "-" * 78 + "\n")
+
+
+def random_mesh(num_points=1000, num_elements=700, seed=3):
+    rng = np.random.default_rng(seed)
+    points = rng.normal(scale=1e4, size=(num_points, 3))
+    points[:5] = [[0.0, -0.0, 1e-7], [-5e-7, 5e-7, 123456789.123], [1, 2, 3], [-1, -2, -3], [0.5, 0.25, 0.125]]
+    point_ids = (rng.permutation(num_points) * 7 + 1).tolist()
+    tri = rng.choice(point_ids, size=(num_elements, 3))
+    quad = rng.choice(point_ids, size=(num_elements // 2, 4))
+    cells = [
+        ElementBlock("CGAX3", np.arange(1, num_elements + 1), tri),
+        ElementBlock("CGAX4", np.arange(num_elements + 1, num_elements + len(quad) + 1), quad),
+    ]
+    node_sets = {"odd": point_ids[:13], "many": point_ids[:800], "empty": []}
+    elem_sets = {"eight": list(range(1, 9)), "some": list(range(3, 20))}
+    return Mesh(points, point_ids, cells, node_sets, elem_sets, {"surf": ["eight", "some", "odd"]})
+
+
+class TestWriteBuffer(unittest.TestCase):
+
+    def assert_same_as_legacy(self, mesh, comment_line=""):
+        expected, actual = io.StringIO(), io.StringIO()
+        legacy_write_buffer(expected, mesh, comment_line)
+        write_buffer(actual, mesh, comment_line)
+        self.assertEqual(actual.getvalue(), expected.getvalue())
+
+    def test_simple_mesh_matches_legacy(self):
+        self.assert_same_as_legacy(read_deck(os.path.join("data", "simple_mesh.inp")), "** comment")
+
+    def test_random_mesh_matches_legacy(self):
+        self.assert_same_as_legacy(random_mesh())
+
+    def test_chunk_boundaries_match_legacy(self):
+        from abaqus_io import deck_write
+
+        chunk_rows = deck_write._CHUNK_ROWS
+        deck_write._CHUNK_ROWS = 7
+        try:
+            self.assert_same_as_legacy(random_mesh(num_points=100, num_elements=50))
+        finally:
+            deck_write._CHUNK_ROWS = chunk_rows
+
+
+class TestIterBuffer(unittest.TestCase):
+
+    def test_chunks_join_to_deck(self):
+        mesh = random_mesh()
+        expected = io.StringIO()
+        write_buffer(expected, mesh, "** comment")
+        chunks = list(iter_buffer(mesh, "** comment", min_chunk_size=1024))
+        self.assertEqual("".join(chunks), expected.getvalue())
+        self.assertGreater(len(chunks), 1)
+
+    def test_chunk_size_is_bounded(self):
+        from abaqus_io import deck_write
+
+        chunk_rows = deck_write._CHUNK_ROWS
+        deck_write._CHUNK_ROWS = 10
+        try:
+            chunks = list(iter_buffer(random_mesh(), min_chunk_size=256))
+        finally:
+            deck_write._CHUNK_ROWS = chunk_rows
+        # one pending piece below the threshold plus one chunk of rows at most
+        self.assertLess(max(len(chunk) for chunk in chunks), 256 + 10 * 80)
+
+
+class TestParallelWriteDeck(unittest.TestCase):
+
+    def test_matches_serial_output(self):
+        from abaqus_io import deck_write
+
+        mesh = random_mesh()
+        chunk_rows = deck_write._CHUNK_ROWS
+        deck_write._CHUNK_ROWS = 64
+        try:
+            with tempfile.TemporaryDirectory() as dirname:
+                serial = os.path.join(dirname, "serial.inp")
+                parallel = os.path.join(dirname, "parallel.inp")
+                write_deck(serial, mesh, "** comment")
+                write_deck(parallel, mesh, "** comment", workers=2)
+                with open(serial, "rb") as f:
+                    expected = f.read()
+                with open(parallel, "rb") as f:
+                    actual = f.read()
+        finally:
+            deck_write._CHUNK_ROWS = chunk_rows
+        self.assertEqual(actual, expected)
+
+
+class TestWriteSplitDeck(unittest.TestCase):
+
+    def assert_same_mesh(self, actual, expected):
+        np.testing.assert_allclose(actual.points, expected.points, atol=1e-6)
+        self.assertEqual(actual.point_ids, expected.point_ids)
+        self.assertEqual(
+            [(b.element_type, b.ids.tolist(), b.connectivity.tolist()) for b in actual.cells],
+            [(b.element_type, b.ids.tolist(), b.connectivity.tolist()) for b in expected.cells],
+        )
+        self.assertEqual(actual.node_sets, {k: v for k, v in expected.node_sets.items() if v})
+        self.assertEqual(actual.elem_sets, expected.elem_sets)
+
+    def test_round_trip(self):
+        mesh = random_mesh()
+        mesh.surface_sets = {}
+        with tempfile.TemporaryDirectory() as dirname:
+            filename = os.path.join(dirname, "mesh.inp")
+            written = write_split_deck(filename, mesh, "** comment")
+            self.assertEqual(len(written), 6)
+            self.assertEqual(mesh.dirty_sections, set())
+            self.assert_same_mesh(read_deck(filename), mesh)
+
+    def test_rewrites_dirty_sections_only(self):
+        mesh = read_deck(os.path.join("data", "simple_mesh.inp"))
+        with tempfile.TemporaryDirectory() as dirname:
+            filename = os.path.join(dirname, "mesh.inp")
+            write_split_deck(filename, mesh)
+            self.assertEqual(write_split_deck(filename, mesh), [])
+
+            mesh.points[0] += 1.0
+            mesh.mark_dirty("nodes")
+            written = write_split_deck(filename, mesh)
+            self.assertEqual(written, [split_deck_paths(filename)["nodes"]])
+            self.assert_same_mesh(read_deck(filename), mesh)
+
+    def test_partial_write_keeps_other_sections_dirty(self):
+        mesh = read_deck(os.path.join("data", "simple_mesh.inp"))
+        with tempfile.TemporaryDirectory() as dirname:
+            filename = os.path.join(dirname, "mesh.inp")
+            write_split_deck(filename, mesh)
+            mesh.mark_dirty("nodes", "elements")
+            written = write_split_deck(filename, mesh, sections=["nodes"])
+            self.assertEqual(written, [split_deck_paths(filename)["nodes"]])
+            self.assertEqual(mesh.dirty_sections, {"elements"})
+
+            self.assertEqual(write_split_deck(filename, mesh, sections=[]), [])
+            self.assertEqual(mesh.dirty_sections, {"elements"})
+
+    def test_converts_monolithic_deck(self):
+        mesh = read_deck(os.path.join("data", "simple_mesh.inp"))
+        with tempfile.TemporaryDirectory() as dirname:
+            filename = os.path.join(dirname, "mesh.inp")
+            write_deck(filename, mesh)
+            mesh.clear_dirty()
+            self.assertEqual(len(write_split_deck(filename, mesh)), 6)
+            self.assert_same_mesh(read_deck(filename), mesh)
+            self.assertEqual(os.listdir(dirname).count("mesh.inp"), 1)
+            self.assertFalse([name for name in os.listdir(dirname) if name.endswith(".tmp")])
+
+    def test_unknown_section(self):
+        mesh = read_deck(os.path.join("data", "simple_mesh.inp"))
+        with tempfile.TemporaryDirectory() as dirname:
+            with self.assertRaises(ValueError):
+                write_split_deck(os.path.join(dirname, "mesh.inp"), mesh, sections=["bogus"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,231 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from abaqus_io import is_native, split_deck_includes
+from abaqus_io.deck_read import read_deck
+from abaqus_io.mesh_io import SECTIONS, Mesh
+from documents import DocumentRegistry
+
+
+def apply_move(doc, record):
+    """A minimal edit: moves the nodes of the record."""
+    for node in record["nodes"]:
+        doc.mesh.points[doc.find_node(node["id"])] = [node["x"], node["y"], 0]
+    doc.mesh.mark_dirty("nodes")
+    return {"nodes": record["nodes"]}
+
+
+class TestDocumentRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.registry = DocumentRegistry(self.tmpdir.name, apply_move, memory_budget=1 << 30)
+        self.deck = os.path.join("data", "simple_mesh.inp")
+
+    def tearDown(self):
+        self.registry.stop()
+        for doc in self.registry.documents():
+            doc.edit_log.close()
+        self.tmpdir.cleanup()
+
+    def load(self, doc_id):
+        with self.registry.use(doc_id) as doc:
+            doc.mesh = read_deck(self.deck)
+            doc.filepath = self.deck
+            doc.version += 1
+        return doc
+
+    def edit(self, doc, node_id, x, y):
+        record = {"op": "update_nodes", "nodes": [{"id": node_id, "x": x, "y": y}]}
+        with self.registry.use(doc.id):
+            with doc.lock:
+                apply_move(doc, record)
+                doc.edit_log.append(record)
+
+    def test_invalid_id(self):
+        for doc_id in ("", "../x", "a/b", "x" * 65, None):
+            with self.assertRaises(ValueError):
+                self.registry.get(doc_id)
+
+    def test_documents_are_separate(self):
+        a, b = self.load("a"), self.load("b")
+        node_id = a.mesh.point_ids[0]
+        self.edit(a, node_id, 10.0, 20.0)
+        self.assertEqual(a.mesh.points[0, 0], 10.0)
+        self.assertNotEqual(b.mesh.points[0, 0], 10.0)
+        self.assertEqual(a.room, "doc:a")
+        self.assertEqual(os.path.dirname(a.info_path), os.path.join(self.tmpdir.name, "a"))
+
+    def test_eviction_and_reload(self):
+        a = self.load("a")
+        node_id = a.mesh.point_ids[1]
+        self.edit(a, node_id, 7.0, 8.0)
+        a.connections = [{"id": 1, "source": 1, "target": 2}]
+
+        self.registry.memory_budget = 0
+        self.assertEqual(self.registry.evict_idle(force=True), ["a"])
+        self.assertFalse(a.loaded)
+        self.assertIsNone(a.mesh)
+        self.assertEqual(os.path.dirname(a.filepath), a.mesh_dir)
+        self.assertTrue(is_native(a.filepath))
+        self.assertEqual(a.edit_log.num_records, 0)
+        with open(a.info_path) as f:
+            self.assertEqual(json.load(f)["filepath"], a.filepath)
+
+        with self.registry.use("a") as doc:
+            self.assertIs(doc, a)
+            self.assertTrue(doc.loaded)
+            np.testing.assert_array_equal(doc.mesh.points[doc.find_node(node_id), :2], [7.0, 8.0])
+            self.assertEqual(doc.connections, [{"id": 1, "source": 1, "target": 2}])
+            # the version survives eviction, clients keep patching
+            self.assertEqual(doc.version, 1)
+
+    def load_split_deck(self, doc_id):
+        """Loads a document whose checkpoints are split decks in its directory."""
+        doc = self.load(doc_id)
+        with self.registry.use(doc_id):
+            doc.filepath = None
+        return doc
+
+    def restart(self):
+        """Returns a new registry over the same directories, like a restarted server."""
+        for doc in self.registry.documents():
+            doc.edit_log.close()
+        self.registry = DocumentRegistry(self.tmpdir.name, apply_move, memory_budget=1 << 30)
+        return self.registry
+
+    def test_checkpoint_shares_clean_sections(self):
+        a = self.load_split_deck("a")
+        node_id = a.mesh.point_ids[0]
+        self.edit(a, node_id, 1.0, 2.0)
+        self.assertTrue(a.checkpointer.checkpoint())
+        first = a.filepath
+        first_includes = split_deck_includes(first)
+
+        self.edit(a, node_id, 3.0, 4.0)
+        self.assertTrue(a.checkpointer.checkpoint())
+        includes = split_deck_includes(a.filepath)
+        self.assertNotEqual(a.filepath, first)
+        self.assertFalse(os.path.exists(first))
+        self.assertEqual(includes["elements"], first_includes["elements"])
+        self.assertNotEqual(includes["nodes"], first_includes["nodes"])
+        self.assertFalse(first_includes["nodes"].exists())
+        with open(a.info_path) as f:
+            self.assertEqual(json.load(f)["filepath"], a.filepath)
+
+    def test_snapshot_copies_the_written_sections(self):
+        a = self.load_split_deck("a")
+        node_id = a.mesh.point_ids[0]
+        with mock.patch.object(Mesh, "copy", autospec=True, side_effect=Mesh.copy) as copy:
+            # without a previous checkpoint every section is written
+            self.edit(a, node_id, 1.0, 2.0)
+            self.assertTrue(a.checkpointer.checkpoint())
+            self.edit(a, node_id, 3.0, 4.0)
+            self.assertTrue(a.checkpointer.checkpoint())
+        self.assertEqual(
+            [call.kwargs["sections"] for call in copy.call_args_list], [set(SECTIONS), {"nodes"}]
+        )
+
+        mesh = read_deck(a.filepath)
+        np.testing.assert_array_equal(mesh.points[0, :2], [3.0, 4.0])
+        self.assertEqual(len(mesh.cells), len(a.mesh.cells))
+
+    def test_interrupted_checkpoint_keeps_the_previous_one(self):
+        a = self.load_split_deck("a")
+        node_id = a.mesh.point_ids[0]
+        self.edit(a, node_id, 1.0, 2.0)
+        a.checkpointer.checkpoint()
+        first = a.filepath
+
+        # the files of the second checkpoint are written, but never recorded
+        self.edit(a, node_id, 3.0, 4.0)
+        with mock.patch.object(a, "write_info", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                a.checkpointer.checkpoint()
+        self.assertEqual(a.filepath, first)
+        self.assertEqual(a.mesh.dirty_sections, {"nodes"})
+        first_mesh = read_deck(first)
+        np.testing.assert_array_equal(first_mesh.points[first_mesh.point_ids.index(node_id), :2], [1.0, 2.0])
+
+        with self.restart().use("a") as doc:
+            np.testing.assert_array_equal(doc.mesh.points[doc.find_node(node_id), :2], [3.0, 4.0])
+
+    def test_failed_load_keeps_checkpoint_and_log(self):
+        a = self.load_split_deck("a")
+        node_id = a.mesh.point_ids[0]
+        self.edit(a, node_id, 1.0, 2.0)
+        a.checkpointer.checkpoint()
+        self.edit(a, node_id, 3.0, 4.0)
+        os.remove(split_deck_includes(a.filepath)["nodes"])
+        with open(a.info_path) as f:
+            mesh_info = f.read()
+
+        registry = self.restart()
+        for _ in range(2):
+            with self.assertRaises(IOError):
+                with registry.use("a"):
+                    pass
+        doc = registry.get("a")
+        self.assertFalse(doc.loaded)
+        self.assertIsNone(doc.mesh)
+        with open(a.info_path) as f:
+            self.assertEqual(f.read(), mesh_info)
+        self.assertEqual(len(list(doc.edit_log.replay())), 1)
+
+    def test_least_recently_used_first(self):
+        a, b = self.load("a"), self.load("b")
+        with self.registry.use("a"):
+            pass
+        self.registry.memory_budget = a.memory_usage() + b.memory_usage() - 1
+        self.assertEqual(self.registry.evict_idle(force=True), ["b"])
+        self.assertTrue(a.loaded)
+
+    def test_viewed_and_used_documents_stay(self):
+        a, b = self.load("a"), self.load("b")
+        self.registry.add_viewer("a", "sid-1")
+        self.registry.memory_budget = 0
+        with self.registry.use("b"):
+            self.assertEqual(self.registry.evict_idle(force=True), [])
+        self.assertTrue(a.loaded)
+
+        self.assertIs(self.registry.remove_viewer("sid-1"), a)
+        self.assertEqual(self.registry.document_of("sid-1"), None)
+        self.assertEqual(sorted(self.registry.evict_idle(force=True)), ["a", "b"])
+
+    def test_viewer_moves_between_documents(self):
+        a, b = self.load("a"), self.load("b")
+        self.registry.add_viewer("a", "sid-1")
+        self.registry.add_viewer("b", "sid-1")
+        self.assertEqual(a.viewers, set())
+        self.assertEqual(b.viewers, {"sid-1"})
+        self.assertEqual(self.registry.document_of("sid-1"), "b")
+
+    def test_concurrent_use_during_eviction(self):
+        a = self.load("a")
+        self.registry.memory_budget = 0
+        errors = []
+
+        def use():
+            for _ in range(20):
+                with self.registry.use("a") as doc:
+                    if doc.mesh is None:
+                        errors.append("mesh evicted while in use")
+
+        threads = [threading.Thread(target=use) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for _ in range(20):
+            self.registry.evict_idle(force=True)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
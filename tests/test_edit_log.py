@@ -0,0 +1,149 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from edit_log import Checkpointer, EditLog
+
+
+class TestEditLog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "edit_log.jsonl")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_append_and_replay(self):
+        log = EditLog(self.path)
+        self.assertEqual(log.append({"op": "a"}), 1)
+        self.assertEqual(log.append({"op": "b", "x": 1.5}), 2)
+        log.close()
+
+        log = EditLog(self.path)
+        self.assertEqual(log.last_seq, 2)
+        self.assertEqual(log.num_records, 2)
+        self.assertEqual([r["op"] for r in log.replay()], ["a", "b"])
+        self.assertEqual([r["seq"] for r in log.replay(after=1)], [2])
+        log.close()
+
+    def test_truncated_record_is_ignored(self):
+        log = EditLog(self.path)
+        log.append({"op": "a"})
+        log.close()
+        with open(self.path, "a") as f:
+            f.write('{"seq": 2, "op": "b"')
+
+        self.assertEqual([r["op"] for r in EditLog(self.path).replay()], ["a"])
+
+    def test_rotate(self):
+        log = EditLog(self.path)
+        log.append({"op": "a"})
+        self.assertEqual(log.rotate(), 1)
+        log.append({"op": "b"})
+
+        # rotated records are replayed until discarded
+        self.assertEqual([r["op"] for r in log.replay()], ["a", "b"])
+        self.assertEqual(log.num_records, 1)
+
+        # a second rotation before the first is discarded keeps both
+        log.rotate()
+        self.assertEqual([r["op"] for r in log.replay()], ["a", "b"])
+
+        log.discard_rotated()
+        log.append({"op": "c"})
+        self.assertEqual([(r["seq"], r["op"]) for r in log.replay()], [(3, "c")])
+        log.close()
+
+
+class TestCheckpointer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.log = EditLog(os.path.join(self.tmpdir.name, "edit_log.jsonl"))
+        self.checkpoint_path = os.path.join(self.tmpdir.name, "state.json")
+        self.lock = threading.RLock()
+        self.state = {"value": 0}
+
+    def tearDown(self):
+        self.log.close()
+        self.tmpdir.cleanup()
+
+    def snapshot(self):
+        state = dict(self.state)
+
+        def write(seq):
+            with open(self.checkpoint_path, "w") as f:
+                json.dump({"state": state, "seq": seq}, f)
+
+        return write
+
+    def edit(self, value):
+        with self.lock:
+            self.state["value"] = value
+            self.log.append({"op": "set", "value": value})
+
+    def recover(self):
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        state = checkpoint["state"]
+        for record in self.log.replay(after=checkpoint["seq"]):
+            state["value"] = record["value"]
+        return state
+
+    def test_checkpoint_and_recover(self):
+        checkpointer = Checkpointer(self.log, self.lock, self.snapshot)
+        self.edit(1)
+        self.edit(2)
+        self.assertTrue(checkpointer.checkpoint())
+        self.assertFalse(checkpointer.checkpoint())
+        self.edit(3)
+
+        self.assertEqual(self.recover(), {"value": 3})
+        self.assertEqual([r["value"] for r in self.log.replay()], [3])
+
+    def test_failed_checkpoint_keeps_records(self):
+        def failing_snapshot():
+            def write(seq):
+                raise IOError("disk full")
+
+            return write
+
+        checkpointer = Checkpointer(self.log, self.lock, failing_snapshot)
+        self.edit(1)
+        with self.assertRaises(IOError):
+            checkpointer.checkpoint()
+        self.edit(2)
+        self.assertEqual([r["value"] for r in self.log.replay()], [1, 2])
+
+        checkpointer.snapshot = self.snapshot
+        self.assertTrue(checkpointer.checkpoint())
+        self.assertEqual(list(self.log.replay()), [])
+        self.assertEqual(self.recover(), {"value": 2})
+
+    def test_size_policy(self):
+        checkpointer = Checkpointer(self.log, self.lock, self.snapshot, max_records=2)
+        self.edit(1)
+        self.assertFalse(checkpointer.due())
+        self.edit(2)
+        self.assertTrue(checkpointer.due())
+
+    def test_background_checkpoint(self):
+        checkpointer = Checkpointer(self.log, self.lock, self.snapshot, interval=0.05)
+        checkpointer.start()
+        self.edit(5)
+        checkpointer.notify()
+
+        deadline = time.monotonic() + 5.0
+        while not os.path.exists(self.checkpoint_path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        checkpointer.stop()
+        self.assertEqual(self.recover(), {"value": 5})
+        self.assertEqual(list(self.log.replay()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
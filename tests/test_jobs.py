@@ -0,0 +1,201 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from abaqus_io import read_deck, read_native
+from jobs import Job, JobCancelled, JobExecutor, follow_upload, format_deck, parse_deck
+
+
+def wait(job, timeout=30):
+    deadline = time.monotonic() + timeout
+    while job.finished is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+class TestJobExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.updates = []
+        self.executor = JobExecutor(max_threads=2, max_processes=1, on_update=lambda job: self.updates.append(job.to_dict()))
+        self.deck = os.path.join("data", "simple_mesh.inp")
+
+    def tearDown(self):
+        self.executor.shutdown()
+        self.tmpdir.cleanup()
+
+    def test_result_and_updates(self):
+        job = wait(self.executor.submit("sum", lambda job, a, b: a + b, 1, 2, doc_id="a"))
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.result, 3)
+        self.assertEqual([update["status"] for update in self.updates], ["running", "done"])
+        self.assertIs(self.executor.get(job.id), job)
+        self.assertEqual(self.executor.jobs("a"), [job])
+        self.assertEqual(self.executor.jobs("b"), [])
+
+    def test_failure(self):
+        def fail(job):
+            raise ValueError("bad deck")
+
+        job = wait(self.executor.submit("load", fail))
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.to_dict()["error"], "bad deck")
+
+    def test_cancel_running(self):
+        started = threading.Event()
+
+        def spin(job):
+            started.set()
+            while True:
+                job.report(done=1, total=2)
+                time.sleep(0.01)
+
+        job = self.executor.submit("spin", spin)
+        started.wait(5)
+        self.assertTrue(self.executor.cancel(job.id))
+        wait(job)
+        self.assertEqual(job.status, "cancelled")
+        self.assertFalse(self.executor.cancel(job.id))
+        self.assertFalse(self.executor.cancel("unknown"))
+
+    def test_progress_and_eta(self):
+        job = Job("load")
+        job.set_status("running")
+        job.started -= 10
+        job.report(stage="parsing", done=25, total=100)
+        state = job.to_dict()
+        self.assertEqual(state["progress"]["stage"], "parsing")
+        self.assertAlmostEqual(state["eta"], 30, delta=1)
+
+        job.cancel_requested.set()
+        with self.assertRaises(JobCancelled):
+            job.report(done=50)
+
+    def test_forget_finished(self):
+        self.executor.max_finished = 1
+        path = os.path.join(self.tmpdir.name, "export.deck")
+        open(path, "w").close()
+
+        def own_file(job):
+            job.files.append(path)
+
+        first = wait(self.executor.submit("export", own_file))
+        second = wait(self.executor.submit("export", lambda job: None))
+        self.assertIsNone(self.executor.get(first.id))
+        self.assertIs(self.executor.get(second.id), second)
+        self.assertFalse(os.path.exists(path))
+
+    def test_process_steps(self):
+        native_path = os.path.join(self.tmpdir.name, "mesh.native")
+        deck_path = os.path.join(self.tmpdir.name, "mesh.inp")
+
+        def load_and_export(job):
+            summary = self.executor.run_in_process(job, parse_deck, self.deck, native_path)
+            size = self.executor.run_in_process(job, format_deck, native_path, deck_path)
+            return summary, size
+
+        job = wait(self.executor.submit("load", load_and_export))
+        self.assertEqual(job.status, "done", job.error)
+        summary, size = job.result
+        self.assertEqual(size, os.path.getsize(deck_path))
+
+        expected = read_deck(self.deck)
+        mesh = read_native(native_path)
+        self.assertEqual(summary["num_nodes"], len(expected.points))
+        self.assertEqual(mesh.point_ids, expected.point_ids)
+        self.assertEqual(read_deck(deck_path).point_ids, expected.point_ids)
+        # the progress of the worker reaches the job
+        self.assertIn("stage", job.progress)
+
+    def test_cancel_before_process_step(self):
+        def load(job):
+            job.cancel_requested.set()
+            self.executor.run_in_process(job, parse_deck, self.deck, os.path.join(self.tmpdir.name, "x"))
+
+        job = wait(self.executor.submit("load", load))
+        self.assertEqual(job.status, "cancelled")
+        self.assertIsNone(self.executor._processes)
+
+
+class TestFollowUpload(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "upload.inp")
+        open(self.path, "wb").close()
+        self.upload = {"total": None, "received": 0, "complete": False, "failed": False}
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_slowly(self, data, fail=False):
+        with open(self.path, "wb") as f:
+            for i in range(0, len(data), 100):
+                f.write(data[i : i + 100])
+                f.flush()
+                self.upload["received"] = i + 100
+                time.sleep(0.001)
+        self.upload["failed" if fail else "complete"] = True
+
+    def test_follows_writer(self):
+        with open(os.path.join("data", "simple_mesh.inp"), "rb") as f:
+            data = f.read()
+        writer = threading.Thread(target=self.write_slowly, args=(data,))
+        writer.start()
+        received = b"".join(follow_upload(lambda **progress: None, self.path, self.upload, poll=0.001))
+        writer.join()
+        self.assertEqual(received, data)
+
+    def test_failed_upload(self):
+        writer = threading.Thread(target=self.write_slowly, args=(b"*NODE\n" * 50, True))
+        writer.start()
+        with self.assertRaises(IOError):
+            for _ in follow_upload(lambda **progress: None, self.path, self.upload, poll=0.001):
+                pass
+        writer.join()
+
+    def test_parse_while_written(self):
+        deck = os.path.join("data", "simple_mesh.inp")
+        native_path = os.path.join(self.tmpdir.name, "mesh.native")
+        with open(deck, "rb") as f:
+            data = f.read()
+        # the included deck is looked up next to the upload
+        with open(os.path.join("data", "simple_mesh_include.inp"), "rb") as f:
+            include = f.read()
+        with open(os.path.join(self.tmpdir.name, "simple_mesh_include.inp"), "wb") as f:
+            f.write(include)
+        writer = threading.Thread(target=self.write_slowly, args=(data,))
+        writer.start()
+        summary = parse_deck(lambda **progress: None, self.path, native_path, self.upload)
+        writer.join()
+        self.assertEqual(read_native(native_path).point_ids, read_deck(deck).point_ids)
+        self.assertEqual(summary["num_nodes"], len(read_deck(deck).points))
+
+
+class TestReadDeckProgress(unittest.TestCase):
+
+    def test_sections_reported(self):
+        reports = []
+        deck = os.path.join("data", "simple_mesh.inp")
+        mesh = read_deck(deck, progress=lambda position, section: reports.append((position, section)))
+        self.assertEqual(mesh.point_ids, read_deck(deck).point_ids)
+        sections = [section for _, section in reports]
+        self.assertIn("NODE", sections)
+        self.assertIn("ELEMENT", sections)
+        positions = [position for position, _ in reports]
+        self.assertEqual(positions, sorted(positions))
+
+    def test_cancel(self):
+        def cancel(position, section):
+            if section == "ELEMENT":
+                raise JobCancelled()
+
+        with self.assertRaises(JobCancelled):
+            read_deck(os.path.join("data", "simple_mesh.inp"), progress=cancel)
+
+
+if __name__ == "__main__":
+    unittest.main()
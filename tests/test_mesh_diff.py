@@ -0,0 +1,107 @@
+import json
+import os
+import unittest
+
+import numpy as np
+
+from abaqus_io.deck_read import read_deck
+from abaqus_io.element_block import ElementBlock
+from abaqus_io.mesh_diff import apply_patch, diff, section_hashes
+from abaqus_io.mesh_io import Mesh
+
+
+def assert_same_mesh(test, actual, expected):
+    """Compares meshes up to the order of nodes, elements and set members."""
+    order_a, order_e = np.argsort(actual.point_ids), np.argsort(expected.point_ids)
+    test.assertEqual(sorted(actual.point_ids), sorted(expected.point_ids))
+    np.testing.assert_array_equal(actual.points[order_a], expected.points[order_e])
+
+    def elements(mesh):
+        return sorted(
+            (int(i), block.element_type, tuple(row))
+            for block in mesh.cells
+            for i, row in zip(block.ids, block.connectivity.tolist())
+        )
+
+    test.assertEqual(elements(actual), elements(expected))
+    for kind in ("node_sets", "elem_sets"):
+        test.assertEqual(
+            {k: sorted(v) for k, v in getattr(actual, kind).items()},
+            {k: sorted(v) for k, v in getattr(expected, kind).items()},
+        )
+    test.assertEqual(actual.surface_sets, expected.surface_sets)
+
+
+class TestMeshDiff(unittest.TestCase):
+
+    def setUp(self):
+        self.mesh = read_deck(os.path.join("data", "simple_mesh.inp"))
+
+    def test_identical_meshes(self):
+        patch = diff(self.mesh, self.mesh.copy())
+        self.assertEqual(sorted(patch["identical"]), sorted(section_hashes(self.mesh)))
+        self.assertFalse(any(patch["summary"].values()))
+
+    def test_changes(self):
+        new = self.mesh.copy()
+        new.points[0] += [0.5, 0.0, 0.0]
+        new.points[1] += [1e-9, 0.0, 0.0]
+        new.points = np.vstack([new.points[2:], [[9.0, 9.0, 0.0]]])
+        new.point_ids = new.point_ids[2:] + [100]
+        new.points = np.vstack([[[0.5, 0.0, 0.0]], new.points])
+        new.point_ids = [1] + new.point_ids
+        new.cells = [
+            ElementBlock("CGAX3", [11, 5, 8], [[1, 4, 3], [5, 100, 3], [6, 3, 4]]),
+            ElementBlock("SFMGAX1", [20], [[3, 4]]),
+        ]
+        new.node_sets["left"] = [10, 11, 100]
+        new.node_sets["fresh"] = [1]
+        del new.elem_sets["elem_set1"]
+
+        patch = diff(self.mesh, new, tol=1e-6)
+        json.dumps(patch)
+
+        self.assertEqual(patch["nodes"]["removed"], [2])
+        self.assertEqual(patch["nodes"]["added"], {"ids": [100], "coords": [[9.0, 9.0, 0.0]]})
+        self.assertEqual(patch["nodes"]["moved"]["ids"], [1])
+        self.assertEqual(patch["nodes"]["moved"]["delta"], [[0.5, 0.0, 0.0]])
+        self.assertEqual(patch["elements"]["removed"], [2])
+        self.assertEqual(
+            patch["elements"]["changed"],
+            [{"element_type": "CGAX3", "ids": [11, 5], "connectivity": [[1, 4, 3], [5, 100, 3]]}],
+        )
+        self.assertEqual(
+            patch["elements"]["added"],
+            [{"element_type": "SFMGAX1", "ids": [20], "connectivity": [[3, 4]]}],
+        )
+        self.assertEqual(patch["node_sets"]["changed"]["left"], {"added": [100], "removed": [12, 13]})
+        self.assertEqual(patch["node_sets"]["added"], {"fresh": [1]})
+        self.assertEqual(patch["elem_sets"]["removed"], ["elem_set1"])
+        self.assertIn("surfaces", patch["identical"])
+
+        assert_same_mesh(self, apply_patch(self.mesh, patch), new)
+
+    def test_random_round_trip(self):
+        rng = np.random.default_rng(5)
+        ids_a = rng.permutation(np.arange(1, 3001))[:2000]
+        mesh_a = Mesh(rng.normal(size=(2000, 3)), ids_a.tolist(), [
+            ElementBlock("CGAX4", np.arange(1, 501), rng.choice(ids_a, size=(500, 4)))
+        ], {"s": ids_a[:50].tolist()})
+
+        ids_b = np.concatenate([ids_a[100:], np.arange(3001, 3101)])
+        points_b = np.vstack([mesh_a.points[100:], rng.normal(size=(100, 3))])
+        points_b[::7] += 1.0
+        blocks_b = [
+            ElementBlock("CGAX4", np.arange(250, 751), rng.choice(ids_b, size=(501, 4))),
+            ElementBlock("CGAX3", np.arange(1000, 1010), rng.choice(ids_b, size=(10, 3))),
+        ]
+        mesh_b = Mesh(points_b, ids_b.tolist(), blocks_b, {"s": ids_b[:70].tolist()}, validate_flag=False)
+
+        patch = diff(mesh_a, mesh_b)
+        self.assertEqual(patch["summary"]["nodes_added"], 100)
+        self.assertEqual(patch["summary"]["nodes_removed"], 100)
+        assert_same_mesh(self, apply_patch(mesh_a, json.loads(json.dumps(patch))), mesh_b)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import unittest
+from collections import deque
+
+import numpy as np
+
+from abaqus_io.element_block import ElementBlock
+from abaqus_io.mesh_graph import (
+    bandwidth_profile,
+    cuthill_mckee,
+    morton_order,
+    node_adjacency,
+    pseudo_peripheral_node,
+)
+from abaqus_io.mesh_io import Mesh
+
+
+def reference_cuthill_mckee(indptr, indices, start):
+    """Textbook queue-based Cuthill-McKee for a single component."""
+    degree = np.diff(indptr)
+    visited = {start}
+    order = []
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        order.append(node)
+        neighbours = [n for n in indices[indptr[node] : indptr[node + 1]] if n not in visited]
+        for n in sorted(neighbours, key=lambda n: (degree[n], n)):
+            visited.add(n)
+            queue.append(n)
+    return order
+
+
+def grid_mesh(nx, ny, seed=0):
+    """A structured quad mesh with shuffled node IDs."""
+    rng = np.random.default_rng(seed)
+    x, y = np.meshgrid(np.arange(nx + 1), np.arange(ny + 1), indexing="ij")
+    points = np.column_stack([x.ravel(), y.ravel(), np.zeros(x.size)]).astype(float)
+    ids = rng.permutation(x.size) + 1
+    index = np.arange(x.size).reshape(nx + 1, ny + 1)
+    connectivity = np.column_stack(
+        [
+            index[:-1, :-1].ravel(),
+            index[1:, :-1].ravel(),
+            index[1:, 1:].ravel(),
+            index[:-1, 1:].ravel(),
+        ]
+    )
+    elem_ids = rng.permutation(len(connectivity)) + 100
+    cells = [ElementBlock("CGAX4", elem_ids, ids[connectivity])]
+    return Mesh(
+        points,
+        ids.tolist(),
+        cells,
+        node_sets={"corner": [int(ids[0])]},
+        elem_sets={"first": [int(elem_ids[0])]},
+    )
+
+
+class TestNodeAdjacency(unittest.TestCase):
+
+    def test_triangle_pair(self):
+        indptr, indices = node_adjacency([np.array([[0, 1, 2], [0, 2, 3]])], 5)
+        neighbours = [indices[indptr[i] : indptr[i + 1]].tolist() for i in range(5)]
+        self.assertEqual(neighbours, [[1, 2, 3], [0, 2], [0, 1, 3], [0, 2], []])
+
+
+class TestCuthillMcKee(unittest.TestCase):
+
+    def test_matches_reference(self):
+        mesh = grid_mesh(7, 5)
+        ids = np.asarray(mesh.point_ids)
+        lookup = np.argsort(ids)
+        connectivity = lookup[np.searchsorted(ids[lookup], mesh.cells[0].connectivity)]
+        indptr, indices = node_adjacency([connectivity], len(ids))
+
+        perm = cuthill_mckee(indptr, indices, reverse=False)
+        start = pseudo_peripheral_node(indptr, indices, int(np.argmin(np.diff(indptr))))
+        self.assertEqual(perm.tolist(), reference_cuthill_mckee(indptr, indices, start))
+
+    def test_disconnected_and_isolated(self):
+        indptr, indices = node_adjacency([np.array([[0, 1], [3, 4]])], 6)
+        perm = cuthill_mckee(indptr, indices)
+        self.assertEqual(sorted(perm.tolist()), list(range(6)))
+
+    def test_reduces_bandwidth(self):
+        mesh = grid_mesh(20, 10)
+        report = mesh.renumber("rcm")
+        self.assertLessEqual(report["bandwidth_after"], 22)
+        self.assertLess(report["bandwidth_after"], report["bandwidth_before"])
+        self.assertLess(report["profile_after"], report["profile_before"])
+
+
+class TestBandwidthProfile(unittest.TestCase):
+
+    def test_path(self):
+        indptr, indices = node_adjacency([np.array([[0, 2], [2, 1]])], 3)
+        self.assertEqual(bandwidth_profile(indptr, indices), (2, 2))
+        self.assertEqual(bandwidth_profile(indptr, indices, np.array([0, 2, 1])), (1, 2))
+
+
+class TestMortonOrder(unittest.TestCase):
+
+    def test_quadrants(self):
+        coords = np.array([[1.0, 1.0], [0.0, 0.0], [1.0, 0.0], [0.0, 1.0]])
+        self.assertEqual(morton_order(coords).tolist(), [1, 2, 3, 0])
+
+
+class TestRenumber(unittest.TestCase):
+
+    def check_consistent(self, original, mesh, report):
+        node_map = dict(report["node_map"].tolist())
+        element_map = dict(report["element_map"].tolist())
+        num_points = len(original.points)
+
+        self.assertEqual(mesh.point_ids, list(range(1, num_points + 1)))
+        old_coords = dict(zip(original.point_ids, map(tuple, original.points)))
+        for old_id, new_id in node_map.items():
+            self.assertEqual(tuple(mesh.points[new_id - 1]), old_coords[old_id])
+
+        old_elements = dict(zip(original.cells[0].ids.tolist(), original.cells[0].connectivity.tolist()))
+        for new_id, row in zip(mesh.cells[0].ids.tolist(), mesh.cells[0].connectivity.tolist()):
+            old_id = [k for k, v in element_map.items() if v == new_id][0]
+            self.assertEqual(row, [node_map[n] for n in old_elements[old_id]])
+
+        self.assertEqual(mesh.node_sets["corner"], [node_map[original.node_sets["corner"][0]]])
+        self.assertEqual(mesh.elem_sets["first"], [element_map[original.elem_sets["first"][0]]])
+        mesh._validate_data()
+
+    def test_strategies(self):
+        for strategy in ("rcm", "compact", "spatial"):
+            with self.subTest(strategy=strategy):
+                original = grid_mesh(4, 3)
+                mesh = original.copy()
+                report = mesh.renumber(strategy)
+                self.check_consistent(original, mesh, report)
+
+    def test_compact_keeps_order(self):
+        mesh = grid_mesh(3, 3)
+        report = mesh.renumber("compact")
+        node_map = report["node_map"][np.argsort(report["node_map"][:, 0])]
+        self.assertEqual(node_map[:, 1].tolist(), list(range(1, 17)))
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            grid_mesh(2, 2).renumber("metis")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,12 @@
 import unittest
 import os
+import tempfile
 import numpy as np
 
-from abaqus_io.deck_read import read_deck
-from abaqus_io.deck_write import write_deck
+from abaqus_io.deck_read import read_deck, open_chunks
+from abaqus_io.deck_write import write_deck, write_partitioned
 from abaqus_io.mesh_io import Mesh
+from abaqus_io.element_block import ElementBlock
 
 
 class TestAbaqusDeckIO(unittest.TestCase):
@@ -43,5 +45,203 @@ class TestAbaqusDeckIO(unittest.TestCase):
         )
 
 
+class TestReadDeckStream(unittest.TestCase):
+
+    def test_chunks(self):
+        path = os.path.join("data", "simple_mesh.inp")
+        with open(path, "rb") as f:
+            data = f.read()
+        # chunks end mid-line, and the file object has no name
+        chunks = (data[i : i + 7] for i in range(0, len(data), 7))
+        with open_chunks(chunks) as f:
+            mesh = read_deck(f, base_dir="data")
+        expected = read_deck(path)
+        self.assertEqual(mesh.point_ids, expected.point_ids)
+        np.testing.assert_array_equal(mesh.points, expected.points)
+        self.assertEqual(len(mesh.cells), len(expected.cells))
+
+    def test_include_looked_up_in_base_dir(self):
+        with open(os.path.join("data", "simple_mesh.inp"), "rb") as f:
+            data = f.read()
+        with open_chunks([data]) as f:
+            with self.assertRaises(IOError):
+                read_deck(f, base_dir=tempfile.gettempdir())
+
+
+class TestMergeCoincident(unittest.TestCase):
+
+    def test_merge_simple_mesh(self):
+        mesh = read_deck(os.path.join("data", "simple_mesh.inp"))
+        merge_map = mesh.merge_coincident(1e-6)
+
+        self.assertEqual(
+            merge_map.tolist(), [[10, 1], [11, 2], [12, 3], [13, 4], [7, 5], [8, 6]]
+        )
+        self.assertEqual(mesh.point_ids, [1, 2, 3, 4, 5, 6])
+        self.assertEqual(len(mesh.points), 6)
+        self.assertEqual(mesh.node_sets["left"], [1, 2, 3, 4])
+        self.assertEqual(mesh.node_sets["Extra"], [5, 6])
+        self.assertTrue(set(mesh.cells[0].connectivity.ravel()) <= set(mesh.point_ids))
+
+    def test_merge_marks_sections_dirty(self):
+        mesh = read_deck(os.path.join("data", "simple_mesh.inp"))
+        mesh.clear_dirty()
+        mesh.merge_coincident(1e-6)
+        self.assertEqual(mesh.dirty_sections, {"nodes", "node_sets", "elements"})
+        with self.assertRaises(ValueError):
+            mesh.mark_dirty("bogus")
+
+    def test_merge_with_tolerance(self):
+        points = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [1.0 + 1e-9, 0.0, 0.0]])
+        cells = [ElementBlock("SFMGAX1", [1, 2], [[9, 8], [9, 7]])]
+        mesh = Mesh(points, [9, 7, 8], cells, node_sets={"all": [9, 8, 7]})
+
+        merge_map = mesh.merge_coincident(1e-6)
+
+        self.assertEqual(merge_map.tolist(), [[8, 7]])
+        self.assertEqual(mesh.point_ids, [9, 7])
+        np.testing.assert_array_equal(mesh.cells[0].connectivity, [[9, 7], [9, 7]])
+        self.assertEqual(mesh.node_sets["all"], [9, 7])
+
+    def test_merge_across_cell_boundaries(self):
+        # each pair straddles a multiple of the tolerance, in every direction
+        points = np.array([
+            [1e-6 - 1e-12, 0.0, 0.0], [1e-6 + 1e-12, 0.0, 0.0],
+            [0.5e-6 - 1e-12, 1.0, 0.0], [0.5e-6 + 1e-12, 1.0, 0.0],
+            [2.0, 3e-6 - 1e-12, -1e-12], [2.0 - 1e-12, 3e-6 + 1e-12, 1e-12],
+        ])
+        mesh = Mesh(points, [1, 2, 3, 4, 5, 6], [])
+
+        merge_map = mesh.merge_coincident(1e-6)
+
+        self.assertEqual(merge_map.tolist(), [[2, 1], [4, 3], [6, 5]])
+        self.assertEqual(mesh.point_ids, [1, 3, 5])
+
+    def test_merge_respects_tolerance(self):
+        points = np.array([[0.0, 0.0], [1.1e-6, -0.5e-6], [0.0, 0.9e-6], [0.8e-6, 0.8e-6]])
+        mesh = Mesh(points, [4, 3, 2, 1], [])
+
+        merge_map = mesh.merge_coincident(1e-6)
+
+        # (0, 0) and (0.8, 0.8) are 1.13 apart, but both lie within the tolerance of (0, 0.9)
+        self.assertEqual(merge_map.tolist(), [[4, 1], [2, 1]])
+        self.assertEqual(mesh.point_ids, [3, 1])
+
+    def test_merge_matches_brute_force(self):
+        rng = np.random.default_rng(3)
+        points = rng.integers(0, 20, size=(300, 3)) * 0.5e-6 + rng.normal(scale=0.2e-6, size=(300, 3))
+        mesh = Mesh(points, list(range(1, 301)), [])
+
+        merge_map = mesh.merge_coincident(1e-6)
+
+        # connected components of the "closer than tol" graph
+        close = np.linalg.norm(points[:, None] - points[None], axis=2) <= 1e-6
+        kept = np.arange(300)
+        for _ in range(300):
+            kept = np.array([kept[row].min() for row in close])
+        expected = [[i + 1, k + 1] for i, k in enumerate(kept) if i != k]
+        self.assertEqual(merge_map.tolist(), expected)
+
+    def test_merge_without_duplicates(self):
+        points = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0]])
+        mesh = Mesh(points, [1, 2], [])
+        self.assertEqual(len(mesh.merge_coincident(1e-6)), 0)
+        self.assertEqual(mesh.point_ids, [1, 2])
+
+
+def strip_mesh(num_elements):
+    """A row of unit quads along x, with node and element sets."""
+    x = np.repeat(np.arange(num_elements + 1, dtype=float), 2)
+    y = np.tile([0.0, 1.0], num_elements + 1)
+    points = np.column_stack([x, y, np.zeros_like(x)])
+    point_ids = list(range(1, len(points) + 1))
+    bottom = np.arange(num_elements) * 2 + 1
+    connectivity = np.column_stack([bottom, bottom + 2, bottom + 3, bottom + 1])
+    cells = [ElementBlock("CGAX4", np.arange(1, num_elements + 1), connectivity)]
+    return Mesh(
+        points,
+        point_ids,
+        cells,
+        node_sets={"left": [1, 2], "right": [len(points) - 1, len(points)]},
+        elem_sets={"first": [1], "all": list(range(1, num_elements + 1))},
+    )
+
+
+class TestPartition(unittest.TestCase):
+
+    def test_balanced_parts(self):
+        mesh = strip_mesh(12)
+        for method in ("rcb", "graph"):
+            with self.subTest(method=method):
+                labels = mesh.partition(3, method)
+                self.assertEqual(len(labels), 1)
+                self.assertEqual(np.bincount(labels[0]).tolist(), [4, 4, 4])
+                # parts of a strip are contiguous runs of elements
+                self.assertEqual(np.count_nonzero(np.diff(labels[0])), 2)
+
+    def test_single_part(self):
+        labels = strip_mesh(5).partition(1)
+        self.assertTrue(np.all(labels[0] == 0))
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            strip_mesh(2).partition(0)
+        with self.assertRaises(ValueError):
+            strip_mesh(2).partition(2, "metis")
+
+    def test_extract(self):
+        mesh = strip_mesh(4)
+        submesh = mesh.extract([np.array([True, True, False, False])])
+        self.assertEqual(submesh.point_ids, [1, 2, 3, 4, 5, 6])
+        self.assertEqual(submesh.node_sets, {"left": [1, 2]})
+        self.assertEqual(submesh.elem_sets, {"first": [1], "all": [1, 2]})
+        submesh._validate_data()
+
+    def test_write_partitioned(self):
+        mesh = strip_mesh(6)
+        with tempfile.TemporaryDirectory() as dirname:
+            paths = write_partitioned(dirname, mesh, 3, workers=2)
+            self.assertEqual([os.path.basename(p) for p in paths], ["part_000.inp", "part_001.inp", "part_002.inp"])
+
+            parts = [read_deck(path) for path in paths]
+        self.assertEqual(sum(len(part.cells[0]) for part in parts), 6)
+        # the middle part touches both neighbours through one column of nodes
+        self.assertEqual(sorted(parts[1].node_sets["INTERFACE"]), [5, 6, 9, 10])
+        self.assertEqual(sorted(parts[1].node_sets["INTERFACE_P0"]), [5, 6])
+        self.assertEqual(sorted(parts[1].node_sets["INTERFACE_P2"]), [9, 10])
+        self.assertNotIn("INTERFACE_P2", parts[0].node_sets)
+
+
+
+class TestCopy(unittest.TestCase):
+
+    def test_copy_sections(self):
+        mesh = strip_mesh(2)
+        mesh.clear_dirty("elements")
+        copied = mesh.copy(sections=["nodes"])
+
+        self.assertIsNot(copied.points, mesh.points)
+        self.assertIsNot(copied.point_ids, mesh.point_ids)
+        np.testing.assert_array_equal(copied.points, mesh.points)
+        # the other sections share their data, in new containers
+        self.assertIs(copied.cells[0], mesh.cells[0])
+        self.assertIs(copied.node_sets["left"], mesh.node_sets["left"])
+        mesh.node_sets["extra"] = [1]
+        mesh.cells.append(ElementBlock("CGAX4", [9], [[1, 2, 3, 4]]))
+        self.assertNotIn("extra", copied.node_sets)
+        self.assertEqual(len(copied.cells), 1)
+
+        self.assertEqual(copied.dirty_sections, mesh.dirty_sections)
+        mesh.clear_dirty()
+        self.assertNotEqual(copied.dirty_sections, set())
+        with self.assertRaises(ValueError):
+            mesh.copy(sections=["bogus"])
+
+    def test_deep_copy(self):
+        mesh = strip_mesh(2)
+        copied = mesh.copy()
+        self.assertIsNot(copied.cells[0], mesh.cells[0])
+        self.assertIsNot(copied.node_sets["left"], mesh.node_sets["left"])
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+
+import numpy as np
+
+from abaqus_io.element_block import ElementBlock
+from abaqus_io.mesh_io import Mesh
+from abaqus_io.mesh_tiles import MeshTiler
+
+
+def grid_mesh(n):
+    """An n x n grid of unit CGAX4 elements, with shuffled node IDs."""
+    rng = np.random.default_rng(3)
+    ij = np.stack(np.meshgrid(np.arange(n + 1), np.arange(n + 1), indexing="xy"), axis=-1).reshape(-1, 2)
+    points = np.column_stack([ij, np.zeros(len(ij))]).astype(np.float64)
+    ids = rng.permutation(len(ij)) + 1
+    corner = (np.arange(n)[None, :] + (n + 1) * np.arange(n)[:, None]).ravel()
+    rows = np.stack([corner, corner + 1, corner + n + 2, corner + n + 1], axis=1)
+    block = ElementBlock("CGAX4", np.arange(1, n * n + 1), ids[rows])
+    return Mesh(points, ids.tolist(), [block])
+
+
+class TestMeshTiler(unittest.TestCase):
+
+    def setUp(self):
+        self.mesh = grid_mesh(40)
+        self.tiler = MeshTiler(self.mesh, max_elements=200, max_nodes=50)
+
+    def test_boundary_edges(self):
+        edges = self.tiler.boundary_edges
+        self.assertEqual(len(edges), 4 * 40)
+        xy = self.mesh.points[edges.ravel(), :2]
+        on_boundary = np.any((xy == 0) | (xy == 40), axis=1)
+        self.assertTrue(np.all(on_boundary))
+
+    def test_level_for_scale(self):
+        self.assertEqual(self.tiler.level_for_scale(256 / 40), 0)
+        self.assertEqual(self.tiler.level_for_scale(4 * 256 / 40), 2)
+        self.assertEqual(self.tiler.level_for_scale(1e12), self.tiler.max_level)
+
+    def test_tiles_partition_elements(self):
+        level = 3
+        tiles = self.tiler.tiles_in_box([0, 0], [40, 40], level)
+        self.assertEqual(len(tiles), 64)
+        elements = []
+        for tx, ty in tiles:
+            tile = self.tiler.tile(level, tx, ty)
+            self.assertFalse(tile["decimated"])
+            rows = tile["element_rows"][0]
+            elements.append(rows)
+            # the nodes of the tile elements are sent along
+            connectivity = self.mesh.cells[0].connectivity[rows]
+            node_ids = np.asarray(self.mesh.point_ids)[tile["node_rows"]]
+            self.assertTrue(np.isin(connectivity, node_ids).all())
+        elements = np.concatenate(elements)
+        self.assertEqual(len(elements), 40 * 40)
+        self.assertEqual(len(np.unique(elements)), 40 * 40)
+
+    def test_decimated_tile(self):
+        tile = self.tiler.tile(0, 0, 0)
+        self.assertTrue(tile["decimated"])
+        self.assertEqual(tile["num_elements"], 40 * 40)
+        self.assertEqual(len(tile["element_rows"][0]), 0)
+        self.assertEqual(len(tile["edges"]), 4 * 40)
+        self.assertTrue(np.isin(tile["edges"].ravel(), tile["node_rows"]).all())
+
+    def test_full_tiles(self):
+        tiles = list(self.tiler.full_tiles(0))
+        self.assertTrue(all(not tile["decimated"] for *_, tile in tiles))
+        self.assertTrue(all(tile["num_elements"] <= 200 for *_, tile in tiles))
+        elements = np.concatenate([tile["element_rows"][0] for *_, tile in tiles])
+        self.assertEqual(len(elements), 40 * 40)
+        self.assertEqual(len(np.unique(elements)), 40 * 40)
+        nodes = np.unique(np.concatenate([tile["node_rows"] for *_, tile in tiles]))
+        self.assertEqual(len(nodes), 41 * 41)
+        # the order of the given tiles is kept
+        first = list(self.tiler.full_tiles(3, [(7, 7), (0, 0)]))
+        self.assertEqual(first[0][1:3], (7, 7))
+        self.assertEqual(first[-1][1:3], (0, 0))
+
+    def test_copy_keeps_node_positions(self):
+        copy = self.tiler.copy()
+        before = copy.tile(3, 0, 0)["node_rows"]
+        # append a node in the corner tile and move one of the far tile there
+        far = self.tiler.tile(3, 7, 7)["node_rows"][0]
+        self.tiler.node_index.update([len(self.mesh.points), far], [[0.5, 0.5], [0.25, 0.25]])
+        np.testing.assert_array_equal(copy.tile(3, 0, 0)["node_rows"], before)
+        nodes = self.tiler.tile(3, 0, 0)["node_rows"]
+        self.assertIn(len(self.mesh.points), nodes)
+        self.assertIn(far, nodes)
+        self.assertIs(copy.element_index, self.tiler.element_index)
+
+    def test_tiles_outside(self):
+        self.assertEqual(self.tiler.tiles_in_box([50, 50], [60, 60], 2), [])
+
+    def test_empty_mesh(self):
+        tiler = MeshTiler(Mesh(np.empty((0, 3)), [], []))
+        tile = tiler.tile(0, 0, 0)
+        self.assertEqual(len(tile["node_rows"]), 0)
+        self.assertEqual(len(tiler.boundary_edges), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import math
+import unittest
+
+from metrics import MetricsRegistry
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter(self):
+        counter = self.registry.counter("events_total", "Events.", ("event",))
+        counter.inc(event="add_node")
+        counter.inc(2, event="add_node")
+        counter.inc(event="sync_mesh")
+        lines = self.registry.render().splitlines()
+        self.assertEqual(lines[:2], ["# HELP events_total Events.", "# TYPE events_total counter"])
+        self.assertIn('events_total{event="add_node"} 3', lines)
+        self.assertIn('events_total{event="sync_mesh"} 1', lines)
+        with self.assertRaises(ValueError):
+            counter.inc(-1, event="add_node")
+
+    def test_labels_validated_and_escaped(self):
+        counter = self.registry.counter("errors_total", "Errors.", ("message",))
+        with self.assertRaises(ValueError):
+            counter.inc()
+        with self.assertRaises(ValueError):
+            counter.inc(message="x", other="y")
+        counter.inc(message='bad "deck"\n')
+        self.assertIn('errors_total{message="bad \\"deck\\"\\n"} 1', self.registry.render())
+
+    def test_histogram(self):
+        histogram = self.registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 2):
+            histogram.observe(value)
+        lines = self.registry.render().splitlines()
+        self.assertEqual(
+            lines[2:],
+            [
+                'latency_seconds_bucket{le="0.1"} 2',
+                'latency_seconds_bucket{le="1"} 3',
+                'latency_seconds_bucket{le="+Inf"} 4',
+                "latency_seconds_sum 2.65",
+                "latency_seconds_count 4",
+            ],
+        )
+        self.assertEqual(histogram.buckets[-1], math.inf)
+        with histogram.time():
+            pass
+        self.assertIn("latency_seconds_count 5", self.registry.render())
+
+    def test_gauge_collect(self):
+        sizes = {"a": 10}
+        self.registry.gauge("mesh_nodes", "Nodes.", ("doc",), collect=lambda: [({"doc": k}, v) for k, v in sizes.items()])
+        self.assertIn('mesh_nodes{doc="a"} 10', self.registry.render())
+        sizes["b"] = 2.5
+        self.assertIn('mesh_nodes{doc="b"} 2.5', self.registry.render())
+
+    def test_duplicate_name(self):
+        self.registry.gauge("documents_loaded", "Documents.")
+        with self.assertRaises(ValueError):
+            self.registry.counter("documents_loaded", "Documents.")
+
+
+if __name__ == "__main__":
+    unittest.main()
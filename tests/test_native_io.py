@@ -0,0 +1,94 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from abaqus_io.deck_read import read_deck
+from abaqus_io.mesh_io import Mesh
+from abaqus_io.native_io import is_native, read_native, read_native_manifest, write_native
+
+
+class TestNativeIO(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.mesh = read_deck(os.path.join("data", "simple_mesh.inp"))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def assert_same_mesh(self, actual, expected):
+        np.testing.assert_array_equal(actual.points, expected.points)
+        self.assertEqual(actual.point_ids, expected.point_ids)
+        self.assertEqual(
+            [(b.element_type, b.ids.tolist(), b.connectivity.tolist()) for b in actual.cells],
+            [(b.element_type, b.ids.tolist(), b.connectivity.tolist()) for b in expected.cells],
+        )
+        self.assertEqual(actual.node_sets, expected.node_sets)
+        self.assertEqual(actual.elem_sets, expected.elem_sets)
+        self.assertEqual(actual.surface_sets, expected.surface_sets)
+
+    def test_round_trip(self):
+        for name in ("project", "project.zip"):
+            path = os.path.join(self.tmpdir.name, name)
+            self.mesh.save_native(path, extra={"connections": [{"source": 1, "target": 2}]})
+            self.assertTrue(is_native(path))
+            self.assertEqual(
+                read_native_manifest(path)["extra"], {"connections": [{"source": 1, "target": 2}]}
+            )
+            for mmap in (True, False):
+                with self.subTest(name=name, mmap=mmap):
+                    loaded = Mesh.load_native(path, mmap=mmap)
+                    self.assert_same_mesh(loaded, self.mesh)
+                    self.assertEqual(loaded.dirty_sections, set())
+                    self.assertEqual(isinstance(loaded.points, np.memmap), mmap)
+
+    def test_mapped_mesh_edits_do_not_touch_file(self):
+        path = os.path.join(self.tmpdir.name, "project.zip")
+        write_native(path, self.mesh)
+        loaded = read_native(path)
+        loaded.points[0] = [9.0, 9.0, 9.0]
+        np.testing.assert_array_equal(read_native(path).points, self.mesh.points)
+
+    def test_rewrites_given_sections_only(self):
+        path = os.path.join(self.tmpdir.name, "project")
+        write_native(path, self.mesh)
+        elements_mtime = os.stat(os.path.join(path, "cells_0_ids.npy")).st_mtime_ns
+
+        self.mesh.points[0] += 1.0
+        write_native(path, self.mesh, sections=["nodes"])
+        self.assertEqual(os.stat(os.path.join(path, "cells_0_ids.npy")).st_mtime_ns, elements_mtime)
+        self.assert_same_mesh(read_native(path), self.mesh)
+
+    def test_base_arrays_are_linked(self):
+        base = os.path.join(self.tmpdir.name, "base")
+        write_native(base, self.mesh)
+        old_points = self.mesh.points.copy()
+
+        path = os.path.join(self.tmpdir.name, "next")
+        self.mesh.points[0] += 1.0
+        write_native(path, self.mesh, sections=["nodes"], base=base)
+        self.assertTrue(os.path.samefile(os.path.join(base, "cells_0_ids.npy"), os.path.join(path, "cells_0_ids.npy")))
+        self.assertFalse(os.path.samefile(os.path.join(base, "points.npy"), os.path.join(path, "points.npy")))
+        self.assert_same_mesh(read_native(path), self.mesh)
+        np.testing.assert_array_equal(read_native(base).points, old_points)
+
+    def test_not_native(self):
+        self.assertFalse(is_native(os.path.join("data", "simple_mesh.inp")))
+
+        path = os.path.join(self.tmpdir.name, "project")
+        write_native(path, self.mesh)
+        manifest_path = os.path.join(path, "manifest.json")
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        manifest["version"] = 99
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f)
+        with self.assertRaises(ValueError):
+            read_native(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from abaqus_io import profiling
+from abaqus_io.deck_read import read_deck
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.deck = os.path.join("data", "simple_mesh.inp")
+
+    def test_sections_and_phases(self):
+        with profiling.profile() as prof:
+            mesh = read_deck(self.deck)
+        self.assertFalse(profiling.enabled())
+        totals = {(total["category"], total["name"]): total for total in prof.summary()}
+        self.assertEqual(totals["section", "NODE"]["rows"], len(mesh.points))
+        self.assertEqual(totals["section", "ELEMENT"]["rows"], sum(len(block) for block in mesh.cells))
+        self.assertGreater(totals["section", "NODE"]["bytes"], 0)
+        for name in ("sets", "concatenate", "merge", "validate"):
+            self.assertIn(("phase", name), totals)
+
+        # the sections of the included deck are within its INCLUDE section
+        include = next(span for span in prof.spans if span.name == "INCLUDE")
+        nested = [span for span in prof.spans if span.depth > include.depth and span.start >= include.start]
+        self.assertTrue(any(span.name == "NODE" for span in nested))
+        self.assertTrue(all(span.duration is not None for span in prof.spans))
+        self.assertIsNone(prof.memory_peak)
+
+    def test_memory(self):
+        with profiling.profile(memory=True) as prof:
+            read_deck(self.deck)
+        self.assertGreater(prof.memory_peak, 0)
+        self.assertTrue(all(span.memory_peak is not None for span in prof.spans))
+        include = next(span for span in prof.spans if span.name == "INCLUDE")
+        merge = next(span for span in prof.spans if span.name == "merge")
+        self.assertGreaterEqual(prof.memory_peak, max(include.memory_peak, merge.memory_peak))
+
+    def test_disabled(self):
+        span = profiling.begin("NODE", "section")
+        span.end(rows=1)
+        with profiling.phase("validate"):
+            pass
+        self.assertFalse(profiling.enabled())
+
+    def test_open_spans_end_with_profile(self):
+        with self.assertRaises(ValueError):
+            with profiling.profile() as prof:
+                outer = profiling.begin("outer")
+                profiling.begin("inner")
+                raise ValueError()
+        self.assertIsNotNone(outer.duration)
+        self.assertEqual([span.depth for span in prof.spans], [0, 1])
+
+    def test_trace(self):
+        with profiling.profile() as prof:
+            read_deck(self.deck)
+        trace = prof.to_trace()
+        self.assertEqual(len(trace["traceEvents"]), len(prof.spans))
+        event = next(event for event in trace["traceEvents"] if event["name"] == "NODE")
+        self.assertEqual(event["ph"], "X")
+        self.assertEqual(event["cat"], "section")
+        self.assertIn("rows", event["args"])
+
+    def test_environment_variable(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "trace.json")
+            with mock.patch.dict(os.environ, {profiling.PROFILE_ENV: path}):
+                read_deck(self.deck)
+            with open(path) as f:
+                trace = json.load(f)
+        names = {event["name"] for event in trace["traceEvents"]}
+        self.assertIn("ELEMENT", names)
+        self.assertIn("validate", names)
+
+
+if __name__ == "__main__":
+    unittest.main()
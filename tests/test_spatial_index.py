@@ -0,0 +1,74 @@
+import unittest
+import numpy as np
+
+from abaqus_io.spatial_index import SpatialIndex
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        self.points = rng.random((2000, 2))
+        self.index = SpatialIndex(self.points)
+
+    def brute_nearest(self, query, k):
+        dist = np.linalg.norm(self.points - query, axis=1)
+        return np.argsort(dist, kind="stable")[:k]
+
+    def test_in_box(self):
+        found = self.index.in_box([0.2, 0.3], [0.4, 0.35])
+        mask = np.all((self.points >= [0.2, 0.3]) & (self.points <= [0.4, 0.35]), axis=1)
+        np.testing.assert_array_equal(found, np.flatnonzero(mask))
+
+    def test_in_box_outside(self):
+        self.assertEqual(len(self.index.in_box([2.0, 2.0], [3.0, 3.0])), 0)
+
+    def test_nearest(self):
+        queries = np.array([[0.5, 0.5], [0.0, 0.0], [1.5, -0.5]])
+        distances, indices = self.index.nearest(queries, k=4)
+        self.assertEqual(indices.shape, (3, 4))
+        for query, row in zip(queries, indices):
+            np.testing.assert_array_equal(row, self.brute_nearest(query, 4))
+        self.assertTrue(np.all(np.diff(distances, axis=1) >= 0))
+
+    def test_nearest_more_than_available(self):
+        index = SpatialIndex([[0.0, 0.0], [1.0, 0.0]])
+        distances, indices = index.nearest([[0.1, 0.0]], k=3)
+        np.testing.assert_array_equal(indices[0], [0, 1, -1])
+        self.assertTrue(np.isinf(distances[0, 2]))
+
+    def test_within_radius(self):
+        query = np.array([0.3, 0.6])
+        found = self.index.within_radius([query], 0.05)[0]
+        dist = np.linalg.norm(self.points - query, axis=1)
+        self.assertEqual(set(found), set(np.flatnonzero(dist <= 0.05)))
+        self.assertTrue(np.all(np.diff(dist[found]) >= 0))
+
+    def test_update_moves_point(self):
+        self.index.update([7], [[5.0, 5.0]])
+        _, indices = self.index.nearest([[5.1, 5.0]], k=1)
+        self.assertEqual(indices[0, 0], 7)
+        self.assertNotIn(7, self.index.in_box([0.0, 0.0], [1.0, 1.0]))
+
+    def test_update_appends_point(self):
+        self.index.update([len(self.points)], [[-1.0, -1.0]])
+        self.assertEqual(len(self.index), len(self.points) + 1)
+        np.testing.assert_array_equal(
+            self.index.in_box([-2.0, -2.0], [-0.5, -0.5]), [len(self.points)]
+        )
+
+    def test_update_triggers_rebuild(self):
+        moved = np.arange(500)
+        self.index.update(moved, self.points[moved] + 0.001)
+        self.assertEqual(len(self.index._moved), 0)
+        _, indices = self.index.nearest([self.points[10] + 0.001], k=1)
+        self.assertEqual(indices[0, 0], 10)
+
+    def test_three_dimensional(self):
+        points = np.array([[0, 0, 0], [1, 0, 0], [0, 0, 1.0]])
+        index = SpatialIndex(points)
+        np.testing.assert_array_equal(index.in_box([-1, -1, 0.5], [1, 1, 2]), [2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import re
+import tempfile
+import unittest
+import zlib
+
+import numpy as np
+
+from abaqus_io.deck_read import read_deck
+from abaqus_io.element_block import ElementBlock
+from abaqus_io.mesh_io import Mesh
+from abaqus_io.vtu_write import write_vtu
+
+_DTYPES = {"UInt8": "<u1", "Int32": "<i4", "Int64": "<i8", "Float64": "<f8"}
+
+
+def read_vtu_arrays(path):
+    """Decodes the appended data arrays of a .vtu file by name."""
+    with open(path, "rb") as f:
+        content = f.read()
+    head, _, data = content.partition(b'<AppendedData encoding="raw">\n_')
+    head = head.decode()
+    compressed = "vtkZLibDataCompressor" in head
+
+    arrays = {}
+    pattern = r'<DataArray type="(\w+)" Name="([^"]+)"(?: NumberOfComponents="(\d+)")? format="appended" offset="(\d+)"/>'
+    for vtk_type, name, components, offset in re.findall(pattern, head):
+        offset = int(offset)
+        if compressed:
+            num_blocks = int(np.frombuffer(data, "<u8", 1, offset)[0])
+            sizes = np.frombuffer(data, "<u8", num_blocks, offset + 24)
+            start = offset + 24 + 8 * num_blocks
+            raw = b""
+            for size in sizes:
+                raw += zlib.decompress(data[start : start + int(size)])
+                start += int(size)
+        else:
+            size = int(np.frombuffer(data, "<u8", 1, offset)[0])
+            raw = data[offset + 8 : offset + 8 + size]
+        array = np.frombuffer(raw, _DTYPES[vtk_type])
+        arrays[name] = array.reshape(-1, int(components)) if components else array
+    return head, arrays
+
+
+class TestWriteVtu(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "mesh.vtu")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_simple_mesh(self):
+        mesh = read_deck(os.path.join("data", "simple_mesh.inp"))
+        for compress in (False, True):
+            with self.subTest(compress=compress):
+                write_vtu(self.path, mesh, compress=compress)
+                head, arrays = read_vtu_arrays(self.path)
+
+                self.assertIn('NumberOfPoints="12" NumberOfCells="4"', head)
+                np.testing.assert_array_equal(arrays["Points"], mesh.points)
+                np.testing.assert_array_equal(arrays["point_ids"], mesh.point_ids)
+                np.testing.assert_array_equal(arrays["element_ids"], [11, 2, 5, 8])
+                # node IDs become 0-based point indices
+                np.testing.assert_array_equal(
+                    arrays["connectivity"], [0, 1, 2, 0, 2, 3, 8, 1, 2, 9, 2, 3]
+                )
+                np.testing.assert_array_equal(arrays["offsets"], [3, 6, 9, 12])
+                np.testing.assert_array_equal(arrays["types"], [5, 5, 5, 5])
+                np.testing.assert_array_equal(arrays["left"], [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0])
+                np.testing.assert_array_equal(arrays["elem_set2"], [0, 0, 1, 1])
+
+    def test_mixed_blocks_and_large_arrays(self):
+        from abaqus_io import vtu_write
+
+        rng = np.random.default_rng(1)
+        points = rng.normal(size=(500, 3))
+        point_ids = (np.arange(500) * 3 + 7).tolist()
+        cells = [
+            ElementBlock("SFMGAX1", [1, 2], [[7, 10], [10, 13]]),
+            ElementBlock("CGAX4", np.arange(3, 203), rng.choice(point_ids, size=(200, 4))),
+        ]
+        mesh = Mesh(points, point_ids, cells)
+
+        block_size = vtu_write._BLOCK_SIZE
+        vtu_write._BLOCK_SIZE = 1000
+        try:
+            write_vtu(self.path, mesh, compress=9)
+        finally:
+            vtu_write._BLOCK_SIZE = block_size
+        _, arrays = read_vtu_arrays(self.path)
+
+        np.testing.assert_array_equal(arrays["Points"], points)
+        self.assertEqual(arrays["types"].tolist(), [3, 3] + [9] * 200)
+        self.assertEqual(arrays["offsets"][:3].tolist(), [2, 4, 8])
+        index = {pid: i for i, pid in enumerate(point_ids)}
+        expected = [index[pid] for pid in cells[1].connectivity.ravel()]
+        self.assertEqual(arrays["connectivity"][4:].tolist(), expected)
+
+    def test_undefined_node(self):
+        mesh = Mesh(np.zeros((2, 3)), [1, 2], [ElementBlock("SFMGAX1", [1], [[1, 3]])], validate_flag=False)
+        with self.assertRaises(ValueError):
+            write_vtu(self.path, mesh)
+
+
+if __name__ == "__main__":
+    unittest.main()